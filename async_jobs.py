@@ -0,0 +1,268 @@
+"""
+异步转换任务接口。
+
+在运行中的asyncio事件循环里调用start_conversion，转换在后台线程中执行(经run_visio_task，支持缓存)，
+立即返回ConversionJob：
+
+    job = start_conversion(目录, visio_to_word_export_png, separate_files=True)
+    async for event in job:          # FileStarted、PageExported、PageInserted、FileSaved……
+        print(event)
+    finished = await job.wait()      # JobFinished，status为"done"、"cancelled"或"failed"
+
+job.cancel()请求取消：正在转换的文件完成后停止。单独转换时已完成文件的输出保留，下次转换时由缓存跳过；
+合并输出时不写出不完整的合并文档，上次完整的output.docx(及分卷)保持不变，流式方式保留检查点供下次续写。
+
+事件由各转换函数的进度回调与阶段记录(tracing.span)产生，所有转换方式通用；
+多进程导出(worker_pool.py、supervisor.py)在工作进程中导出页面，没有PageExported事件。
+
+注意:
+- 阶段监听在进程内是全局的，同一进程中的转换任务依次执行，后启动的任务等待前一个结束
+- 每个任务的事件只能由一个消费者遍历
+"""
+import asyncio
+import threading
+import time
+
+import tracing
+from core import run_visio_task
+
+_run_lock = threading.Lock()
+
+
+class ConversionCancelled(Exception):
+    """转换已按请求取消"""
+
+
+class JobEvent:
+    """
+    转换事件的基类。
+
+    属性:
+        type (str): 事件类型
+        at (float): 事件发生时距任务开始的秒数
+        file (str): 相关的Visio文件，与文件无关时为None
+        page (int): 页码(从1开始)，与页面无关时为None
+        elapsed (float): 该阶段耗时(秒)，没有时为None
+    """
+
+    type = "event"
+
+    def __init__(self, at, file=None, page=None, elapsed=None):
+        self.at = at
+        self.file = file
+        self.page = page
+        self.elapsed = elapsed
+
+    def to_dict(self):
+        data = {"type": self.type}
+        data.update({k: v for k, v in vars(self).items() if v is not None})
+        return data
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items() if k != "type")
+        return f"{type(self).__name__}({fields})"
+
+
+class FileStarted(JobEvent):
+    """开始转换一个文件，index为序号(从1开始)，total为本次转换的文件数"""
+
+    type = "file_started"
+
+    def __init__(self, at, file, index, total):
+        super().__init__(at, file)
+        self.index = index
+        self.total = total
+
+
+class PageExported(JobEvent):
+    """一页已从Visio导出为图片"""
+
+    type = "page_exported"
+
+
+class PageInserted(JobEvent):
+    """一页图片已插入文档"""
+
+    type = "page_inserted"
+
+
+class FileSaved(JobEvent):
+    """一个文件的全部页面已写入(单独转换时已保存为文档)，elapsed为该文件的总耗时"""
+
+    type = "file_saved"
+
+
+class DocumentSaved(JobEvent):
+    """本次转换的文档已全部保存(合并文档写出到磁盘)"""
+
+    type = "document_saved"
+
+
+class JobError(JobEvent):
+    """转换出错：file为空表示整个任务失败，否则为被跳过(隔离)的文件"""
+
+    type = "error"
+
+    def __init__(self, at, message, file=None):
+        super().__init__(at, file)
+        self.message = message
+
+
+class JobFinished(JobEvent):
+    """
+    任务结束，总是最后一个事件。
+
+    属性:
+        status (str): "done"完成、"cancelled"已取消、"failed"失败
+        stats (dict): run_visio_task填写的统计信息
+        result: 转换函数的返回值
+    """
+
+    type = "finished"
+
+    def __init__(self, at, status, stats, result=None):
+        super().__init__(at, elapsed=at)
+        self.status = status
+        self.stats = stats
+        self.result = result
+
+    def to_dict(self):
+        data = super().to_dict()
+        data.pop("result", None)
+        return data
+
+
+class ConversionJob:
+    """
+    一次异步转换的句柄，由start_conversion创建。
+
+    属性:
+        status (str): "queued"等待前一个任务、"running"、"done"、"cancelled"或"failed"
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._events = asyncio.Queue()
+        self._finished = loop.create_future()
+        self._cancel_event = threading.Event()
+        self.status = "queued"
+
+    def cancel(self):
+        """请求取消(可在任意线程调用)，当前文件完成后停止"""
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def done(self):
+        return self._finished.done()
+
+    async def wait(self):
+        """等待任务结束，返回JobFinished事件"""
+        return await asyncio.shield(self._finished)
+
+    async def events(self):
+        """逐个返回事件，JobFinished之后结束"""
+        while True:
+            event = await self._events.get()
+            yield event
+            if isinstance(event, JobFinished):
+                return
+
+    def __aiter__(self):
+        return self.events()
+
+    def _emit(self, event):
+        """在转换线程中调用，把事件交给事件循环"""
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, event)
+        except RuntimeError:
+            pass  # 事件循环已关闭，没有人再等待事件，转换照常进行到结束
+
+    def _deliver(self, event):
+        self._events.put_nowait(event)
+        if isinstance(event, JobFinished) and not self._finished.done():
+            self._finished.set_result(event)
+
+    def _run(self, visio_dir, func, args, kwargs):
+        user_progress = kwargs.pop("update_progress", None)
+        with _run_lock:
+            start = time.perf_counter()
+            file_starts = {}
+
+            def now():
+                return time.perf_counter() - start
+
+            def handle_progress(filename, current, total):
+                # 在开始每个文件之前检查取消请求，已完成的文件不受影响
+                if self._cancel_event.is_set():
+                    raise ConversionCancelled()
+                file_starts[filename] = time.perf_counter()
+                self._emit(FileStarted(now(), filename, current, total))
+                if user_progress:
+                    user_progress(filename, current, total)
+
+            def on_span(phase, name, span_args, elapsed):
+                if phase != "end":
+                    return
+                filename = span_args.get("file")
+                if name == "export":
+                    self._emit(PageExported(now(), filename, span_args.get("page"), elapsed))
+                elif name == "insert":
+                    self._emit(PageInserted(now(), filename, span_args.get("page"), elapsed))
+                elif name == "end_file":
+                    begin = file_starts.pop(filename, None)
+                    file_elapsed = time.perf_counter() - begin if begin else elapsed
+                    self._emit(FileSaved(now(), filename, elapsed=file_elapsed))
+                elif name == "save":
+                    self._emit(DocumentSaved(now(), elapsed=elapsed))
+
+            stats = {}
+            result = None
+            if self._cancel_event.is_set():
+                status = "cancelled"
+            else:
+                self.status = "running"
+                tracing.add_listener(on_span)
+                try:
+                    result = run_visio_task(
+                        visio_dir,
+                        func,
+                        *args,
+                        stats=stats,
+                        update_progress=handle_progress,
+                        **kwargs,
+                    )
+                    status = "done"
+                    if isinstance(result, dict):
+                        for failure in result.get("failed", []):
+                            self._emit(JobError(now(), failure["error"], failure["file"]))
+                except ConversionCancelled:
+                    status = "cancelled"
+                except Exception as e:
+                    status = "failed"
+                    self._emit(JobError(now(), str(e)))
+                finally:
+                    tracing.remove_listener(on_span)
+            self.status = status
+            self._emit(JobFinished(now(), status, stats, result))
+
+
+def start_conversion(visio_dir, func, *args, **kwargs):
+    """
+    在后台线程中启动转换，返回ConversionJob。必须在运行中的事件循环里调用。
+
+    参数:
+        visio_dir (str): Visio文件所在目录
+        func (callable): 转换函数，如visio_to_word_export_png
+        *args, **kwargs: 透传给run_visio_task(force、files、kill_processes等)与转换函数的参数；
+            update_progress仍会被调用
+
+    返回:
+        ConversionJob: 任务句柄
+    """
+    job = ConversionJob(asyncio.get_running_loop())
+    # 不设为守护线程：程序退出前等待转换线程结束，以便正常关闭Visio/Word；需要尽快退出时先调用cancel
+    threading.Thread(target=job._run, args=(visio_dir, func, args, dict(kwargs))).start()
+    return job
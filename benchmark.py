@@ -0,0 +1,446 @@
+"""
+转换性能基准测试。
+
+使用fake_office模拟的Visio/Word对象(可配置各操作耗时与失败率)和合成的.vsdx样本，
+分别测量各转换函数与执行方式的每秒文件数、每秒页数和峰值内存，不需要Windows与Office。
+
+用法:
+    python benchmark.py                          # 默认small样本、typical耗时
+    python benchmark.py --corpus medium --profile none --cases export_png/docx pipelined/com
+    python benchmark.py --fail Export=0.01 --json result.json
+
+每个用例在独立的子进程中运行，峰值内存(RSS)互不影响；并行用例包含其工作进程。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+
+# 合成样本规模: 名称 -> (文件数, 每个文件页数, 每页形状数)
+CORPORA = {
+    "small": (10, 2, 20),
+    "medium": (40, 5, 100),
+    "large": (100, 10, 300),
+}
+
+# 模拟耗时(秒): Visio打开/每页导出/复制/每次跨进程调用，Word插入/粘贴/保存
+LATENCY_PROFILES = {
+    "none": {},
+    "typical": {
+        "open_latency": 0.05,
+        "page_latency": 0.02,
+        "copy_latency": 0.01,
+        "call_latency": 0.01,
+        "insert_latency": 0.005,
+        "paste_latency": 0.01,
+        "save_latency": 0.05,
+    },
+}
+
+_VISIO_OPTIONS = ("open_latency", "page_latency", "copy_latency", "call_latency")
+_WORD_OPTIONS = ("insert_latency", "paste_latency", "save_latency")
+_VISIO_FAILURES = ("Open", "Export", "Copy")
+
+_NS = 'xmlns="http://schemas.microsoft.com/office/visio/2012/main" '
+_R_NS = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_PKG_RELS = '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+_REL_BASE = "http://schemas.microsoft.com/visio/2010/relationships/"
+
+
+def _shape_xml(shape_id, rng, page_width, page_height):
+    width = round(rng.uniform(0.5, 2.0), 3)
+    height = round(rng.uniform(0.3, 1.2), 3)
+    pin_x = round(rng.uniform(width / 2, page_width - width / 2), 3)
+    pin_y = round(rng.uniform(height / 2, page_height - height / 2), 3)
+    return (
+        f'<Shape ID="{shape_id}" Type="Shape" Master="1">'
+        f'<Cell N="PinX" V="{pin_x}"/><Cell N="PinY" V="{pin_y}"/>'
+        f'<Cell N="Width" V="{width}"/><Cell N="Height" V="{height}"/>'
+        f'<Cell N="LocPinX" V="{width / 2}" F="Width*0.5"/>'
+        f'<Cell N="LocPinY" V="{height / 2}" F="Height*0.5"/>'
+        '<Section N="Geometry" IX="0">'
+        '<Row T="MoveTo" IX="1"><Cell N="X" V="0"/><Cell N="Y" V="0"/></Row>'
+        f'<Row T="LineTo" IX="2"><Cell N="X" V="{width}"/><Cell N="Y" V="0"/></Row>'
+        f'<Row T="LineTo" IX="3"><Cell N="X" V="{width}"/><Cell N="Y" V="{height}"/></Row>'
+        f'<Row T="LineTo" IX="4"><Cell N="X" V="0"/><Cell N="Y" V="{height}"/></Row>'
+        '<Row T="LineTo" IX="5"><Cell N="X" V="0"/><Cell N="Y" V="0"/></Row>'
+        "</Section>"
+        f"<Text>步骤{shape_id}</Text>"
+        "</Shape>"
+    )
+
+
+def write_synthetic_vsdx(path, pages=2, shapes_per_page=20, seed=0):
+    """
+    生成一个结构完整的合成.vsdx文件。
+
+    每页包含指定数量的带几何与文字的矩形形状，并引用同一个母版，
+    页面名称为"Page-1"、"Page-2"……，形状位置由seed决定。
+
+    参数:
+        path (str): 输出路径
+        pages (int): 页数
+        shapes_per_page (int): 每页形状数
+        seed (int): 随机种子，相同种子生成相同内容
+    """
+    rng = random.Random(seed)
+    page_width, page_height = 11.69, 8.27  # A4横向(英寸)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr(
+            "[Content_Types].xml",
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/visio/document.xml" ContentType="application/vnd.ms-visio.drawing.main+xml"/>'
+            "</Types>",
+        )
+        package.writestr(
+            "_rels/.rels",
+            _PKG_RELS
+            + '<Relationship Id="rId1" Type="http://schemas.microsoft.com/visio/2010/relationships/document" '
+            'Target="visio/document.xml"/></Relationships>',
+        )
+        package.writestr(
+            "visio/document.xml", f"<VisioDocument {_NS}{_R_NS}><DocumentSettings/></VisioDocument>"
+        )
+        package.writestr(
+            "visio/_rels/document.xml.rels",
+            _PKG_RELS
+            + f'<Relationship Id="rId1" Type="{_REL_BASE}pages" Target="pages/pages.xml"/>'
+            + f'<Relationship Id="rId2" Type="{_REL_BASE}masters" Target="masters/masters.xml"/>'
+            + "</Relationships>",
+        )
+        package.writestr(
+            "visio/masters/masters.xml",
+            f'<Masters {_NS}{_R_NS}><Master ID="1" NameU="Process" Name="流程">'
+            '<Rel r:id="rId1"/></Master></Masters>',
+        )
+        package.writestr(
+            "visio/masters/_rels/masters.xml.rels",
+            _PKG_RELS
+            + f'<Relationship Id="rId1" Type="{_REL_BASE}master" Target="master1.xml"/>'
+            + "</Relationships>",
+        )
+        package.writestr(
+            "visio/masters/master1.xml",
+            f'<MasterContents {_NS}{_R_NS}><Shapes><Shape ID="5" Type="Shape">'
+            '<Cell N="LineWeight" V="0.01"/></Shape></Shapes></MasterContents>',
+        )
+
+        page_items = []
+        page_rels = []
+        for number in range(1, pages + 1):
+            page_items.append(
+                f'<Page ID="{number - 1}" NameU="Page-{number}" Name="Page-{number}">'
+                f'<PageSheet><Cell N="PageWidth" V="{page_width}"/>'
+                f'<Cell N="PageHeight" V="{page_height}"/></PageSheet>'
+                f'<Rel r:id="rId{number}"/></Page>'
+            )
+            page_rels.append(
+                f'<Relationship Id="rId{number}" Type="{_REL_BASE}page" '
+                f'Target="page{number}.xml"/>'
+            )
+            shapes = "".join(
+                _shape_xml(shape_id, rng, page_width, page_height)
+                for shape_id in range(1, shapes_per_page + 1)
+            )
+            package.writestr(
+                f"visio/pages/page{number}.xml",
+                f"<PageContents {_NS}{_R_NS}><Shapes>{shapes}</Shapes></PageContents>",
+            )
+            package.writestr(
+                f"visio/pages/_rels/page{number}.xml.rels",
+                _PKG_RELS
+                + f'<Relationship Id="rId1" Type="{_REL_BASE}master" '
+                'Target="../masters/master1.xml"/></Relationships>',
+            )
+        package.writestr(
+            "visio/pages/pages.xml", f"<Pages {_NS}{_R_NS}>{''.join(page_items)}</Pages>"
+        )
+        package.writestr(
+            "visio/pages/_rels/pages.xml.rels", _PKG_RELS + "".join(page_rels) + "</Relationships>"
+        )
+
+
+def build_corpus(root, name="small"):
+    """
+    在root下生成指定规模的合成样本目录。
+
+    返回:
+        tuple: (样本目录, 文件名列表, 总页数)
+    """
+    files, pages, shapes = CORPORA[name]
+    corpus_dir = os.path.join(root, name)
+    os.makedirs(corpus_dir, exist_ok=True)
+    file_list = []
+    for i in range(files):
+        filename = f"diagram_{i + 1:04d}.vsdx"
+        write_synthetic_vsdx(os.path.join(corpus_dir, filename), pages, shapes, seed=i)
+        file_list.append(filename)
+    return corpus_dir, file_list, files * pages
+
+
+def _clean_outputs(visio_dir):
+    """删除上一个用例生成的输出"""
+    for name in os.listdir(visio_dir):
+        path = os.path.join(visio_dir, name)
+        if name == "Converted_Files" or name.endswith(".parts"):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name.startswith(("output", "temp_")):
+            os.remove(path)
+
+
+def _case_export_png(doc_backend, separate_files=False, bulk_export=False):
+    def run(visio_dir, file_list, visio_factory, office_factory):
+        from core import visio_to_word_export_png
+
+        visio_to_word_export_png(
+            visio_dir,
+            file_list,
+            separate_files=separate_files,
+            visio_factory=visio_factory,
+            office_factory=office_factory,
+            use_page_cache=False,
+            doc_backend=doc_backend,
+            bulk_export=bulk_export,
+        )
+
+    return run
+
+
+def _case_export_vector(doc_backend, vector_format="svg"):
+    def run(visio_dir, file_list, visio_factory, office_factory):
+        from core import visio_to_word_export_vector
+
+        visio_to_word_export_vector(
+            visio_dir,
+            file_list,
+            visio_factory=visio_factory,
+            office_factory=office_factory,
+            use_page_cache=False,
+            doc_backend=doc_backend,
+            vector_format=vector_format,
+        )
+
+    return run
+
+
+def _case_pipelined(doc_backend):
+    def run(visio_dir, file_list, visio_factory, office_factory):
+        from pipeline import visio_to_word_export_png_pipelined
+
+        visio_to_word_export_png_pipelined(
+            visio_dir,
+            file_list,
+            visio_factory=visio_factory,
+            office_factory=office_factory,
+            use_page_cache=False,
+            doc_backend=doc_backend,
+        )
+
+    return run
+
+
+def _case_parallel(workers, doc_backend):
+    def run(visio_dir, file_list, visio_factory, office_factory):
+        from worker_pool import visio_to_word_export_png_parallel
+
+        visio_to_word_export_png_parallel(
+            visio_dir,
+            file_list,
+            workers=workers,
+            visio_factory=visio_factory,
+            office_factory=office_factory,
+            use_page_cache=False,
+            doc_backend=doc_backend,
+        )
+
+    return run
+
+
+def _run_copy_paste(visio_dir, file_list, visio_factory, office_factory):
+    from core import visio_to_word_copy_paste
+
+    visio_to_word_copy_paste(
+        visio_dir, file_list, visio_factory=visio_factory, office_factory=office_factory
+    )
+
+
+def _run_images(visio_dir, file_list, visio_factory, office_factory):
+    from core import visio_to_images
+
+    if not visio_to_images(visio_dir, file_list, visio_factory=visio_factory, use_page_cache=False):
+        raise Exception("导出图片失败")
+
+
+CASES = {
+    "export_png/docx": _case_export_png("docx"),
+    "export_png/com": _case_export_png("com"),
+    "export_png/stream": _case_export_png("stream"),
+    "export_png/docx-separate": _case_export_png("docx", separate_files=True),
+    "export_png/docx-bulk": _case_export_png("docx", bulk_export=True),
+    "export_vector/docx": _case_export_vector("docx"),
+    "export_vector/stream": _case_export_vector("stream"),
+    "export_vector/docx-emf": _case_export_vector("docx", "emf"),
+    "pipelined/docx": _case_pipelined("docx"),
+    "pipelined/com": _case_pipelined("com"),
+    "parallel-2/docx": _case_parallel(2, "docx"),
+    "parallel-4/docx": _case_parallel(4, "docx"),
+    "copy_paste": _run_copy_paste,
+    "images": _run_images,
+}
+
+
+def peak_rss_bytes():
+    """
+    返回当前进程及其已结束子进程的峰值常驻内存(字节)，无法获取时返回None。
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset
+
+    usage = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux以KB为单位，macOS以字节为单位
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def _case_process(case, visio_dir, file_list, visio_options, word_options, result_queue):
+    result = {"case": case, "error": None}
+    start_time = time.perf_counter()
+    try:
+        CASES[case](
+            visio_dir,
+            file_list,
+            FakeVisioFactory(**visio_options),
+            FakeOfficeFactory(**word_options),
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed"] = time.perf_counter() - start_time
+    result["peak_rss"] = peak_rss_bytes()
+    result_queue.put(result)
+
+
+def run_case(case, visio_dir, file_list, total_pages, visio_options, word_options):
+    """
+    在独立子进程中运行一个用例。
+
+    返回:
+        dict: case、elapsed、files_per_sec、pages_per_sec、peak_rss(字节)和error
+    """
+    _clean_outputs(visio_dir)
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(
+        target=_case_process,
+        args=(case, visio_dir, file_list, visio_options, word_options, result_queue),
+    )
+    process.start()
+    result = result_queue.get()
+    process.join()
+
+    elapsed = result["elapsed"]
+    result["files_per_sec"] = len(file_list) / elapsed if elapsed > 0 else 0.0
+    result["pages_per_sec"] = total_pages / elapsed if elapsed > 0 else 0.0
+    return result
+
+
+def run_benchmark(corpus="small", profile="typical", cases=None, failures=None, root=None):
+    """
+    生成样本并依次运行各用例。
+
+    参数:
+        corpus (str): 样本规模，见CORPORA
+        profile (str): 模拟耗时方案，见LATENCY_PROFILES
+        cases (list, 可选): 要运行的用例名称，默认全部
+        failures (dict, 可选): 注入失败的概率，如{"Export": 0.01}
+        root (str, 可选): 样本所在目录，默认使用临时目录并在结束后删除
+
+    返回:
+        list: 每个用例的结果
+    """
+    latency = LATENCY_PROFILES[profile]
+    failures = failures or {}
+    visio_options = {k: v for k, v in latency.items() if k in _VISIO_OPTIONS}
+    word_options = {k: v for k, v in latency.items() if k in _WORD_OPTIONS}
+    visio_options["failures"] = {k: v for k, v in failures.items() if k in _VISIO_FAILURES}
+    word_options["failures"] = {k: v for k, v in failures.items() if k not in _VISIO_FAILURES}
+
+    temp_root = None
+    if root is None:
+        root = temp_root = tempfile.mkdtemp(prefix="v2w_bench_")
+    try:
+        visio_dir, file_list, total_pages = build_corpus(root, corpus)
+        results = []
+        for case in cases or list(CASES):
+            print(f"运行 {case} ...", flush=True)
+            results.append(
+                run_case(case, visio_dir, file_list, total_pages, visio_options, word_options)
+            )
+        return results
+    finally:
+        if temp_root:
+            shutil.rmtree(temp_root, ignore_errors=True)
+
+
+def print_results(results):
+    print()
+    print(f"{'用例':<26}{'文件/秒':>10}{'页/秒':>10}{'用时(秒)':>10}{'峰值内存(MB)':>14}  结果")
+    for result in results:
+        rss = result["peak_rss"]
+        rss_text = f"{rss / 1024 / 1024:.1f}" if rss else "-"
+        print(
+            f"{result['case']:<26}{result['files_per_sec']:>10.2f}"
+            f"{result['pages_per_sec']:>10.2f}{result['elapsed']:>10.2f}"
+            f"{rss_text:>14}  {result['error'] or '成功'}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="使用模拟后端测量各转换方式的吞吐")
+    parser.add_argument("--corpus", choices=sorted(CORPORA), default="small")
+    parser.add_argument("--profile", choices=sorted(LATENCY_PROFILES), default="typical")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), help="默认运行全部用例")
+    parser.add_argument(
+        "--fail",
+        action="append",
+        default=[],
+        metavar="操作=概率",
+        help="注入失败，如Export=0.01，可指定多次",
+    )
+    parser.add_argument("--root", help="样本生成目录，默认使用临时目录")
+    parser.add_argument("--json", help="把结果另存为JSON文件")
+    args = parser.parse_args(argv)
+
+    failures = {}
+    for item in args.fail:
+        operation, _, rate = item.partition("=")
+        failures[operation] = float(rate)
+
+    results = run_benchmark(args.corpus, args.profile, args.cases, failures, args.root)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+    return 1 if any(result["error"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+整个文档一次导出页面图片。
+
+逐页调用page.Export时每页至少一次跨进程COM调用，页数多的文件中这部分开销占主要时间。
+批量模式通过Visio的"另存为网页"(SaveAsWebObject)在一次操作中把所有页面输出为PNG，
+再在本地按页码拆分为与逐页导出相同的临时图片。
+
+注意:
+- 另存为网页的图片分辨率由Visio的网页设置决定，可能与page.Export的结果不同
+- 输出的图片数与页数不一致(如文档包含背景页)时，缺少的页面改为逐页导出
+- 页面缓存仍然有效：全部页面命中缓存时不调用Visio导出
+"""
+import os
+import re
+import shutil
+
+from core import export_page, page_key_settings, temp_image_path
+from page_cache import vsdx_page_keys
+from tracing import span
+
+WEB_PAGE_NAME = "pages.htm"
+WEB_FILES_DIR = "pages_files"
+
+
+def _natural_key(name):
+    """按文件名中的数字大小排序，使page_10排在page_9之后"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def export_document_images(visio_app, visio_doc, work_dir):
+    """
+    通过另存为网页一次导出文档的全部页面。
+
+    参数:
+        visio_app: Visio应用程序实例
+        visio_doc: 已打开的Visio文档
+        work_dir (str): 存放网页输出的空目录
+
+    返回:
+        list: 按页码排序的PNG图片路径
+    """
+    save_as_web = visio_app.SaveAsWebObject
+    settings = save_as_web.WebPageSettings
+    settings.TargetPath = os.path.join(work_dir, WEB_PAGE_NAME)
+    settings.PriFormat = "PNG"
+    settings.StartPage = 1
+    settings.EndPage = visio_doc.Pages.Count
+    # 只输出页面图片：不生成导航栏、缩放、搜索和属性控件，不弹出任何界面
+    settings.NavBar = False
+    settings.PanAndZoom = False
+    settings.Search = False
+    settings.PropControl = False
+    settings.OpenBrowser = False
+    settings.SilentMode = True
+    settings.QuietMode = True
+    save_as_web.AttachToVisioDoc(visio_doc)
+    save_as_web.CreatePages()
+
+    files_dir = os.path.join(work_dir, WEB_FILES_DIR)
+    names = [name for name in os.listdir(files_dir) if name.lower().endswith(".png")]
+    return [os.path.join(files_dir, name) for name in sorted(names, key=_natural_key)]
+
+
+def export_pages_bulk(visio_app, visio_dir, filename, page_cache=None, temp_dir=None):
+    """
+    打开Visio文件，一次导出全部页面后逐页产出临时PNG图片，用法同core.export_pages。
+
+    返回:
+        generator: 逐页产出(临时图片路径, 是否最后一页)，图片由调用方负责删除
+    """
+    temp_dir = temp_dir or visio_dir
+    visio_file_path = os.path.normpath(os.path.join(visio_dir, filename))
+    page_keys = (
+        vsdx_page_keys(visio_file_path, page_key_settings(visio_app, "png"))
+        if page_cache
+        else None
+    )
+    with span("open", file=filename):
+        visio_doc = visio_app.Documents.Open(visio_file_path)
+    work_dir = temp_image_path(temp_dir, filename, 0, "web")
+    image_paths = []
+    handed_over = 0  # 已交给调用方的图片数，其余图片在结束时删除
+    try:
+        pages = list(visio_doc.Pages)
+        image_paths = [
+            temp_image_path(temp_dir, filename, i + 1) for i in range(len(pages))
+        ]
+        keys = [
+            page_keys.get(page.NameU) if page_keys else None for page in pages
+        ]
+        missing = [
+            i
+            for i, key in enumerate(keys)
+            if key is None or not page_cache.fetch(key, image_paths[i])
+        ]
+
+        if missing:
+            os.makedirs(work_dir, exist_ok=True)
+            with span("bulk_export", file=filename, pages=len(pages)):
+                exported = export_document_images(visio_app, visio_doc, work_dir)
+            if len(exported) != len(pages):
+                print(
+                    f"批量导出得到{len(exported)}张图片，与页数{len(pages)}不一致，"
+                    f"改为逐页导出: {filename}"
+                )
+                exported = None
+            for i in missing:
+                with span("export", file=filename, page=i + 1):
+                    if exported is None:
+                        export_page(pages[i], image_paths[i])
+                    else:
+                        shutil.move(exported[i], image_paths[i])
+                    if keys[i] is not None:
+                        page_cache.store(keys[i], image_paths[i])
+
+        for i, image_path in enumerate(image_paths):
+            handed_over = i + 1
+            yield image_path, i == len(pages) - 1
+    finally:
+        for image_path in image_paths[handed_over:]:
+            if os.path.exists(image_path):
+                os.remove(image_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        with span("close", file=filename):
+            visio_doc.Close()
@@ -0,0 +1,616 @@
+"""
+命令行批量转换。
+
+按清单文件(TOML或JSON)依次转换多个目录，所有任务共用同一个Visio/Word会话，
+结束后打印每个目录的汇总，任一任务失败时以非零状态退出，便于计划任务调用。
+watch子命令转换后持续监视各目录(见watcher.py)，文件变化时只重新转换变化的文件。
+merge子命令把目录中已单独转换的文档直接拼接为output.docx(见docx_patch.py)，不再启动Visio/Word。
+enqueue/worker子命令通过任务队列在多台主机上分布式转换(见job_queue.py)。
+
+清单示例(TOML):
+
+    [defaults]
+    method = "export_png"      # export_png / export_png_supervised / export_vector / multi / copy_paste / images
+    separate_files = true
+    word_processor = "Word"
+    doc_backend = "docx"       # 仅export_png与export_vector使用
+    bulk_export = false        # 仅export_png使用，每个文件一次导出全部页面
+    vector_format = "svg"      # 仅export_vector使用，svg或emf
+    targets = ["merged", "separate", "images"]  # 仅multi使用，每页只导出一次同时生成这些输出
+    image_format = "PNG"       # 仅images与multi使用
+    force = false
+
+    [[jobs]]
+    dir = "D:/SOP/财务SOP/应付管理"
+
+    [[jobs]]
+    dir = "D:/SOP/制造SOP/销售管理"
+    output_dir = "D:/输出/销售管理"
+    files = ["销售订单.vsdx"]
+    separate_files = false
+
+相对路径相对于清单文件所在目录。
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import tracing
+from async_jobs import ConversionCancelled
+from config import DAEMON_PORT, DAEMON_RECYCLE_JOBS, QUEUE_PATH
+from core import (
+    com_initialize,
+    com_uninitialize,
+    kill_visio_processes,
+    kill_word_processes,
+    run_visio_task,
+    uses_office_app,
+    visio_to_images,
+    visio_to_multi_targets,
+    visio_to_word_copy_paste,
+    visio_to_word_export_png,
+    visio_to_word_export_vector,
+)
+from scanner import scan_visio_files
+from session import AppSession
+from supervisor import visio_to_word_export_png_supervised
+from watcher import DirectoryWatcher
+
+try:
+    import tomllib
+except ImportError:  # Python 3.11以下
+    tomllib = None
+
+# 转换方式 -> (转换函数, 该方式可用的任务选项)
+METHODS = {
+    "export_png": (
+        visio_to_word_export_png,
+        (
+            "separate_files",
+            "word_processor",
+            "doc_backend",
+            "volume_pages",
+            "volume_bytes",
+            "bulk_export",
+        ),
+    ),
+    "export_png_supervised": (
+        visio_to_word_export_png_supervised,
+        (
+            "separate_files",
+            "word_processor",
+            "doc_backend",
+            "volume_pages",
+            "volume_bytes",
+            "file_timeout",
+            "page_timeout",
+            "retries",
+        ),
+    ),
+    "export_vector": (
+        visio_to_word_export_vector,
+        (
+            "separate_files",
+            "word_processor",
+            "doc_backend",
+            "volume_pages",
+            "volume_bytes",
+            "vector_format",
+        ),
+    ),
+    "multi": (
+        visio_to_multi_targets,
+        (
+            "targets",
+            "image_format",
+            "word_processor",
+            "doc_backend",
+            "volume_pages",
+            "volume_bytes",
+        ),
+    ),
+    "copy_paste": (
+        visio_to_word_copy_paste,
+        ("separate_files", "word_processor", "volume_pages"),
+    ),
+    "images": (visio_to_images, ("image_format", "word_processor")),
+}
+
+DEFAULT_JOB = {
+    "method": "export_png",
+    "separate_files": False,
+    "word_processor": "Word",
+    "force": False,
+}
+
+
+def load_manifest(path):
+    """
+    读取清单文件并展开为任务列表。
+
+    参数:
+        path (str): 清单路径，扩展名为.toml时按TOML解析，否则按JSON解析
+
+    返回:
+        list: 每个任务的选项字典，已合并defaults并把dir/output_dir转换为绝对路径
+    """
+    if path.lower().endswith(".toml"):
+        if tomllib is None:
+            raise Exception("当前Python版本不支持TOML清单，请使用JSON格式")
+        with open(path, "rb") as f:
+            manifest = tomllib.load(f)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = manifest.get("defaults", {})
+    jobs = []
+    for i, entry in enumerate(manifest.get("jobs", [])):
+        try:
+            jobs.append(normalize_job(entry, defaults, base_dir))
+        except Exception as e:
+            raise Exception(f"清单第{i + 1}个任务无效: {e}")
+    return jobs
+
+
+def normalize_job(entry, defaults=None, base_dir=None):
+    """
+    合并默认选项并检查任务，dir/output_dir相对于base_dir转换为绝对路径。
+
+    返回:
+        dict: 规范化后的任务
+    """
+    job = dict(DEFAULT_JOB, **(defaults or {}))
+    job.update(entry)
+    if "dir" not in job:
+        raise Exception("缺少dir")
+    if job["method"] not in METHODS:
+        raise Exception(f"转换方式无效: {job['method']}")
+    base_dir = base_dir or os.getcwd()
+    job["dir"] = os.path.join(base_dir, job["dir"])
+    if job.get("output_dir"):
+        job["output_dir"] = os.path.join(base_dir, job["output_dir"])
+    return job
+
+
+def job_function(job):
+    """
+    返回执行任务的转换函数及其参数。
+
+    返回:
+        tuple: (转换函数, 透传给run_visio_task的参数)，不含应用实例工厂
+    """
+    func, option_names = METHODS[job["method"]]
+    kwargs = {name: job[name] for name in option_names if name in job}
+    if job.get("output_dir"):
+        kwargs["output_dir"] = job["output_dir"]
+    return func, kwargs
+
+
+def run_job(job, session, force=False, update_progress=None):
+    """
+    在给定会话中执行一个清单任务。
+
+    参数:
+        job (dict): load_manifest返回的任务
+        session (AppSession): 应用会话
+        force (bool): 忽略缓存强制重新转换
+        update_progress (function, 可选): 进度回调函数，格式为func(文件名, 当前序号, 总数)，
+            抛出ConversionCancelled时在下一个文件开始前取消任务
+
+    返回:
+        dict: 汇总信息，包括dir、status("成功"/"跳过"/"失败"/"已取消")、统计数据、耗时和错误
+    """
+    func, kwargs = job_function(job)
+    kwargs["visio_factory"] = session.visio_factory
+    if func is visio_to_word_export_png_supervised:
+        # 在工作进程中启动并在超时后结束自己的Visio实例，不能使用会话中的实例
+        kwargs["visio_factory"] = session.process_visio_factory
+    if func is not visio_to_images:
+        kwargs["office_factory"] = session.office_factory
+
+    summary = {"dir": job["dir"], "status": "成功", "error": None}
+    stats = {}
+    start_time = time.perf_counter()
+    try:
+        if not os.path.isdir(job["dir"]):
+            raise Exception("目录不存在")
+        result = run_visio_task(
+            job["dir"],
+            func,
+            force=force or job.get("force", False),
+            use_cache=job.get("use_cache", True),
+            kill_processes=False,
+            files=job.get("files"),
+            stats=stats,
+            update_progress=update_progress,
+            **kwargs,
+        )
+        if func is visio_to_images and stats.get("converted") and not result:
+            raise Exception("导出图片失败")
+        if isinstance(result, dict) and result.get("failed"):
+            failed = [failure["file"] for failure in result["failed"]]
+            raise Exception(f"{len(failed)}个文件已隔离: {', '.join(failed)}")
+        if not stats.get("converted"):
+            summary["status"] = "跳过"
+    except ConversionCancelled:
+        summary["status"] = "已取消"
+        session.reset()  # 取消时转换中途停止，不把未完成的文档留在常驻的应用中
+    except Exception as e:
+        summary["status"] = "失败"
+        summary["error"] = str(e)
+        session.reset()  # 出错后应用可能已不可用，下一个任务重新启动
+    summary.update(stats)
+    summary["elapsed"] = time.perf_counter() - start_time
+    return summary
+
+
+def kill_job_processes(jobs):
+    """终止已有的Visio进程，以及任务会用到的Word/WPS进程"""
+    kill_visio_processes()
+    for word_processor in sorted(
+        {
+            job["word_processor"]
+            for job in jobs
+            if uses_office_app(job["method"], job.get("doc_backend"))
+        }
+    ):
+        kill_word_processes(word_processor)
+
+
+def run_jobs(
+    jobs, force=False, kill_processes=True, visio_factory=None, office_factory=None
+):
+    """
+    在同一个应用会话中依次执行任务。
+
+    参数:
+        jobs (list): load_manifest返回的任务列表
+        force (bool): 忽略缓存，强制重新转换全部任务
+        kill_processes (bool): 开始前是否终止已有的Visio/Word进程(只执行一次)
+        visio_factory, office_factory (function, 可选): 创建应用实例的函数，
+            默认启动真实的Visio与Word/WPS
+
+    返回:
+        list: 每个任务的汇总信息
+    """
+    if kill_processes:
+        kill_job_processes(jobs)
+
+    summaries = []
+    com_initialize()
+    try:
+        with AppSession(visio_factory, office_factory) as session:
+            for idx, job in enumerate(jobs):
+                print(f"[{idx + 1}/{len(jobs)}] {job['dir']}")
+                summaries.append(run_job(job, session, force))
+    finally:
+        com_uninitialize()
+    return summaries
+
+
+def watch_jobs(
+    jobs,
+    kill_processes=True,
+    visio_factory=None,
+    office_factory=None,
+    polling=None,
+    stop_event=None,
+):
+    """
+    先转换一次全部任务，之后持续监视各任务的目录，文件变化时重新转换。
+
+    参数:
+        jobs (list): load_manifest返回的任务列表
+        kill_processes (bool): 开始前是否终止已有的Visio/Word进程(只执行一次)
+        visio_factory, office_factory (function, 可选): 创建应用实例的函数
+        polling (bool, 可选): 是否强制轮询，默认取config.WATCH_POLLING
+        stop_event (threading.Event, 可选): 设置后停止监视，默认一直运行到Ctrl+C
+
+    流程:
+    1. 在同一个应用会话中依次转换全部任务(未修改的文件命中缓存直接跳过)
+    2. 为每个任务的目录启动DirectoryWatcher，变化经去抖后放入队列
+    3. 主线程(COM所在线程)取出变化，重新执行对应任务，转换缓存保证只重新导出变化的文件
+
+    注意:
+    - 只指定了files的任务，其中的文件都没有变化时不会重新执行
+    - 合并输出模式下任一文件变化都会重建output.docx，未修改页面从页面缓存读取
+    """
+    if kill_processes:
+        kill_job_processes(jobs)
+
+    changes = queue.Queue()
+    stop_event = stop_event or threading.Event()
+    watchers = []
+    com_initialize()
+    try:
+        with AppSession(visio_factory, office_factory) as session:
+            for idx, job in enumerate(jobs):
+                print(f"[{idx + 1}/{len(jobs)}] {job['dir']}")
+                print_summary([run_job(job, session)])
+
+            for idx, job in enumerate(jobs):
+                watcher = DirectoryWatcher(
+                    job["dir"],
+                    lambda changed, idx=idx: changes.put((idx, changed)),
+                    polling=polling,
+                )
+                try:
+                    watcher.start()
+                except OSError as e:
+                    print(f"无法监视目录 {job['dir']}: {e}")
+                    continue
+                watchers.append(watcher)
+            print(f"正在监视{len(watchers)}个目录，按Ctrl+C退出。")
+
+            while not stop_event.is_set():
+                try:
+                    idx, changed = changes.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                # 合并已排队的变化，同一任务只执行一次
+                pending = {idx: set(changed)}
+                while not changes.empty():
+                    idx, changed = changes.get()
+                    pending.setdefault(idx, set()).update(changed)
+                for idx in sorted(pending):
+                    job = jobs[idx]
+                    if job.get("files") and not pending[idx] & set(job["files"]):
+                        continue
+                    print(f"{time.strftime('%H:%M:%S')} 文件变化: {', '.join(sorted(pending[idx]))}")
+                    print_summary([run_job(job, session)])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for watcher in watchers:
+            watcher.stop()
+        com_uninitialize()
+
+
+def print_summary(summaries):
+    """打印每个目录的转换结果"""
+    print()
+    print("转换汇总:")
+    for summary in summaries:
+        line = (
+            f"  [{summary['status']}] {summary['dir']}  "
+            f"共{summary.get('total', 0)}个文件，转换{summary.get('converted', 0)}个，"
+            f"跳过{summary.get('skipped', 0)}个，用时{summary['elapsed']:.1f}秒"
+        )
+        if summary["error"]:
+            line += f"\n      错误: {summary['error']}"
+        print(line)
+    failed = sum(1 for s in summaries if s["status"] == "失败")
+    print(f"完成{len(summaries) - failed}个目录，失败{failed}个。")
+
+
+def main(argv=None, visio_factory=None, office_factory=None):
+    """命令行入口，返回进程退出码"""
+    parser = argparse.ArgumentParser(description="Visio批量转换命令行工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="按清单文件批量转换")
+    run_parser.add_argument("manifest", help="清单文件(.toml或.json)")
+    run_parser.add_argument("--force", action="store_true", help="忽略缓存强制重新转换")
+    run_parser.add_argument(
+        "--no-kill", action="store_true", help="开始前不终止已有的Visio/Word进程"
+    )
+    run_parser.add_argument(
+        "--trace", metavar="目录", help="记录各阶段耗时，写出JSON日志与Chrome trace到该目录"
+    )
+    run_parser.add_argument(
+        "--native", action="store_true", help="不使用Visio，直接解析.vsdx渲染页面(见native_render.py)"
+    )
+
+    watch_parser = subparsers.add_parser("watch", help="转换后持续监视目录，文件变化时自动重新转换")
+    watch_parser.add_argument("manifest", help="清单文件(.toml或.json)")
+    watch_parser.add_argument(
+        "--no-kill", action="store_true", help="开始前不终止已有的Visio/Word进程"
+    )
+    watch_parser.add_argument(
+        "--poll", action="store_true", help="定期扫描目录代替inotify(适用于网络共享目录)"
+    )
+    watch_parser.add_argument(
+        "--native", action="store_true", help="不使用Visio，直接解析.vsdx渲染页面"
+    )
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="把已单独转换的文档拼接为output.docx，不重新转换"
+    )
+    merge_parser.add_argument("dir", help="Visio文件所在目录(其Converted_Files下为单独转换的文档)")
+    merge_parser.add_argument(
+        "files", nargs="*", help="按此顺序合并的Visio文件名，省略时按扫描顺序合并全部文件"
+    )
+    merge_parser.add_argument("--output", help="合并文档路径，默认为目录下的output.docx")
+
+    enqueue_parser = subparsers.add_parser(
+        "enqueue", help="把清单中的任务按文件拆分提交到任务队列，等待工作进程完成"
+    )
+    enqueue_parser.add_argument("manifest", help="清单文件(.toml或.json)")
+    enqueue_parser.add_argument("--queue", default=QUEUE_PATH, help="队列文件路径")
+    enqueue_parser.add_argument("--force", action="store_true", help="忽略缓存强制重新转换")
+    enqueue_parser.add_argument(
+        "--local-workers", type=int, default=0, metavar="N", help="同时在本机启动N个工作进程"
+    )
+    enqueue_parser.add_argument(
+        "--native", action="store_true", help="本机工作进程不使用Visio，直接解析.vsdx渲染页面"
+    )
+
+    worker_parser = subparsers.add_parser("worker", help="从任务队列租用文件并转换")
+    worker_parser.add_argument("--queue", default=QUEUE_PATH, help="队列文件路径")
+    worker_parser.add_argument("--id", help="工作进程标识，默认为主机名:进程号")
+    worker_parser.add_argument(
+        "--no-kill", action="store_true", help="开始前不终止已有的Visio进程"
+    )
+    worker_parser.add_argument(
+        "--exit-when-idle", action="store_true", help="队列中的任务全部结束后退出"
+    )
+    worker_parser.add_argument(
+        "--native", action="store_true", help="不使用Visio，直接解析.vsdx渲染页面"
+    )
+
+    serve_parser = subparsers.add_parser("serve", help="启动常驻转换服务")
+    serve_parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    serve_parser.add_argument(
+        "--recycle", type=int, default=DAEMON_RECYCLE_JOBS, help="实例处理多少个任务后重启"
+    )
+    serve_parser.add_argument(
+        "--native", action="store_true", help="不使用Visio，直接解析.vsdx渲染页面"
+    )
+
+    submit_parser = subparsers.add_parser("submit", help="把清单中的任务提交给常驻转换服务")
+    submit_parser.add_argument("manifest", help="清单文件(.toml或.json)")
+    submit_parser.add_argument("--force", action="store_true", help="忽略缓存强制重新转换")
+    submit_parser.add_argument("--port", type=int, default=DAEMON_PORT)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "native", False) and visio_factory is None:
+        from native_render import NativeVisioFactory
+
+        visio_factory = NativeVisioFactory()
+    if args.command == "serve":
+        from daemon import serve
+
+        serve(
+            port=args.port,
+            recycle_jobs=args.recycle,
+            visio_factory=visio_factory,
+            office_factory=office_factory,
+        )
+        return 0
+
+    if args.command == "submit":
+        from daemon import daemon_available, run_remote
+
+        try:
+            jobs = load_manifest(args.manifest)
+        except Exception as e:
+            print(f"读取清单失败: {e}")
+            return 2
+        if not daemon_available(port=args.port):
+            print("转换服务未运行，请先执行: python cli.py serve")
+            return 2
+
+        def handle_progress(filename, current, total):
+            print(f"  ({current}/{total}) {filename}")
+
+        summaries = []
+        for idx, job in enumerate(jobs):
+            print(f"[{idx + 1}/{len(jobs)}] {job['dir']}")
+            if args.force:
+                job["force"] = True
+            try:
+                summaries.append(run_remote(job, handle_progress, port=args.port))
+            except Exception as e:
+                summaries.append(
+                    {"dir": job["dir"], "status": "失败", "error": str(e), "elapsed": 0.0}
+                )
+        print_summary(summaries)
+        return 1 if any(s["status"] == "失败" for s in summaries) else 0
+
+    if args.command == "enqueue":
+        from job_queue import run_distributed
+
+        try:
+            jobs = load_manifest(args.manifest)
+        except Exception as e:
+            print(f"读取清单失败: {e}")
+            return 2
+
+        def handle_progress(filename, current, total):
+            print(f"  ({current}/{total}) {filename}")
+
+        summaries = run_distributed(
+            jobs,
+            args.queue,
+            force=args.force,
+            update_progress=handle_progress,
+            local_workers=args.local_workers,
+            visio_factory=visio_factory,
+            office_factory=office_factory,
+        )
+        print_summary(summaries)
+        return 1 if any(s["status"] == "失败" for s in summaries) else 0
+
+    if args.command == "worker":
+        from job_queue import run_worker
+
+        try:
+            run_worker(
+                args.queue,
+                args.id,
+                visio_factory=visio_factory,
+                office_factory=office_factory,
+                kill_processes=not (args.no_kill or args.native),
+                exit_when_idle=args.exit_when_idle,
+            )
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == "merge":
+        from docx_patch import merge_converted_docx
+
+        start = time.perf_counter()
+        try:
+            file_list = args.files or scan_visio_files(args.dir)
+            merged = merge_converted_docx(args.dir, file_list, args.output)
+        except (OSError, ValueError) as e:
+            print(f"合并失败: {e}")
+            return 1
+        print(
+            f"已合并{len(merged)}个文件，用时{time.perf_counter() - start:.1f}秒: "
+            f"{args.output or os.path.join(args.dir, 'output.docx')}"
+        )
+        return 0
+
+    if args.command == "watch":
+        try:
+            jobs = load_manifest(args.manifest)
+        except Exception as e:
+            print(f"读取清单失败: {e}")
+            return 2
+        watch_jobs(
+            jobs,
+            kill_processes=not (args.no_kill or args.native),
+            visio_factory=visio_factory,
+            office_factory=office_factory,
+            polling=args.poll or None,
+        )
+        return 0
+
+    if args.command == "run":
+        try:
+            jobs = load_manifest(args.manifest)
+        except Exception as e:
+            print(f"读取清单失败: {e}")
+            return 2
+        if args.trace:
+            tracing.start()
+        try:
+            summaries = run_jobs(
+                jobs,
+                force=args.force,
+                kill_processes=not (args.no_kill or args.native),
+                visio_factory=visio_factory,
+                office_factory=office_factory,
+            )
+        finally:
+            tracer = tracing.stop()
+        print_summary(summaries)
+        if tracer is not None:
+            print()
+            tracer.print_summary()
+            log_path, trace_path = tracer.write(args.trace)
+            print(f"耗时日志: {log_path}\nChrome trace: {trace_path}")
+        return 1 if any(s["status"] == "失败" for s in summaries) else 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
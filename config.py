@@ -1,2 +1,62 @@
 SOFTWARE_VERSION = "v2.2"
 WORD_APP_VISIBLE = False  # 处理时是否显示WORD应用
+DEFAULT_WORKERS = 1  # 导出PNG时的并行Visio进程数，1表示单进程串行处理
+PAGE_CACHE_ENABLED = True  # 是否复用.vsdx中未修改页面上次导出的图片
+PAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 页面缓存容量上限(字节)
+DOC_BACKEND = "docx"  # 导出PNG方式的文档生成方式："docx"直接生成，"com"通过Word/WPS生成
+# 直接生成文档时的页面设置(A4，Word默认页边距)
+DOCX_PAGE_WIDTH_CM = 21.0
+DOCX_PAGE_HEIGHT_CM = 29.7
+DOCX_MARGIN_TOP_CM = 2.54
+DOCX_MARGIN_BOTTOM_CM = 2.54
+DOCX_MARGIN_LEFT_CM = 3.17
+DOCX_MARGIN_RIGHT_CM = 3.17
+STREAM_CHECKPOINT_PAGES = 50  # 流式生成合并文档时每隔多少页写一次检查点
+# 合并文档自动分卷：任一预算达到后换到output_002.docx等新分卷，0表示不限
+VOLUME_MAX_PAGES = 0
+VOLUME_MAX_BYTES = 0
+# 常驻转换服务(daemon.py)：只监听本机地址，实例处理指定数量的任务后自动重启
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+DAEMON_RECYCLE_JOBS = 20
+DAEMON_TOKEN_DIR = ""  # 保存服务令牌文件的目录，为空时使用用户主目录(令牌文件只有当前用户可读)
+# 目录扫描：是否包含子目录，以及包含/排除的通配符(匹配相对路径或文件名，如"草稿/*"、"*_old.vsdx")
+SCAN_RECURSIVE = True
+SCAN_INCLUDE = []
+SCAN_EXCLUDE = []
+TRACE_DIR = ""  # GUI转换时写出各阶段耗时日志与Chrome trace的目录，为空时只在控制台打印汇总
+# 超时保护(supervisor.py)：单个文件/单页的最长时间(秒)、失败重试次数与首次重试等待时间(秒，之后加倍)
+WATCHDOG_FILE_TIMEOUT = 300
+WATCHDOG_PAGE_TIMEOUT = 60
+WATCHDOG_RETRIES = 2
+WATCHDOG_BACKOFF = 2.0
+# 导出图片后处理(image_stage.py，需要Pillow)：插入文档前只缩小不放大，显示尺寸保持不变
+IMAGE_MAX_WIDTH_PX = 0  # 图片最大像素宽度，0表示不限
+IMAGE_TARGET_DPI = 0  # 按文档中显示尺寸计算的目标分辨率，如150，0表示不限
+IMAGE_FORMAT = ""  # ""保持导出结果，"png"重新优化压缩，"jpeg"转为JPEG(体积最小，线条边缘略有损失)
+IMAGE_JPEG_QUALITY = 85  # 转为JPEG时的质量(1-95)
+IMAGE_DEDUP = True  # 流式生成合并文档时内容相同的图片只保存一份(python-docx方式始终去重)
+# 导出矢量图方式：页面导出格式("svg"或"emf")，以及SVG附带的PNG后备图片的最大像素宽度(需要Pillow，0表示不缩小)
+VECTOR_FORMAT = "svg"
+VECTOR_FALLBACK_WIDTH_PX = 480
+EXPORT_BULK = False  # 导出PNG时每个文件通过"另存为网页"一次导出全部页面，减少逐页的COM调用
+SCHEDULE_LARGEST_FIRST = True  # 多进程导出时按页数从多到少分发文件(输出顺序不变)，页数直接从.vsdx读取
+# GUI预览：缩略图最大像素尺寸、内存中最多保留的缩略图数量与磁盘缓存(Converted_Files/.thumbnails)容量上限(字节)
+THUMBNAIL_SIZE = 240
+THUMBNAIL_MEMORY_ITEMS = 256
+THUMBNAIL_DISK_MAX_BYTES = 64 * 1024 * 1024
+# 页面渲染方式："visio"通过COM调用Visio，"native"由native_render.py直接解析.vsdx渲染(不需要Office，只支持.vsdx)
+VISIO_BACKEND = "visio"
+NATIVE_RENDER_DPI = 96  # 原生渲染导出位图的分辨率
+NATIVE_FONT = ""  # 原生渲染位图中文字使用的字体文件(如"msyh.ttc")，为空时依次尝试常见中文字体
+# 监视模式(watcher.py)：最后一次变化后等待多少秒再转换(去抖)、轮询间隔(秒)，以及是否强制轮询(网络共享目录上inotify收不到其他电脑的修改)
+WATCH_DEBOUNCE = 2.0
+WATCH_POLL_INTERVAL = 2.0
+WATCH_POLLING = False
+# 分布式任务队列(job_queue.py)：SQLite队列文件(多台主机时放在共享目录)、租约时长与心跳间隔(秒)、
+# 每个文件最多尝试次数(含工作进程崩溃导致的租约过期)，以及空闲时查询队列的间隔(秒)
+QUEUE_PATH = "v2w_queue.sqlite3"
+QUEUE_LEASE_SECONDS = 120
+QUEUE_HEARTBEAT_INTERVAL = 30
+QUEUE_MAX_ATTEMPTS = 3
+QUEUE_POLL_INTERVAL = 2.0
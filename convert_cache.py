@@ -0,0 +1,249 @@
+"""
+基于文件内容哈希的增量转换缓存。
+
+清单保存在 visio_dir/Converted_Files/.v2w_cache.json，记录每个源文件的内容哈希、
+转换设置以及生成的输出文件。源文件内容与设置均未变化且输出仍然存在时跳过转换。
+"""
+import hashlib
+import json
+import os
+import shutil
+
+CACHE_DIR_NAME = "Converted_Files"
+CACHE_MANIFEST_NAME = ".v2w_cache.json"
+CACHE_VERSION = 1
+
+MERGED_KEY = "<merged>"  # 合并输出(output.docx)在清单中的条目名
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """分块计算文件的SHA-256，避免大文件一次性读入内存"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_key(settings):
+    """把转换设置序列化为稳定的字符串，作为缓存键的一部分"""
+    return json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ConversionCache:
+    """
+    文件级增量转换缓存。
+
+    参数:
+        visio_dir (str): Visio文件所在目录
+        settings (dict): 影响输出结果的转换设置(方法、格式、软件等)
+        outputs_for (function): func(文件名)返回该文件对应的输出路径列表；
+            文件名为MERGED_KEY时返回合并输出的路径列表
+        merged (bool): 是否为合并输出模式(所有文件写入同一个文档)
+        output_dir (str, 可选): 输出所在目录，清单保存在其Converted_Files下，默认visio_dir
+    """
+
+    def __init__(self, visio_dir, settings, outputs_for, merged=False, output_dir=None):
+        self.visio_dir = visio_dir
+        self.output_dir = output_dir or visio_dir
+        self.settings = settings_key(settings)
+        self.outputs_for = outputs_for
+        self.merged = merged
+        self.manifest_path = os.path.join(
+            self.output_dir, CACHE_DIR_NAME, CACHE_MANIFEST_NAME
+        )
+        self.entries = {}
+        self._hashes = {}
+        self.load()
+
+    def load(self):
+        """读取清单，清单损坏或版本不符时视为空缓存"""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == CACHE_VERSION:
+                self.entries = manifest.get("entries", {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """原子地写回清单"""
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": CACHE_VERSION, "entries": self.entries},
+                f,
+                ensure_ascii=False,
+                indent=1,
+            )
+        os.replace(temp_path, self.manifest_path)
+
+    def file_hash(self, filename):
+        """
+        返回源文件的内容哈希。
+
+        大小与修改时间均与清单记录一致时直接复用记录中的哈希，避免重复读取文件。
+        """
+        if filename in self._hashes:
+            return self._hashes[filename]
+
+        path = os.path.join(self.visio_dir, filename)
+        stat = os.stat(path)
+        entry = self.entries.get(filename)
+        if (
+            entry
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime") == stat.st_mtime_ns
+        ):
+            digest = entry["hash"]
+        else:
+            digest = file_sha256(path)
+        self._hashes[filename] = digest
+        return digest
+
+    def _entry_is_fresh(self, key, digest):
+        entry = self.entries.get(key)
+        return (
+            entry is not None
+            and entry.get("hash") == digest
+            and entry.get("settings") == self.settings
+            and all(os.path.exists(path) for path in self._outputs(key))
+        )
+
+    def _outputs(self, key):
+        return [os.path.normpath(path) for path in self.outputs_for(key)]
+
+    def _merged_digest(self, file_list):
+        digest = hashlib.sha256()
+        for filename in file_list:
+            digest.update(filename.encode("utf-8") + b"\0")
+            digest.update(self.file_hash(filename).encode("ascii"))
+        return digest.hexdigest()
+
+    def pending_files(self, file_list):
+        """
+        返回需要重新转换的文件列表。
+
+        单独输出模式下只返回有变化的文件；合并输出模式下任意文件(或顺序)变化都
+        需要重建整个文档，因此返回完整列表，全部未变化时返回空列表。
+        """
+        if self.merged:
+            if self._entry_is_fresh(MERGED_KEY, self._merged_digest(file_list)):
+                return []
+            return list(file_list)
+
+        return [
+            filename
+            for filename in file_list
+            if not self._entry_is_fresh(filename, self.file_hash(filename))
+        ]
+
+    def changed_files(self, file_list):
+        """
+        合并输出模式下返回内容有变化或新增的文件，用于就地更新合并文档。
+
+        返回:
+            list: 需要重新导出的文件(顺序变化或删除文件时可能为空)；
+            上次的合并输出不可用(设置不同、输出已删除或旧版清单没有逐文件哈希)时返回None
+        """
+        entry = self.entries.get(MERGED_KEY)
+        if (
+            not entry
+            or entry.get("settings") != self.settings
+            or "files" not in entry
+            or not all(os.path.exists(path) for path in self._outputs(MERGED_KEY))
+        ):
+            return None
+        return [
+            filename
+            for filename in file_list
+            if entry["files"].get(filename) != self.file_hash(filename)
+        ]
+
+    def record(self, file_list, since=None):
+        """
+        记录本次转换成功生成的输出。
+
+        参数:
+            file_list (list): 本次参与转换的文件
+            since (float, 可选): 转换开始时间戳，只记录在此之后写出的输出，
+                用于转换中途失败时仅保留已完成的文件
+        """
+
+        def written(paths):
+            return all(
+                os.path.exists(path)
+                and (since is None or os.path.getmtime(path) >= since)
+                for path in paths
+            )
+
+        keys = [MERGED_KEY] if self.merged else list(file_list)
+        for key in keys:
+            outputs = self._outputs(key)
+            if not written(outputs):
+                continue
+            if key == MERGED_KEY:
+                digest = self._merged_digest(file_list)
+                stat = None
+            else:
+                digest = self.file_hash(key)
+                stat = os.stat(os.path.join(self.visio_dir, key))
+            self.entries[key] = {
+                "hash": digest,
+                "size": stat.st_size if stat else None,
+                "mtime": stat.st_mtime_ns if stat else None,
+                "settings": self.settings,
+                "outputs": [
+                    os.path.relpath(path, self.output_dir) for path in outputs
+                ],
+            }
+            if key == MERGED_KEY:
+                # 逐文件哈希，下次只有部分文件变化时可就地更新合并文档
+                self.entries[key]["files"] = {
+                    filename: self.file_hash(filename) for filename in file_list
+                }
+
+    def evict_stale(self, current_files):
+        """
+        移除源文件已被删除或重命名的条目，并删除这些条目生成的输出。
+
+        参数:
+            current_files (list): 本次扫描到的源文件名列表
+
+        返回:
+            list: 被移除的源文件名列表
+
+        注意:
+        - 未被扫描到但仍在磁盘上的文件(被SCAN_EXCLUDE排除，或关闭SCAN_RECURSIVE后子目录中的文件)
+          不算删除，保留其条目与输出
+        """
+        current = set(current_files)
+        stale = [
+            key
+            for key in self.entries
+            if key != MERGED_KEY
+            and key not in current
+            and not os.path.exists(os.path.join(self.visio_dir, key))
+        ]
+        for key in stale:
+            for relpath in self.entries.pop(key).get("outputs", []):
+                path = os.path.join(self.output_dir, relpath)
+                try:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    elif os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    print(f"删除过期输出失败: {path} ({e})")
+        return stale
+
+
+def forget_merged_output(output_dir):
+    """
+    合并文档被转换以外的方式改写(如由单独文档拼接)后移除其缓存条目，
+    下次合并转换时按实际内容重新生成，而不是误认为output.docx仍是上次转换的结果。
+    """
+    cache = ConversionCache(output_dir, {}, lambda key: [])
+    if cache.entries.pop(MERGED_KEY, None) is not None:
+        cache.save()
@@ -1,9 +1,44 @@
+import inspect
 import os
-import pythoncom
-import win32com.client
 import subprocess
-from config import WORD_APP_VISIBLE
-
+import time
+from config import (
+    DOC_BACKEND,
+    EXPORT_BULK,
+    IMAGE_FORMAT,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_MAX_WIDTH_PX,
+    IMAGE_TARGET_DPI,
+    VOLUME_MAX_BYTES,
+    VECTOR_FALLBACK_WIDTH_PX,
+    VECTOR_FORMAT,
+    VISIO_BACKEND,
+    VOLUME_MAX_PAGES,
+    WORD_APP_VISIBLE,
+)
+from convert_cache import MERGED_KEY, ConversionCache
+from page_cache import open_page_cache, vsdx_page_keys
+from scanner import scan_visio_files
+from targets import (
+    ALL_TARGETS,
+    IMAGE_FORMATS,
+    TARGET_IMAGES,
+    TARGET_MERGED,
+    TARGET_SEPARATE,
+    FanOutSink,
+    ImageDirSink,
+    image_dir_path,
+    normalize_targets,
+)
+from tracing import page_done, span
+from volumes import VolumePlanner, VolumeSink, staging_path
+
+try:
+    import pythoncom
+    import win32com.client
+except ImportError:  # 非Windows环境(如Linux下配合模拟后端运行)
+    pythoncom = None
+    win32com = None
 
 
 
@@ -12,8 +47,10 @@ def kill_visio_processes():
     终止所有正在运行的 Visio 进程以防止文件被占用。
 
     使用Windows的taskkill命令强制终止所有visio.exe进程。
-    如果终止失败会捕获异常并打印错误信息。
+    如果终止失败会捕获异常并打印错误信息。原生渲染方式不启动Visio，不做任何操作。
     """
+    if VISIO_BACKEND == "native":
+        return
     try:
         subprocess.run(["taskkill", "/F", "/IM", "visio.exe"], check=True)
         print("所有Visio进程已终止。")
@@ -40,6 +77,37 @@ def kill_word_processes(word_processor="Word"):
         print(f"进程终止异常: {e}")
 
 
+def com_initialize():
+    """初始化当前线程的COM环境，非Windows环境下为空操作"""
+    if pythoncom is not None:
+        pythoncom.CoInitialize()
+
+
+def com_uninitialize():
+    """释放当前线程的COM环境，非Windows环境下为空操作"""
+    if pythoncom is not None:
+        pythoncom.CoUninitialize()
+
+
+def create_visio_app():
+    """
+    创建不可见的 Visio 应用程序实例。
+
+    返回:
+        win32com.client.Dispatch对象: Visio应用程序实例；
+        config.VISIO_BACKEND为"native"时返回原生渲染实例(见native_render.py)
+    """
+    if VISIO_BACKEND == "native":
+        from native_render import NativeVisioApp
+
+        return NativeVisioApp()
+    if win32com is None:
+        raise Exception("未安装pywin32，无法启动Visio")
+    visio_app = win32com.client.Dispatch("Visio.Application")
+    visio_app.Visible = False
+    return visio_app
+
+
 def create_office_app(app_type):
     """
     创建指定类型的办公软件应用程序实例 (Word 或 WPS)。
@@ -53,6 +121,8 @@ def create_office_app(app_type):
     对于Word直接创建实例，对于WPS会尝试不同版本(Kwps.Application和Wps.Application)。
     如果都无法创建则抛出异常。
     """
+    if win32com is None:
+        raise Exception(f"未安装pywin32，无法启动{app_type}")
     if app_type == "Word":
         return win32com.client.Dispatch("Word.Application")
 
@@ -71,6 +141,10 @@ def visio_to_word_copy_paste(
     update_progress=None,
     separate_files=False,
     word_processor="Word",
+    volume_pages=None,
+    visio_factory=None,
+    office_factory=None,
+    output_dir=None,
 ):
     """
     使用复制粘贴方式将Visio文件内容转换到Word/WPS文档中。
@@ -81,6 +155,10 @@ def visio_to_word_copy_paste(
         update_progress (function, 可选): 进度回调函数，格式为func(文件名, 当前序号, 总数)
         separate_files (bool): 是否每个Visio文件生成单独的Word文档
         word_processor (str): 目标办公软件类型，"Word"或"WPS"
+        volume_pages (int, 可选): 合并文档每卷最多页数，默认取config.VOLUME_MAX_PAGES
+        visio_factory (function, 可选): 创建Visio实例的函数，默认create_visio_app
+        office_factory (function, 可选): 创建办公应用实例的函数，默认create_office_app
+        output_dir (str, 可选): 输出目录(output.docx与Converted_Files的父目录)，默认visio_dir
 
     流程:
     1. 初始化COM环境
@@ -92,69 +170,383 @@ def visio_to_word_copy_paste(
     注意:
     - 使用前确保没有Visio和Word/WPS进程运行(可调用kill_*_processes)
     - 会创建临时Word应用程序实例，操作完成后自动退出
+    - 粘贴内容的大小无法预先得知，因此本方式只按页数分卷
+    - 与导出图片方式一样通过create_sink写入：分卷先写入临时路径，出错或取消时不保存，已有的输出保持不变
     """
-    pythoncom.CoInitialize()
+    com_initialize()
     try:
-        visio_app = win32com.client.Dispatch("Visio.Application")
-        visio_app.Visible = False
-        output_dir = None
+        visio_app = (visio_factory or create_visio_app)()
+        output_root = output_dir or visio_dir
+        os.makedirs(output_root, exist_ok=True)
 
-        office_app = create_office_app(word_processor)
-        office_app.Visible = WORD_APP_VISIBLE
-
-        if not separate_files:
-            doc = office_app.Documents.Add()
-            office_app.Selection.EndKey(6)
+        # 与导出图片方式共用写入器：分卷先写入临时路径，出错时丢弃
+        sink = create_sink(
+            output_root, separate_files, word_processor, "com", office_factory, volume_pages, 0
+        )
 
         total_files = len(file_list)
-        for idx, filename in enumerate(file_list):
-            if update_progress:
-                update_progress(filename, idx + 1, total_files)
+        try:
+            for idx, filename in enumerate(file_list):
+                if update_progress:
+                    update_progress(filename, idx + 1, total_files)
+
+                visio_file_path = os.path.normpath(os.path.join(visio_dir, filename))
+                with span("open", file=filename):
+                    visio_doc = visio_app.Documents.Open(visio_file_path)
+
+                sink.begin_file(filename)
+                total_pages = visio_doc.Pages.Count
+                for i, page in enumerate(visio_doc.Pages):
+                    visio_window = visio_app.ActiveWindow
+                    visio_window.Page = page
+                    visio_window.SelectAll()
+                    with span("copy", file=filename, page=i + 1):
+                        visio_window.Selection.Copy()
+                    with span("paste", file=filename, page=i + 1):
+                        sink.add_pasted_page(i == total_pages - 1)
+                    page_done()
+
+                with span("close", file=filename):
+                    visio_doc.Close()
+                with span("end_file", file=filename):
+                    sink.end_file(filename)
+        except BaseException:
+            sink.abort()
+            raise
+
+        with span("save"):
+            sink.close()
 
-            visio_file_path = os.path.normpath(os.path.join(visio_dir, filename))
-            visio_doc = visio_app.Documents.Open(visio_file_path)
+    finally:
+        com_uninitialize()
 
-            if separate_files:
-                current_doc = office_app.Documents.Add()
-                current_selection = office_app.Selection
-                current_selection.EndKey(6)
-            else:
-                current_doc = doc
-                current_selection = office_app.Selection
 
-            total_pages = visio_doc.Pages.Count
-            for i, page in enumerate(visio_doc.Pages):
-                visio_window = visio_app.ActiveWindow
-                visio_window.Page = page
-                visio_window.SelectAll()
-                visio_window.Selection.Copy()
+class WordSink:
+    """
+    通过COM驱动Word/WPS，将逐页导出的图片写入文档。
 
-                range_end = current_doc.Content
-                range_end.Collapse(0)
-                range_end.Paste()
+    参数:
+        visio_dir (str): 输出所在目录(output.docx与Converted_Files的父目录)
+        separate_files (bool): 是否每个Visio文件生成单独的Word文档
+        word_processor (str): 目标办公软件类型，"Word"或"WPS"
+        office_factory (function, 可选): 创建办公应用实例的函数，默认create_office_app
+        output_path (str, 可选): 合并文档路径，默认visio_dir/output.docx
+
+    用法:
+        每个文件依次调用begin_file、add_picture(逐页)、end_file，全部完成后调用close。
+    """
+
+    def __init__(
+        self,
+        visio_dir,
+        separate_files=False,
+        word_processor="Word",
+        office_factory=None,
+        output_path=None,
+    ):
+        self.visio_dir = visio_dir
+        self.separate_files = separate_files
+        self.output_path = output_path or os.path.join(visio_dir, "output.docx")
+        self.office_app = (office_factory or create_office_app)(word_processor)
+        self.office_app.Visible = WORD_APP_VISIBLE
+        self.doc = None
+        self.current_doc = None
+        self.svg_supported = True  # 插入SVG失败一次后其余页面直接插入后备图片
+        self.has_pages = False  # 合并文档中是否已有页面
 
-                if i < total_pages - 1:
+        if not separate_files:
+            self.doc = self.office_app.Documents.Add()
+            self.office_app.Selection.EndKey(6)
+
+    def resume_point(self, file_list):
+        """返回可跳过的已完成文件数，COM方式不支持断点续写"""
+        return 0
+
+    def begin_file(self, filename):
+        """开始写入一个Visio文件的页面，合并文档中每个文件从新的一页开始"""
+        if self.separate_files:
+            self.current_doc = self.office_app.Documents.Add()
+            self.office_app.Selection.EndKey(6)
+        else:
+            self.current_doc = self.doc
+            if self.has_pages:
+                range_end = self.doc.Content
+                range_end.Collapse(0)
+                with span("InsertBreak"):
                     range_end.InsertBreak(7)
 
-            visio_doc.Close()
+    def add_picture(self, image_path, is_last_page):
+        """在文档末尾插入一页图片，非最后一页时追加分页符"""
+        self._end_page(self._insert_picture(image_path), is_last_page)
+
+    def _insert_picture(self, image_path):
+        """在文档末尾插入图片，返回插入位置的Range"""
+        range_end = self.current_doc.Content
+        range_end.Collapse(0)
+        with span("AddPicture"):
+            range_end.InlineShapes.AddPicture(image_path)
+        return range_end
+
+    def add_pasted_page(self, is_last_page):
+        """把剪贴板中的内容(复制粘贴方式复制的Visio页面)粘贴到文档末尾，非最后一页时追加分页符"""
+        range_end = self.current_doc.Content
+        range_end.Collapse(0)
+        range_end.Paste()
+        self._end_page(range_end, is_last_page)
+
+    def _end_page(self, range_end, is_last_page):
+        self.has_pages = True
+        if not is_last_page:
+            with span("InsertBreak"):
+                range_end.InsertBreak(7)
+
+    def add_vector_picture(self, vector_path, fallback_path, is_last_page):
+        """
+        插入一页矢量图，Word直接插入SVG/EMF并自行生成SVG的后备图片。
+
+        办公软件不支持插入SVG(如旧版WPS)时改为插入fallback_path(PNG后备图片)；EMF没有后备图片，失败时照常抛出异常。
+        """
+        if fallback_path and not self.svg_supported:
+            range_end = self._insert_picture(fallback_path)
+        elif fallback_path:
+            try:
+                range_end = self._insert_picture(vector_path)
+            except Exception as e:
+                print(f"插入SVG失败，改为插入PNG后备图片: {e}")
+                self.svg_supported = False
+                range_end = self._insert_picture(fallback_path)
+        else:
+            range_end = self._insert_picture(vector_path)
+        self._end_page(range_end, is_last_page)
+
+    def end_file(self, filename):
+        """结束一个Visio文件，单独转换模式下保存并关闭其文档"""
+        if self.separate_files:
+            output_path = converted_docx_path(self.visio_dir, filename)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with span("SaveAs"):
+                self.current_doc.SaveAs(output_path)
+            self.current_doc.Close()
+        self.current_doc = None
+
+    def next_volume(self, output_path):
+        """保存并关闭当前合并文档，在同一个办公应用中开始写入新的分卷"""
+        with span("SaveAs"):
+            self.doc.SaveAs(self.output_path)
+        self.doc.Close()
+        self.output_path = output_path
+        self.doc = self.office_app.Documents.Add()
+        self.office_app.Selection.EndKey(6)
+        self.has_pages = False
+
+    def close(self):
+        """保存并关闭合并文档(如有)，然后退出办公应用"""
+        if not self.separate_files:
+            with span("SaveAs"):
+                self.doc.SaveAs(self.output_path)
+            self.doc.Close()
+        self.office_app.Quit()
+
+    def abort(self):
+        """
+        转换出错或取消时调用：不保存并关闭本写入器打开的文档，然后退出办公应用，已有的output.docx保持不变。
+
+        会话中常驻的办公应用(session.AppSession)的Quit为空操作，先关闭文档才不会把未保存的文档留在其中。
+        办公应用可能已无响应(如被超时保护结束)，此时只打印错误，不掩盖原来的异常。
+        """
+        documents = [self.current_doc]
+        if self.doc is not self.current_doc:
+            documents.append(self.doc)
+        self.doc = self.current_doc = None
+        for document in documents:
+            if document is None:
+                continue
+            try:
+                document.Close(0)  # wdDoNotSaveChanges
+            except Exception as e:
+                print(f"关闭文档失败: {e}")
+        try:
+            self.office_app.Quit(0)
+        except Exception as e:
+            print(f"退出办公应用失败: {e}")
 
-            if separate_files:
-                if separate_files:
-                    output_name = os.path.splitext(filename)[0] + ".docx"
-                    output_path = os.path.join(
-                        visio_dir, "Converted_Files", output_name
-                    )
-                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                    current_doc.SaveAs(output_path)
-                    current_doc.Close()
 
-        if not separate_files:
-            output_word_path = os.path.join(visio_dir, "output.docx")
-            doc.SaveAs(output_word_path)
-        office_app.Quit()
+def create_sink(
+    visio_dir,
+    separate_files=False,
+    word_processor="Word",
+    doc_backend=None,
+    office_factory=None,
+    volume_pages=None,
+    volume_bytes=None,
+    resume=True,
+    process_images=True,
+    merged_order=None,
+):
+    """
+    创建接收逐页图片的文档写入器。
+
+    参数:
+        visio_dir (str): 输出所在目录
+        separate_files (bool): 是否每个Visio文件生成单独的Word文档
+        word_processor (str): 目标办公软件类型，仅"com"方式使用
+        doc_backend (str, 可选): "docx"使用python-docx直接生成，"com"通过Word/WPS生成，
+            "stream"流式写入合并文档(支持断点续写)，默认取config.DOC_BACKEND
+        office_factory (function, 可选): 创建办公应用实例的函数，仅"com"方式使用
+        volume_pages (int, 可选): 合并文档每卷最多页数，默认取config.VOLUME_MAX_PAGES
+        volume_bytes (int, 可选): 合并文档每卷最多图片字节数，默认取config.VOLUME_MAX_BYTES
+        resume (bool): "stream"方式是否从上次中断的检查点继续
+        process_images (bool): 是否按config.IMAGE_*包装图片后处理，
+            多个写入器共用图片时由调用方统一包装
+        merged_order (list, 可选): 合并文档中全部文件的顺序，给定时返回就地更新output.docx的PatchSink
+
+    返回:
+        WordSink、DocxSink、StreamingDocxSink实例，启用分卷时为包装它们的VolumeSink，
+        启用图片后处理(config.IMAGE_*)时再由ImageStageSink包装
+
+    注意:
+    - "stream"仅用于合并输出，单独转换时每个文档都很小，按"docx"方式生成
+    - 分卷只作用于合并输出，且分卷时不支持断点续写
+    - 就地更新只支持"docx"与"stream"方式且不能分卷，见merged_patch_supported
+    """
+    doc_backend = doc_backend or DOC_BACKEND
+    volume_pages = VOLUME_MAX_PAGES if volume_pages is None else volume_pages
+    volume_bytes = VOLUME_MAX_BYTES if volume_bytes is None else volume_bytes
+    use_volumes = not separate_files and (volume_pages or volume_bytes)
+
+    # 分卷时先写入临时路径，由VolumeSink在全部完成后替换正式的分卷
+    output_path = staging_path(visio_dir, 1) if use_volumes else None
+    if output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    if merged_order is not None and not separate_files:
+        if doc_backend not in ("docx", "stream") or use_volumes:
+            raise ValueError("就地更新合并文档只支持docx与stream方式，且不能分卷")
+        from docx_patch import PatchSink
+
+        sink = PatchSink(visio_dir, merged_order)
+    elif doc_backend == "stream" and not separate_files:
+        from docx_stream import StreamingDocxSink
+
+        sink = StreamingDocxSink(
+            visio_dir,
+            output_path,
+            resume=resume and not use_volumes,
+            write_index=not use_volumes,
+        )
+    elif doc_backend in ("docx", "stream"):
+        from docx_sink import DocxSink  # python-docx仅在此方式下需要
+
+        sink = DocxSink(visio_dir, separate_files, output_path, write_index=not use_volumes)
+    elif doc_backend == "com":
+        sink = WordSink(visio_dir, separate_files, word_processor, office_factory, output_path)
+    else:
+        raise ValueError(f"未知的文档生成方式: {doc_backend}")
+
+    if use_volumes:
+        sink = VolumeSink(sink, VolumePlanner(visio_dir, volume_pages, volume_bytes))
+    if not process_images:
+        return sink
+
+    from image_stage import wrap_sink
+
+    return wrap_sink(sink)
+
+
+def uses_office_app(method, doc_backend=None):
+    """
+    判断转换方式是否需要启动Word/WPS。
 
+    参数:
+        method (str): 转换方式，"copy_paste"、"export_png"、"export_vector"、"multi"或"images"
+        doc_backend (str, 可选): 文档生成方式，默认取config.DOC_BACKEND
+    """
+    if method == "copy_paste":
+        return True
+    if method == "images":
+        return False
+    return (doc_backend or DOC_BACKEND) == "com"
+
+
+def converted_docx_path(visio_dir, filename):
+    """返回单独转换模式下Visio文件对应的Word文档路径"""
+    output_name = os.path.splitext(filename)[0] + ".docx"
+    return os.path.join(visio_dir, "Converted_Files", output_name)
+
+
+def temp_image_path(visio_dir, filename, page_number, extension="png"):
+    """返回页面导出时使用的临时图片路径，子目录中文件名的路径分隔符替换为双下划线"""
+    flat_name = filename.replace("\\", "__").replace("/", "__")
+    return os.path.join(visio_dir, f"temp_{flat_name}_{page_number}.{extension}")
+
+
+def page_key_settings(visio_app, extension):
+    """返回计算页面缓存键的导出设置，原生渲染的图片与Visio导出的图片分开缓存"""
+    tag = getattr(visio_app, "RendererTag", "")
+    return f"{extension}|{tag}" if tag else extension
+
+
+def export_page(page, image_path, page_keys=None, page_cache=None):
+    """
+    导出单个页面，页面内容未变化时直接从页面缓存复制图片。
+
+    参数:
+        page: Visio页面对象
+        image_path (str): 导出图片路径，扩展名决定格式
+        page_keys (dict, 可选): vsdx_page_keys计算的{页面名称: 缓存键}
+        page_cache (PageCache, 可选): 页面缓存
+    """
+    key = page_keys.get(page.NameU) if page_keys and page_cache else None
+    if key is not None and page_cache.fetch(key, image_path):
+        return
+    page.Export(image_path)
+    if key is not None:
+        page_cache.store(key, image_path)
+
+
+def export_pages(
+    visio_app, visio_dir, filename, page_cache=None, temp_dir=None, bulk=None, extension="png"
+):
+    """
+    打开Visio文件并逐页导出为临时图片(默认PNG)。
+
+    参数:
+        visio_app: Visio应用程序实例
+        visio_dir (str): Visio文件所在目录路径
+        filename (str): Visio文件名
+        page_cache (PageCache, 可选): 页面缓存，.vsdx中未修改的页面不再调用page.Export
+        temp_dir (str, 可选): 临时图片所在目录，默认visio_dir
+        bulk (bool, 可选): 是否一次导出整个文档(见bulk_export.py)，默认取config.EXPORT_BULK，
+            批量导出只输出PNG，其他格式始终逐页导出
+        extension (str): 图片格式(扩展名)，如"png"、"jpg"
+
+    返回:
+        generator: 逐页产出(临时图片路径, 是否最后一页)，图片由调用方负责删除
+    """
+    if (EXPORT_BULK if bulk is None else bulk) and extension == "png":
+        from bulk_export import export_pages_bulk
+
+        yield from export_pages_bulk(visio_app, visio_dir, filename, page_cache, temp_dir)
+        return
+
+    visio_file_path = os.path.normpath(os.path.join(visio_dir, filename))
+    page_keys = (
+        vsdx_page_keys(visio_file_path, page_key_settings(visio_app, extension))
+        if page_cache
+        else None
+    )
+    with span("open", file=filename):
+        visio_doc = visio_app.Documents.Open(visio_file_path)
+    try:
+        total_pages = visio_doc.Pages.Count
+        for i, page in enumerate(visio_doc.Pages):
+            image_path = temp_image_path(temp_dir or visio_dir, filename, i + 1, extension)
+            with span("export", file=filename, page=i + 1):
+                export_page(page, image_path, page_keys, page_cache)
+            yield image_path, i == total_pages - 1
     finally:
-        pythoncom.CoUninitialize()
+        with span("close", file=filename):
+            visio_doc.Close()
 
 
 def visio_to_word_export_png(
@@ -163,6 +555,15 @@ def visio_to_word_export_png(
     update_progress=None,
     separate_files=False,
     word_processor="Word",
+    visio_factory=None,
+    office_factory=None,
+    use_page_cache=True,
+    doc_backend=None,
+    volume_pages=None,
+    volume_bytes=None,
+    output_dir=None,
+    bulk_export=None,
+    merged_order=None,
 ):
     """
     使用导出PNG图片方式将Visio文件内容转换到Word/WPS文档中。
@@ -173,10 +574,21 @@ def visio_to_word_export_png(
         update_progress (function, 可选): 进度回调函数，格式为func(文件名, 当前序号, 总数)
         separate_files (bool): 是否每个Visio文件生成单独的Word文档
         word_processor (str): 目标办公软件类型，"Word"或"WPS"
+        visio_factory (function, 可选): 创建Visio实例的函数，默认create_visio_app
+        office_factory (function, 可选): 创建办公应用实例的函数，默认create_office_app
+        use_page_cache (bool): 是否复用.vsdx中未修改页面上次导出的图片
+        doc_backend (str, 可选): 文档生成方式，"docx"(不启动Word)、"stream"或"com"，
+            默认取config.DOC_BACKEND
+        volume_pages (int, 可选): 合并文档每卷最多页数，默认取config.VOLUME_MAX_PAGES
+        volume_bytes (int, 可选): 合并文档每卷最多图片字节数，默认取config.VOLUME_MAX_BYTES
+        output_dir (str, 可选): 输出目录(output.docx与Converted_Files的父目录)，默认visio_dir
+        bulk_export (bool, 可选): 是否每个文件一次导出全部页面，默认取config.EXPORT_BULK
+        merged_order (list, 可选): 合并输出时文档中全部文件的顺序，给定时只把file_list中的文件
+            重新写入，并就地更新已有的output.docx(见docx_patch.py)，由run_visio_task增量转换时传入
 
     流程:
     1. 初始化COM环境
-    2. 启动Visio和Word/WPS应用程序
+    2. 启动Visio和Word/WPS应用程序(docx方式不启动Word/WPS)
     3. 根据separate_files决定创建单个或多个Word文档
     4. 遍历每个Visio文件，将每页导出为PNG图片并插入Word
     5. 保存生成的Word文档并退出应用程序
@@ -184,68 +596,191 @@ def visio_to_word_export_png(
     注意:
     - 会创建临时PNG图片文件，操作完成后自动删除
     - 使用前确保没有Visio和Word/WPS进程运行(可调用kill_*_processes)
-    - 会创建临时Word应用程序实例，操作完成后自动退出
+    - com方式会创建临时Word应用程序实例，操作完成后自动退出
     """
-    pythoncom.CoInitialize()
+    output_root = output_dir or visio_dir
+    os.makedirs(output_root, exist_ok=True)
+    page_cache = open_page_cache(output_root, use_page_cache)
+    com_initialize()
     try:
-        visio_app = win32com.client.Dispatch("Visio.Application")
-        visio_app.Visible = False
-
-        office_app = create_office_app(word_processor)
-        office_app.Visible = WORD_APP_VISIBLE
-
-        if not separate_files:
-            doc = office_app.Documents.Add()
-            office_app.Selection.EndKey(6)
+        visio_app = (visio_factory or create_visio_app)()
+        sink = create_sink(
+            output_root,
+            separate_files,
+            word_processor,
+            doc_backend,
+            office_factory,
+            volume_pages,
+            volume_bytes,
+            merged_order=merged_order,
+        )
 
         total_files = len(file_list)
-        for idx, filename in enumerate(file_list):
-            if update_progress:
-                update_progress(filename, idx + 1, total_files)
+        skip = sink.resume_point(file_list)
+        try:
+            for idx, filename in enumerate(file_list):
+                if idx < skip:
+                    continue
+                if update_progress:
+                    update_progress(filename, idx + 1, total_files)
+
+                with span("file", file=filename):
+                    sink.begin_file(filename)
+                    pages = export_pages(
+                        visio_app, visio_dir, filename, page_cache, output_root, bulk_export
+                    )
+                    for page_number, (image_path, is_last_page) in enumerate(pages, 1):
+                        with span("insert", file=filename, page=page_number):
+                            sink.add_picture(image_path, is_last_page)
+                        with span("remove_temp", file=filename, page=page_number):
+                            os.remove(image_path)
+                        page_done()
+                    with span("end_file", file=filename):
+                        sink.end_file(filename)
+        except BaseException:
+            sink.abort()
+            raise
+
+        with span("save"):
+            sink.close()
 
-            visio_file_path = os.path.normpath(os.path.join(visio_dir, filename))
-            visio_doc = visio_app.Documents.Open(visio_file_path)
+    finally:
+        com_uninitialize()
 
-            if separate_files:
-                current_doc = office_app.Documents.Add()
-                current_selection = office_app.Selection
-                current_selection.EndKey(6)
-            else:
-                current_doc = doc
-                current_selection = office_app.Selection
+def export_vector_pages(
+    visio_app, visio_dir, filename, vector_format="svg", page_cache=None, temp_dir=None
+):
+    """
+    打开Visio文件并逐页导出为临时矢量图，SVG同时导出一张缩小的PNG后备图片。
 
-            total_pages = visio_doc.Pages.Count
-            for i, page in enumerate(visio_doc.Pages):
-                temp_image_path = os.path.join(
-                    visio_dir, f"temp_{filename}_{i + 1}.png"
-                )
-                page.Export(temp_image_path)
+    参数:
+        vector_format (str): "svg"或"emf"
+        其余参数同export_pages
 
-                range_end = current_doc.Content
-                range_end.Collapse(0)
-                range_end.InlineShapes.AddPicture(temp_image_path)
+    返回:
+        generator: 逐页产出(矢量图路径, 后备图片路径或None, 是否最后一页)，图片由调用方负责删除
+    """
+    from image_stage import shrink_image
+
+    visio_file_path = os.path.normpath(os.path.join(visio_dir, filename))
+    # 页面缓存按扩展名区分文件，后备PNG与导出PNG方式共用缓存
+    page_keys = (
+        vsdx_page_keys(visio_file_path, page_key_settings(visio_app, "png"))
+        if page_cache
+        else None
+    )
+    temp_dir = temp_dir or visio_dir
+    with span("open", file=filename):
+        visio_doc = visio_app.Documents.Open(visio_file_path)
+    try:
+        total_pages = visio_doc.Pages.Count
+        for i, page in enumerate(visio_doc.Pages):
+            vector_path = temp_image_path(temp_dir, filename, i + 1, vector_format)
+            fallback_path = None
+            with span("export", file=filename, page=i + 1):
+                export_page(page, vector_path, page_keys, page_cache)
+                if vector_format == "svg":
+                    fallback_path = temp_image_path(temp_dir, filename, i + 1)
+                    export_page(page, fallback_path, page_keys, page_cache)
+                    shrink_image(fallback_path, VECTOR_FALLBACK_WIDTH_PX)
+            yield vector_path, fallback_path, i == total_pages - 1
+    finally:
+        with span("close", file=filename):
+            visio_doc.Close()
 
-                if i < total_pages - 1:
-                    range_end.InsertBreak(7)
 
-                os.remove(temp_image_path)
+def visio_to_word_export_vector(
+    visio_dir,
+    file_list,
+    update_progress=None,
+    separate_files=False,
+    word_processor="Word",
+    visio_factory=None,
+    office_factory=None,
+    use_page_cache=True,
+    doc_backend=None,
+    volume_pages=None,
+    volume_bytes=None,
+    output_dir=None,
+    vector_format=None,
+    merged_order=None,
+):
+    """
+    使用导出矢量图方式将Visio文件内容转换到Word/WPS文档中。
 
-            visio_doc.Close()
+    每页导出为SVG(附带缩小的PNG后备图片)或EMF后嵌入文档，图片保持矢量，
+    文档比导出PNG更小、放大不模糊；与复制粘贴方式不同，不经过系统剪贴板。
 
-            if separate_files:
-                output_name = os.path.splitext(filename)[0] + ".docx"
-                output_path = os.path.join(visio_dir, "Converted_Files", output_name)
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                current_doc.SaveAs(output_path)
-                current_doc.Close()
+    参数:
+        前12个参数同visio_to_word_export_png
+        vector_format (str, 可选): "svg"或"emf"，默认取config.VECTOR_FORMAT
+        merged_order (list, 可选): 同visio_to_word_export_png
 
-        if not separate_files:
-            output_word_path = os.path.join(visio_dir, "output.docx")
-            doc.SaveAs(output_word_path)
-        office_app.Quit()
+    注意:
+    - SVG需要Word 2016及以上版本显示，旧版本显示PNG后备图片
+    - com方式由Word直接插入矢量图，WPS对SVG的支持取决于其版本
+    """
+    vector_format = (vector_format or VECTOR_FORMAT).lower()
+    if vector_format not in ("svg", "emf"):
+        raise ValueError(f"未知的矢量图格式: {vector_format}")
+    output_root = output_dir or visio_dir
+    os.makedirs(output_root, exist_ok=True)
+    page_cache = open_page_cache(output_root, use_page_cache)
+    com_initialize()
+    try:
+        visio_app = (visio_factory or create_visio_app)()
+        sink = create_sink(
+            output_root,
+            separate_files,
+            word_processor,
+            doc_backend,
+            office_factory,
+            volume_pages,
+            volume_bytes,
+            merged_order=merged_order,
+        )
+
+        total_files = len(file_list)
+        skip = sink.resume_point(file_list)
+        try:
+            for idx, filename in enumerate(file_list):
+                if idx < skip:
+                    continue
+                if update_progress:
+                    update_progress(filename, idx + 1, total_files)
+
+                with span("file", file=filename):
+                    sink.begin_file(filename)
+                    pages = export_vector_pages(
+                        visio_app,
+                        visio_dir,
+                        filename,
+                        vector_format,
+                        page_cache,
+                        output_root,
+                    )
+                    for page_number, (vector_path, fallback_path, is_last_page) in enumerate(
+                        pages, 1
+                    ):
+                        with span("insert", file=filename, page=page_number):
+                            sink.add_vector_picture(vector_path, fallback_path, is_last_page)
+                        with span("remove_temp", file=filename, page=page_number):
+                            os.remove(vector_path)
+                            if fallback_path:
+                                os.remove(fallback_path)
+                        page_done()
+                    with span("end_file", file=filename):
+                        sink.end_file(filename)
+        except BaseException:
+            sink.abort()
+            raise
+
+        with span("save"):
+            sink.close()
 
     finally:
-        pythoncom.CoUninitialize()
+        com_uninitialize()
+
 
 def visio_to_images(
     visio_dir,
@@ -253,6 +788,9 @@ def visio_to_images(
     update_progress=None,
     image_format="PNG",
     word_processor="Word",
+    visio_factory=None,
+    use_page_cache=True,
+    output_dir=None,
 ):
     """
     将Visio文件导出为图片到Converted_Files目录下
@@ -263,6 +801,9 @@ def visio_to_images(
         update_progress (function, 可选): 进度回调函数，格式为func(文件名, 当前序号, 总数)
         image_format (str): 导出的图片格式，支持"PNG"、"JPG"、"GIF"等Visio支持的格式
         word_processor (str): 保留参数，保持接口一致性，实际不使用
+        visio_factory (function, 可选): 创建Visio实例的函数，默认create_visio_app
+        use_page_cache (bool): 是否复用.vsdx中未修改页面上次导出的图片
+        output_dir (str, 可选): 输出目录(Converted_Files的父目录)，默认visio_dir
 
     返回:
         list: 生成的图片文件路径列表
@@ -275,42 +816,55 @@ def visio_to_images(
     5. 返回所有生成的图片路径
 
     注意:
-    - 图片会保存在visio_dir/Converted_Files/原文件名/目录下
+    - 图片会保存在output_dir/Converted_Files/原文件名/目录下
     - 图片命名为"Page_1.png"、"Page_2.png"等形式
     - 使用前确保没有Visio进程运行(可调用kill_visio_processes)
     """
-    pythoncom.CoInitialize()
+    output_root = output_dir or visio_dir
+    page_cache = open_page_cache(output_root, use_page_cache)
+    com_initialize()
     generated_files = []
+    visio_app = None
     try:
-        visio_app = win32com.client.Dispatch("Visio.Application")
-        visio_app.Visible = False
+        visio_app = (visio_factory or create_visio_app)()
 
         total_files = len(file_list)
         for idx, filename in enumerate(file_list):
             if update_progress:
                 update_progress(filename, idx + 1, total_files)
 
-            # 创建文件输出目录: visio_dir/Converted_Files/原文件名/
-            output_dir = os.path.join(
-                visio_dir, "Converted_Files", os.path.splitext(filename)[0]
+            # 创建文件输出目录: output_dir/Converted_Files/原文件名/
+            file_output_dir = os.path.join(
+                output_root, "Converted_Files", os.path.splitext(filename)[0]
             )
-            os.makedirs(output_dir, exist_ok=True)
+            os.makedirs(file_output_dir, exist_ok=True)
 
             # 打开Visio文件
             visio_file_path = os.path.normpath(os.path.join(visio_dir, filename))
-            visio_doc = visio_app.Documents.Open(visio_file_path)
+            page_keys = (
+                vsdx_page_keys(
+                    visio_file_path, page_key_settings(visio_app, image_format.lower())
+                )
+                if page_cache
+                else None
+            )
+            with span("open", file=filename):
+                visio_doc = visio_app.Documents.Open(visio_file_path)
 
             # 导出每一页
             for i, page in enumerate(visio_doc.Pages):
                 page_number = i + 1
                 image_name = f"Page_{page_number}.{image_format.lower()}"
-                image_path = os.path.join(output_dir, image_name)
+                image_path = os.path.join(file_output_dir, image_name)
 
                 # 导出图片 (使用完整的导出方法确保质量)
-                page.Export(image_path)
+                with span("export", file=filename, page=page_number):
+                    export_page(page, image_path, page_keys, page_cache)
                 generated_files.append(image_path)
+                page_done()
 
-            visio_doc.Close()
+            with span("close", file=filename):
+                visio_doc.Close()
 
         return generated_files
 
@@ -322,64 +876,435 @@ def visio_to_images(
             visio_app.Quit()
         except:
             pass
-        pythoncom.CoUninitialize()
+        com_uninitialize()
+
+
+def visio_to_multi_targets(
+    visio_dir,
+    file_list,
+    update_progress=None,
+    targets=ALL_TARGETS,
+    image_format="PNG",
+    word_processor="Word",
+    visio_factory=None,
+    office_factory=None,
+    use_page_cache=True,
+    doc_backend=None,
+    volume_pages=None,
+    volume_bytes=None,
+    output_dir=None,
+    merged_order=None,
+):
+    """
+    一次转换同时生成多种输出：合并文档、单独文档与图片目录。
+
+    每个Visio文件只打开一次、每页只导出一次，导出的图片依次写入各个输出，
+    代替分别运行导出PNG(合并/单独)与导出图片时重复打开文件和导出页面。
+
+    参数:
+        visio_dir (str): Visio文件所在目录路径
+        file_list (list): 要转换的Visio文件名列表
+        update_progress (function, 可选): 进度回调函数，格式为func(文件名, 当前序号, 总数)
+        targets (list): 输出目标，"merged"(output.docx)、"separate"(Converted_Files/原文件名.docx)、
+            "images"(Converted_Files/原文件名/Page_1.png……)的任意组合
+        image_format (str): 导出的图片格式，"PNG"、"JPG"、"GIF"或"BMP"
+        其余参数同visio_to_word_export_png，merged_order只作用于合并文档
+
+    注意:
+    - 图片目录保存导出的原图，插入文档的图片仍按config.IMAGE_*后处理
+    - 合并文档的分卷设置照常生效，但不支持"stream"方式的断点续写
+    """
+    targets = normalize_targets(targets)
+    if image_format.upper() not in IMAGE_FORMATS:
+        raise ValueError(f"多目标导出不支持的图片格式: {image_format}")
+    extension = image_format.lower()
+    output_root = output_dir or visio_dir
+    os.makedirs(output_root, exist_ok=True)
+    page_cache = open_page_cache(output_root, use_page_cache)
+    com_initialize()
+    try:
+        visio_app = (visio_factory or create_visio_app)()
+        sinks = []
+        if TARGET_IMAGES in targets:
+            sinks.append(ImageDirSink(output_root))
+        document_sinks = [
+            create_sink(
+                output_root,
+                target == TARGET_SEPARATE,
+                word_processor,
+                doc_backend,
+                office_factory,
+                volume_pages,
+                volume_bytes,
+                resume=False,
+                process_images=False,
+                merged_order=merged_order if target == TARGET_MERGED else None,
+            )
+            for target in targets
+            if target in (TARGET_MERGED, TARGET_SEPARATE)
+        ]
+        if document_sinks:
+            from image_stage import wrap_sink
+
+            # 后处理会原地改写图片，放在图片目录之后，且所有文档共用一次处理结果
+            sinks.append(wrap_sink(FanOutSink(document_sinks)))
+        sink = FanOutSink(sinks)
+
+        total_files = len(file_list)
+        try:
+            for idx, filename in enumerate(file_list):
+                if update_progress:
+                    update_progress(filename, idx + 1, total_files)
+
+                with span("file", file=filename):
+                    sink.begin_file(filename)
+                    pages = export_pages(
+                        visio_app,
+                        visio_dir,
+                        filename,
+                        page_cache,
+                        output_root,
+                        extension=extension,
+                    )
+                    for page_number, (image_path, is_last_page) in enumerate(pages, 1):
+                        with span("insert", file=filename, page=page_number):
+                            sink.add_picture(image_path, is_last_page)
+                        with span("remove_temp", file=filename, page=page_number):
+                            os.remove(image_path)
+                        page_done()
+                    with span("end_file", file=filename):
+                        sink.end_file(filename)
+        except BaseException:
+            sink.abort()
+            raise
+
+        with span("save"):
+            sink.close()
+
+    finally:
+        com_uninitialize()
+
 
-def get_visio_files(visio_dir, extensions=None, func=None):
+def get_visio_files(
+    visio_dir, extensions=None, func=None, include=None, exclude=None, recursive=None
+):
     """
     获取指定目录下所有Visio文件
 
     参数:
         visio_dir (str): 要扫描的目录路径
         extensions (list, 可选): 要匹配的文件扩展名列表，默认包含 .vsdx/.vsd
+        include, exclude (list, 可选): 包含/排除通配符，默认取config.SCAN_INCLUDE/SCAN_EXCLUDE
+        recursive (bool, 可选): 是否包含子目录，默认取config.SCAN_RECURSIVE
 
     返回:
-        list: 匹配到的Visio文件名列表(相对路径)
+        list: 匹配到的Visio文件名列表(相对路径)，顺序稳定
     """
-    if extensions is None:
-        extensions = [".vsdx", ".vsd"]
-
     try:
-        all_files = [
-            f
-            for f in os.listdir(visio_dir)
-            if os.path.isfile(os.path.join(visio_dir, f))
-        ]
-
-        file_list = [
-            f for f in all_files if os.path.splitext(f.lower())[1] in extensions
-        ]
-
-        return sorted(file_list)  # 按名称排序保证处理顺序一致
+        return scan_visio_files(visio_dir, extensions, include, exclude, recursive)
 
     except Exception as e:
         print(f"扫描目录失败: {e}")
         return []
 
-def run_visio_task(visio_dir, func, *args, **kwargs):
+# 不影响输出内容、不参与缓存键计算的参数
+_CACHE_IGNORED_ARGS = {
+    "visio_dir",
+    "file_list",
+    "update_progress",
+    "workers",
+    "depth",
+    "use_page_cache",
+    "output_dir",
+    "file_timeout",
+    "page_timeout",
+    "retries",
+    "backoff",
+    "merged_order",
+}
+
+
+def _cache_config_defaults():
+    """默认值为None、实际取config中配置的参数，计算缓存键时换成生效的值"""
+    return {
+        "doc_backend": DOC_BACKEND,
+        "volume_pages": VOLUME_MAX_PAGES,
+        "volume_bytes": VOLUME_MAX_BYTES,
+        "vector_format": VECTOR_FORMAT,
+    }
+
+
+def renderer_tag(visio_factory=None):
+    """
+    返回页面渲染方式的标识，计入转换缓存的设置键，使Visio与原生渲染的输出互不复用。
+
+    参数:
+        visio_factory (function, 可选): 创建Visio实例的函数；声明了RendererTag属性的工厂
+            (如native_render.NativeVisioFactory、session.AppSession)按该属性区分，
+            默认工厂按config.VISIO_BACKEND判断，其余视为Visio
+    """
+    owner = getattr(visio_factory, "__self__", None)  # AppSession.visio_factory等绑定方法
+    tag = getattr(visio_factory, "RendererTag", None) or getattr(owner, "RendererTag", None)
+    if tag:
+        return tag
+    if visio_factory in (None, create_visio_app) and VISIO_BACKEND == "native":
+        from native_render import RENDERER_TAG
+
+        return RENDERER_TAG
+    return "visio"
+
+
+def conversion_outputs(visio_dir, filename, func_name, separate_files, targets=None):
+    """
+    返回一次转换为指定文件生成的输出路径列表。
+
+    参数:
+        visio_dir (str): 输出所在目录，通常即Visio文件所在目录
+        filename (str): Visio文件名，为MERGED_KEY时表示合并输出
+        func_name (str): 转换函数名
+        separate_files (bool): 是否单独转换每个文件
+        targets (tuple, 可选): 多目标导出的输出目标
+    """
+    if filename == MERGED_KEY:
+        return [os.path.join(visio_dir, "output.docx")]
+    if func_name == "visio_to_images":
+        return [image_dir_path(visio_dir, filename)]
+    if func_name == "visio_to_multi_targets":
+        outputs = []
+        if TARGET_SEPARATE in targets:
+            outputs.append(converted_docx_path(visio_dir, filename))
+        if TARGET_IMAGES in targets:
+            outputs.append(image_dir_path(visio_dir, filename))
+        return outputs
+    return [converted_docx_path(visio_dir, filename)]
+
+
+def create_conversion_cache(visio_dir, func, *args, **kwargs):
+    """
+    根据转换函数及其参数创建增量转换缓存。
+
+    参数与run_visio_task透传给func的参数一致，用于确定缓存键中的转换设置和输出位置。
+    """
+    bound = inspect.signature(func).bind(visio_dir, [], *args, **kwargs)
+    bound.apply_defaults()
+    settings = {"func": func.__name__}
+    for name, value in bound.arguments.items():
+        if name not in _CACHE_IGNORED_ARGS and not callable(value):
+            settings[name] = value
+    # 未显式传入的参数按config中的当前值计入，修改配置后不会复用按旧配置生成的输出
+    for name, default in _cache_config_defaults().items():
+        if name in settings and settings[name] is None:
+            settings[name] = default
+    if func.__name__ == "visio_to_word_export_vector":
+        settings["vector_fallback_width"] = VECTOR_FALLBACK_WIDTH_PX
+    # 应用实例工厂不计入参数，单独记录渲染方式
+    settings["renderer"] = renderer_tag(bound.arguments.get("visio_factory"))
+    # 图片后处理改变文档内容，启用时计入转换设置
+    if func.__name__ != "visio_to_images" and (
+        IMAGE_MAX_WIDTH_PX or IMAGE_TARGET_DPI or IMAGE_FORMAT
+    ):
+        settings["image"] = [
+            IMAGE_MAX_WIDTH_PX,
+            IMAGE_TARGET_DPI,
+            IMAGE_FORMAT,
+            IMAGE_JPEG_QUALITY,
+        ]
+
+    separate_files = bool(bound.arguments.get("separate_files", False))
+    merged = func.__name__ != "visio_to_images" and not separate_files
+    targets = None
+    if func.__name__ == "visio_to_multi_targets":
+        targets = normalize_targets(bound.arguments["targets"])
+        settings["targets"] = list(targets)
+        # 含合并文档时任一文件变化都要全部重新导出，单独文档与图片随之一起更新
+        merged = TARGET_MERGED in targets
+    output_root = bound.arguments.get("output_dir") or visio_dir
+    return ConversionCache(
+        visio_dir,
+        settings,
+        lambda filename: conversion_outputs(
+            output_root, filename, func.__name__, separate_files, targets
+        ),
+        merged=merged,
+        output_dir=output_root,
+    )
+
+
+def merged_patch_path(visio_dir, func, *args, **kwargs):
+    """
+    判断本次合并输出能否就地更新已有的output.docx(见docx_patch.py)。
+
+    参数与run_visio_task透传给func的参数一致。
+
+    返回:
+        str: 可以就地更新时返回output.docx的路径，否则返回None
+
+    注意:
+    - 要求转换函数支持merged_order参数、文档生成方式为"docx"或"stream"且未启用分卷，
+      并且output.docx自上次写出后未被修改(索引有效)
+    """
+    signature = inspect.signature(func)
+    if "merged_order" not in signature.parameters:
+        return None
+    bound = signature.bind(visio_dir, [], *args, **kwargs)
+    bound.apply_defaults()
+    arguments = bound.arguments
+    volume_pages = arguments.get("volume_pages")
+    volume_bytes = arguments.get("volume_bytes")
+    if (arguments.get("doc_backend") or DOC_BACKEND) not in ("docx", "stream"):
+        return None
+    if (VOLUME_MAX_PAGES if volume_pages is None else volume_pages) or (
+        VOLUME_MAX_BYTES if volume_bytes is None else volume_bytes
+    ):
+        return None
+    if func.__name__ == "visio_to_multi_targets" and TARGET_MERGED not in arguments["targets"]:
+        return None
+
+    from docx_patch import load_merged_index
+
+    output_path = os.path.join(arguments.get("output_dir") or visio_dir, "output.docx")
+    return output_path if load_merged_index(output_path) is not None else None
+
+
+def run_visio_task(
+    visio_dir,
+    func,
+    *args,
+    force=False,
+    use_cache=True,
+    kill_processes=True,
+    files=None,
+    stats=None,
+    **kwargs,
+):
     """
     自动获取 file_list 并执行指定的 Visio 处理任务函数。
 
     参数:
         visio_dir (str): Visio 文件所在目录
         func (callable): 要执行的处理函数（如 visio_to_word_export_png）
+        force (bool): 忽略缓存，强制重新转换全部文件
+        use_cache (bool): 是否启用基于内容哈希的增量转换缓存
+        kill_processes (bool): 转换前是否终止已有的Visio/Word进程，
+            复用同一应用会话批量转换时应传False
+        files (list, 可选): 只按给定顺序转换目录中的这些文件，默认目录下全部Visio文件
+        stats (dict, 可选): 传入时填写本次运行的统计信息:
+            total(文件总数)、converted(实际转换数)、skipped(命中缓存数)、evicted(清理数)
         *args, **kwargs: 会透传给 func 的额外参数
 
     返回:
-        func 返回值，或 None（如果无文件或出错）
+        func 返回值，或 None（如果无文件、全部命中缓存或出错）
+
+    注意:
+    - 启用缓存时只转换内容或设置发生变化的文件，已删除/重命名文件的旧输出会被清理
+    - 合并输出模式下，docx/stream方式只重新导出变化的文件并就地更新output.docx，
+      顺序变化或删除文件时只调整文档(见merged_patch_path)；其他情况重建整个output.docx
     """
-    kill_visio_processes()
-    kill_word_processes("Word")
-    file_list = get_visio_files(visio_dir)
+    if stats is None:
+        stats = {}
+    stats.update(total=0, converted=0, skipped=0, evicted=0)
+
+    all_files = get_visio_files(visio_dir)
+    file_list = all_files
+    if files is not None:
+        available = set(all_files)
+        file_list = [f for f in files if f in available]
     if not file_list:
         print(f"在目录 {visio_dir} 中未找到任何 Visio 文件。")
         return None
+    stats["total"] = len(file_list)
+
+    todo = file_list
+    cache = None
+    merged_order = None
+    patch_path = None
+    if use_cache:
+        cache = create_conversion_cache(visio_dir, func, *args, **kwargs)
+        # 只转换部分文件时，其余文件的缓存条目不算过期
+        evicted = cache.evict_stale(all_files)
+        for filename in evicted:
+            print(f"源文件已不存在，清理缓存: {filename}")
+        stats["evicted"] = len(evicted)
+        if not force:
+            todo = cache.pending_files(file_list)
+            if todo and cache.merged:
+                patch_path = merged_patch_path(visio_dir, func, *args, **kwargs)
+                changed = cache.changed_files(file_list) if patch_path else None
+                if changed is not None:
+                    merged_order = file_list
+                    todo = changed
+        stats["skipped"] = len(file_list) - len(todo)
+        if merged_order is not None:
+            print(
+                f"就地更新合并文档：重新导出 {len(todo)} 个文件，"
+                f"保留 {len(file_list) - len(todo)} 个未修改的文件。"
+            )
+        elif not todo:
+            cache.save()
+            print(f"目录 {visio_dir} 中的文件均未修改，跳过转换。")
+            return None
+        elif len(todo) < len(file_list):
+            print(f"跳过 {len(file_list) - len(todo)} 个未修改的文件。")
+
+    method = {
+        "visio_to_word_copy_paste": "copy_paste",
+        "visio_to_images": "images",
+        "visio_to_multi_targets": "multi",
+    }.get(func.__name__, "export_png")
+    if kill_processes:
+        kill_visio_processes()
+        if uses_office_app(method, kwargs.get("doc_backend")):
+            kill_word_processes(kwargs.get("word_processor", "Word"))
+    start_time = time.time() - 2  # 容忍部分文件系统较粗的时间戳精度
+    result = None
+    completed = False
+    try:
+        if merged_order is not None:
+            from docx_patch import MergedPatchError, patch_merged_docx
+
+            try:
+                if todo:
+                    result = func(visio_dir, todo, *args, merged_order=merged_order, **kwargs)
+                else:
+                    patch_merged_docx(patch_path, merged_order)
+            except MergedPatchError as e:
+                # 合并文档与索引不一致时不能跳过缺少的文件，改为完整重建
+                print(f"{e}，完整重新生成合并文档。")
+                merged_order = None
+                todo = file_list
+                stats["skipped"] = 0
+        if merged_order is None:
+            result = func(visio_dir, todo, *args, **kwargs)
+        stats["converted"] = len(todo)
+        completed = True
+        return result
+    finally:
+        if cache is not None:
+            # 带超时保护的转换会跳过失败的文件，中途出错或取消时也只写入了部分文件，
+            # 此时合并文档不完整，不能记为已转换
+            failed = not completed or (
+                isinstance(result, dict) and (result.get("failed") or result.get("skipped"))
+            )
+            if not (failed and cache.merged):
+                cache.record(file_list if cache.merged else todo, since=start_time)
+            cache.save()
 
-    return func(visio_dir, file_list, *args, **kwargs)
 
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="批量将目录中的Visio文件导出为Word")
+    parser.add_argument("dirs", nargs="*", help="Visio文件所在目录，可指定多个")
+    parser.add_argument("--force", action="store_true", help="忽略缓存强制重新转换")
+    cli_args = parser.parse_args()
+
+    for visio_dir in cli_args.dirs:
+        run_visio_task(
+            visio_dir, visio_to_word_export_png, separate_files=True, force=cli_args.force
+        )
+    if cli_args.dirs:
+        raise SystemExit(0)
 
-if __name__ == "__main__":
- 
     # visio_dir = r"D:\Lenovo\Desktop\进迭时空SOP-v2\财务SOP\应付管理"
     # run_visio_task(visio_dir, visio_to_word_export_png, separate_files=True)
 
@@ -405,4 +1330,6 @@ if __name__ == "__main__":
     # run_visio_task(visio_dir, visio_to_word_export_png, separate_files=True)
 
     visio_dir = r"D:\Lenovo\Desktop\进迭时空SOP-v2\制造SOP\销售管理"
-    run_visio_task(visio_dir, visio_to_word_export_png, separate_files=True)
\ No newline at end of file
+    run_visio_task(
+        visio_dir, visio_to_word_export_png, separate_files=True, force=cli_args.force
+    )
\ No newline at end of file
@@ -0,0 +1,457 @@
+"""
+常驻转换服务。
+
+服务进程持有预热的Visio/Word实例，通过本机HTTP接口接收转换任务，
+避免每次转换都终止进程并冷启动应用。所有任务在同一个工作线程中依次执行，
+COM对象不跨线程使用；实例每完成一定数量的任务后自动重启，无响应时也会重启。
+
+接口(JSON):
+    GET  /health             服务与实例状态
+    POST /jobs               提交任务，请求体为cli清单中的单个任务，返回{"id": 任务ID}
+    GET  /jobs/<id>          任务状态与汇总
+    GET  /jobs/<id>/events   以每行一个JSON的形式持续返回任务进度，任务结束后断开
+    POST /jobs/<id>/cancel   取消任务：等待中的任务不再执行，正在转换的任务在当前文件完成后停止
+    POST /shutdown           停止服务
+
+除/health外的请求都要在X-V2W-Token头中带上服务令牌：令牌在服务启动时随机生成，
+写入只有当前用户可读的令牌文件(见token_path)，本机的submit与GUI从中读取。
+服务同时检查Host与Origin头，POST请求体必须为application/json，
+防止浏览器中的网页通过跨站请求或DNS重绑定提交任务、停止服务。
+"""
+import hmac
+import itertools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from async_jobs import ConversionCancelled
+from cli import normalize_job, run_job
+from config import DAEMON_HOST, DAEMON_PORT, DAEMON_RECYCLE_JOBS, DAEMON_TOKEN_DIR
+from core import com_initialize, com_uninitialize
+from session import AppSession
+
+TOKEN_HEADER = "X-V2W-Token"
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+def token_path(port=DAEMON_PORT):
+    """返回服务令牌文件路径，每个端口一个，默认位于用户主目录"""
+    token_dir = DAEMON_TOKEN_DIR or os.path.expanduser("~")
+    return os.path.join(token_dir, f".v2w_daemon_{port}.token")
+
+
+def read_token(port=DAEMON_PORT):
+    """读取服务令牌，服务未运行或无权读取时返回None"""
+    try:
+        with open(token_path(port), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_token(path):
+    """
+    生成新的服务令牌并写入只有当前用户可读写的文件。
+
+    注意:
+    - 先删除旧文件再以0600权限新建，不沿用旧文件的权限；Windows上由用户主目录的权限保护
+    """
+    token = secrets.token_urlsafe(32)
+    if os.path.exists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def _host_name(value):
+    """从Host头或Origin中取出主机名(去掉端口与IPv6的方括号)"""
+    if "://" in value:
+        return urllib.parse.urlsplit(value).hostname or ""
+    if value.startswith("["):
+        return value[1:].split("]", 1)[0]
+    return value.rsplit(":", 1)[0].lower()
+
+
+class Job:
+    """服务中的一个任务及其进度事件"""
+
+    def __init__(self, job_id, spec):
+        self.id = job_id
+        self.spec = spec
+        self.status = "queued"
+        self.summary = None
+        self.events = []
+        self.condition = threading.Condition()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消，由工作线程在下一个文件开始前检查"""
+        self.cancel_event.set()
+
+    def emit(self, event):
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def finish(self, summary):
+        with self.condition:
+            self.summary = summary
+            self.status = {"失败": "failed", "已取消": "cancelled"}.get(summary["status"], "done")
+            self.events.append({"type": "done", "summary": summary})
+            self.condition.notify_all()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def to_dict(self):
+        return {"id": self.id, "status": self.status, "summary": self.summary}
+
+
+class ConversionService:
+    """
+    任务队列与持有应用会话的工作线程。
+
+    参数:
+        visio_factory, office_factory (function, 可选): 创建应用实例的函数
+        recycle_jobs (int): 每个实例最多处理的任务数，达到后重启实例，0表示不重启
+    """
+
+    def __init__(
+        self, visio_factory=None, office_factory=None, recycle_jobs=DAEMON_RECYCLE_JOBS
+    ):
+        self.visio_factory = visio_factory
+        self.office_factory = office_factory
+        self.recycle_jobs = recycle_jobs
+        self.jobs = {}
+        self.queue = queue.Queue()
+        self.jobs_done = 0
+        self.session_jobs = 0
+        self.recycles = 0
+        self.current = None
+        self.started_at = time.time()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._session = None
+        self._worker = threading.Thread(target=self._work, daemon=True)
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self.queue.put(None)
+        self._worker.join(timeout=30)
+
+    def submit(self, spec):
+        """提交任务，返回Job"""
+        spec = normalize_job(spec)
+        with self._lock:
+            job = Job(str(next(self._ids)), spec)
+            self.jobs[job.id] = job
+        self.queue.put(job)
+        return job
+
+    def health(self):
+        """返回服务状态"""
+        session = self._session
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started_at,
+            "queued": self.queue.qsize(),
+            "running": self.current.id if self.current else None,
+            "jobs_done": self.jobs_done,
+            "session_jobs": self.session_jobs,
+            "recycle_jobs": self.recycle_jobs,
+            "recycles": self.recycles,
+            "apps_started": bool(session and session.started),
+        }
+
+    def _work(self):
+        com_initialize()
+        self._session = AppSession(self.visio_factory, self.office_factory)
+        try:
+            while True:
+                job = self.queue.get()
+                if job is None:
+                    break
+                self._run(job)
+        finally:
+            self._session.close()
+            com_uninitialize()
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.finish({"dir": job.spec["dir"], "status": "已取消", "error": None})
+            return
+        session = self._session
+        if self.recycle_jobs and self.session_jobs >= self.recycle_jobs:
+            print(f"实例已处理{self.session_jobs}个任务，重新启动")
+            session.reset()
+            self.session_jobs = 0
+            self.recycles += 1
+        elif not session.check():
+            self.session_jobs = 0
+
+        self.current = job
+        job.status = "running"
+        job.emit({"type": "start", "dir": job.spec["dir"]})
+
+        def handle_progress(filename, current, total):
+            if job.cancel_event.is_set():
+                raise ConversionCancelled()
+            job.emit(
+                {"type": "progress", "file": filename, "current": current, "total": total}
+            )
+
+        summary = run_job(
+            job.spec, session, job.spec.get("force", False), handle_progress
+        )
+        self.session_jobs = self.session_jobs + 1 if session.started else 0
+        self.jobs_done += 1
+        self.current = None
+        job.finish(summary)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None  # 由serve设置
+    token = None  # 由serve设置
+
+    def _send_json(self, data, code=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            self._send_json({"error": "任务不存在"}, 404)
+        return job
+
+    def _authorized(self):
+        """
+        检查请求来源与令牌，不通过时返回错误响应并返回False。
+
+        Host必须是本机地址(防止DNS重绑定)，带Origin头时(浏览器发出的请求)必须来自本服务自身；
+        /health不需要令牌，供daemon_available检测服务是否运行。
+        """
+        allowed = LOOPBACK_HOSTS + (self.server.server_address[0],)
+        if _host_name(self.headers.get("Host", "")) not in allowed:
+            self._send_json({"error": "不允许的Host"}, 403)
+            return False
+        origin = self.headers.get("Origin")
+        if origin is not None:
+            parts = urllib.parse.urlsplit(origin)
+            if _host_name(origin) not in allowed or parts.port != self.server.server_port:
+                self._send_json({"error": "不允许跨站请求"}, 403)
+                return False
+        if self.path == "/health":
+            return True
+        if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), self.token):
+            self._send_json({"error": "服务令牌无效"}, 403)
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self.path.strip("/").split("/")
+        if parts == ["health"]:
+            self._send_json(self.service.health())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job:
+                self._send_json(job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self._job(parts[1])
+            if job:
+                self._stream_events(job)
+        else:
+            self._send_json({"error": "未知接口"}, 404)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._send_json({"error": "请求体必须为application/json"}, 415)
+            return
+        if self.path == "/jobs":
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                spec = json.loads(self.rfile.read(length) or b"{}")
+                job = self.service.submit(spec)
+            except Exception as e:
+                self._send_json({"error": str(e)}, 400)
+                return
+            self._send_json({"id": job.id}, 202)
+        elif self.path.startswith("/jobs/") and self.path.endswith("/cancel"):
+            job = self._job(self.path.strip("/").split("/")[1])
+            if job:
+                job.cancel()
+                self._send_json(job.to_dict())
+        elif self.path == "/shutdown":
+            self._send_json({"status": "stopping"})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self._send_json({"error": "未知接口"}, 404)
+
+    def _stream_events(self, job):
+        # HTTP/1.0响应，不设Content-Length，逐行写出事件直到任务结束后断开
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        sent = 0
+        while True:
+            with job.condition:
+                while sent == len(job.events) and not job.finished:
+                    job.condition.wait(timeout=15)
+                events = job.events[sent:]
+                finished = job.finished
+            for event in events:
+                self.wfile.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            sent += len(events)
+            if finished and sent == len(job.events):
+                return
+
+    def log_message(self, format, *args):
+        pass  # 不在控制台逐条打印请求
+
+
+def serve(
+    host=DAEMON_HOST,
+    port=DAEMON_PORT,
+    recycle_jobs=DAEMON_RECYCLE_JOBS,
+    visio_factory=None,
+    office_factory=None,
+):
+    """
+    启动转换服务并阻塞，直到收到/shutdown请求。
+
+    注意:
+    - 只应监听本机地址；令牌文件在启动时生成(port为0时按实际端口命名)，停止时删除
+    """
+    service = ConversionService(visio_factory, office_factory, recycle_jobs)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    path = token_path(server.server_port)
+    token = _write_token(path)
+    server.RequestHandlerClass = type(
+        "Handler", (_Handler,), {"service": service, "token": token}
+    )
+    server.daemon_threads = True
+    service.start()
+    print(f"转换服务已启动: http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.stop()
+        if read_token(server.server_port) == token:
+            os.remove(path)
+        print("转换服务已停止")
+
+
+def _request(path, data=None, host=DAEMON_HOST, port=DAEMON_PORT, timeout=10):
+    url = f"http://{host}:{port}{path}"
+    body = None if data is None else json.dumps(data).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    token = read_token(port)
+    if token:
+        headers[TOKEN_HEADER] = token
+    request = urllib.request.Request(url, data=body, headers=headers)
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def daemon_available(host=DAEMON_HOST, port=DAEMON_PORT, timeout=0.5):
+    """转换服务是否正在运行，且本用户能读取其令牌"""
+    if read_token(port) is None:
+        return False
+    try:
+        with _request("/health", host=host, port=port, timeout=timeout) as response:
+            return json.load(response).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+
+
+def submit_job(spec, host=DAEMON_HOST, port=DAEMON_PORT):
+    """向转换服务提交任务，返回任务ID"""
+    try:
+        with _request("/jobs", spec, host, port) as response:
+            return json.load(response)["id"]
+    except urllib.error.HTTPError as e:
+        raise Exception(f"提交任务失败: {json.load(e).get('error', e)}")
+
+
+def stream_events(job_id, host=DAEMON_HOST, port=DAEMON_PORT):
+    """逐个返回任务的进度事件，任务结束后停止"""
+    with _request(f"/jobs/{job_id}/events", host=host, port=port, timeout=None) as response:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
+
+def cancel_job(job_id, host=DAEMON_HOST, port=DAEMON_PORT):
+    """请求转换服务取消任务"""
+    with _request(f"/jobs/{job_id}/cancel", {}, host, port) as response:
+        response.read()
+
+
+class RemoteJob:
+    """
+    已提交给转换服务的任务，cancel/done与async_jobs.ConversionJob一致，供GUI的"取消"按钮使用。
+    """
+
+    def __init__(self, job_id, host=DAEMON_HOST, port=DAEMON_PORT):
+        self.id = job_id
+        self.host = host
+        self.port = port
+        self.finished = False
+
+    def cancel(self):
+        """请求取消：正在转换的文件完成后停止，请求失败时只打印错误"""
+        try:
+            cancel_job(self.id, self.host, self.port)
+        except (OSError, ValueError) as e:
+            print(f"取消任务失败: {e}")
+
+    def done(self):
+        return self.finished
+
+
+def run_remote(spec, update_progress=None, host=DAEMON_HOST, port=DAEMON_PORT, on_submit=None):
+    """
+    提交任务并等待完成。
+
+    参数:
+        spec (dict): 任务，格式同cli清单中的单个任务，dir应为绝对路径
+        update_progress (function, 可选): 进度回调函数，格式为func(文件名, 当前序号, 总数)
+        on_submit (function, 可选): 提交后以RemoteJob调用，调用方可通过它取消任务
+
+    返回:
+        dict: 任务汇总，格式同cli.run_job的返回值，取消时status为"已取消"
+    """
+    job = RemoteJob(submit_job(spec, host, port), host, port)
+    if on_submit:
+        on_submit(job)
+    try:
+        for event in stream_events(job.id, host, port):
+            if event["type"] == "progress" and update_progress:
+                update_progress(event["file"], event["current"], event["total"])
+            elif event["type"] == "done":
+                return event["summary"]
+    finally:
+        job.finished = True
+    raise Exception("与转换服务的连接中断")
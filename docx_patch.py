@@ -0,0 +1,691 @@
+"""
+合并文档(output.docx)的就地增量更新，以及由单独转换的文档直接拼接合并文档。
+
+python-docx与流式方式生成合并文档时，每个源文件的页面前后各有一个隐藏书签(_V2W_1、_V2W_2……)，
+Converted_Files/.merged_index.json记录书签与源文件的对应关系以及写出时output.docx的大小与修改时间。
+
+之后只有部分文件变化时，只重新导出这些文件(写入临时文档)，再按新的文件顺序与现有文档拼接：
+未变化文件的正文与图片原样搬移，不重新导出也不重新插入；已删除文件的部分被移除。
+output.docx在上次写出后被修改过(大小或修改时间不一致)时不做增量更新，改为完整重建。
+
+拼接时图片按内容去重，正文引用的关系ID与图片文件名重新编号，样式、页眉页脚等其余部件保留原样。
+同样的拼接也用于把Converted_Files下已有的单独文档按指定顺序合并为output.docx(merge_converted_docx)，
+不必再启动Visio/Word完整转换一遍。
+"""
+import copy
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import zipfile
+
+from lxml import etree
+
+from config import IMAGE_DEDUP
+from volumes import VOLUME_INDEX_NAME, remove_stale_volumes
+
+MERGED_INDEX_NAME = os.path.join("Converted_Files", ".merged_index.json")
+MERGED_INDEX_VERSION = 2  # 版本1可能错误地为分卷的第一卷写出索引，不再使用
+BOOKMARK_PREFIX = "_V2W_"  # 以下划线开头的书签在Word中默认隐藏
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+PKG_RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+OFFICE_DOCUMENT_REL_TYPE = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+)
+
+# 正文内容引用的关系类型，拼接时按引用重新建立；其余关系(样式、页眉页脚等)保留原样
+_BODY_REL_TYPES = {
+    R_NS + "/image",
+    R_NS + "/oleObject",
+    R_NS + "/package",
+    R_NS + "/hyperlink",
+}
+
+_PARAGRAPH = f"{{{W_NS}}}p"
+_BOOKMARK_START = f"{{{W_NS}}}bookmarkStart"
+_BOOKMARK_END = f"{{{W_NS}}}bookmarkEnd"
+_PPR_BEFORE_PAGE_BREAK = {f"{{{W_NS}}}{name}" for name in ("pStyle", "keepNext", "keepLines")}
+
+
+class MergedPatchError(ValueError):
+    """合并文档的书签与索引不一致，无法就地更新，需要完整重建"""
+
+
+def bookmark_start_xml(number, namespaces=""):
+    """第number个源文件的书签起点(正文级元素)，namespaces为需要声明的命名空间"""
+    return f'<w:bookmarkStart {namespaces} w:id="{number}" w:name="{BOOKMARK_PREFIX}{number}"/>'
+
+
+def bookmark_end_xml(number, namespaces=""):
+    """第number个源文件的书签终点"""
+    return f'<w:bookmarkEnd {namespaces} w:id="{number}"/>'
+
+
+def merged_index_path(output_path):
+    """返回合并文档对应的索引路径(与output.docx同目录的Converted_Files下)"""
+    return os.path.join(os.path.dirname(output_path), MERGED_INDEX_NAME)
+
+
+def write_merged_index(output_path, files):
+    """
+    在合并文档写出后记录各源文件对应的书签。
+
+    参数:
+        output_path (str): 合并文档路径
+        files (list): 按文档中顺序排列的源文件名，第i个文件的书签为_V2W_i
+
+    注意:
+    - 只用于完整的合并文档，分卷时不写索引；同时删除上次分卷遗留的分卷索引与其余分卷
+    """
+    remove_stale_volumes(os.path.dirname(output_path))
+    stat = os.stat(output_path)
+    index = {
+        "version": MERGED_INDEX_VERSION,
+        "output": os.path.basename(output_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "files": [
+            {"file": filename, "bookmark": f"{BOOKMARK_PREFIX}{number}"}
+            for number, filename in enumerate(files, 1)
+        ],
+    }
+    path = merged_index_path(output_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def load_merged_index(output_path):
+    """
+    读取合并文档的索引。
+
+    返回:
+        dict: 索引；不存在、已损坏、合并文档在写出后被修改过或已被分卷时返回None
+    """
+    try:
+        with open(merged_index_path(output_path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        stat = os.stat(output_path)
+    except (OSError, ValueError):
+        return None
+    volume_index = os.path.join(os.path.dirname(output_path), VOLUME_INDEX_NAME)
+    if os.path.exists(volume_index):
+        return None  # output.docx只是第一卷
+    if (
+        index.get("version") != MERGED_INDEX_VERSION
+        or index.get("output") != os.path.basename(output_path)
+        or index.get("size") != stat.st_size
+        or index.get("mtime") != stat.st_mtime_ns
+    ):
+        return None
+    return index
+
+
+class _DocxPackage:
+    """只读打开的docx包：主文档、主文档关系与内容类型"""
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path)
+        self.names = set(self.zip.namelist())
+        self.main_part = "word/document.xml"
+        package_rels = self._read_rels("_rels/.rels")
+        for rel_type, target, _ in package_rels.values():
+            if rel_type == OFFICE_DOCUMENT_REL_TYPE:
+                self.main_part = target.lstrip("/")
+        self.rels_part = posixpath.join(
+            posixpath.dirname(self.main_part),
+            "_rels",
+            posixpath.basename(self.main_part) + ".rels",
+        )
+        self.rels = self._read_rels(self.rels_part)
+        self.document = etree.fromstring(self.zip.read(self.main_part))
+        self.body = self.document.find(f"{{{W_NS}}}body")
+        self.content_types = etree.fromstring(self.zip.read("[Content_Types].xml"))
+
+    def _read_rels(self, name):
+        """返回{关系ID: (类型, 目标, 目标模式)}"""
+        if name not in self.names:
+            return {}
+        rels = {}
+        for rel in etree.fromstring(self.zip.read(name)):
+            rels[rel.get("Id")] = (rel.get("Type"), rel.get("Target"), rel.get("TargetMode"))
+        return rels
+
+    def part_name(self, target):
+        """把主文档关系中的目标解析为包内部件名"""
+        return _resolve_target(posixpath.dirname(self.main_part), target)
+
+    def content_type(self, part_name):
+        """按Override或扩展名的Default查找部件的内容类型"""
+        for element in self.content_types:
+            if element.get("PartName") == "/" + part_name:
+                return element.get("ContentType")
+        extension = posixpath.splitext(part_name)[1].lstrip(".").lower()
+        for element in self.content_types:
+            if (element.get("Extension") or "").lower() == extension:
+                return element.get("ContentType")
+        return "application/octet-stream"
+
+    def body_elements(self):
+        """正文中除最后的节属性外的全部元素"""
+        return [child for child in self.body if child.tag != f"{{{W_NS}}}sectPr"]
+
+    def sections(self):
+        """
+        按书签划分正文。
+
+        返回:
+            tuple: ({书签名: 元素列表}, 不在任何书签内的元素列表)
+
+        异常:
+            MergedPatchError: 本模块的书签重复、嵌套或没有终点
+        """
+        sections = {}
+        loose = []
+        current = None
+        current_id = None
+        for child in self.body_elements():
+            name = child.get(f"{{{W_NS}}}name") or ""
+            if child.tag == _BOOKMARK_START and name.startswith(BOOKMARK_PREFIX):
+                if current is not None or name in sections:
+                    raise MergedPatchError(f"合并文档中的书签{name}重复或未闭合")
+                current = sections[name] = []
+                current_id = child.get(f"{{{W_NS}}}id")
+            elif current is not None and child.tag == _BOOKMARK_END and (
+                child.get(f"{{{W_NS}}}id") == current_id
+            ):
+                current = None
+            elif current is not None:
+                current.append(child)
+            else:
+                loose.append(child)
+        if current is not None:
+            raise MergedPatchError("合并文档中的书签未闭合")
+        return sections, loose
+
+    def close(self):
+        self.zip.close()
+
+
+class _Splicer:
+    """
+    以base包为基础，把来自多个包的正文片段拼接为新的主文档。
+
+    正文引用的图片等部件按内容去重后重新命名，关系ID重新编号；base中正文以外的部件保留。
+    """
+
+    def __init__(self, base):
+        self.base = base
+        # base中保留的关系：正文内容以外的关系(样式、页眉页脚、主题等)
+        self.kept_rels = {
+            rid: rel for rid, rel in base.rels.items() if rel[0] not in _BODY_REL_TYPES
+        }
+        dropped = {
+            base.part_name(target)
+            for rel_type, target, mode in base.rels.values()
+            if rel_type in _BODY_REL_TYPES and mode != "External"
+        }
+        # 页眉等其他部件仍然引用的图片不能删除
+        still_used = set()
+        for name in base.names:
+            if name.endswith(".rels") and name != base.rels_part:
+                for rel_type, target, mode in base._read_rels(name).values():
+                    if mode != "External":
+                        source_dir = posixpath.dirname(posixpath.dirname(name))
+                        still_used.add(_resolve_target(source_dir, target))
+        self.dropped_parts = dropped - still_used
+        self.used_names = base.names - self.dropped_parts
+        self.new_rels = {}  # 新关系ID -> (类型, 目标, 目标模式)
+        self.new_parts = {}  # 部件名 -> (读取内容的包, 源部件名, 内容类型)
+        self.by_digest = {}  # (关系类型, 内容SHA1) -> 新关系ID
+        self.next_rel = 1
+        self.next_media = 1
+        self.body = []
+        self.own_marks = set()  # 本模块添加的书签元素，已按源文件序号编号
+
+    def _new_rid(self):
+        while True:
+            rid = f"rIdV2W{self.next_rel}"
+            self.next_rel += 1
+            if rid not in self.kept_rels:
+                return rid
+
+    def _new_part_name(self, source_name):
+        """为复制过来的部件分配不冲突的名称，图片放在word/media下按image1、image2……编号"""
+        directory, base_name = posixpath.split(source_name)
+        extension = posixpath.splitext(base_name)[1].lower()
+        if directory.endswith("media"):
+            while True:
+                name = f"word/media/image{self.next_media}{extension}"
+                self.next_media += 1
+                if name not in self.used_names:
+                    break
+        else:
+            stem = posixpath.splitext(base_name)[0]
+            name = posixpath.join(directory, base_name)
+            number = 1
+            while name in self.used_names:
+                number += 1
+                name = posixpath.join(directory, f"{stem}_{number}{extension}")
+        self.used_names.add(name)
+        return name
+
+    def _map_rel(self, package, rid, cache):
+        """把package中的关系转为新文档中的关系，返回新ID"""
+        if rid in cache:
+            return cache[rid]
+        rel = package.rels.get(rid)
+        if rel is None:
+            return rid
+        rel_type, target, mode = rel
+        if package is self.base and rel_type not in _BODY_REL_TYPES:
+            new_rid = rid
+        elif mode == "External":
+            new_rid = self._new_rid()
+            self.new_rels[new_rid] = rel
+        else:
+            source_name = package.part_name(target)
+            blob = package.zip.read(source_name)
+            key = (rel_type, hashlib.sha1(blob).hexdigest())
+            new_rid = self.by_digest.get(key)
+            if new_rid is None:
+                part_name = self._new_part_name(source_name)
+                new_rid = self._new_rid()
+                self.by_digest[key] = new_rid
+                self.new_parts[part_name] = (package, source_name, package.content_type(source_name))
+                self.new_rels[new_rid] = (
+                    rel_type,
+                    posixpath.relpath(part_name, posixpath.dirname(self.base.main_part)),
+                    None,
+                )
+        cache[rid] = new_rid
+        return new_rid
+
+    def add_section(self, package, elements, number, rel_cache, page_break=False):
+        """
+        追加一个源文件的正文片段，前后加上编号为number的书签。
+
+        rel_cache为同一个包共用的关系映射，避免重复读取同一张图片。
+        page_break为True时片段第一段设置段前分页(与逐页插入时一致)，该文件从新的一页开始，
+        片段以表格等开头时在其前面插入一个分页段落；为False时去掉第一段的段前分页
+        (片段在原文档中不是第一个文件，移到文档开头后不应再留下空白页)。
+        """
+        start = etree.fromstring(bookmark_start_xml(number, f'xmlns:w="{W_NS}"'))
+        self.body.append(start)
+        self.own_marks.add(start)
+        first = True
+        for element in elements:
+            element = _copy_without_own_bookmarks(element)
+            if element is None:
+                continue
+            for node in element.iter():
+                for name, value in node.attrib.items():
+                    if name.startswith(f"{{{R_NS}}}"):
+                        node.set(name, self._map_rel(package, value, rel_cache))
+            if first and not page_break and element.tag == _PARAGRAPH:
+                if _strip_page_break_before(element):
+                    continue  # 原先为分页插入的空段落
+            elif first and page_break:
+                if element.tag != _PARAGRAPH:
+                    self.body.append(etree.Element(_PARAGRAPH))
+                    _set_page_break_before(self.body[-1])
+                else:
+                    _set_page_break_before(element)
+            first = False
+            self.body.append(element)
+        end = etree.fromstring(bookmark_end_xml(number, f'xmlns:w="{W_NS}"'))
+        self.body.append(end)
+        self.own_marks.add(end)
+
+    def add_loose(self, elements):
+        """追加不属于任何源文件的base正文内容(如手动添加的封面)"""
+        for element in elements:
+            element = _copy_without_own_bookmarks(element)
+            if element is not None:
+                self.body.append(element)
+
+    def write(self, output_path):
+        """写出拼接结果：先写临时文件，完成后替换output_path"""
+        base = self.base
+        _renumber_ids(self.body, self.own_marks)
+
+        document = etree.fromstring(base.zip.read(base.main_part))
+        body = document.find(f"{{{W_NS}}}body")
+        sect_pr = body.find(f"{{{W_NS}}}sectPr")
+        for child in list(body):
+            if child is not sect_pr:
+                body.remove(child)
+        for element in self.body:
+            if sect_pr is not None:
+                sect_pr.addprevious(element)
+            else:
+                body.append(element)
+
+        rels = etree.Element(f"{{{PKG_RELS_NS}}}Relationships", nsmap={None: PKG_RELS_NS})
+        for rid, (rel_type, target, mode) in list(self.kept_rels.items()) + list(
+            self.new_rels.items()
+        ):
+            rel = etree.SubElement(rels, f"{{{PKG_RELS_NS}}}Relationship")
+            rel.set("Id", rid)
+            rel.set("Type", rel_type)
+            rel.set("Target", target)
+            if mode:
+                rel.set("TargetMode", mode)
+
+        temp_path = output_path + ".tmp"
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as package:
+            package.writestr("[Content_Types].xml", self._content_types_xml())
+            for info in base.zip.infolist():
+                name = info.filename
+                if name in ("[Content_Types].xml", base.main_part, base.rels_part):
+                    continue
+                if name in self.dropped_parts:
+                    continue
+                # writestr会改写ZipInfo中的偏移，复制一份以免之后无法再从base中读取该部件
+                package.writestr(copy.copy(info), base.zip.read(name))
+            package.writestr(base.main_part, _serialize(document))
+            package.writestr(base.rels_part, _serialize(rels))
+            # 图片本身已经压缩，直接存储
+            for part_name, (source, source_name, _) in self.new_parts.items():
+                package.writestr(
+                    part_name, source.zip.read(source_name), compress_type=zipfile.ZIP_STORED
+                )
+        os.replace(temp_path, output_path)
+
+    def _content_types_xml(self):
+        types = etree.fromstring(etree.tostring(self.base.content_types))
+        for element in list(types):
+            part_name = (element.get("PartName") or "").lstrip("/")
+            if part_name and part_name in self.dropped_parts:
+                types.remove(element)
+        defaults = {
+            (element.get("Extension") or "").lower(): element.get("ContentType")
+            for element in types
+            if element.get("Extension")
+        }
+        for part_name, (_, _, content_type) in self.new_parts.items():
+            extension = posixpath.splitext(part_name)[1].lstrip(".").lower()
+            if extension and extension not in defaults:
+                element = etree.SubElement(types, f"{{{CT_NS}}}Default")
+                element.set("Extension", extension)
+                element.set("ContentType", content_type)
+                defaults[extension] = content_type
+            elif defaults.get(extension) != content_type:
+                element = etree.SubElement(types, f"{{{CT_NS}}}Override")
+                element.set("PartName", "/" + part_name)
+                element.set("ContentType", content_type)
+        return _serialize(types)
+
+
+def _resolve_target(source_dir, target):
+    """把关系目标解析为包内部件名：以/开头的目标相对包根目录，其余相对关系所属部件所在目录"""
+    if target.startswith("/"):
+        return posixpath.normpath(target.lstrip("/"))
+    return posixpath.normpath(posixpath.join(source_dir, target))
+
+
+def _serialize(element):
+    return etree.tostring(element, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def _set_page_break_before(paragraph):
+    """为段落设置段前分页"""
+    ppr = paragraph.find(f"{{{W_NS}}}pPr")
+    if ppr is None:
+        ppr = etree.Element(f"{{{W_NS}}}pPr")
+        paragraph.insert(0, ppr)
+    if ppr.find(f"{{{W_NS}}}pageBreakBefore") is None:
+        # 按架构顺序放在pStyle、keepNext、keepLines之后
+        index = 0
+        for child in ppr:
+            if child.tag in _PPR_BEFORE_PAGE_BREAK:
+                index = ppr.index(child) + 1
+        ppr.insert(index, etree.Element(f"{{{W_NS}}}pageBreakBefore"))
+
+
+def _strip_page_break_before(paragraph):
+    """
+    去掉段落的段前分页。
+
+    返回:
+        bool: 段落除段前分页外没有任何内容(add_section为分页插入的空段落)，应整个丢弃
+    """
+    ppr = paragraph.find(f"{{{W_NS}}}pPr")
+    if ppr is None:
+        return False
+    breaks = ppr.findall(f"{{{W_NS}}}pageBreakBefore")
+    for node in breaks:
+        ppr.remove(node)
+    return bool(breaks) and len(ppr) == 0 and len(paragraph) == 1
+
+
+def _copy_without_own_bookmarks(element):
+    """
+    复制正文元素，去掉其中本模块生成的书签(拼接后重新添加)。
+
+    元素本身就是这样的书签起点(正文级的书签)时返回None。
+    """
+    element = etree.fromstring(etree.tostring(element))
+    own_ids = set()
+    for node in list(element.iter(_BOOKMARK_START)):
+        if (node.get(f"{{{W_NS}}}name") or "").startswith(BOOKMARK_PREFIX):
+            if node is element:
+                return None
+            own_ids.add(node.get(f"{{{W_NS}}}id"))
+            node.getparent().remove(node)
+    for node in list(element.iter(_BOOKMARK_END)):
+        if node.get(f"{{{W_NS}}}id") in own_ids:
+            node.getparent().remove(node)
+    return element
+
+
+def _renumber_ids(body, own_marks):
+    """
+    重新编号正文中的图形ID(wp:docPr)与其他书签ID，避免来自不同文档的编号重复。
+
+    本模块的书签(own_marks)编号即源文件序号，其余书签排在其后。
+    """
+    next_shape = 1
+    for element in body:
+        for node in element.iter(f"{{{WP_NS}}}docPr"):
+            node.set("id", str(next_shape))
+            next_shape += 1
+
+    next_bookmark = len(own_marks) // 2 + 1
+    mapping = {}
+    for element in body:
+        if element in own_marks:
+            continue
+        for node in element.iter(_BOOKMARK_START, _BOOKMARK_END):
+            old_id = node.get(f"{{{W_NS}}}id")
+            if node.tag == _BOOKMARK_START or old_id not in mapping:
+                mapping[old_id] = str(next_bookmark)
+                next_bookmark += 1
+            node.set(f"{{{W_NS}}}id", mapping[old_id])
+
+
+def patch_merged_docx(output_path, order, staging_path=None, staged_files=None):
+    """
+    按新的文件顺序就地更新合并文档。
+
+    参数:
+        output_path (str): 已有的合并文档，需有有效的索引(见load_merged_index)
+        order (list): 更新后文档中全部源文件的顺序
+        staging_path (str, 可选): 包含重新导出文件的临时文档，为None时只调整顺序或删除文件
+        staged_files (list, 可选): 临时文档中按书签顺序排列的源文件
+
+    异常:
+        MergedPatchError: 索引无效，或order中的文件在原文档和临时文档中都找不到对应的内容
+            (如新增后转换失败、书签损坏)，此时output.docx保持不变，应完整重建
+
+    注意:
+    - 临时文档中没有的文件沿用原文档中的内容(带超时保护的转换中失败的已有文件)
+    """
+    index = load_merged_index(output_path)
+    if index is None:
+        raise MergedPatchError(f"合并文档索引无效，无法增量更新: {output_path}")
+    old_bookmarks = {entry["file"]: entry["bookmark"] for entry in index["files"]}
+    staged = {
+        filename: f"{BOOKMARK_PREFIX}{number}"
+        for number, filename in enumerate(staged_files or [], 1)
+    }
+
+    base = _DocxPackage(output_path)
+    staging = _DocxPackage(staging_path) if staging_path else None
+    try:
+        old_sections, loose = base.sections()
+        new_sections = staging.sections()[0] if staging else {}
+        splicer = _Splicer(base)
+        splicer.add_loose(loose)
+        caches = {id(base): {}, id(staging): {}}
+        written = []
+        for filename in order:
+            elements = None
+            if filename in staged:
+                package, elements = staging, new_sections.get(staged[filename])
+            if elements is None:
+                package, elements = base, old_sections.get(old_bookmarks.get(filename))
+            if elements is None:
+                raise MergedPatchError(f"合并文档中缺少文件的内容: {filename}")
+            written.append(filename)
+            # 文件调整顺序后按其最终位置重新设置分页：只有文档开头的内容不分页
+            splicer.add_section(
+                package,
+                elements,
+                len(written),
+                caches[id(package)],
+                page_break=len(written) > 1 or bool(loose),
+            )
+        splicer.write(output_path)
+    finally:
+        base.close()
+        if staging:
+            staging.close()
+    write_merged_index(output_path, written)
+
+
+def merge_converted_docx(visio_dir, file_list, output_path=None):
+    """
+    把单独转换生成的文档(Converted_Files下)按file_list的顺序拼接为一个合并文档。
+
+    参数:
+        visio_dir (str): 输出所在目录(Converted_Files的父目录)
+        file_list (list): Visio文件名列表，合并后按此顺序排列
+        output_path (str, 可选): 合并文档路径，默认visio_dir/output.docx
+
+    返回:
+        list: 实际合并的文件，没有单独文档的文件会打印提示并跳过
+
+    异常:
+        ValueError: file_list中的文件都没有单独文档
+
+    注意:
+    - 样式、页面设置与页眉页脚取自第一个文档；每个文件从新的一页开始
+    - 写入默认的output.docx时同时写出书签索引，之后可以就地增量更新；转换缓存中旧的合并输出条目会被移除
+    """
+    from convert_cache import forget_merged_output
+    from core import converted_docx_path
+
+    default_path = os.path.join(visio_dir, "output.docx")
+    output_path = output_path or default_path
+    files = []
+    for filename in file_list:
+        if os.path.exists(converted_docx_path(visio_dir, filename)):
+            files.append(filename)
+        else:
+            print(f"没有单独转换的文档，已跳过: {filename}")
+    if not files:
+        raise ValueError(f"目录中没有可合并的单独文档，请先单独转换: {visio_dir}")
+
+    # 图片在写出时才从各文档中读取，写出前保持全部文档打开
+    packages = []
+    try:
+        for filename in files:
+            packages.append(_DocxPackage(converted_docx_path(visio_dir, filename)))
+        splicer = _Splicer(packages[0])
+        for number, package in enumerate(packages, 1):
+            splicer.add_section(
+                package,
+                package.body_elements(),
+                number,
+                {},
+                page_break=number > 1,
+            )
+        splicer.write(output_path)
+    finally:
+        for package in packages:
+            package.close()
+    if os.path.abspath(output_path) == os.path.abspath(default_path):
+        write_merged_index(output_path, files)
+        forget_merged_output(visio_dir)
+    return files
+
+
+class PatchSink:
+    """
+    只接收变化文件页面的合并文档写入器，接口与core.WordSink一致。
+
+    页面先流式写入临时文档(Converted_Files/.merged_patch.docx)，close时按order与现有output.docx拼接。
+    出错时(abort)现有output.docx保持不变。
+
+    参数:
+        visio_dir (str): 输出所在目录
+        order (list): 更新后合并文档中全部源文件的顺序
+        dedup (bool): 内容相同的图片是否只保存一份，默认取config.IMAGE_DEDUP
+    """
+
+    def __init__(self, visio_dir, order, dedup=IMAGE_DEDUP):
+        from docx_stream import StreamingDocxSink
+
+        self.output_path = os.path.join(visio_dir, "output.docx")
+        self.order = list(order)
+        self.staging_path = os.path.join(visio_dir, "Converted_Files", ".merged_patch.docx")
+        os.makedirs(os.path.dirname(self.staging_path), exist_ok=True)
+        self.inner = StreamingDocxSink(
+            visio_dir,
+            output_path=self.staging_path,
+            resume=False,
+            dedup=dedup,
+            write_index=False,
+        )
+
+    def resume_point(self, file_list):
+        return 0
+
+    def begin_file(self, filename):
+        self.inner.begin_file(filename)
+
+    def add_picture(self, image_path, is_last_page):
+        self.inner.add_picture(image_path, is_last_page)
+
+    def add_vector_picture(self, vector_path, fallback_path, is_last_page):
+        self.inner.add_vector_picture(vector_path, fallback_path, is_last_page)
+
+    def end_file(self, filename):
+        self.inner.end_file(filename)
+
+    def close(self):
+        """生成临时文档并拼接到output.docx"""
+        self.inner.close()
+        try:
+            patch_merged_docx(
+                self.output_path,
+                self.order,
+                self.staging_path,
+                self.inner.completed_files,
+            )
+        finally:
+            os.remove(self.staging_path)
+
+    def abort(self):
+        """丢弃已写入的临时内容，output.docx保持不变"""
+        self.inner.abort()
+        shutil.rmtree(self.inner.parts_dir, ignore_errors=True)
@@ -0,0 +1,277 @@
+"""
+使用 python-docx 直接生成Word文档，不启动Word/WPS。
+
+接口与core.WordSink一致：每个文件依次调用begin_file、add_picture(逐页)、end_file，
+全部完成后调用close。图片尺寸与分页方式与通过COM调用AddPicture/InsertBreak的结果一致。
+矢量图(add_vector_picture)中SVG以Office 2016起支持的svgBlip扩展嵌入并附带PNG后备图片，EMF直接嵌入。
+合并文档中每个源文件的页面用书签包围并写出索引，供之后就地增量更新(见docx_patch.py)。
+"""
+import hashlib
+import os
+import struct
+
+from docx import Document
+from docx.image.image import Image
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.part import Part
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.oxml.shape import CT_Inline
+from docx.shared import Cm, Emu
+
+from config import (
+    DOCX_MARGIN_BOTTOM_CM,
+    DOCX_MARGIN_LEFT_CM,
+    DOCX_MARGIN_RIGHT_CM,
+    DOCX_MARGIN_TOP_CM,
+    DOCX_PAGE_HEIGHT_CM,
+    DOCX_PAGE_WIDTH_CM,
+)
+from core import converted_docx_path
+from docx_patch import bookmark_end_xml, bookmark_start_xml, write_merged_index
+
+EMU_PER_INCH = 914400
+DEFAULT_DPI = 96  # Word对未声明分辨率的图片按96 DPI计算尺寸
+EMU_PER_HUNDREDTH_MM = 360
+
+VECTOR_CONTENT_TYPES = {"svg": "image/svg+xml", "emf": "image/x-emf"}
+SVG_BLIP_EXT_URI = "{96DAC541-7B7A-43D3-8B79-37D633B846F1}"
+SVG_BLIP_NS = "http://schemas.microsoft.com/office/drawing/2016/SVG/main"
+
+
+def usable_area_emu():
+    """返回页面去掉页边距后的可用宽度和高度(EMU)"""
+    width = Cm(DOCX_PAGE_WIDTH_CM - DOCX_MARGIN_LEFT_CM - DOCX_MARGIN_RIGHT_CM)
+    height = Cm(DOCX_PAGE_HEIGHT_CM - DOCX_MARGIN_TOP_CM - DOCX_MARGIN_BOTTOM_CM)
+    return int(width), int(height)
+
+
+def fit_picture_size(px_width, px_height, horz_dpi, vert_dpi, max_width, max_height):
+    """
+    计算图片插入后的显示尺寸。
+
+    按图片自身分辨率换算出原始尺寸，超出可用区域时等比缩小，与Word插入图片时的行为一致。
+
+    参数:
+        px_width, px_height (int): 图片像素尺寸
+        horz_dpi, vert_dpi (int): 图片分辨率，python-docx在未声明时返回72，按96处理
+        max_width, max_height (int): 可用区域尺寸(EMU)
+
+    返回:
+        tuple: (宽度, 高度)，单位EMU
+    """
+    horz_dpi = DEFAULT_DPI if horz_dpi in (None, 0, 72) else horz_dpi
+    vert_dpi = DEFAULT_DPI if vert_dpi in (None, 0, 72) else vert_dpi
+    width = px_width * EMU_PER_INCH / horz_dpi
+    height = px_height * EMU_PER_INCH / vert_dpi
+
+    scale = 1.0
+    if width > max_width:
+        scale = max_width / width
+    if height * scale > max_height:
+        scale = max_height / height
+    return int(width * scale), int(height * scale)
+
+
+def picture_size(image_path):
+    """读取图片头信息并返回插入后的显示尺寸(EMU)"""
+    image = Image.from_file(image_path)
+    max_width, max_height = usable_area_emu()
+    return fit_picture_size(
+        image.px_width,
+        image.px_height,
+        image.horz_dpi,
+        image.vert_dpi,
+        max_width,
+        max_height,
+    )
+
+
+def emf_picture_size(emf_path):
+    """
+    读取EMF文件头中的图框尺寸(0.01毫米)，返回插入后的显示尺寸(EMU)。
+
+    超出可用区域时等比缩小，与picture_size一致。
+    """
+    with open(emf_path, "rb") as f:
+        header = f.read(40)
+    record_type, _, left, top, right, bottom = struct.unpack("<II16x4i", header)
+    if record_type != 1:
+        raise ValueError(f"不是有效的EMF文件: {emf_path}")
+    width = (right - left) * EMU_PER_HUNDREDTH_MM
+    height = (bottom - top) * EMU_PER_HUNDREDTH_MM
+    # 尺寸已经是EMU，按每英寸914400"像素"换算即为原值
+    return fit_picture_size(width, height, EMU_PER_INCH, EMU_PER_INCH, *usable_area_emu())
+
+
+def vector_picture_size(vector_path, fallback_path=None):
+    """返回矢量图插入后的显示尺寸(EMU)，有后备图片时与其一致"""
+    if fallback_path:
+        return picture_size(fallback_path)
+    return emf_picture_size(vector_path)
+
+
+def svg_blip_ext_xml(rid, namespaces=""):
+    """生成引用SVG图片的a:blip扩展，namespaces为需要在根元素上声明的命名空间"""
+    return (
+        f"<a:extLst {namespaces}>"
+        f'<a:ext uri="{SVG_BLIP_EXT_URI}">'
+        f'<asvg:svgBlip xmlns:asvg="{SVG_BLIP_NS}" r:embed="{rid}"/>'
+        "</a:ext></a:extLst>"
+    )
+
+
+def new_document():
+    """创建页面尺寸与页边距符合配置的空白文档"""
+    document = Document()
+    section = document.sections[0]
+    section.page_width = Cm(DOCX_PAGE_WIDTH_CM)
+    section.page_height = Cm(DOCX_PAGE_HEIGHT_CM)
+    section.top_margin = Cm(DOCX_MARGIN_TOP_CM)
+    section.bottom_margin = Cm(DOCX_MARGIN_BOTTOM_CM)
+    section.left_margin = Cm(DOCX_MARGIN_LEFT_CM)
+    section.right_margin = Cm(DOCX_MARGIN_RIGHT_CM)
+    return document
+
+
+class DocxSink:
+    """
+    以python-docx在内存中组装文档，将逐页导出的图片写入output.docx或
+    Converted_Files下的单独文档。
+
+    参数:
+        visio_dir (str): 输出所在目录(output.docx与Converted_Files的父目录)
+        separate_files (bool): 是否每个Visio文件生成单独的Word文档
+        output_path (str, 可选): 合并文档路径，默认visio_dir/output.docx
+        write_index (bool): 保存合并文档后是否写出其索引，分卷时应关闭
+    """
+
+    def __init__(self, visio_dir, separate_files=False, output_path=None, write_index=True):
+        self.visio_dir = visio_dir
+        self.separate_files = separate_files
+        self.output_path = output_path or os.path.join(visio_dir, "output.docx")
+        self.doc = None if separate_files else new_document()
+        self.current_doc = None
+        self.break_before = False  # 下一页是否另起一页(当前文档中已有页面)
+        self.vector_parts = {}  # 矢量图SHA1 -> 已加入当前文档包的部件
+        self.sections = []  # 合并文档中已写入的源文件，第i个文件的书签编号为i
+        self.write_index = write_index  # 分卷时不写索引，下次完整重建
+
+    def _append_body(self, xml):
+        """在合并文档正文末尾(节属性之前)追加一个正文级元素"""
+        body = self.doc.element.body
+        element = parse_xml(xml)
+        if body.sectPr is not None:
+            body.sectPr.addprevious(element)
+        else:
+            body.append(element)
+
+    def resume_point(self, file_list):
+        """返回可跳过的已完成文件数，内存中组装的文档不支持断点续写"""
+        return 0
+
+    def begin_file(self, filename):
+        """开始写入一个Visio文件的页面，合并文档中每个文件从新的一页开始"""
+        if self.separate_files:
+            self.current_doc = new_document()
+            self.vector_parts = {}
+            self.break_before = False
+        else:
+            self.current_doc = self.doc
+            self._append_body(bookmark_start_xml(len(self.sections) + 1, nsdecls("w")))
+
+    def _page_run(self):
+        """
+        追加一段放置一页图片的正文并返回其中的run。
+
+        文档第一页之后的页面所在段落设置段前分页，而不是在上一段末尾插入分页符，
+        否则每页开头多出一个空段落，占满整页的图片会被挤到下一页。
+        """
+        paragraph = self.current_doc.add_paragraph()
+        if self.break_before:
+            paragraph.paragraph_format.page_break_before = True
+        self.break_before = True
+        return paragraph.add_run()
+
+    def add_picture(self, image_path, is_last_page):
+        """在文档末尾插入一页图片，非第一页时从新的一页开始"""
+        width, height = picture_size(image_path)
+        run = self._page_run()
+        run.add_picture(image_path, width=Emu(width), height=Emu(height))
+
+    def _vector_rid(self, vector_path):
+        """把矢量图加入文档包(内容相同的只加入一次)，返回其关系ID"""
+        with open(vector_path, "rb") as f:
+            blob = f.read()
+        digest = hashlib.sha1(blob).hexdigest()
+        part = self.vector_parts.get(digest)
+        if part is None:
+            extension = os.path.splitext(vector_path)[1].lower().lstrip(".")
+            document_part = self.current_doc.part
+            partname = document_part.package.next_partname(
+                f"/word/media/image%d.{extension}"
+            )
+            part = Part(
+                partname, VECTOR_CONTENT_TYPES[extension], blob, document_part.package
+            )
+            self.vector_parts[digest] = part
+        return self.current_doc.part.relate_to(part, RT.IMAGE)
+
+    def add_vector_picture(self, vector_path, fallback_path, is_last_page):
+        """
+        在文档末尾插入一页矢量图，非第一页时从新的一页开始。
+
+        参数:
+            vector_path (str): SVG或EMF图片路径
+            fallback_path (str): SVG的PNG后备图片路径，不支持SVG的Word版本显示该图片；EMF时为None
+            is_last_page (bool): 是否为文件的最后一页
+        """
+        width, height = vector_picture_size(vector_path, fallback_path)
+        run = self._page_run()
+        vector_rid = self._vector_rid(vector_path)
+        if fallback_path:
+            shape = run.add_picture(fallback_path, width=Emu(width), height=Emu(height))
+            blip = shape._inline.graphic.graphicData.pic.blipFill.blip
+            blip.append(parse_xml(svg_blip_ext_xml(vector_rid, nsdecls("a", "r"))))
+        else:
+            inline = CT_Inline.new_pic_inline(
+                self.current_doc.part.next_id,
+                vector_rid,
+                os.path.basename(vector_path),
+                Emu(width),
+                Emu(height),
+            )
+            run._r.add_drawing(inline)
+
+    def end_file(self, filename):
+        """结束一个Visio文件，单独转换模式下保存其文档"""
+        if self.separate_files:
+            output_path = converted_docx_path(self.visio_dir, filename)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            self.current_doc.save(output_path)
+        else:
+            self.sections.append(filename)
+            self._append_body(bookmark_end_xml(len(self.sections), nsdecls("w")))
+        self.current_doc = None
+
+    def next_volume(self, output_path):
+        """保存当前合并文档并开始写入新的分卷"""
+        self.doc.save(self.output_path)
+        self.output_path = output_path
+        self.doc = new_document()
+        self.vector_parts = {}
+        self.break_before = False
+        self.sections = []
+        self.write_index = False
+
+    def close(self):
+        """保存合并文档(如有)并写出其索引"""
+        if not self.separate_files:
+            self.doc.save(self.output_path)
+            if self.write_index:
+                write_merged_index(self.output_path, self.sections)
+
+    def abort(self):
+        """转换出错或取消时调用：丢弃内存中的合并文档，已有的output.docx保持不变"""
+        self.doc = None
+        self.current_doc = None
@@ -0,0 +1,450 @@
+"""
+流式写入的合并文档生成器，用于页数极多的output.docx。
+
+图片与正文XML片段在转换过程中直接追加到磁盘上的工作目录(output.docx.parts)，
+内存占用与页数无关；每隔一定页数在文件边界处写入检查点，转换中断后再次运行会从
+最后一个检查点继续。全部完成后把工作目录流式打包为output.docx。
+内容完全相同的图片只保存一份，后续页面引用同一个图片关系。
+每个源文件的页面用书签包围，打包后写出索引，供之后就地增量更新(见docx_patch.py)。
+"""
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+from xml.sax.saxutils import escape
+
+from config import (
+    DOCX_MARGIN_BOTTOM_CM,
+    DOCX_MARGIN_LEFT_CM,
+    DOCX_MARGIN_RIGHT_CM,
+    DOCX_MARGIN_TOP_CM,
+    DOCX_PAGE_HEIGHT_CM,
+    DOCX_PAGE_WIDTH_CM,
+    IMAGE_DEDUP,
+    STREAM_CHECKPOINT_PAGES,
+)
+from docx_patch import bookmark_end_xml, bookmark_start_xml, write_merged_index
+from docx_sink import (
+    VECTOR_CONTENT_TYPES,
+    picture_size,
+    svg_blip_ext_xml,
+    vector_picture_size,
+)
+
+TWIPS_PER_CM = 1440 / 2.54
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "gif": "image/gif",
+    "bmp": "image/bmp",
+    **VECTOR_CONTENT_TYPES,
+}
+
+NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+    'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"'
+)
+
+IMAGE_REL_TYPE = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+)
+
+PICTURE_XML = (
+    "<w:drawing>"
+    '<wp:inline distT="0" distB="0" distL="0" distR="0">'
+    '<wp:extent cx="{cx}" cy="{cy}"/>'
+    '<wp:docPr id="{id}" name="Picture {id}"/>'
+    '<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+    '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    "<pic:pic>"
+    '<pic:nvPicPr><pic:cNvPr id="0" name="{name}"/><pic:cNvPicPr/></pic:nvPicPr>'
+    '<pic:blipFill><a:blip r:embed="{rid}">{blip_ext}</a:blip><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+    '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr>'
+    "</pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing>"
+)
+
+PAGE_BREAK_BEFORE_XML = "<w:pPr><w:pageBreakBefore/></w:pPr>"
+
+
+def picture_paragraph_xml(rid, image_id, name, cx, cy, page_break_before, blip_ext=""):
+    """
+    生成包含一张内嵌图片的段落XML，blip_ext为图片的扩展(如SVG引用)。
+
+    page_break_before为True时段落设置段前分页(与docx_sink.DocxSink一致，不在上一段末尾插入分页符)。
+    """
+    drawing = PICTURE_XML.format(
+        rid=rid, id=image_id, name=escape(name), cx=cx, cy=cy, blip_ext=blip_ext
+    )
+    return (
+        "<w:p>"
+        + (PAGE_BREAK_BEFORE_XML if page_break_before else "")
+        + f"<w:r>{drawing}</w:r></w:p>"
+    )
+
+
+def section_xml():
+    """返回与config中页面设置一致的节属性XML"""
+
+    def twips(cm):
+        return int(round(cm * TWIPS_PER_CM))
+
+    return (
+        "<w:sectPr>"
+        f'<w:pgSz w:w="{twips(DOCX_PAGE_WIDTH_CM)}" w:h="{twips(DOCX_PAGE_HEIGHT_CM)}"/>'
+        f'<w:pgMar w:top="{twips(DOCX_MARGIN_TOP_CM)}" w:right="{twips(DOCX_MARGIN_RIGHT_CM)}" '
+        f'w:bottom="{twips(DOCX_MARGIN_BOTTOM_CM)}" w:left="{twips(DOCX_MARGIN_LEFT_CM)}" '
+        'w:header="851" w:footer="992" w:gutter="0"/>'
+        "</w:sectPr>"
+    )
+
+
+def _source_signature(visio_dir, filename):
+    """源文件的大小与修改时间，用于判断检查点是否仍然有效"""
+    try:
+        stat = os.stat(os.path.join(visio_dir, filename))
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class StreamingDocxSink:
+    """
+    增量写入磁盘的合并文档写入器，接口与core.WordSink一致(仅支持合并输出)。
+
+    参数:
+        visio_dir (str): 输出所在目录，生成visio_dir/output.docx
+        output_path (str, 可选): 合并文档路径，默认visio_dir/output.docx
+        checkpoint_pages (int): 每写入多少页后在下一个文件边界写检查点
+        resume (bool): 存在有效检查点时是否从中断处继续
+        dedup (bool): 内容相同的图片是否只保存一份，默认取config.IMAGE_DEDUP
+        write_index (bool): 打包后是否写出合并文档索引，用于临时文档时应关闭
+
+    工作目录结构(output.docx.parts):
+        media/      已写入的图片
+        body.xml    正文段落片段
+        rels.xml    图片关系片段
+        checkpoint.json  已完成的文件、上述两个片段文件在检查点时的长度及图片哈希索引
+    """
+
+    def __init__(
+        self,
+        visio_dir,
+        output_path=None,
+        checkpoint_pages=STREAM_CHECKPOINT_PAGES,
+        resume=True,
+        dedup=IMAGE_DEDUP,
+        write_index=True,
+    ):
+        self.visio_dir = visio_dir
+        self.dedup = dedup
+        self.write_index = write_index
+        self.output_path = output_path or os.path.join(visio_dir, "output.docx")
+        self.parts_dir = self.output_path + ".parts"
+        self.media_dir = os.path.join(self.parts_dir, "media")
+        self.checkpoint_path = os.path.join(self.parts_dir, "checkpoint.json")
+        self.checkpoint_pages = max(1, checkpoint_pages)
+
+        self.completed_files = []
+        self.next_image = 1
+        self.next_shape = 1
+        self.media = {}  # 图片SHA1 -> [图片编号, 文件名]
+        self.pages_since_checkpoint = 0
+        self._checkpoint = None
+        self._file_pages = None  # 当前文件已写入的页数，None表示不在文件中
+
+        os.makedirs(self.media_dir, exist_ok=True)
+        if resume:
+            self._load_checkpoint()
+        elif os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self._open_fragments()
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                self._checkpoint = json.load(f)
+        except (OSError, ValueError):
+            self._checkpoint = None
+
+    def _open_fragments(self):
+        """打开(必要时截断到检查点位置)正文与关系片段文件"""
+        checkpoint = self._checkpoint or {
+            "body_size": 0,
+            "rels_size": 0,
+            "next_image": 1,
+        }
+        self.body = open(os.path.join(self.parts_dir, "body.xml"), "a+b")
+        self.rels = open(os.path.join(self.parts_dir, "rels.xml"), "a+b")
+        self.body.truncate(checkpoint["body_size"])
+        self.rels.truncate(checkpoint["rels_size"])
+        self.body.seek(0, os.SEEK_END)
+        self.rels.seek(0, os.SEEK_END)
+
+        self.next_image = checkpoint["next_image"]
+        # 旧版检查点没有以下两项，图片编号与形状编号当时一一对应
+        self.next_shape = checkpoint.get("next_shape", self.next_image)
+        self.media = dict(checkpoint.get("media", {}))
+        # 删除检查点之后写入的图片
+        for name in os.listdir(self.media_dir):
+            number = os.path.splitext(name)[0].replace("image", "")
+            if not number.isdigit() or int(number) >= self.next_image:
+                os.remove(os.path.join(self.media_dir, name))
+        if self._checkpoint:
+            self.completed_files = [
+                entry["file"] for entry in self._checkpoint["files"]
+            ]
+
+    def resume_point(self, file_list):
+        """
+        返回可以跳过的前序文件数量。
+
+        检查点中已完成的文件必须是file_list的前缀且源文件未被修改，否则丢弃检查点从头开始。
+        """
+        if not self._checkpoint:
+            return 0
+        entries = self._checkpoint["files"]
+        valid = len(entries) <= len(file_list) and all(
+            file_list[i] == entry["file"]
+            and _source_signature(self.visio_dir, entry["file"]) == entry["signature"]
+            for i, entry in enumerate(entries)
+        )
+        if not valid:
+            print("检查点与本次文件列表不一致，从头开始生成合并文档")
+            self.body.close()
+            self.rels.close()
+            self._checkpoint = None
+            self.completed_files = []
+            os.remove(self.checkpoint_path)
+            self._open_fragments()
+            return 0
+
+        print(f"从检查点继续，跳过已完成的 {len(entries)} 个文件")
+        return len(entries)
+
+    def begin_file(self, filename):
+        """
+        开始写入一个Visio文件的页面，书签编号为其在文档中的序号。
+
+        书签起点随第一页一起写入：文件在写入任何页面之前出错时，检查点中不会留下没有终点的书签。
+        """
+        self._file_pages = 0
+
+    def _write_bookmark_start(self):
+        self.body.write(bookmark_start_xml(len(self.completed_files) + 1).encode("utf-8"))
+
+    def _image_digest(self, image_path):
+        digest = hashlib.sha1()
+        with open(image_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _add_media(self, image_path):
+        """
+        把图片复制到工作目录并写入图片关系，返回(图片编号, 文件名)。
+
+        启用去重时，与已写入图片内容相同的图片直接返回已有的编号。
+        """
+        extension = os.path.splitext(image_path)[1].lower().lstrip(".")
+        digest = self._image_digest(image_path) if self.dedup else None
+        if digest in self.media:
+            image_id, name = self.media[digest]
+        else:
+            image_id = self.next_image
+            self.next_image += 1
+            name = f"image{image_id}.{extension}"
+            shutil.copyfile(image_path, os.path.join(self.media_dir, name))
+            self.rels.write(
+                f'<Relationship Id="rIdImg{image_id}" Type="{IMAGE_REL_TYPE}" '
+                f'Target="media/{name}"/>'.encode("utf-8")
+            )
+            if digest:
+                self.media[digest] = [image_id, name]
+        return image_id, name
+
+    def _write_paragraph(self, image_id, name, cx, cy, blip_ext=""):
+        if self._file_pages == 0:
+            self._write_bookmark_start()
+        shape_id = self.next_shape
+        self.next_shape += 1
+        # 文档第一页之后的页面从新的一页开始(每页一个形状，编号大于1说明文档中已有页面)
+        paragraph = picture_paragraph_xml(
+            f"rIdImg{image_id}", shape_id, name, cx, cy, shape_id > 1, blip_ext
+        )
+        self.body.write(paragraph.encode("utf-8"))
+        self.pages_since_checkpoint += 1
+        self._file_pages += 1
+
+    def add_picture(self, image_path, is_last_page):
+        """把图片写入工作目录并追加一段包含该图片的正文"""
+        image_id, name = self._add_media(image_path)
+        cx, cy = picture_size(image_path)
+        self._write_paragraph(image_id, name, cx, cy)
+
+    def add_vector_picture(self, vector_path, fallback_path, is_last_page):
+        """
+        追加一页矢量图：SVG以PNG后备图片为主图并通过svgBlip扩展引用，EMF直接作为图片。
+
+        参数同docx_sink.DocxSink.add_vector_picture。
+        """
+        cx, cy = vector_picture_size(vector_path, fallback_path)
+        vector_id, vector_name = self._add_media(vector_path)
+        if not fallback_path:
+            self._write_paragraph(vector_id, vector_name, cx, cy)
+            return
+        image_id, name = self._add_media(fallback_path)
+        blip_ext = svg_blip_ext_xml(f"rIdImg{vector_id}")
+        self._write_paragraph(image_id, name, cx, cy, blip_ext)
+
+    def end_file(self, filename):
+        """结束一个Visio文件，累计页数达到阈值时写检查点"""
+        if self._file_pages == 0:
+            self._write_bookmark_start()  # 没有页面的文件
+        self._file_pages = None
+        self.completed_files.append(filename)
+        self.body.write(bookmark_end_xml(len(self.completed_files)).encode("utf-8"))
+        if self.pages_since_checkpoint >= self.checkpoint_pages:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """把片段文件刷到磁盘并原子地更新检查点"""
+        for f in (self.body, self.rels):
+            f.flush()
+            os.fsync(f.fileno())
+        previous = {
+            entry["file"]: entry for entry in (self._checkpoint or {}).get("files", [])
+        }
+        self._checkpoint = {
+            "files": [
+                previous.get(filename)
+                or {
+                    "file": filename,
+                    "signature": _source_signature(self.visio_dir, filename),
+                }
+                for filename in self.completed_files
+            ],
+            "body_size": self.body.tell(),
+            "rels_size": self.rels.tell(),
+            "next_image": self.next_image,
+            "next_shape": self.next_shape,
+            "media": self.media,
+        }
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._checkpoint, f, ensure_ascii=False)
+        os.replace(temp_path, self.checkpoint_path)
+        self.pages_since_checkpoint = 0
+
+    def next_volume(self, output_path):
+        """打包当前分卷(分卷不写合并文档索引)，并在新路径上重新开始流式写入"""
+        self.write_index = False
+        self.close()
+        self.__init__(
+            self.visio_dir,
+            output_path,
+            self.checkpoint_pages,
+            resume=False,
+            dedup=self.dedup,
+            write_index=False,
+        )
+
+    def abort(self):
+        """
+        转换出错时调用：保留工作目录以便下次续写。
+
+        出错时若当前文件尚未写入任何页面，先把已完成的文件写入检查点；
+        写到一半的文件会在续写时被截断。output.docx只在close时写出，出错时保持不变。
+        写检查点失败时只打印错误，不掩盖原来的异常。
+        """
+        try:
+            if not self._file_pages and self.pages_since_checkpoint:
+                self.checkpoint()
+        except OSError as e:
+            print(f"写入检查点失败: {e}")
+        finally:
+            self.body.close()
+            self.rels.close()
+
+    def close(self):
+        """把工作目录流式打包为output.docx并删除工作目录"""
+        self.body.close()
+        self.rels.close()
+
+        extensions = sorted(
+            {
+                os.path.splitext(name)[1].lstrip(".")
+                for name in os.listdir(self.media_dir)
+            }
+        )
+        temp_output = self.output_path + ".tmp"
+        with zipfile.ZipFile(temp_output, "w", zipfile.ZIP_DEFLATED) as package:
+            package.writestr("[Content_Types].xml", _content_types_xml(extensions))
+            package.writestr("_rels/.rels", _package_rels_xml())
+
+            with package.open("word/document.xml", "w") as f:
+                f.write(
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    f"<w:document {NAMESPACES}><w:body>".encode("utf-8")
+                )
+                with open(os.path.join(self.parts_dir, "body.xml"), "rb") as body:
+                    shutil.copyfileobj(body, f)
+                f.write((section_xml() + "</w:body></w:document>").encode("utf-8"))
+
+            with package.open("word/_rels/document.xml.rels", "w") as f:
+                f.write(
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/'
+                    'package/2006/relationships">'.encode("utf-8")
+                )
+                with open(os.path.join(self.parts_dir, "rels.xml"), "rb") as rels:
+                    shutil.copyfileobj(rels, f)
+                f.write(b"</Relationships>")
+
+            # 图片本身已经压缩，直接存储以节省打包时间
+            for name in sorted(os.listdir(self.media_dir)):
+                package.write(
+                    os.path.join(self.media_dir, name),
+                    f"word/media/{name}",
+                    compress_type=zipfile.ZIP_STORED,
+                )
+
+        os.replace(temp_output, self.output_path)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        if self.write_index:
+            write_merged_index(self.output_path, self.completed_files)
+
+
+def _content_types_xml(extensions):
+    defaults = "".join(
+        '<Default Extension="{}" ContentType="{}"/>'.format(
+            extension, CONTENT_TYPES.get(extension, "application/octet-stream")
+        )
+        for extension in extensions
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        + defaults
+        + '<Override PartName="/word/document.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+
+
+def _package_rels_xml():
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/'
+        '2006/relationships/officeDocument" Target="word/document.xml"/>'
+        "</Relationships>"
+    )
@@ -0,0 +1,505 @@
+"""
+模拟的 Visio / Word COM 对象模型。
+
+仅实现 core.py 实际调用到的属性与方法，用于在没有Windows和Office的环境(如Linux)下
+运行转换流程、验证输出顺序并测量吞吐。所有工厂类均可被pickle，可直接传给多进程工作池。
+
+各操作的耗时可配置，并可按概率注入失败(抛出FakeComError)或卡死(长时间不返回)，
+用于基准测试与容错测试。
+可注入的操作: "Open"、"Export"、"Copy"(Visio)，"AddPicture"、"Paste"、"SaveAs"、"Quit"(Word)。
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import time
+import zipfile
+import zlib
+
+
+def make_png(width, height, seed=b""):
+    """
+    生成一张灰度PNG图片的字节内容。
+
+    参数:
+        width (int): 图片宽度(像素)
+        height (int): 图片高度(像素)
+        seed (bytes): 决定像素内容的种子，相同种子生成完全相同的图片
+
+    返回:
+        bytes: PNG文件内容
+    """
+    digest = hashlib.sha256(seed).digest()
+    rows = []
+    for y in range(height):
+        row = bytes(digest[(x + y) % len(digest)] for x in range(width))
+        rows.append(b"\x00" + row)
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    phys = struct.pack(">IIB", 3780, 3780, 1)  # 96 DPI
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"pHYs", phys)
+        + chunk(b"IDAT", zlib.compress(b"".join(rows)))
+        + chunk(b"IEND", b"")
+    )
+
+
+def make_svg(width, height, seed=b""):
+    """
+    生成一张SVG图片的内容，尺寸按96 DPI换算为英寸，相同种子生成完全相同的图片。
+
+    返回:
+        bytes: SVG文件内容
+    """
+    digest = hashlib.sha256(seed).digest()
+    shapes = "".join(
+        f'<rect x="{digest[i] * width // 256}" y="{digest[i + 1] * height // 256}" '
+        f'width="{width // 8}" height="{height // 8}" fill="none" stroke="#000"/>'
+        for i in range(0, len(digest), 2)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        f'width="{width / 96:.4f}in" height="{height / 96:.4f}in" '
+        f'viewBox="0 0 {width} {height}">{shapes}</svg>'
+    ).encode("utf-8")
+
+
+def make_emf(width, height, seed=b""):
+    """
+    生成一个只包含文件头、一条注释记录与结束记录的EMF文件，图框尺寸按96 DPI换算。
+
+    返回:
+        bytes: EMF文件内容
+    """
+    frame_width = width * 2540 // 96  # 0.01毫米
+    frame_height = height * 2540 // 96
+    comment = hashlib.sha256(seed).digest()
+    records = [
+        struct.pack("<II", 70, 12 + len(comment)) + struct.pack("<I", len(comment)) + comment,
+        struct.pack("<IIIII", 14, 20, 0, 0, 20),  # EMR_EOF
+    ]
+    header_size = 88
+    total_size = header_size + sum(len(r) for r in records)
+    header = struct.pack(
+        "<II4i4iIIIIHHIII2i2i",
+        1,  # EMR_HEADER
+        header_size,
+        0, 0, width - 1, height - 1,
+        0, 0, frame_width, frame_height,
+        0x464D4520,  # " EMF"
+        0x10000,
+        total_size,
+        len(records) + 1,
+        1,
+        0,
+        0, 0, 0,
+        width, height,
+        frame_width // 100, frame_height // 100,
+    )
+    return header + b"".join(records)
+
+
+def read_vsdx_pages(path):
+    """
+    读取.vsdx压缩包中各页面的名称与XML内容。
+
+    返回:
+        list: [(页面名称, 页面XML字节)]，按页面编号排序；不是有效压缩包时返回None
+    """
+    if not zipfile.is_zipfile(path):
+        return None
+    pages = []
+    with zipfile.ZipFile(path) as package:
+        names = {}
+        if "visio/pages/pages.xml" in package.namelist():
+            pages_xml = package.read("visio/pages/pages.xml").decode("utf-8")
+            names = dict(
+                enumerate(re.findall(r'<Page\b[^>]*\bNameU="([^"]*)"', pages_xml), 1)
+            )
+        for name in package.namelist():
+            match = re.fullmatch(r"visio/pages/page(\d+)\.xml", name)
+            if match:
+                number = int(match.group(1))
+                page_name = names.get(number, f"Page-{number}")
+                pages.append((number, page_name, package.read(name)))
+    return [(page_name, data) for _, page_name, data in sorted(pages)]
+
+
+def _file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+class FakeComError(Exception):
+    """模拟的COM调用失败"""
+
+
+HANG_SECONDS = 3600  # 模拟卡死时的等待时间
+
+
+class FailureInjector:
+    """
+    按操作名称以固定概率抛出FakeComError或卡死，随机序列由seed决定，便于复现。
+
+    参数:
+        failures (dict, 可选): {操作名称: 失败概率(0~1)}
+        seed (int): 随机种子
+        hangs (dict, 可选): {操作名称: 卡死概率(0~1)}
+        hang_files (tuple, 可选): 文件名(不含目录)在其中时，对该文件的操作必定卡死
+    """
+
+    def __init__(self, failures=None, seed=0, hangs=None, hang_files=()):
+        self.failures = dict(failures or {})
+        self.hangs = dict(hangs or {})
+        self.hang_files = tuple(hang_files)
+        self.random = random.Random(seed)
+        self.injected = 0
+
+    def check(self, operation, detail=""):
+        rate = self.hangs.get(operation, 0.0)
+        if (rate and self.random.random() < rate) or (
+            detail and os.path.basename(detail) in self.hang_files
+        ):
+            self.injected += 1
+            time.sleep(HANG_SECONDS)
+        rate = self.failures.get(operation, 0.0)
+        if rate and self.random.random() < rate:
+            self.injected += 1
+            raise FakeComError(f"模拟{operation}失败: {detail}")
+
+
+# 模拟的系统剪贴板，Visio的Selection.Copy写入，Word的Range.Paste读取
+_clipboard = {"seed": None}
+
+
+class FakeVisioPage:
+    def __init__(self, app, document, index, name=None, content=None):
+        self.app = app
+        self.Document = document
+        self.Index = index
+        self.Name = self.NameU = name or f"Page-{index}"
+        # .vsdx页面按自身XML生成图片，其余文件按整个文件内容生成
+        self.seed = (
+            hashlib.sha256(content).digest()
+            if content is not None
+            else document.digest + struct.pack(">I", index)
+        )
+
+    def Export(self, path):
+        time.sleep(self.app.call_latency + self.app.page_latency)
+        self.app.injector.check("Export", path)
+        # 与Visio一致，按扩展名决定导出格式
+        make = {".svg": make_svg, ".emf": make_emf}.get(
+            os.path.splitext(path)[1].lower(), make_png
+        )
+        with open(path, "wb") as f:
+            f.write(make(self.app.image_width, self.app.image_height, self.seed))
+        self.app.export_count += 1
+
+
+class FakeVisioPages:
+    def __init__(self, pages):
+        self._pages = pages
+
+    @property
+    def Count(self):
+        return len(self._pages)
+
+    def Item(self, index):
+        return self._pages[index - 1]
+
+    def __iter__(self):
+        return iter(self._pages)
+
+    def __len__(self):
+        return len(self._pages)
+
+
+class FakeVisioDocument:
+    def __init__(self, app, path):
+        self.app = app
+        self.FullName = path
+        self.digest = _file_digest(path)
+        vsdx_pages = read_vsdx_pages(path)
+        if vsdx_pages is None:
+            pages = [FakeVisioPage(app, self, i + 1) for i in range(app.pages_per_file)]
+        else:
+            pages = [
+                FakeVisioPage(app, self, i + 1, name, content)
+                for i, (name, content) in enumerate(vsdx_pages)
+            ]
+        self.Pages = FakeVisioPages(pages)
+
+    def Close(self):
+        self.app.open_documents.remove(self)
+
+
+class FakeVisioSelection:
+    def __init__(self, window):
+        self.window = window
+
+    def Copy(self):
+        app = self.window.app
+        time.sleep(app.call_latency + app.copy_latency)
+        app.injector.check("Copy", self.window.Page.Name)
+        _clipboard["seed"] = self.window.Page.seed
+
+
+class FakeVisioWindow:
+    """模拟的Visio活动窗口，支持切换页面、全选并复制到剪贴板"""
+
+    def __init__(self, app):
+        self.app = app
+        self.Page = None
+        self.Selection = FakeVisioSelection(self)
+
+    def SelectAll(self):
+        pass
+
+
+class FakeVisioDocuments:
+    def __init__(self, app):
+        self.app = app
+
+    @property
+    def Count(self):
+        return len(self.app.open_documents)
+
+    def Open(self, path):
+        if not os.path.isfile(path):
+            raise Exception(f"无法打开文件: {path}")
+        time.sleep(self.app.open_latency)
+        self.app.injector.check("Open", path)
+        document = FakeVisioDocument(self.app, path)
+        self.app.open_documents.append(document)
+        return document
+
+
+class FakeWebPageSettings:
+    def __init__(self):
+        self.TargetPath = ""
+        self.PriFormat = "PNG"
+        self.StartPage = 1
+        self.EndPage = 0
+
+
+class FakeSaveAsWeb:
+    """模拟的另存为网页对象：一次调用输出文档全部页面的图片"""
+
+    def __init__(self, app):
+        self.app = app
+        self.WebPageSettings = FakeWebPageSettings()
+        self.document = None
+
+    def AttachToVisioDoc(self, document):
+        self.document = document
+
+    def CreatePages(self):
+        app = self.app
+        settings = self.WebPageSettings
+        pages = self.document.Pages._pages[settings.StartPage - 1 : settings.EndPage]
+        time.sleep(app.call_latency + app.page_latency * len(pages))
+        app.injector.check("Export", self.document.FullName)
+        stem = os.path.splitext(settings.TargetPath)[0]
+        files_dir = stem + "_files"
+        os.makedirs(files_dir, exist_ok=True)
+        with open(settings.TargetPath, "w", encoding="utf-8") as f:
+            f.write("<html></html>")
+        for i, page in enumerate(pages, settings.StartPage):
+            with open(os.path.join(files_dir, f"{os.path.basename(stem)}_{i}.png"), "wb") as f:
+                f.write(make_png(app.image_width, app.image_height, page.seed))
+        app.export_count += len(pages)
+
+
+class FakeVisioApp:
+    """
+    模拟的 Visio.Application。
+
+    参数:
+        page_latency (float): 每页导出(渲染)耗时(秒)
+        open_latency (float): 每次Documents.Open耗时(秒)
+        pages_per_file (int): 非.vsdx压缩包文件的默认页数
+        image_size (tuple): 导出图片的像素尺寸(宽, 高)
+        copy_latency (float): 每次Selection.Copy耗时(秒)
+        call_latency (float): 每次跨进程调用Export/Copy/CreatePages的额外耗时(秒)
+        failures (dict, 可选): 注入失败的概率，如{"Export": 0.01}
+        fail_seed (int): 失败注入的随机种子
+        hangs (dict, 可选): 注入卡死的概率，如{"Export": 0.01}
+        hang_files (tuple, 可选): 打开时卡死的文件名，模拟损坏的图表
+    """
+
+    def __init__(
+        self,
+        page_latency=0.0,
+        open_latency=0.0,
+        pages_per_file=3,
+        image_size=(64, 48),
+        copy_latency=0.0,
+        failures=None,
+        fail_seed=0,
+        hangs=None,
+        hang_files=(),
+        call_latency=0.0,
+    ):
+        self.page_latency = page_latency
+        self.call_latency = call_latency
+        self.open_latency = open_latency
+        self.copy_latency = copy_latency
+        self.pages_per_file = pages_per_file
+        self.image_width, self.image_height = image_size
+        self.injector = FailureInjector(failures, fail_seed, hangs, hang_files)
+        self.Visible = True
+        self.Documents = FakeVisioDocuments(self)
+        self.ActiveWindow = FakeVisioWindow(self)
+        self.SaveAsWebObject = FakeSaveAsWeb(self)
+        self.open_documents = []
+        self.export_count = 0
+
+    def Quit(self):
+        self.open_documents.clear()
+
+
+class FakeVisioFactory:
+    """可pickle的FakeVisioApp工厂，用法同core.create_visio_app"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def __call__(self):
+        return FakeVisioApp(**self.options)
+
+
+class FakeInlineShapes:
+    def __init__(self, document):
+        self.document = document
+
+    def AddPicture(self, path):
+        time.sleep(self.document.app.insert_latency)
+        self.document.app.injector.check("AddPicture", path)
+        if os.path.splitext(path)[1].lower() in self.document.app.unsupported_formats:
+            raise FakeComError(f"不支持的图片格式: {path}")
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self.document.items.append({"type": "picture", "sha1": digest})
+
+
+class FakeWordRange:
+    def __init__(self, document):
+        self.document = document
+        self.InlineShapes = FakeInlineShapes(document)
+
+    def Collapse(self, direction):
+        pass
+
+    def InsertBreak(self, break_type):
+        self.document.items.append({"type": "break", "value": break_type})
+
+    def Paste(self):
+        app = self.document.app
+        time.sleep(app.paste_latency)
+        app.injector.check("Paste")
+        if _clipboard["seed"] is None:
+            raise FakeComError("剪贴板为空")
+        digest = hashlib.sha1(_clipboard["seed"]).hexdigest()
+        self.document.items.append({"type": "paste", "sha1": digest})
+
+
+class FakeWordDocument:
+    def __init__(self, app):
+        self.app = app
+        self.items = []
+        self.closed = False
+
+    @property
+    def Content(self):
+        return FakeWordRange(self)
+
+    def SaveAs(self, path):
+        time.sleep(self.app.save_latency)
+        self.app.injector.check("SaveAs", path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"items": self.items}, f, ensure_ascii=False, indent=1)
+
+    def Close(self, SaveChanges=None):
+        # 关闭后不再计入Documents.Count，便于检查转换结束后是否有文档遗留在应用中
+        if not self.closed:
+            self.closed = True
+            self.app.documents.remove(self)
+
+
+class FakeWordDocuments:
+    def __init__(self, app):
+        self.app = app
+
+    @property
+    def Count(self):
+        return len(self.app.documents)
+
+    def Add(self):
+        document = FakeWordDocument(self.app)
+        self.app.documents.append(document)
+        return document
+
+
+class FakeWordSelection:
+    def EndKey(self, unit):
+        pass
+
+
+class FakeWordApp:
+    """
+    模拟的 Word.Application / WPS 应用。
+
+    SaveAs会把文档内容(图片哈希与分页符序列)写成JSON，便于比较不同执行方式的输出是否一致。
+
+    参数:
+        insert_latency (float): 每次AddPicture耗时(秒)
+        save_latency (float): 每次SaveAs耗时(秒)
+        paste_latency (float): 每次Range.Paste耗时(秒)
+        failures (dict, 可选): 注入失败的概率，如{"SaveAs": 0.5}
+        fail_seed (int): 失败注入的随机种子
+        unsupported_formats (tuple): AddPicture不支持的图片扩展名，如(".svg",)模拟旧版WPS
+    """
+
+    def __init__(
+        self,
+        insert_latency=0.0,
+        save_latency=0.0,
+        paste_latency=0.0,
+        failures=None,
+        fail_seed=0,
+        unsupported_formats=(),
+    ):
+        self.insert_latency = insert_latency
+        self.unsupported_formats = tuple(unsupported_formats)
+        self.save_latency = save_latency
+        self.paste_latency = paste_latency
+        self.injector = FailureInjector(failures, fail_seed)
+        self.Visible = True
+        self.documents = []
+        self.Documents = FakeWordDocuments(self)
+        self.Selection = FakeWordSelection()
+        self.quit = False
+
+    def Quit(self, SaveChanges=None):
+        self.injector.check("Quit")
+        self.quit = True
+
+
+class FakeOfficeFactory:
+    """可pickle的FakeWordApp工厂，用法同core.create_office_app"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def __call__(self, app_type="Word"):
+        return FakeWordApp(**self.options)
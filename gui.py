@@ -1,9 +1,32 @@
+import asyncio
+import base64
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
-from config import SOFTWARE_VERSION
-from core import visio_to_word_copy_paste, visio_to_word_export_png, kill_visio_processes, kill_word_processes
+import multiprocessing
+import time
+import async_jobs
+import tracing
+from config import SOFTWARE_VERSION, DEFAULT_WORKERS, THUMBNAIL_SIZE, TRACE_DIR
+from core import (
+    visio_to_multi_targets,
+    visio_to_word_copy_paste,
+    visio_to_word_export_vector,
+    kill_visio_processes,
+    kill_word_processes,
+    uses_office_app,
+)
+from daemon import daemon_available, run_remote
+from docx_patch import merge_converted_docx
+from pipeline import visio_to_word_export_png_pipelined
+from scanner import iter_visio_batches
+from supervisor import visio_to_word_export_png_supervised
+from targets import ALL_TARGETS, IMAGE_FORMATS
+from thumbnails import ThumbnailLoader
+from vsdx_index import VsdxIndex
+from watcher import DirectoryWatcher
+from worker_pool import visio_to_word_export_png_parallel
 
 class VisioConverterApp:
     def __init__(self, root):
@@ -13,10 +36,23 @@ class VisioConverterApp:
         # 初始化变量
         self.selected_dir = tk.StringVar()
         self.all_select_var = tk.BooleanVar(value=True)
+        self.item_files = {}  # 列表项id -> 文件名
         self.files_data = {}
         self.conversion_method = tk.StringVar(value="export_png")
         self.separate_files_var = tk.BooleanVar(value=False)
+        self.watchdog_var = tk.BooleanVar(value=False)
         self.word_processor = tk.StringVar(value="Word")  # 新增软件选择变量
+        self.workers_var = tk.IntVar(value=DEFAULT_WORKERS)
+        # 多目标导出的输出目标与图片格式
+        self.target_vars = {target: tk.BooleanVar(value=True) for target in ALL_TARGETS}
+        self.image_format_var = tk.StringVar(value=IMAGE_FORMATS[0])
+        self.scan_generation = 0  # 每次重新加载目录时递增，旧的扫描线程据此停止
+        # 监视模式：目录中的文件变化时自动增量转换
+        self.watch_var = tk.BooleanVar(value=False)
+        self.watcher = None
+        self.watch_pending = False  # 转换期间又有变化，结束后需要再转换一次
+        self.converting = False
+        self.current_job = None  # 正在进行的async_jobs.ConversionJob，供"取消"按钮使用
 
         # 创建界面组件
         self.create_widgets()
@@ -44,6 +80,12 @@ class VisioConverterApp:
             variable=self.all_select_var,
             command=self.toggle_select_all,
         ).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(
+            dir_frame,
+            text="监视目录",
+            variable=self.watch_var,
+            command=self.toggle_watch,
+        ).pack(side=tk.LEFT, padx=5)
 
         # 转换方式选择区域
         method_frame = ttk.Frame(self.root, padding=(10, 5))
@@ -62,23 +104,66 @@ class VisioConverterApp:
             variable=self.conversion_method,
             value="copy_paste",
         ).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(
+            method_frame,
+            text="导出矢量图",
+            variable=self.conversion_method,
+            value="export_vector",
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(
+            method_frame,
+            text="多目标导出",
+            variable=self.conversion_method,
+            value="multi",
+        ).pack(side=tk.LEFT, padx=5)
         ttk.Checkbutton(
             method_frame, text="单独转换每个文件", variable=self.separate_files_var
         ).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(
+            method_frame, text="超时保护", variable=self.watchdog_var
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(method_frame, text="并行进程:").pack(side=tk.LEFT)
+        ttk.Spinbox(
+            method_frame, from_=1, to=32, width=4, textvariable=self.workers_var
+        ).pack(side=tk.LEFT)
+
+        # 多目标导出：每页只导出一次，同时生成勾选的输出
+        target_frame = ttk.Frame(self.root, padding=(10, 0))
+        target_frame.pack(fill=tk.X)
+
+        ttk.Label(target_frame, text="多目标导出输出:").pack(side=tk.LEFT)
+        for target, text in zip(ALL_TARGETS, ("合并文档", "单独文档", "图片")):
+            ttk.Checkbutton(
+                target_frame, text=text, variable=self.target_vars[target]
+            ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(target_frame, text="图片格式:").pack(side=tk.LEFT)
+        ttk.Combobox(
+            target_frame,
+            values=IMAGE_FORMATS,
+            textvariable=self.image_format_var,
+            state="readonly",
+            width=6,
+        ).pack(side=tk.LEFT, padx=5)
 
         # 文件列表区域
         list_frame = ttk.Frame(self.root, padding=10)
         list_frame.pack(fill=tk.BOTH, expand=True)
 
         self.tree = ttk.Treeview(
-            list_frame, columns=("selected", "filename", "order"), show="headings"
+            list_frame,
+            columns=("selected", "filename", "order", "pages"),
+            show="headings",
         )
         self.tree.heading("selected", text="选择", anchor=tk.CENTER)
         self.tree.heading("filename", text="文件名", anchor=tk.W)
         self.tree.heading("order", text="排序号", anchor=tk.W)
+        self.tree.heading(
+            "pages", text="页数", anchor=tk.W, command=self.sort_by_pages
+        )
         self.tree.column("selected", width=50, anchor=tk.CENTER)
         self.tree.column("filename", width=350)
         self.tree.column("order", width=100)
+        self.tree.column("pages", width=60)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         scrollbar = ttk.Scrollbar(
@@ -89,6 +174,25 @@ class VisioConverterApp:
 
         self.tree.bind("<Double-1>", self.on_double_click)
         self.tree.bind("<Button-1>", self.on_treeview_click)
+        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+
+        # 预览区域：显示选中文件的内嵌缩略图(或上次导出的第一页)，在后台线程中加载
+        preview_frame = ttk.LabelFrame(list_frame, text="预览", padding=5)
+        preview_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 0), before=self.tree)
+        self.preview_label = ttk.Label(
+            preview_frame, text="选中文件后显示预览", anchor=tk.CENTER, width=30
+        )
+        self.preview_label.pack(fill=tk.X)
+        self.preview_info = ttk.Label(
+            preview_frame, text="", wraplength=THUMBNAIL_SIZE, justify=tk.LEFT
+        )
+        self.preview_info.pack(fill=tk.X, pady=(5, 0))
+        self.preview_photo = None  # 保持对当前图片的引用，否则会被回收
+        self.thumbnail_loader = ThumbnailLoader(
+            lambda root, filename, data: self.root.after(
+                0, self.show_preview, root, filename, data
+            )
+        )
 
         # 控制按钮区域
         ctrl_frame = ttk.Frame(self.root, padding=10)
@@ -108,9 +212,15 @@ class VisioConverterApp:
             software_frame, text="WPS", variable=self.word_processor, value="WPS"
         ).pack(side=tk.LEFT)
 
+        ttk.Button(ctrl_frame, text="取消", command=self.cancel_conversion).pack(
+            side=tk.RIGHT, padx=5
+        )
         ttk.Button(ctrl_frame, text="开始转换", command=self.start_conversion).pack(
             side=tk.RIGHT, padx=5
         )
+        ttk.Button(ctrl_frame, text="合并单独文档", command=self.merge_documents).pack(
+            side=tk.RIGHT, padx=5
+        )
 
     def on_treeview_click(self, event):
         """处理复选框点击事件"""
@@ -187,42 +297,206 @@ class VisioConverterApp:
             dir_path = os.path.abspath(os.path.normpath(dir_path))
             self.selected_dir.set(dir_path)
             self.load_files(dir_path)
+            if self.watcher is not None:
+                self.start_watch()
 
     def load_files(self, dir_path):
-        """加载目录中的Visio文件到列表"""
+        """在后台线程中扫描目录(含子目录)，分批加载Visio文件到列表"""
         self.tree.delete(*self.tree.get_children())
         self.files_data.clear()
+        self.item_files.clear()
+        self.scan_generation += 1
+        self.status_label.config(text="正在扫描目录...")
 
         # 确保路径是绝对路径
         dir_path = os.path.abspath(os.path.normpath(dir_path))
-        
-        files = [
-            f for f in os.listdir(dir_path) 
-            if f.lower().endswith((".vsd", ".vsdx")) and os.path.isfile(os.path.join(dir_path, f))
-        ]
-        files.sort()
 
-        for index, filename in enumerate(files):
-            selected_icon = "☑" if self.all_select_var.get() else "☐"
+        threading.Thread(
+            target=self.scan_files, args=(dir_path, self.scan_generation), daemon=True
+        ).start()
+
+    def scan_files(self, dir_path, generation):
+        """扫描线程：每得到一批文件就交给界面线程插入"""
+        try:
+            for batch in iter_visio_batches(dir_path):
+                if generation != self.scan_generation:
+                    return  # 已切换到其他目录
+                self.root.after(0, self.add_file_batch, batch, generation)
+        except Exception as e:
+            error_msg = str(e)
+            self.root.after(
+                0, lambda: self.status_label.config(text=f"扫描目录失败：{error_msg}")
+            )
+            return
+        self.root.after(0, self.finish_scan, generation)
+
+    def add_file_batch(self, batch, generation):
+        """把一批扫描结果插入列表，文件名为相对于所选目录的路径"""
+        if generation != self.scan_generation:
+            return
+        selected = self.all_select_var.get()
+        selected_icon = "☑" if selected else "☐"
+        for filename in batch:
+            index = len(self.files_data) + 1
+            item = self.tree.insert("", tk.END, values=(selected_icon, filename, index, ""))
             self.files_data[filename] = {
-                "selected": self.all_select_var.get(),
-                "order": index + 1,
+                "selected": selected,
+                "order": index,
+                "pages": None,
+                "item": item,
             }
-            self.tree.insert("", tk.END, values=(selected_icon, filename, index + 1))
+            self.item_files[item] = filename
+        self.status_label.config(text=f"正在扫描目录... 已找到{len(self.files_data)}个文件")
+
+    def finish_scan(self, generation):
+        if generation != self.scan_generation:
+            return
+        self.status_label.config(text=f"共找到{len(self.files_data)}个文件，正在读取页数...")
+        threading.Thread(
+            target=self.index_files,
+            args=(self.selected_dir.get(), list(self.files_data), generation),
+            daemon=True,
+        ).start()
+
+    def index_files(self, dir_path, file_list, generation):
+        """索引线程：直接读取.vsdx得到页数(不启动Visio)，每50个文件刷新一次列表"""
+        index = VsdxIndex(dir_path)
+        page_counts = {}
+        for i, filename in enumerate(file_list, 1):
+            if generation != self.scan_generation:
+                return
+            meta = index.get(filename)
+            page_counts[filename] = meta["page_count"] if meta else None
+            if i % 50 == 0 or i == len(file_list):
+                self.root.after(0, self.set_page_counts, page_counts, generation)
+                page_counts = {}
+        try:
+            index.save(keep=file_list)
+        except OSError as e:
+            print(f"保存元数据索引失败: {e}")
+
+    def set_page_counts(self, page_counts, generation):
+        """把页数填入列表，.vsd等无法解析的文件显示为"-" """
+        if generation != self.scan_generation:
+            return
+        for filename, pages in page_counts.items():
+            data = self.files_data[filename]
+            data["pages"] = pages
+            values = list(self.tree.item(data["item"], "values"))
+            values[3] = "-" if pages is None else pages
+            self.tree.item(data["item"], values=tuple(values))
+        total_pages = sum(data["pages"] or 0 for data in self.files_data.values())
+        self.status_label.config(
+            text=f"共找到{len(self.files_data)}个文件，{total_pages}页"
+        )
+
+    def sort_by_pages(self):
+        """按页数从多到少重新排列并编号，使工作量大的文件先转换"""
+        children = sorted(
+            self.tree.get_children(),
+            key=lambda child: -(self.files_data[self.item_files[child]]["pages"] or 0),
+        )
+        for index, child in enumerate(children, 1):
+            self.tree.move(child, "", index - 1)
+            values = list(self.tree.item(child, "values"))
+            values[2] = index
+            self.tree.item(child, values=tuple(values))
+            self.files_data[self.item_files[child]]["order"] = index
+
+    def on_tree_select(self, event):
+        """选中文件变化时请求加载其缩略图"""
+        selection = self.tree.selection()
+        if not selection or selection[0] not in self.item_files:
+            return
+        filename = self.item_files[selection[0]]
+        pages = self.files_data[filename]["pages"]
+        self.preview_info.config(
+            text=filename if pages is None else f"{filename}\n共{pages}页"
+        )
+        self.preview_label.config(image="", text="正在加载...")
+        self.thumbnail_loader.request(self.selected_dir.get(), filename)
+
+    def show_preview(self, root, filename, data):
+        """显示加载完成的缩略图，期间已选中其他文件时忽略"""
+        selection = self.tree.selection()
+        if (
+            root != self.selected_dir.get()
+            or not selection
+            or self.item_files.get(selection[0]) != filename
+        ):
+            return
+        if data is None:
+            self.preview_photo = None
+            self.preview_label.config(image="", text="无预览")
+            return
+        self.preview_photo = tk.PhotoImage(data=base64.b64encode(data))
+        self.preview_label.config(image=self.preview_photo, text="")
 
     def start_conversion(self):
         """启动转换流程"""
         if not self.selected_dir.get():
             messagebox.showerror("错误", "请先选择目录！")
             return
+        if self.converting:
+            messagebox.showwarning("警告", "正在转换，请等待完成！")
+            return
+
+        # 常驻转换服务运行时交给服务处理，复用其中已启动的Visio/Word
+        use_daemon = daemon_available()
+        if not use_daemon and not self.kill_processes():
+            return
+
+        settings = self.conversion_settings()
+        if settings is None:
+            return
+
+        self.status_label.config(text="正在初始化转换...")
+        self.start_processing(settings, use_daemon)
 
+    def kill_processes(self):
+        """终止已有的Visio与所选办公软件进程，失败时提示并返回False"""
         try:
             kill_visio_processes()
-            kill_word_processes(self.word_processor.get())
+            if uses_office_app(self.conversion_method.get()):
+                kill_word_processes(self.word_processor.get())
         except Exception as e:
             messagebox.showerror("错误", f"终止进程时出错: {e}")
-            return
+            return False
+        return True
+
+    def conversion_settings(self):
+        """
+        读取列表中的排序号与界面上的转换设置。
 
+        返回:
+            dict: process_files的同名参数；多目标导出未勾选任何输出时提示并返回None
+        """
+        self.read_orders()
+
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except (ValueError, tk.TclError):
+            workers = 1
+
+        targets = tuple(
+            target for target in ALL_TARGETS if self.target_vars[target].get()
+        )
+        if self.conversion_method.get() == "multi" and not targets:
+            messagebox.showerror("错误", "请至少勾选一个多目标导出的输出！")
+            return None
+
+        return {
+            "method": self.conversion_method.get(),
+            "separate_files": self.separate_files_var.get(),
+            "word_processor": self.word_processor.get(),
+            "workers": workers,
+            "watchdog": self.watchdog_var.get(),
+            "targets": targets,
+            "image_format": self.image_format_var.get(),
+        }
+
+    def read_orders(self):
+        """读取列表中编辑过的排序号"""
         for child in self.tree.get_children():
             filename = self.tree.item(child)["values"][1]
             try:
@@ -232,90 +506,376 @@ class VisioConverterApp:
             except ValueError:
                 self.files_data[filename]["order"] = 0
 
-        self.status_label.config(text="正在初始化转换...")
+    def selected_files(self):
+        """按排序号返回选中的文件"""
+        return [
+            filename
+            for filename, data in sorted(
+                self.files_data.items(), key=lambda item: item[1]["order"]
+            )
+            if data["selected"]
+        ]
+
+    def merge_documents(self):
+        """把选中文件已单独转换的文档按排序号拼接为output.docx，不启动Visio/Word"""
+        if not self.selected_dir.get():
+            messagebox.showerror("错误", "请先选择目录！")
+            return
+        if self.converting:
+            messagebox.showwarning("警告", "正在转换，请等待完成！")
+            return
+        self.read_orders()
+        file_list = self.selected_files()
+        if not file_list:
+            messagebox.showwarning("警告", "没有选择任何文件！")
+            return
+
+        visio_dir = os.path.abspath(os.path.normpath(self.selected_dir.get()))
+        self.converting = True
+        self.status_label.config(text="正在合并单独文档...")
+
+        def merge():
+            try:
+                start = time.perf_counter()
+                merged = merge_converted_docx(visio_dir, file_list)
+                output_path = os.path.join(visio_dir, "output.docx")
+                message = f"已合并{len(merged)}个文件！\n保存路径：{output_path}"
+                if len(merged) < len(file_list):
+                    missing = [f for f in file_list if f not in merged]
+                    message += "\n以下文件没有单独转换的文档，已跳过：\n" + "\n".join(missing)
+                done_text = f"合并完成，用时{time.perf_counter() - start:.1f}秒"
+                self.root.after(
+                    0,
+                    lambda: [
+                        messagebox.showinfo("完成", message),
+                        self.status_label.config(text=done_text),
+                    ],
+                )
+            except Exception as e:
+                error_msg = str(e)
+                self.root.after(
+                    0,
+                    lambda: [
+                        messagebox.showerror("错误", f"合并失败: {error_msg}"),
+                        self.status_label.config(text=f"错误：{error_msg}"),
+                    ],
+                )
+            finally:
+                self.root.after(0, self.finish_processing)
+
+        threading.Thread(target=merge, daemon=True).start()
 
+    def start_processing(self, settings, use_daemon, incremental=False):
+        """在后台线程中转换，同一时间只进行一次转换"""
+        self.converting = True
         thread = threading.Thread(
             target=self.process_files,
-            args=(
-                self.selected_dir.get(),
-                self.conversion_method.get(),
-                self.separate_files_var.get(),
-                self.word_processor.get(),
-            ),
+            args=(self.selected_dir.get(),),
+            kwargs=dict(settings, use_daemon=use_daemon, incremental=incremental),
         )
         thread.start()
 
-    def process_files(self, visio_dir, method, separate_files, word_processor):
-        """处理文件的主逻辑"""
+    async def run_job(self, visio_dir, func, file_list, incremental, kwargs):
+        """
+        通过async_jobs在后台线程中转换，按事件更新进度文字。
+
+        监视模式启用转换缓存，只转换内容变化的文件；手动转换总是转换全部所选文件。
+
+        返回:
+            JobFinished: 任务结束事件，status为"done"或"cancelled"；失败时抛出异常
+        """
+        job = async_jobs.start_conversion(
+            visio_dir,
+            func,
+            kill_processes=False,
+            files=file_list,
+            use_cache=incremental,
+            **kwargs,
+        )
+        self.current_job = job
+        current = ""
+        error = None
+        async for event in job:
+            if isinstance(event, async_jobs.FileStarted):
+                current = f"({event.index}/{event.total}) {event.file}"
+                self.progress_text = f"正在处理：{current}"
+            elif isinstance(event, async_jobs.PageInserted) and event.page:
+                self.progress_text = f"正在处理：{current} 第{event.page}页"
+            elif isinstance(event, async_jobs.JobError) and event.file is None:
+                error = event.message
+        finished = await job.wait()
+        if finished.status == "failed":
+            raise Exception(error)
+        return finished
+
+    def show_cancelled(self, incremental):
+        """转换已按请求取消，已完成的文件保留"""
+        if incremental:
+            text = "监视中：转换已取消"
+            self.root.after(0, lambda: self.status_label.config(text=text))
+            return
+        self.root.after(
+            0,
+            lambda: [
+                messagebox.showinfo("已取消", "转换已取消，已完成的文件已保留。"),
+                self.status_label.config(text="转换已取消"),
+            ],
+        )
+
+    def cancel_conversion(self):
+        """请求取消正在进行的转换：当前文件完成后停止"""
+        job = self.current_job
+        if not self.converting or job is None or job.done():
+            self.status_label.config(text="没有可取消的转换")
+            return
+        job.cancel()
+        self.status_label.config(text="正在取消…(当前文件完成后停止)")
+
+    def finish_processing(self):
+        """转换结束：监视期间有新的变化时再转换一次"""
+        self.converting = False
+        self.current_job = None
+        if self.watch_pending and self.watcher is not None:
+            self.watch_pending = False
+            self.run_watch_conversion()
+
+    def toggle_watch(self):
+        """勾选"监视目录"时开始监视，取消勾选时停止"""
+        if not self.watch_var.get():
+            self.stop_watch()
+            self.status_label.config(text="已停止监视")
+            return
+        if not self.selected_dir.get():
+            self.watch_var.set(False)
+            messagebox.showerror("错误", "请先选择目录！")
+            return
+        if not daemon_available() and not self.kill_processes():
+            self.watch_var.set(False)
+            return
+        self.start_watch()
+
+    def start_watch(self):
+        """监视当前目录，先增量转换一次，之后每批变化只重新转换变化的文件"""
+        self.stop_watch()
+        visio_dir = self.selected_dir.get()
+        self.watcher = DirectoryWatcher(
+            visio_dir,
+            lambda changed: self.root.after(0, self.on_watch_change, visio_dir, changed),
+        )
+        try:
+            self.watcher.start()
+        except OSError as e:
+            self.watcher = None
+            self.watch_var.set(False)
+            messagebox.showerror("错误", f"无法监视目录: {e}")
+            return
+        self.run_watch_conversion()
+
+    def stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.watch_pending = False
+
+    def on_watch_change(self, visio_dir, changed):
+        """把新增、删除的文件同步到列表，然后增量转换"""
+        if self.watcher is None or visio_dir != self.selected_dir.get():
+            return
+        added = []
+        for filename in changed:
+            exists = os.path.isfile(os.path.join(visio_dir, filename))
+            if exists and filename not in self.files_data:
+                added.append(filename)
+            elif not exists and filename in self.files_data:
+                item = self.files_data.pop(filename)["item"]
+                self.item_files.pop(item, None)
+                self.tree.delete(item)
+        if added:
+            self.add_file_batch(added, self.scan_generation)
+        self.run_watch_conversion()
+
+    def run_watch_conversion(self):
+        """按当前设置增量转换，正在转换时等本次结束后再执行"""
+        if self.converting:
+            self.watch_pending = True
+            return
+        settings = self.conversion_settings()
+        if settings is None:
+            return
+        self.status_label.config(text="监视中：正在检查变化...")
+        self.start_processing(settings, daemon_available(), incremental=True)
+
+    def process_files(
+        self,
+        visio_dir,
+        method,
+        separate_files,
+        word_processor,
+        workers=1,
+        use_daemon=False,
+        watchdog=False,
+        targets=ALL_TARGETS,
+        image_format="PNG",
+        incremental=False,
+    ):
+        """
+        处理文件的主逻辑
+
+        incremental为True时(监视模式)通过转换缓存只转换内容变化的文件，
+        结束后只更新状态栏，不弹出提示框。
+        """
         try:
             # 确保路径是绝对路径且规范化
             visio_dir = os.path.abspath(os.path.normpath(visio_dir))
             
-            sorted_files = sorted(
-                [
-                    (f, self.files_data[f])
-                    for f in self.files_data
-                    if self.files_data[f]["selected"]
-                ],
-                key=lambda x: x[1]["order"],
-                reverse=False,
-            )
-            file_list = [f[0] for f in sorted_files]
+            file_list = self.selected_files()
 
             if not file_list:
-                self.root.after(
-                    0, lambda: messagebox.showwarning("警告", "没有选择任何文件！")
-                )
+                if not incremental:
+                    self.root.after(
+                        0, lambda: messagebox.showwarning("警告", "没有选择任何文件！")
+                    )
                 return
 
-            def handle_progress(current_file, current, total):
-                self.root.after(
-                    0,
-                    lambda: self.status_label.config(
-                        text=f"正在处理：({current}/{total}) {current_file}"
-                    ),
-                )
+            failed_files = []
+            converted = len(file_list)
+            tracer = tracing.start()
+            self.progress_text = "正在处理..."
+            self.root.after(0, self.refresh_progress, tracer)
 
-            if method == "copy_paste":
-                visio_to_word_copy_paste(
-                    visio_dir,
-                    file_list,
+            def handle_progress(current_file, current, total):
+                self.progress_text = f"正在处理：({current}/{total}) {current_file}"
+
+            if use_daemon:
+                if method == "export_png" and watchdog:
+                    method = "export_png_supervised"  # 服务同样启用超时保护
+
+                def set_current_job(job):
+                    self.current_job = job  # "取消"按钮通过服务取消任务
+
+                summary = run_remote(
+                    {
+                        "dir": visio_dir,
+                        "method": method,
+                        "files": file_list,
+                        "separate_files": separate_files,
+                        "word_processor": word_processor,
+                        "targets": list(targets),
+                        "image_format": image_format,
+                        "force": not incremental,
+                    },
                     handle_progress,
-                    separate_files,
-                    word_processor,
+                    on_submit=set_current_job,
                 )
+                if summary["status"] == "已取消":
+                    self.show_cancelled(incremental)
+                    return
+                if summary["status"] == "失败":
+                    raise Exception(summary["error"])
+                converted = summary.get("converted", converted)
             else:
-                visio_to_word_export_png(
-                    visio_dir,
-                    file_list,
-                    handle_progress,
-                    separate_files,
-                    word_processor,
+                kwargs = {
+                    "separate_files": separate_files,
+                    "word_processor": word_processor,
+                }
+                if method == "export_png" and watchdog:
+                    # 卡死的文件会被隔离，其余文件照常转换
+                    func = visio_to_word_export_png_supervised
+                elif method == "multi":
+                    func = visio_to_multi_targets
+                    kwargs = {
+                        "targets": targets,
+                        "image_format": image_format,
+                        "word_processor": word_processor,
+                    }
+                elif method == "export_vector":
+                    func = visio_to_word_export_vector
+                elif method == "copy_paste":
+                    func = visio_to_word_copy_paste
+                elif workers > 1:
+                    func = visio_to_word_export_png_parallel
+                    kwargs["workers"] = workers
+                else:
+                    func = visio_to_word_export_png_pipelined
+
+                finished = asyncio.run(
+                    self.run_job(visio_dir, func, file_list, incremental, kwargs)
                 )
+                if finished.status == "cancelled":
+                    self.show_cancelled(incremental)
+                    return
+                converted = finished.stats["converted"]
+                result = finished.result
+                if func is visio_to_word_export_png_supervised and result:
+                    failed_files = [failure["file"] for failure in result["failed"]]
+                    failed_files += result["skipped"]
+
+            if incremental:
+                if converted:
+                    done_text = f"监视中：{time.strftime('%H:%M:%S')} 已更新{converted}个文件"
+                else:
+                    done_text = "监视中：文件均未修改"
+                if failed_files:
+                    done_text += f"，{len(failed_files)}个文件失败已隔离"
+                self.root.after(0, lambda: self.status_label.config(text=done_text))
+                return
 
-            output_path = os.path.abspath(os.path.join(
-                visio_dir, "Converted_Files" if separate_files else "output.docx"
-            ))
+            if method == "multi":
+                output_path = visio_dir
+            else:
+                output_path = os.path.abspath(os.path.join(
+                    visio_dir, "Converted_Files" if separate_files else "output.docx"
+                ))
+            done_text = "转换完成"
+            if tracer.pages_done:
+                done_text += f"，平均{tracer.pages_per_sec():.1f}页/秒"
+            done_message = f"文件已转换完成！\n保存路径：{output_path}"
+            if failed_files:
+                done_message += "\n以下文件失败已隔离：\n" + "\n".join(failed_files)
             self.root.after(
                 0,
                 lambda: [
-                    messagebox.showinfo(
-                        "完成", f"文件已转换完成！\n保存路径：{output_path}"
-                    ),
-                    self.status_label.config(text="转换完成"),
+                    messagebox.showinfo("完成", done_message),
+                    self.status_label.config(text=done_text),
                 ],
             )
         except Exception as e:
             # DEBUG
             # raise e
             error_msg = str(e)
-            self.root.after(
-                0,
-                lambda msg=error_msg: [
-                    messagebox.showerror("错误", f"转换失败: {msg}"),
-                    self.status_label.config(text=f"错误：{msg}"),
-                ],
-            )
+            if incremental:
+                print(f"监视模式转换失败: {error_msg}")
+                self.root.after(
+                    0,
+                    lambda msg=error_msg: self.status_label.config(
+                        text=f"监视中：转换失败：{msg}"
+                    ),
+                )
+            else:
+                self.root.after(
+                    0,
+                    lambda msg=error_msg: [
+                        messagebox.showerror("错误", f"转换失败: {msg}"),
+                        self.status_label.config(text=f"错误：{msg}"),
+                    ],
+                )
+        finally:
+            tracer = tracing.stop()
+            if tracer is not None:
+                tracer.print_summary()
+                if TRACE_DIR:
+                    tracer.write(TRACE_DIR)
+            self.root.after(0, self.finish_processing)
+
+    def refresh_progress(self, tracer):
+        """转换进行中每0.5秒刷新一次状态栏，显示实时的每秒页数"""
+        if tracing.active() is not tracer:
+            return
+        text = self.progress_text
+        if tracer.pages_done:
+            text += f"  {tracer.pages_per_sec():.1f}页/秒"
+        self.status_label.config(text=text)
+        self.root.after(500, self.refresh_progress, tracer)
 
 def center_window(root, width, height):
     """窗口居中显示"""
@@ -326,6 +886,7 @@ def center_window(root, width, height):
     root.geometry(f"{width}x{height}+{x}+{y}")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包后的exe中启动并行工作进程需要
     root = tk.Tk()
     app = VisioConverterApp(root)
     center_window(root, 650, 450)
@@ -0,0 +1,212 @@
+"""
+导出图片的后处理：插入文档前按目标分辨率或最大宽度缩小图片，并重新压缩。
+
+page.Export按Visio默认分辨率输出PNG，页数多时合并文档体积很大、保存和打开都慢。
+后处理只缩小不放大，同时按缩放比例调整图片声明的DPI，使其在文档中的显示尺寸不变。
+内容完全相同的图片(如重复的模板页)由文档写入器去重，在DOCX包中只保存一份。
+
+注意:
+- 需要Pillow，未安装时打印一次提示并原样插入图片
+- 通过Word/WPS(COM)生成文档时无法去重，缩放与重新压缩仍然有效
+"""
+import os
+
+from config import (
+    IMAGE_FORMAT,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_MAX_WIDTH_PX,
+    IMAGE_TARGET_DPI,
+)
+from docx_sink import DEFAULT_DPI, EMU_PER_INCH, fit_picture_size, usable_area_emu
+from tracing import span
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+_warned = False
+
+
+class ImageOptions:
+    """
+    图片后处理选项，未指定的参数取config中的IMAGE_*配置。
+
+    参数:
+        max_width (int, 可选): 最大像素宽度，0表示不限
+        target_dpi (int, 可选): 按文档中显示尺寸计算的目标分辨率，0表示不限
+        image_format (str, 可选): ""保持导出结果，"png"重新优化压缩，"jpeg"转为JPEG
+        jpeg_quality (int, 可选): JPEG质量(1-95)
+    """
+
+    def __init__(self, max_width=None, target_dpi=None, image_format=None, jpeg_quality=None):
+        self.max_width = IMAGE_MAX_WIDTH_PX if max_width is None else max_width
+        self.target_dpi = IMAGE_TARGET_DPI if target_dpi is None else target_dpi
+        self.image_format = (IMAGE_FORMAT if image_format is None else image_format).lower()
+        self.jpeg_quality = IMAGE_JPEG_QUALITY if jpeg_quality is None else jpeg_quality
+        if self.image_format not in ("", "png", "jpeg"):
+            raise ValueError(f"未知的图片格式: {self.image_format}")
+
+    @property
+    def enabled(self):
+        return bool(self.max_width or self.target_dpi or self.image_format)
+
+
+def _effective_dpi(image):
+    """返回Word计算显示尺寸时使用的分辨率，未声明或为72时按96处理(与fit_picture_size一致)"""
+    dpi = image.info.get("dpi") or (0, 0)
+    horz, vert = (round(float(d)) for d in dpi)
+    return (
+        DEFAULT_DPI if horz in (0, 72) else horz,
+        DEFAULT_DPI if vert in (0, 72) else vert,
+    )
+
+
+def _scale_factor(image, options):
+    """计算缩小比例(不大于1)"""
+    px_width, px_height = image.size
+    horz_dpi, vert_dpi = _effective_dpi(image)
+    scale = 1.0
+    if options.max_width and px_width > options.max_width:
+        scale = options.max_width / px_width
+    if options.target_dpi:
+        width_emu, _ = fit_picture_size(
+            px_width, px_height, horz_dpi, vert_dpi, *usable_area_emu()
+        )
+        target_px = width_emu / EMU_PER_INCH * options.target_dpi
+        scale = min(scale, target_px / px_width)
+    return scale
+
+
+def process_image(image_path, options):
+    """
+    按选项处理一张图片。
+
+    参数:
+        image_path (str): 导出的临时图片路径，转为PNG时直接覆盖
+        options (ImageOptions): 处理选项
+
+    返回:
+        str: 处理后的图片路径，转为JPEG时是同目录下新的.jpg文件(由调用方删除)
+    """
+    with Image.open(image_path) as source:
+        source.load()
+        image = source
+        scale = _scale_factor(source, options)
+        horz_dpi, vert_dpi = _effective_dpi(source)
+        if scale < 1.0:
+            size = (
+                max(1, round(source.width * scale)),
+                max(1, round(source.height * scale)),
+            )
+            image = source.resize(size, Image.LANCZOS)
+            # 按实际缩放比例调整DPI，保持显示尺寸不变
+            horz_dpi *= size[0] / source.width
+            vert_dpi *= size[1] / source.height
+        elif not options.image_format:
+            return image_path
+
+        # 声明为72 DPI的图片会被当作96 DPI显示，避开该值
+        dpi = tuple(73 if round(d) == 72 else d for d in (horz_dpi, vert_dpi))
+        image_format = options.image_format or (source.format or "png").lower()
+        if image_format == "jpeg":
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            output_path = os.path.splitext(image_path)[0] + ".jpg"
+            image.save(output_path, "JPEG", quality=options.jpeg_quality, optimize=True, dpi=dpi)
+        else:
+            output_path = image_path
+            image.save(output_path, "PNG", optimize=True, dpi=dpi)
+    return output_path
+
+
+class ImageStageSink:
+    """
+    在图片插入文档前进行后处理的写入器，包装create_sink创建的其他写入器。
+
+    参数:
+        sink: 被包装的写入器
+        options (ImageOptions): 处理选项
+    """
+
+    def __init__(self, sink, options):
+        self.sink = sink
+        self.options = options
+        self.filename = None
+        self.page = 0
+
+    def resume_point(self, file_list):
+        return self.sink.resume_point(file_list)
+
+    def begin_file(self, filename):
+        self.filename = filename
+        self.page = 0
+        self.sink.begin_file(filename)
+
+    def add_picture(self, image_path, is_last_page):
+        self.page += 1
+        with span("image", file=self.filename, page=self.page):
+            processed_path = process_image(image_path, self.options)
+        try:
+            self.sink.add_picture(processed_path, is_last_page)
+        finally:
+            if processed_path != image_path and os.path.exists(processed_path):
+                os.remove(processed_path)
+
+    def add_vector_picture(self, vector_path, fallback_path, is_last_page):
+        # 矢量图不处理，后备图片在导出时已经缩小
+        self.page += 1
+        self.sink.add_vector_picture(vector_path, fallback_path, is_last_page)
+
+    def add_pasted_page(self, is_last_page):
+        # 粘贴的页面不是图片文件，不做处理
+        self.page += 1
+        self.sink.add_pasted_page(is_last_page)
+
+    def end_file(self, filename):
+        self.sink.end_file(filename)
+
+    def next_volume(self, output_path):
+        self.sink.next_volume(output_path)
+
+    def close(self):
+        self.sink.close()
+
+    def abort(self):
+        self.sink.abort()
+
+
+def shrink_image(image_path, max_width):
+    """
+    把图片缩小到不超过max_width像素宽(显示尺寸不变)，用于矢量图的PNG后备图片。
+
+    返回:
+        str: 图片路径；未安装Pillow或max_width为0时保持原样
+    """
+    if Image is None or not max_width:
+        return image_path
+    return process_image(image_path, ImageOptions(max_width, 0, "", IMAGE_JPEG_QUALITY))
+
+
+def wrap_sink(sink, options=None):
+    """
+    按配置为写入器加上图片后处理。
+
+    返回:
+        未启用后处理或未安装Pillow时返回原写入器，否则返回ImageStageSink
+    """
+    global _warned
+    options = options or ImageOptions()
+    if not options.enabled:
+        return sink
+    if Image is None:
+        if not _warned:
+            print("未安装Pillow，跳过图片缩放与压缩")
+            _warned = True
+        return sink
+    return ImageStageSink(sink, options)
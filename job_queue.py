@@ -0,0 +1,543 @@
+"""
+多主机分布式转换任务队列。
+
+协调端(enqueue)把清单中的每个任务按文件拆分为子任务写入队列，任意数量的工作进程(worker，
+可以分布在多台装有Visio的主机上)从队列中租用子任务并转换，转换期间定期发送心跳续租，
+完成或失败后把结果写回队列。工作进程崩溃或失联时租约到期，子任务自动重新分配给其他工作进程。
+
+队列保存在一个SQLite文件中(SqliteTaskQueue)，所有状态变化都在单个写事务中完成，
+同一台电脑上可以直接启动多个本地工作进程运行和测试整个流程(enqueue --local-workers)。
+
+转换缓存只由协调端读写：协调端按缓存只提交内容变化的文件，子任务结束后记录结果；
+合并输出的任务由各文件先单独转换，全部完成后协调端再把单独文档拼接为output.docx(见docx_patch.py)。
+
+注意:
+- 各主机访问的目录路径必须相同(如UNC路径\\\\server\\share\\SOP)，清单中应使用这样的路径
+- 租约按各主机的系统时间判断，主机之间的时钟需要同步，租约时长应远大于时钟误差
+- 网络文件系统上SQLite的文件锁不一定可靠，队列文件最好放在稳定的共享目录中
+- 分布式转换不支持合并文档分卷(volume_pages/volume_bytes)
+"""
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from config import (
+    QUEUE_HEARTBEAT_INTERVAL,
+    QUEUE_LEASE_SECONDS,
+    QUEUE_MAX_ATTEMPTS,
+    QUEUE_POLL_INTERVAL,
+)
+from core import (
+    com_initialize,
+    com_uninitialize,
+    create_conversion_cache,
+    get_visio_files,
+    kill_visio_processes,
+)
+from session import AppSession
+from targets import TARGET_MERGED, TARGET_SEPARATE, normalize_targets
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER NOT NULL,
+    job_index INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+CREATE INDEX IF NOT EXISTS tasks_batch ON tasks (batch_id);
+"""
+
+# 子任务状态：pending等待租用，leased已被工作进程租用，done完成，failed多次尝试后仍失败
+FINISHED_STATUSES = ("done", "failed")
+
+
+class SqliteTaskQueue:
+    """
+    保存在SQLite文件中的子任务队列。
+
+    参数:
+        path (str): 队列文件路径，不存在时自动创建
+        lease_seconds (float): 租约时长，超过此时间没有心跳的子任务会重新分配，默认取config.QUEUE_LEASE_SECONDS
+        max_attempts (int): 每个子任务最多尝试次数，默认取config.QUEUE_MAX_ATTEMPTS
+
+    注意:
+    - 每次操作使用独立的连接，同一个对象可以在心跳线程与主线程中同时使用
+    """
+
+    def __init__(self, path, lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            connection.executescript(_SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return _Transaction(connection)
+
+    def create_batch(self, tasks):
+        """
+        新建一批子任务。
+
+        参数:
+            tasks (list): (任务序号, 文件名, 子任务清单)元组的列表
+
+        返回:
+            int: 批次ID
+        """
+        now = time.time()
+        with self._connect() as connection:
+            batch_id = connection.execute(
+                "INSERT INTO batches (created) VALUES (?)", (now,)
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO tasks (batch_id, job_index, filename, spec, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (batch_id, job_index, filename, json.dumps(spec, ensure_ascii=False), now)
+                    for job_index, filename, spec in tasks
+                ],
+            )
+        return batch_id
+
+    def lease(self, worker):
+        """
+        租用一个等待中或租约已过期的子任务。
+
+        返回:
+            dict: 子任务(id、batch_id、job_index、filename、spec、attempts)，没有可租用的子任务时返回None
+
+        注意:
+        - 租约过期次数达到上限的子任务直接标记为失败，避免反复导致工作进程崩溃的文件无限重试
+        """
+        now = time.time()
+        with self._connect() as connection:
+            while True:
+                row = connection.execute(
+                    "SELECT * FROM tasks WHERE status = 'pending' "
+                    "OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["status"] == "leased":
+                    print(f"子任务租约已过期，重新分配: {row['filename']} (原工作进程 {row['worker']})")
+                    if row["attempts"] >= self.max_attempts:
+                        connection.execute(
+                            "UPDATE tasks SET status = 'failed', worker = NULL, error = ?, "
+                            "updated = ? WHERE id = ?",
+                            (f"尝试{row['attempts']}次后租约仍过期，工作进程可能已崩溃", now, row["id"]),
+                        )
+                        continue
+                connection.execute(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (worker, now + self.lease_seconds, now, row["id"]),
+                )
+                return {
+                    "id": row["id"],
+                    "batch_id": row["batch_id"],
+                    "job_index": row["job_index"],
+                    "filename": row["filename"],
+                    "spec": json.loads(row["spec"]),
+                    "attempts": row["attempts"] + 1,
+                }
+
+    def heartbeat(self, task_id, worker):
+        """
+        续租子任务。
+
+        返回:
+            bool: 续租成功；子任务已被重新分配给其他工作进程时返回False
+        """
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, task_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, worker, result):
+        """报告子任务完成，result为可序列化为JSON的汇总；租约已失效时返回False"""
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_expires = NULL, "
+                "updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(result, ensure_ascii=False), time.time(), task_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, task_id, worker, error):
+        """
+        报告子任务失败：尝试次数未达上限时放回队列，否则标记为失败。
+
+        返回:
+            bool: 报告被接受；租约已失效时返回False
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "worker = CASE WHEN attempts < ? THEN NULL ELSE worker END, "
+                "error = ?, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, self.max_attempts, error, time.time(), task_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def tasks(self, batch_id):
+        """返回批次中全部子任务的状态"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT id, job_index, filename, status, worker, attempts, result, error "
+                "FROM tasks WHERE batch_id = ? ORDER BY id",
+                (batch_id,),
+            ).fetchall()
+        tasks = []
+        for row in rows:
+            task = dict(row)
+            task["result"] = json.loads(task["result"]) if task["result"] else None
+            tasks.append(task)
+        return tasks
+
+    def unfinished(self):
+        """返回队列中尚未结束(等待或已租用)的子任务数"""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status NOT IN (?, ?)", FINISHED_STATUSES
+            ).fetchone()[0]
+
+
+class _Transaction:
+    """进入时开始写事务(BEGIN IMMEDIATE)，退出时提交或回滚并关闭连接"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.connection.close()
+
+
+def merged_output(job):
+    """任务是否生成合并文档(output.docx)"""
+    if job["method"] == "images":
+        return False
+    if job["method"] == "multi":
+        return TARGET_MERGED in normalize_targets(job.get("targets"))
+    return not job.get("separate_files", False)
+
+
+def file_task_spec(job, filename):
+    """
+    返回转换单个文件的子任务清单。
+
+    合并输出的任务改为单独转换，由协调端最后拼接；转换缓存由协调端维护，子任务不读写缓存。
+    """
+    spec = {
+        key: value for key, value in job.items() if key not in ("force", "volume_pages", "volume_bytes")
+    }
+    spec["files"] = [filename]
+    spec["use_cache"] = False
+    if job["method"] == "multi":
+        targets = [t for t in normalize_targets(job.get("targets")) if t != TARGET_MERGED]
+        if merged_output(job) and TARGET_SEPARATE not in targets:
+            targets.append(TARGET_SEPARATE)
+        spec["targets"] = targets
+    elif job["method"] != "images":
+        spec["separate_files"] = True
+    return spec
+
+
+class _JobPlan:
+    """协调端中一个清单任务的拆分结果与转换缓存"""
+
+    def __init__(self, job, force=False, visio_factory=None):
+        from cli import job_function
+
+        self.job = job
+        self.output_root = job.get("output_dir") or job["dir"]
+        self.merged = merged_output(job)
+        self.start_time = time.perf_counter()
+        self.summary = {"dir": job["dir"], "status": "成功", "error": None}
+        self.failed = []
+        self.file_list = []
+        self.todo = []
+        self.cache = None
+
+        if not os.path.isdir(job["dir"]):
+            self.summary.update(status="失败", error="目录不存在")
+            return
+        all_files = get_visio_files(job["dir"])
+        self.file_list = all_files
+        if job.get("files") is not None:
+            available = set(all_files)
+            self.file_list = [f for f in job["files"] if f in available]
+
+        # 缓存设置与子任务一致，和本机单独转换同一目录时共用缓存条目
+        func, kwargs = job_function(file_task_spec(job, ""))
+        self.cache = create_conversion_cache(
+            job["dir"], func, visio_factory=visio_factory, **kwargs
+        )
+        for filename in self.cache.evict_stale(all_files):
+            print(f"源文件已不存在，清理缓存: {filename}")
+        if force or job.get("force", False):
+            self.todo = list(self.file_list)
+        else:
+            self.todo = self.cache.pending_files(self.file_list)
+        self.cache.save()
+        self.summary.update(
+            total=len(self.file_list), converted=0, skipped=len(self.file_list) - len(self.todo)
+        )
+
+    def record(self, task):
+        """记录一个已结束的子任务"""
+        if task["status"] == "done":
+            self.summary["converted"] += 1
+            self.cache.record([task["filename"]])
+            self.cache.save()
+        else:
+            self.failed.append(task["filename"])
+            print(f"文件转换失败: {task['filename']} ({task['error']})")
+
+    def finish(self):
+        """所有子任务结束后拼接合并文档并返回汇总"""
+        from docx_patch import load_merged_index, merge_converted_docx
+
+        if self.summary["status"] != "失败":
+            try:
+                output_path = os.path.join(self.output_root, "output.docx")
+                # 没有文件需要转换且上次拼接的合并文档未被修改时不必重新拼接
+                if self.merged and self.file_list and (
+                    self.todo or load_merged_index(output_path) is None
+                ):
+                    merge_converted_docx(self.output_root, self.file_list)
+                if self.failed:
+                    raise Exception(f"{len(self.failed)}个文件失败: {', '.join(self.failed)}")
+                if not self.summary["converted"]:
+                    self.summary["status"] = "跳过"
+            except Exception as e:
+                self.summary.update(status="失败", error=str(e))
+        self.summary["elapsed"] = time.perf_counter() - self.start_time
+        return self.summary
+
+
+def run_distributed(
+    jobs,
+    queue_path,
+    force=False,
+    update_progress=None,
+    poll_interval=QUEUE_POLL_INTERVAL,
+    local_workers=0,
+    visio_factory=None,
+    office_factory=None,
+):
+    """
+    协调端：把清单任务按文件拆分写入队列，等待工作进程完成并汇总。
+
+    参数:
+        jobs (list): cli.load_manifest返回的任务列表
+        queue_path (str): 队列文件路径
+        force (bool): 忽略缓存，全部文件重新转换
+        update_progress (function, 可选): 进度回调函数，格式为func(文件名, 已结束子任务数, 子任务总数)
+        poll_interval (float): 查询队列的间隔(秒)
+        local_workers (int): 提交后在本机启动的工作进程数(见start_local_workers)，0表示只等待其他工作进程
+        visio_factory, office_factory (function, 可选): 本机工作进程创建应用实例的函数；
+            visio_factory同时决定转换缓存中记录的渲染方式(见core.renderer_tag)，应与各工作进程一致
+
+    返回:
+        list: 每个任务的汇总信息，格式同cli.run_job的返回值
+
+    流程:
+    1. 按转换缓存确定各任务需要转换的文件，每个文件生成一个子任务
+    2. 等待全部子任务结束，逐个记录到转换缓存
+    3. 合并输出的任务把单独文档拼接为output.docx
+    """
+    task_queue = SqliteTaskQueue(queue_path)
+    plans = []
+    tasks = []
+    for job_index, job in enumerate(jobs):
+        try:
+            plan = _JobPlan(job, force, visio_factory)
+        except Exception as e:
+            plan = None
+            print(f"拆分任务失败: {job['dir']} ({e})")
+            summary = {"dir": job["dir"], "status": "失败", "error": str(e), "elapsed": 0.0}
+        plans.append(plan or summary)
+        if plan is not None:
+            tasks.extend(
+                (job_index, filename, file_task_spec(job, filename)) for filename in plan.todo
+            )
+
+    if tasks:
+        batch_id = task_queue.create_batch(tasks)
+        print(f"已提交{len(tasks)}个文件到队列 {queue_path} (批次{batch_id})，等待工作进程转换...")
+        workers = start_local_workers(queue_path, local_workers, visio_factory, office_factory)
+        recorded = set()
+        while len(recorded) < len(tasks):
+            for task in task_queue.tasks(batch_id):
+                if task["id"] in recorded or task["status"] not in FINISHED_STATUSES:
+                    continue
+                recorded.add(task["id"])
+                plans[task["job_index"]].record(task)
+                if update_progress:
+                    update_progress(task["filename"], len(recorded), len(tasks))
+            if len(recorded) < len(tasks):
+                time.sleep(poll_interval)
+        for process in workers:
+            process.join()
+
+    return [plan.finish() if isinstance(plan, _JobPlan) else plan for plan in plans]
+
+
+class _Heartbeat:
+    """转换期间在后台线程中定期续租，租约被收回时设置lost"""
+
+    def __init__(self, task_queue, task_id, worker, interval):
+        self.task_queue = task_queue
+        self.task_id = task_id
+        self.worker = worker
+        self.interval = interval
+        self.lost = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                if not self.task_queue.heartbeat(self.task_id, self.worker):
+                    self.lost = True
+                    return
+            except sqlite3.Error as e:
+                print(f"心跳失败: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop_event.set()
+        self._thread.join()
+
+
+def run_worker(
+    queue_path,
+    worker_id=None,
+    visio_factory=None,
+    office_factory=None,
+    kill_processes=False,
+    exit_when_idle=False,
+    stop_event=None,
+    poll_interval=QUEUE_POLL_INTERVAL,
+    heartbeat_interval=QUEUE_HEARTBEAT_INTERVAL,
+    lease_seconds=QUEUE_LEASE_SECONDS,
+):
+    """
+    工作进程：不断从队列租用子任务并转换，所有子任务共用同一个Visio/Word会话。
+
+    参数:
+        queue_path (str): 队列文件路径
+        worker_id (str, 可选): 工作进程标识，默认"主机名:进程号"
+        visio_factory, office_factory (function, 可选): 创建应用实例的函数
+        kill_processes (bool): 开始前是否终止已有的Visio进程
+        exit_when_idle (bool): 队列中没有未结束的子任务时退出，默认一直等待新的子任务
+        stop_event (threading.Event, 可选): 设置后处理完当前子任务即退出
+        poll_interval (float): 没有子任务时查询队列的间隔(秒)
+        heartbeat_interval (float): 心跳间隔(秒)，应明显小于租约时长
+        lease_seconds (float): 每次租用与续租的租约时长(秒)
+
+    返回:
+        int: 完成的子任务数
+
+    注意:
+    - 心跳在单独的线程中发送，卡死的转换仍会续租，应配合export_png_supervised方式的超时保护使用
+    - 租约被收回(如长时间失联)后不再报告结果，以重新分配后的工作进程为准
+    """
+    from cli import run_job
+
+    task_queue = SqliteTaskQueue(queue_path, lease_seconds)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    if kill_processes:
+        kill_visio_processes()
+
+    completed = 0
+    print(f"工作进程 {worker_id} 已启动，队列: {queue_path}")
+    com_initialize()
+    try:
+        with AppSession(visio_factory, office_factory) as session:
+            while not stop_event.is_set():
+                task = task_queue.lease(worker_id)
+                if task is None:
+                    if exit_when_idle and not task_queue.unfinished():
+                        break
+                    stop_event.wait(poll_interval)
+                    continue
+
+                print(f"[{worker_id}] 开始转换: {task['filename']} (第{task['attempts']}次)")
+                with _Heartbeat(task_queue, task["id"], worker_id, heartbeat_interval) as heartbeat:
+                    summary = run_job(task["spec"], session)
+                if heartbeat.lost:
+                    print(f"[{worker_id}] 租约已被收回，放弃结果: {task['filename']}")
+                    continue
+                if summary["status"] == "失败":
+                    task_queue.fail(task["id"], worker_id, summary["error"])
+                    print(f"[{worker_id}] 转换失败: {task['filename']} ({summary['error']})")
+                elif task_queue.complete(task["id"], worker_id, summary):
+                    completed += 1
+    finally:
+        com_uninitialize()
+    print(f"工作进程 {worker_id} 已退出，完成{completed}个文件")
+    return completed
+
+
+def start_local_workers(queue_path, count, visio_factory=None, office_factory=None):
+    """
+    在本机启动count个工作进程，队列中的子任务全部结束后自动退出。
+
+    返回:
+        list: multiprocessing.Process列表
+    """
+    processes = []
+    for index in range(count):
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(queue_path, f"{socket.gethostname()}:local{index + 1}"),
+            kwargs={
+                "visio_factory": visio_factory,
+                "office_factory": office_factory,
+                "exit_when_idle": True,
+            },
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+    return processes
@@ -0,0 +1,1348 @@
+"""
+不依赖Visio的.vsdx页面渲染器。
+
+直接解析.vsdx压缩包中的页面、母版、样式与主题XML，把形状的几何(Geometry节)、
+文字块、连接线箭头与嵌入的位图渲染为SVG或PNG，并提供与Visio COM对象相同的
+Documents.Open / Pages / page.Export 接口(NativeVisioApp)。把NativeVisioFactory
+作为visio_factory传入各转换函数，或在config中设置VISIO_BACKEND = "native"，
+即可在没有Office的Linux机器上转换，并可用多进程占满所有CPU核心。
+
+支持范围为流程图/SOP常用的形状子集:
+- 几何: MoveTo、LineTo、ArcTo、EllipticalArcTo、Ellipse、相对坐标(Rel*)各行、
+  PolylineTo，NURBSTo按控制点近似为均匀B样条
+- 形状继承母版(含组合母版的子形状)与样式表的单元格，支持组合、翻转与旋转、背景页
+- 文字按第一个字符/段落格式排版，自动换行按字符宽度估算
+- 线型(实线/虚线)、线宽、填充色与透明度、连接线首尾箭头、位图(PNG/JPEG/GIF/BMP)
+
+注意:
+- 只支持.vsdx/.vsdm，.vsd等二进制格式需要Visio
+- 阴影、渐变、图案填充、EMF/OLE对象、多种字符格式混排等不渲染或按近似处理，
+  输出与Visio导出的结果不完全一致
+- PNG与其他位图格式需要Pillow；PNG中的中文需要中文字体(见config.NATIVE_FONT)
+- 不支持复制粘贴方式(没有剪贴板)，也不支持导出EMF
+"""
+import base64
+import io
+import math
+import os
+import posixpath
+import re
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from lxml import etree
+
+from config import NATIVE_FONT, NATIVE_RENDER_DPI
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+RENDERER_TAG = "native-1"  # 渲染结果变化时修改，使页面缓存中的旧图片失效
+
+VISIO_NS = "http://schemas.microsoft.com/office/visio/2012/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+DRAWINGML_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+
+_NS = {"v": VISIO_NS, "r": REL_NS, "p": PKG_REL_NS, "a": DRAWINGML_NS}
+
+SVG_PX_PER_INCH = 96  # SVG坐标单位与英寸的换算
+SUPERSAMPLE = 2  # 位图先按该倍数绘制再缩小，用于抗锯齿
+DEFAULT_MARGIN = 4 / 72  # 文字块默认页边距(4磅)
+DEFAULT_CHAR_SIZE = 12 / 72  # 默认字号(12磅)
+DEFAULT_LINE_WEIGHT = 0.75 / 72
+
+# Visio默认颜色表，文档未定义Colors时按索引取色
+_PALETTE = (
+    "#000000", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#FFFF00", "#FF00FF", "#00FFFF",
+    "#800000", "#008000", "#000080", "#808000", "#800080", "#008080", "#C0C0C0", "#E6E6E6",
+    "#CDCDCD", "#B3B3B3", "#9A9A9A", "#808080", "#666666", "#4D4D4D", "#333333", "#1A1A1A",
+)
+# 主题中未解析到颜色时的默认值(Office主题)
+_DEFAULT_THEME = {"dk1": "#000000", "lt1": "#FFFFFF", "accent1": "#5B9BD5"}
+
+# 线型(LinePattern)对应的虚线长度，单位为线宽
+_DASHES = {2: (6, 3), 3: (1, 2), 4: (6, 2, 1, 2), 5: (6, 2, 1, 2, 1, 2), 6: (10, 3)}
+
+# 单元格所属的样式类别，样式表按类别分别继承
+_LINE_CELLS = {
+    "LineWeight", "LineColor", "LinePattern", "LineColorTrans", "LineCap",
+    "BeginArrow", "EndArrow", "BeginArrowSize", "EndArrowSize", "Rounding",
+}
+_FILL_CELLS = {
+    "FillForegnd", "FillBkgnd", "FillPattern", "FillForegndTrans", "FillBkgndTrans",
+}
+
+_IMAGE_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+}
+# page.Export支持的位图扩展名与Pillow格式名
+_RASTER_FORMATS = {
+    ".png": "PNG",
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".gif": "GIF",
+    ".bmp": "BMP",
+    ".tif": "TIFF",
+    ".tiff": "TIFF",
+}
+
+
+def _float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _localname(element):
+    return etree.QName(element).localname
+
+
+# ---------------------------------------------------------------- 仿射变换
+# 矩阵以(a, b, c, d, e, f)表示，x' = a*x + c*y + e，y' = b*x + d*y + f
+
+
+def _multiply(m, n):
+    """返回先应用n再应用m的变换"""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (
+        a * a2 + c * b2,
+        b * a2 + d * b2,
+        a * c2 + c * d2,
+        b * c2 + d * d2,
+        a * e2 + c * f2 + e,
+        b * e2 + d * f2 + f,
+    )
+
+
+def _apply(m, point):
+    x, y = point
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def _local_transform(pin_x, pin_y, loc_x, loc_y, angle, flip_x=False, flip_y=False):
+    """形状局部坐标到父坐标: 平移到定位点、翻转、旋转、平移到中心点"""
+    cos, sin = math.cos(angle), math.sin(angle)
+    sx = -1.0 if flip_x else 1.0
+    sy = -1.0 if flip_y else 1.0
+    m = (1.0, 0.0, 0.0, 1.0, -loc_x, -loc_y)
+    m = _multiply((sx, 0.0, 0.0, sy, 0.0, 0.0), m)
+    m = _multiply((cos, sin, -sin, cos, 0.0, 0.0), m)
+    return _multiply((1.0, 0.0, 0.0, 1.0, pin_x, pin_y), m)
+
+
+# ---------------------------------------------------------------- 几何
+# 曲线统一在形状局部坐标中采样为折线，再整体变换，翻转和旋转无需特殊处理
+
+
+def _arc_through(start, middle, end, segments_per_radian=6):
+    """返回经过三点的圆弧上从start(不含)到end(含)的采样点，三点共线时返回[end]"""
+    (x1, y1), (x2, y2), (x3, y3) = start, middle, end
+    det = 2 * (x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2))
+    if abs(det) < 1e-12:
+        return [end]
+    s1, s2, s3 = x1 * x1 + y1 * y1, x2 * x2 + y2 * y2, x3 * x3 + y3 * y3
+    cx = (s1 * (y2 - y3) + s2 * (y3 - y1) + s3 * (y1 - y2)) / det
+    cy = (s1 * (x3 - x2) + s2 * (x1 - x3) + s3 * (x2 - x1)) / det
+    radius = math.hypot(x1 - cx, y1 - cy)
+    a1 = math.atan2(y1 - cy, x1 - cx)
+    a2 = math.atan2(y2 - cy, x2 - cx)
+    a3 = math.atan2(y3 - cy, x3 - cx)
+    sweep = (a3 - a1) % (2 * math.pi)  # 逆时针从start到end的角度
+    if (a2 - a1) % (2 * math.pi) > sweep:
+        sweep -= 2 * math.pi  # middle不在逆时针方向上，改为顺时针
+    count = max(2, int(abs(sweep) * segments_per_radian) + 1)
+    points = [
+        (cx + radius * math.cos(a1 + sweep * i / count), cy + radius * math.sin(a1 + sweep * i / count))
+        for i in range(1, count)
+    ]
+    return points + [end]
+
+
+def _arc_to(start, end, bow):
+    """ArcTo: bow为弧中点到弦中点的距离，为正时弧从start到end逆时针"""
+    if abs(bow) < 1e-12:
+        return [end]
+    (x1, y1), (x2, y2) = start, end
+    chord = math.hypot(x2 - x1, y2 - y1)
+    if chord < 1e-12:
+        return [end]
+    # 弦方向右侧的法向量
+    nx, ny = (y2 - y1) / chord, -(x2 - x1) / chord
+    middle = ((x1 + x2) / 2 + nx * bow, (y1 + y2) / 2 + ny * bow)
+    return _arc_through(start, middle, end)
+
+
+def _elliptical_arc_to(start, end, control, angle, ratio):
+    """EllipticalArcTo: 经过control、长轴角度angle、长短轴比ratio的椭圆弧"""
+    if abs(ratio) < 1e-12:
+        return [end]
+    cos, sin = math.cos(-angle), math.sin(-angle)
+
+    def to_circle(point):
+        x, y = point
+        return (x * cos - y * sin) / ratio, x * sin + y * cos
+
+    def from_circle(point):
+        x, y = point[0] * ratio, point[1]
+        return x * cos + y * sin, -x * sin + y * cos
+
+    points = _arc_through(to_circle(start), to_circle(control), to_circle(end))
+    return [from_circle(p) for p in points[:-1]] + [end]
+
+
+def _ellipse(center, axis_a, axis_b, segments=48):
+    """Ellipse: 以中心点与两个轴端点确定的完整椭圆"""
+    cx, cy = center
+    ax, ay = axis_a[0] - cx, axis_a[1] - cy
+    bx, by = axis_b[0] - cx, axis_b[1] - cy
+    return [
+        (
+            cx + ax * math.cos(t) + bx * math.sin(t),
+            cy + ay * math.cos(t) + by * math.sin(t),
+        )
+        for t in (2 * math.pi * i / segments for i in range(segments + 1))
+    ]
+
+
+def _bezier(points, segments=16):
+    """返回贝塞尔曲线(二次或三次)上除起点外的采样点"""
+    result = []
+    for i in range(1, segments + 1):
+        t = i / segments
+        current = list(points)
+        while len(current) > 1:
+            current = [
+                (p[0] + (q[0] - p[0]) * t, p[1] + (q[1] - p[1]) * t)
+                for p, q in zip(current, current[1:])
+            ]
+        result.append(current[0])
+    return result
+
+
+def _bspline(points, degree, segments=32):
+    """按均匀的夹紧B样条近似NURBS曲线，返回除起点外的采样点"""
+    degree = max(1, min(int(degree), len(points) - 1))
+    count = len(points)
+    knots = (
+        [0.0] * (degree + 1)
+        + [i / (count - degree) for i in range(1, count - degree)]
+        + [1.0] * (degree + 1)
+    )
+    result = []
+    for step in range(1, segments + 1):
+        t = min(step / segments, 1.0 - 1e-9)
+        span = degree
+        while span < count - 1 and knots[span + 1] <= t:
+            span += 1
+        d = [points[j] for j in range(span - degree, span + 1)]
+        for r in range(1, degree + 1):
+            for j in range(degree, r - 1, -1):
+                i = j + span - degree
+                denominator = knots[i + degree - r + 1] - knots[i]
+                alpha = (t - knots[i]) / denominator if denominator else 0.0
+                d[j] = (
+                    (1 - alpha) * d[j - 1][0] + alpha * d[j][0],
+                    (1 - alpha) * d[j - 1][1] + alpha * d[j][1],
+                )
+        result.append(d[degree])
+    result[-1] = points[-1]
+    return result
+
+
+def _formula_numbers(formula, name):
+    """解析POLYLINE(...)、NURBS(...)公式中的数值参数"""
+    match = re.search(name + r"\s*\(([^)]*)\)", formula or "", re.IGNORECASE)
+    if not match:
+        return []
+    return [_float(value) for value in match.group(1).split(",")]
+
+
+def _geometry_paths(rows, width, height):
+    """
+    把一个Geometry节的各行转换为折线。
+
+    返回:
+        list: [(点列表, 是否闭合)]，坐标为形状局部坐标(英寸)
+    """
+    subpaths = []
+    current = None
+    last = (0.0, 0.0)
+
+    def cell(row, name):
+        return _float(row["cells"].get(name, (None, None))[0])
+
+    for _, row in sorted(rows.items(), key=lambda item: _float(item[0], 1e9)):
+        row_type = row["type"]
+        x, y = cell(row, "X"), cell(row, "Y")
+        a, b, c, d = cell(row, "A"), cell(row, "B"), cell(row, "C"), cell(row, "D")
+        if row_type and row_type.startswith("Rel"):
+            x, y = x * width, y * height
+        if row_type in ("MoveTo", "RelMoveTo"):
+            current = [(x, y)]
+            subpaths.append(current)
+            last = (x, y)
+            continue
+        if row_type == "Ellipse":
+            subpaths.append(_ellipse((x, y), (a, b), (c, d)))
+            continue
+        if row_type == "InfiniteLine" or row_type is None:
+            continue
+        if current is None:
+            current = [last]
+            subpaths.append(current)
+
+        end = (x, y)
+        if row_type in ("LineTo", "RelLineTo", "SplineStart", "SplineKnot"):
+            points = [end]
+        elif row_type == "ArcTo":
+            points = _arc_to(last, end, a)
+        elif row_type == "EllipticalArcTo":
+            points = _elliptical_arc_to(last, end, (a, b), c, d)
+        elif row_type == "RelEllipticalArcTo":
+            relative = _elliptical_arc_to(
+                (last[0] / width if width else 0, last[1] / height if height else 0),
+                (cell(row, "X"), cell(row, "Y")),
+                (a, b),
+                c,
+                d,
+            )
+            points = [(px * width, py * height) for px, py in relative[:-1]] + [end]
+        elif row_type == "RelCubBezTo":
+            points = _bezier([last, (a * width, b * height), (c * width, d * height), end])
+        elif row_type == "RelQuadBezTo":
+            points = _bezier([last, (a * width, b * height), end])
+        elif row_type == "PolylineTo":
+            numbers = _formula_numbers(row["cells"].get("A", (None, None))[1], "POLYLINE")
+            points = []
+            if len(numbers) >= 2:
+                x_relative, y_relative = numbers[0] == 0, numbers[1] == 0
+                for px, py in zip(numbers[2::2], numbers[3::2]):
+                    points.append((px * width if x_relative else px, py * height if y_relative else py))
+            points.append(end)
+        elif row_type == "NURBSTo":
+            numbers = _formula_numbers(row["cells"].get("E", (None, None))[1], "NURBS")
+            control = [last]
+            degree = 3
+            if len(numbers) >= 4:
+                degree = numbers[1]
+                x_relative, y_relative = numbers[2] == 0, numbers[3] == 0
+                for px, py in zip(numbers[4::4], numbers[5::4]):
+                    control.append((px * width if x_relative else px, py * height if y_relative else py))
+            control.append(end)
+            points = _bspline(control, degree) if len(control) > 2 else [end]
+        else:
+            points = [end]
+        current.extend(points)
+        last = end
+
+    result = []
+    for points in subpaths:
+        if len(points) < 2:
+            continue
+        closed = math.hypot(points[0][0] - points[-1][0], points[0][1] - points[-1][1]) < 1e-6
+        result.append((points, closed))
+    return result
+
+
+# ---------------------------------------------------------------- ShapeSheet
+
+
+def _parse_section(element):
+    section = {"del": element.get("Del") == "1", "cells": {}, "rows": {}}
+    for child in element:
+        if not isinstance(child.tag, str):
+            continue
+        tag = _localname(child)
+        if tag == "Cell":
+            section["cells"][child.get("N")] = (child.get("V"), child.get("F"))
+        elif tag == "Row":
+            key = child.get("IX") or child.get("N")
+            section["rows"][key] = {
+                "type": child.get("T"),
+                "del": child.get("Del") == "1",
+                "cells": {
+                    cell.get("N"): (cell.get("V"), cell.get("F"))
+                    for cell in child.iterfind("v:Cell", _NS)
+                },
+            }
+    return section
+
+
+class _Sheet:
+    """一个ShapeSheet(页面、形状、母版形状或样式)的单元格、节与文字"""
+
+    def __init__(self, element, part=None):
+        self.element = element
+        self.part = part  # 所在部件，用于解析其中引用的图片
+        self.cells = {}
+        self.sections = {}
+        self.text = None
+        self.foreign = None
+        for child in element:
+            if not isinstance(child.tag, str):
+                continue
+            tag = _localname(child)
+            if tag == "Cell":
+                self.cells[child.get("N")] = (child.get("V"), child.get("F"))
+            elif tag == "Section":
+                self.sections[(child.get("N"), child.get("IX"))] = _parse_section(child)
+            elif tag == "Text":
+                self.text = child
+            elif tag == "ForeignData":
+                self.foreign = child
+
+
+def _merge_sections(sheets, name):
+    """按优先级从低到高合并同名节，行按IX合并，Del="1"的节或行被删除"""
+    merged = {}
+    for sheet in reversed(sheets):
+        for (section_name, ix), section in sheet.sections.items():
+            if section_name != name:
+                continue
+            if section["del"]:
+                merged.pop(ix, None)
+                continue
+            target = merged.setdefault(ix, {"cells": {}, "rows": {}})
+            target["cells"].update(section["cells"])
+            for key, row in section["rows"].items():
+                if row["del"]:
+                    target["rows"].pop(key, None)
+                    continue
+                old = target["rows"].get(key)
+                if old is None:
+                    target["rows"][key] = {"type": row["type"], "cells": dict(row["cells"])}
+                else:
+                    old["type"] = row["type"] or old["type"]
+                    old["cells"].update(row["cells"])
+    return merged
+
+
+class _Shape:
+    """页面或母版中的形状，单元格依次从自身、母版形状、样式表中查找"""
+
+    def __init__(self, document, element, part, master=None):
+        self.document = document
+        self.sheet = _Sheet(element, part)
+        self.master = master
+        self.children = []
+        self.chain = [self.sheet] + (master.chain if master else [])
+
+    def style_id(self, kind):
+        for sheet in self.chain:
+            value = sheet.element.get(kind)
+            if value is not None:
+                return value
+        return None
+
+    def _styles(self, name):
+        kind = (
+            "LineStyle" if name in _LINE_CELLS
+            else "FillStyle" if name in _FILL_CELLS
+            else "TextStyle"
+        )
+        return self.document.style_chain(self.style_id(kind), kind)
+
+    def cell(self, name):
+        """返回单元格的(V, F)，未定义时返回(None, None)"""
+        for sheet in self.chain:
+            if name in sheet.cells:
+                return sheet.cells[name]
+        for sheet in self._styles(name):
+            if name in sheet.cells:
+                return sheet.cells[name]
+        return None, None
+
+    def number(self, name, default=0.0):
+        return _float(self.cell(name)[0], default)
+
+    def sections(self, name):
+        sheets = list(self.chain)
+        if name in ("Character", "Paragraph"):
+            sheets += self.document.style_chain(self.style_id("TextStyle"), "TextStyle")
+        return _merge_sections(sheets, name)
+
+    def first_row(self, name):
+        """返回Character/Paragraph节第一行的单元格"""
+        for _, section in sorted(self.sections(name).items(), key=lambda item: _float(item[0])):
+            if section["rows"]:
+                first = min(section["rows"], key=lambda key: _float(key, 1e9))
+                return section["rows"][first]["cells"]
+        return {}
+
+    @property
+    def text(self):
+        for sheet in self.chain:
+            if sheet.text is not None:
+                return sheet
+        return None
+
+    @property
+    def foreign(self):
+        for sheet in self.chain:
+            if sheet.foreign is not None:
+                return sheet
+        return None
+
+
+# ---------------------------------------------------------------- 文档
+
+
+def _part_rels(package, part_name):
+    """读取部件的内部关系，返回{关系ID: 目标部件路径}"""
+    directory, name = posixpath.split(part_name)
+    try:
+        root = etree.fromstring(package.read(posixpath.join(directory, "_rels", name + ".rels")))
+    except KeyError:
+        return {}
+    targets = {}
+    for rel in root.iterfind("p:Relationship", _NS):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            targets[rel.get("Id")] = target.lstrip("/")
+        else:
+            targets[rel.get("Id")] = posixpath.normpath(posixpath.join(directory, target))
+    return targets
+
+
+def _rel_target(package, part_name, element):
+    """返回元素下Rel子元素指向的部件路径"""
+    rel = element.find("v:Rel", _NS)
+    if rel is None:
+        return None
+    return _part_rels(package, part_name).get(rel.get(f"{{{REL_NS}}}id"))
+
+
+class _VsdxPackage:
+    """已打开的.vsdx包：页面列表、母版、样式表、颜色表与主题颜色"""
+
+    def __init__(self, path):
+        self.zip = zipfile.ZipFile(path)
+        self.styles = {}
+        self.colors = list(_PALETTE)
+        self.theme = dict(_DEFAULT_THEME)
+        self.masters = {}  # {母版ID: 部件路径}
+        self._master_shapes = {}
+        self._parse_document()
+        self._parse_theme()
+        self.pages = self._parse_pages()
+
+    def close(self):
+        self.zip.close()
+
+    def read_xml(self, part_name):
+        return etree.fromstring(self.zip.read(part_name))
+
+    def _parse_document(self):
+        try:
+            root = self.read_xml("visio/document.xml")
+        except KeyError:
+            return
+        for entry in root.iterfind("v:Colors/v:ColorEntry", _NS):
+            ix = int(_float(entry.get("IX"), -1))
+            if 0 <= ix < len(self.colors):
+                self.colors[ix] = entry.get("RGB") or self.colors[ix]
+            elif ix == len(self.colors):
+                self.colors.append(entry.get("RGB") or "#000000")
+        for style in root.iterfind("v:StyleSheets/v:StyleSheet", _NS):
+            self.styles[style.get("ID")] = _Sheet(style, "visio/document.xml")
+
+        masters_part = "visio/masters/masters.xml"
+        try:
+            masters_root = self.read_xml(masters_part)
+        except KeyError:
+            return
+        for master in masters_root.iterfind("v:Master", _NS):
+            target = _rel_target(self.zip, masters_part, master)
+            if target:
+                self.masters[master.get("ID")] = target
+
+    def _parse_theme(self):
+        names = sorted(n for n in self.zip.namelist() if re.fullmatch(r"visio/theme/theme\d+\.xml", n))
+        if not names:
+            return
+        scheme = self.read_xml(names[0]).find(".//a:clrScheme", _NS)
+        if scheme is None:
+            return
+        for child in scheme:
+            if not isinstance(child.tag, str):
+                continue
+            color = child.find("a:srgbClr", _NS)
+            value = color.get("val") if color is not None else None
+            if value is None:
+                color = child.find("a:sysClr", _NS)
+                value = color.get("lastClr") if color is not None else None
+            if value:
+                self.theme[_localname(child)] = "#" + value
+
+    def _parse_pages(self):
+        pages_part = "visio/pages/pages.xml"
+        root = self.read_xml(pages_part)
+        pages = []
+        for page in root.iterfind("v:Page", _NS):
+            sheet = page.find("v:PageSheet", _NS)
+            cells = _Sheet(sheet).cells if sheet is not None else {}
+            pages.append(
+                {
+                    "id": page.get("ID"),
+                    "name": page.get("Name") or page.get("NameU"),
+                    "name_u": page.get("NameU") or page.get("Name"),
+                    "background": page.get("Background") == "1",
+                    "back_page": page.get("BackPage"),
+                    "width": _float(cells.get("PageWidth", (None, None))[0], 8.5),
+                    "height": _float(cells.get("PageHeight", (None, None))[0], 11.0),
+                    "part": _rel_target(self.zip, pages_part, page),
+                }
+            )
+        return pages
+
+    def style_chain(self, style_id, kind):
+        """返回样式表及其同类别父样式，按优先级从高到低"""
+        chain = []
+        seen = set()
+        while style_id is not None and style_id not in seen and style_id in self.styles:
+            seen.add(style_id)
+            sheet = self.styles[style_id]
+            chain.append(sheet)
+            style_id = sheet.element.get(kind)
+        return chain
+
+    def build_shape(self, element, part, master_id=None):
+        """
+        创建形状及其子形状。
+
+        参数:
+            master_id (str, 可选): 所在组合实例的母版ID，子形状按MasterShape在其中查找继承对象
+        """
+        master = None
+        if element.get("Master") is not None:
+            master_id = element.get("Master")
+            master = self.master_shape(master_id, element.get("MasterShape"))
+        elif master_id is not None and element.get("MasterShape") is not None:
+            master = self.master_shape(master_id, element.get("MasterShape"))
+        shape = _Shape(self, element, part, master)
+        shapes = element.find("v:Shapes", _NS)
+        if shapes is not None:
+            shape.children = [
+                self.build_shape(child, part, master_id) for child in shapes.iterfind("v:Shape", _NS)
+            ]
+        elif master is not None:
+            shape.children = master.children  # 实例未保存子形状时沿用母版中的子形状
+        return shape
+
+    def master_shape(self, master_id, shape_id=None):
+        """返回母版中的形状，未指定shape_id时返回母版的第一个顶层形状"""
+        if master_id not in self._master_shapes:
+            shapes = {}
+            top = []
+            part = self.masters.get(master_id)
+            if part:
+                try:
+                    root = self.read_xml(part)
+                except KeyError:
+                    root = None
+                if root is not None:
+                    top = [
+                        self.build_shape(element, part)
+                        for element in root.iterfind("v:Shapes/v:Shape", _NS)
+                    ]
+                    stack = list(top)
+                    while stack:
+                        shape = stack.pop()
+                        shapes[shape.sheet.element.get("ID")] = shape
+                        stack.extend(shape.children)
+            self._master_shapes[master_id] = (top, shapes)
+        top, shapes = self._master_shapes[master_id]
+        if shape_id is None:
+            return top[0] if top else None
+        return shapes.get(shape_id)
+
+    def page_shapes(self, page):
+        if not page["part"]:
+            return []
+        try:
+            root = self.read_xml(page["part"])
+        except KeyError:
+            return []
+        return [self.build_shape(element, page["part"]) for element in root.iterfind("v:Shapes/v:Shape", _NS)]
+
+    def color(self, value, role="accent1", default="#000000"):
+        """
+        把颜色单元格的(V, F)转换为#RRGGBB。
+
+        单元格未定义时返回default，无法解析(如主题颜色)时取主题中role对应的颜色。
+        """
+        v, f = value
+        if v is None and f is None:
+            return default
+        if v:
+            if re.fullmatch(r"#[0-9A-Fa-f]{6}", v):
+                return v.upper()
+            if re.fullmatch(r"\d+", v):
+                index = int(v)
+                if index < len(self.colors):
+                    return self.colors[index].upper()
+        for text in (v, f):
+            match = re.search(r"RGB\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)", text or "", re.IGNORECASE)
+            if match:
+                return "#%02X%02X%02X" % tuple(min(255, int(c)) for c in match.groups())
+        return self.theme.get(role, _DEFAULT_THEME.get(role, "#000000")).upper()
+
+    def media(self, sheet):
+        """返回形状ForeignData引用的位图(扩展名, 字节)，不是位图或找不到时返回None"""
+        foreign = sheet.foreign
+        if foreign.get("ForeignType") not in ("Bitmap", None):
+            return None
+        target = _rel_target(self.zip, sheet.part, foreign)
+        if not target:
+            return None
+        try:
+            data = self.zip.read(target)
+        except KeyError:
+            return None
+        return posixpath.splitext(target)[1].lower(), data
+
+
+# ---------------------------------------------------------------- 渲染为绘制列表
+
+
+def _text_content(sheet):
+    """返回文字块的纯文本，Visio的换行符统一为\\n"""
+    text = "".join(sheet.text.itertext())
+    for separator in ("\r\n", "\r", "\u2028", "\u2029"):
+        text = text.replace(separator, "\n")
+    return text.strip("\n")
+
+
+def _char_width(char):
+    """估算字符宽度(以字号为单位)"""
+    if ord(char) >= 0x2E80:
+        return 1.0
+    if char == " ":
+        return 0.3
+    return 0.55
+
+
+def _wrap_text(text, size, max_width):
+    """按估算的字符宽度自动换行，英文单词不拆开"""
+    lines = []
+    for paragraph in text.split("\n"):
+        if max_width <= 0:
+            lines.append(paragraph)
+            continue
+        line = ""
+        width = 0.0
+        for token in re.findall(r"[A-Za-z0-9_.,;:!?'\"()\-]+|\s|.", paragraph):
+            token_width = sum(_char_width(c) for c in token) * size
+            if line and width + token_width > max_width and not token.isspace():
+                lines.append(line.rstrip())
+                line, width = "", 0.0
+            if not line and token.isspace():
+                continue
+            line += token
+            width += token_width
+        lines.append(line.rstrip())
+    return lines
+
+
+class _Renderer:
+    """
+    把页面形状转换为与输出格式无关的绘制列表。
+
+    参数:
+        package (_VsdxPackage): 已打开的.vsdx包
+        page (dict): 页面信息
+        scale (float): 每英寸对应的像素数
+    """
+
+    def __init__(self, package, page, scale):
+        self.package = package
+        self.page = page
+        self.scale = scale
+        self.items = []
+        # 页面坐标(英寸，y轴向上)到像素坐标(y轴向下)
+        self.page_matrix = (scale, 0.0, 0.0, -scale, 0.0, page["height"] * scale)
+
+    def render(self):
+        pages = {page["id"]: page for page in self.package.pages}
+        backgrounds = []
+        back_page = pages.get(self.page["back_page"])
+        while back_page is not None and back_page not in backgrounds:
+            backgrounds.insert(0, back_page)
+            back_page = pages.get(back_page["back_page"])
+        for page in backgrounds + [self.page]:
+            for shape in self.package.page_shapes(page):
+                self._shape(shape, self.page_matrix)
+        return self.items
+
+    def _shape(self, shape, parent_matrix):
+        width = shape.number("Width")
+        height = shape.number("Height")
+        matrix = _multiply(
+            parent_matrix,
+            _local_transform(
+                shape.number("PinX"),
+                shape.number("PinY"),
+                shape.number("LocPinX", width / 2),
+                shape.number("LocPinY", height / 2),
+                shape.number("Angle"),
+                shape.number("FlipX") != 0,
+                shape.number("FlipY") != 0,
+            ),
+        )
+        if shape.number("Hidden") or shape.cell("Type")[0] == "Guide":
+            return
+        display_mode = int(shape.number("DisplayMode", 2))
+        if shape.children and display_mode == 1:
+            self._own_content(shape, matrix, width, height)
+        for child in shape.children:
+            self._shape(child, matrix)
+        if not shape.children or display_mode == 2:
+            self._own_content(shape, matrix, width, height)
+
+    def _own_content(self, shape, matrix, width, height):
+        if shape.foreign is not None:
+            self._image(shape, matrix, width, height)
+        self._geometry(shape, matrix, width, height)
+        if shape.text is not None:
+            self._text(shape, matrix, width, height)
+
+    def _geometry(self, shape, matrix, width, height):
+        line_pattern = int(shape.number("LinePattern", 1))
+        line_weight = shape.number("LineWeight", DEFAULT_LINE_WEIGHT)
+        stroke = None
+        if line_pattern != 0:
+            stroke = self.package.color(shape.cell("LineColor"), "accent1")
+        fill_pattern = int(shape.number("FillPattern", 1))
+        fill = None
+        if fill_pattern != 0:
+            fill = self.package.color(shape.cell("FillForegnd"), "accent1", "#FFFFFF")
+        fill_opacity = 1.0 - min(1.0, max(0.0, shape.number("FillForegndTrans")))
+        width_px = max(line_weight * self.scale, self.scale / 96)
+        dash = _DASHES.get(line_pattern)
+        dash = tuple(d * max(width_px, 1.0) for d in dash) if dash else None
+
+        all_paths = []
+        for ix, section in sorted(shape.sections("Geometry").items(), key=lambda i: _float(i[0])):
+            cells = section["cells"]
+            if _float(cells.get("NoShow", (None, None))[0]):
+                continue
+            paths = [
+                ([_apply(matrix, p) for p in points], closed)
+                for points, closed in _geometry_paths(section["rows"], width, height)
+            ]
+            if not paths:
+                continue
+            all_paths.extend(paths)
+            section_fill = fill if not _float(cells.get("NoFill", (None, None))[0]) else None
+            section_stroke = stroke if not _float(cells.get("NoLine", (None, None))[0]) else None
+            filled = [p for p in paths if p[1]] if section_fill else []
+            if filled:
+                self.items.append(
+                    {"kind": "path", "paths": filled, "fill": section_fill, "opacity": fill_opacity}
+                )
+            if section_stroke:
+                self.items.append(
+                    {"kind": "path", "paths": paths, "stroke": section_stroke, "width": width_px, "dash": dash}
+                )
+
+        if stroke and all_paths:
+            size_px = width_px
+            for cell_name, size_name, points in (
+                ("BeginArrow", "BeginArrowSize", all_paths[0][0][:2][::-1]),
+                ("EndArrow", "EndArrowSize", all_paths[-1][0][-2:]),
+            ):
+                if shape.number(cell_name) and len(points) == 2:
+                    self._arrow(points[0], points[1], shape.number(size_name, 2), size_px, stroke)
+
+    def _arrow(self, start, end, size, line_px, color):
+        """在end处画指向end方向的实心箭头"""
+        length = math.hypot(end[0] - start[0], end[1] - start[1])
+        if length < 1e-9:
+            return
+        ux, uy = (end[0] - start[0]) / length, (end[1] - start[1]) / length
+        arrow_length = (0.05 + 0.025 * size) * self.scale + 2 * line_px
+        half_width = arrow_length * 0.35
+        base = (end[0] - ux * arrow_length, end[1] - uy * arrow_length)
+        points = [
+            end,
+            (base[0] - uy * half_width, base[1] + ux * half_width),
+            (base[0] + uy * half_width, base[1] - ux * half_width),
+            end,
+        ]
+        self.items.append({"kind": "path", "paths": [(points, True)], "fill": color, "opacity": 1.0})
+
+    def _image(self, shape, matrix, width, height):
+        media = self.package.media(shape.foreign)
+        if media is None:
+            return
+        offset_x = shape.number("ImgOffsetX")
+        offset_y = shape.number("ImgOffsetY")
+        image_width = shape.number("ImgWidth", width)
+        image_height = shape.number("ImgHeight", height)
+        # 图片坐标(x向右、y向下，单位英寸)到像素坐标
+        image_matrix = _multiply(matrix, (1.0, 0.0, 0.0, -1.0, offset_x, offset_y + image_height))
+        self.items.append(
+            {
+                "kind": "image",
+                "extension": media[0],
+                "data": media[1],
+                "matrix": image_matrix,
+                "width": image_width,
+                "height": image_height,
+            }
+        )
+
+    def _text(self, shape, matrix, width, height):
+        text = _text_content(shape.text)
+        if not text.strip():
+            return
+        char = shape.first_row("Character")
+        para = shape.first_row("Paragraph")
+        size = _float(char.get("Size", (None, None))[0], DEFAULT_CHAR_SIZE)
+        style = int(_float(char.get("Style", (None, None))[0]))
+        color = self.package.color(char.get("Color", (None, None)), "dk1")
+        align = int(_float(para.get("HorzAlign", (None, None))[0], 1))
+
+        text_width = shape.number("TxtWidth", width)
+        text_height = shape.number("TxtHeight", height)
+        left = shape.number("LeftMargin", DEFAULT_MARGIN)
+        right = shape.number("RightMargin", DEFAULT_MARGIN)
+        top = shape.number("TopMargin", DEFAULT_MARGIN)
+        bottom = shape.number("BottomMargin", DEFAULT_MARGIN)
+        text_matrix = _multiply(
+            matrix,
+            _local_transform(
+                shape.number("TxtPinX", width / 2),
+                shape.number("TxtPinY", height / 2),
+                shape.number("TxtLocPinX", text_width / 2),
+                shape.number("TxtLocPinY", text_height / 2),
+                shape.number("TxtAngle"),
+            ),
+        )
+
+        lines = _wrap_text(text, size, text_width - left - right)
+        line_height = size * 1.2
+        total = line_height * len(lines)
+        vertical = int(shape.number("VerticalAlign", 1))
+        if vertical == 0:
+            block_top = text_height - top
+        elif vertical == 2:
+            block_top = bottom + total
+        else:
+            block_top = (bottom + text_height - top) / 2 + total / 2
+        x = {0: left, 2: text_width - right}.get(align, text_width / 2)
+        anchor = {0: "start", 2: "end"}.get(align, "middle")
+
+        # 文字不随形状镜像，按文字块y轴(向上)方向确定旋转角度
+        origin = _apply(text_matrix, (0.0, 0.0))
+        up = _apply(text_matrix, (0.0, 1.0))
+        angle = math.degrees(math.atan2(up[0] - origin[0], origin[1] - up[1]))
+        for i, line in enumerate(lines):
+            if not line:
+                continue
+            baseline = block_top - line_height * i - size * 0.95
+            self.items.append(
+                {
+                    "kind": "text",
+                    "text": line,
+                    "position": _apply(text_matrix, (x, baseline)),
+                    "angle": angle,
+                    "size": size * self.scale,
+                    "color": color,
+                    "bold": bool(style & 1),
+                    "italic": bool(style & 2),
+                    "anchor": anchor,
+                }
+            )
+
+
+# ---------------------------------------------------------------- SVG输出
+
+
+def _svg_path_data(paths):
+    parts = []
+    for points, closed in paths:
+        parts.append("M" + " L".join(f"{x:.2f} {y:.2f}" for x, y in points) + (" Z" if closed else ""))
+    return " ".join(parts)
+
+
+def _svg_image_href(extension, data):
+    mime = _IMAGE_TYPES.get(extension)
+    if mime is None:
+        # BMP/TIFF等SVG不支持的格式先转为PNG
+        if Image is None:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                output = io.BytesIO()
+                image.save(output, "PNG")
+        except Exception:
+            return None
+        mime, data = "image/png", output.getvalue()
+    return f"data:{mime};base64," + base64.b64encode(data).decode("ascii")
+
+
+def render_svg(items, width_in, height_in):
+    """把绘制列表(按SVG_PX_PER_INCH生成)输出为SVG文档字节"""
+    width_px = width_in * SVG_PX_PER_INCH
+    height_px = height_in * SVG_PX_PER_INCH
+    body = []
+    for item in items:
+        if item["kind"] == "path":
+            if "fill" in item:
+                opacity = f' fill-opacity="{item["opacity"]:.3f}"' if item["opacity"] < 1 else ""
+                body.append(f'<path d="{_svg_path_data(item["paths"])}" fill="{item["fill"]}"{opacity}/>')
+            else:
+                dash = f' stroke-dasharray="{",".join(f"{d:.2f}" for d in item["dash"])}"' if item["dash"] else ""
+                body.append(
+                    f'<path d="{_svg_path_data(item["paths"])}" fill="none" stroke="{item["stroke"]}" '
+                    f'stroke-width="{item["width"]:.2f}" stroke-linejoin="round" stroke-linecap="round"{dash}/>'
+                )
+        elif item["kind"] == "image":
+            href = _svg_image_href(item["extension"], item["data"])
+            if href:
+                matrix = " ".join(f"{v:.4f}" for v in item["matrix"])
+                body.append(
+                    f'<image transform="matrix({matrix})" width="{item["width"]:.4f}" '
+                    f'height="{item["height"]:.4f}" preserveAspectRatio="none" href="{href}"/>'
+                )
+        elif item["kind"] == "text":
+            x, y = item["position"]
+            weight = ' font-weight="bold"' if item["bold"] else ""
+            italic = ' font-style="italic"' if item["italic"] else ""
+            rotate = f' transform="rotate({item["angle"]:.2f} {x:.2f} {y:.2f})"' if abs(item["angle"]) > 0.01 else ""
+            body.append(
+                f'<text x="{x:.2f}" y="{y:.2f}" font-size="{item["size"]:.2f}" fill="{item["color"]}" '
+                f'text-anchor="{item["anchor"]}"{weight}{italic}{rotate} xml:space="preserve">'
+                f"{escape(item['text'])}</text>"
+            )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        f'width="{width_in:.4f}in" height="{height_in:.4f}in" '
+        f'viewBox="0 0 {width_px:.2f} {height_px:.2f}" '
+        "font-family=" + quoteattr("Calibri, 'Microsoft YaHei', SimHei, sans-serif") + ">"
+        + "".join(body)
+        + "</svg>"
+    ).encode("utf-8")
+
+
+# ---------------------------------------------------------------- 位图输出
+
+_FONT_CANDIDATES = (
+    "msyh.ttc",
+    "simhei.ttf",
+    "simsun.ttc",
+    "NotoSansCJK-Regular.ttc",
+    "wqy-microhei.ttc",
+    "DejaVuSans.ttf",
+)
+_fonts = {}
+
+
+def _font(size):
+    """按字号返回字体，依次尝试config.NATIVE_FONT与常见中文字体，都不可用时使用Pillow内置字体"""
+    size = max(1, int(round(size)))
+    if size not in _fonts:
+        font = None
+        for name in ((NATIVE_FONT,) if NATIVE_FONT else ()) + _FONT_CANDIDATES:
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        _fonts[size] = font or ImageFont.load_default(size)
+    return _fonts[size]
+
+
+def _dash_segments(points, pattern):
+    """把折线按虚线长度拆分为多段"""
+    segments = []
+    current = [points[0]]
+    index, remaining, drawing = 0, pattern[0], True
+    for start, end in zip(points, points[1:]):
+        length = math.hypot(end[0] - start[0], end[1] - start[1])
+        position = 0.0
+        while length - position > remaining:
+            position += remaining
+            t = position / length
+            point = (start[0] + (end[0] - start[0]) * t, start[1] + (end[1] - start[1]) * t)
+            if drawing:
+                current.append(point)
+                segments.append(current)
+            current = [point]
+            index = (index + 1) % len(pattern)
+            remaining, drawing = pattern[index], not drawing
+        remaining -= length - position
+        if drawing:
+            current.append(end)
+        else:
+            current = [end]
+    if drawing and len(current) > 1:
+        segments.append(current)
+    return segments
+
+
+def _paste_image(canvas, item):
+    """按变换矩阵把位图画到画布上(支持翻转与旋转)"""
+    try:
+        with Image.open(io.BytesIO(item["data"])) as source:
+            image = source.convert("RGBA")
+    except Exception:
+        return
+    a, b, c, d, e, f = item["matrix"]
+    width_px = max(1, round(math.hypot(a, b) * item["width"]))
+    height_px = max(1, round(math.hypot(c, d) * item["height"]))
+    image = image.resize((width_px, height_px), Image.LANCZOS)
+    if a * d - b * c < 0:
+        image = image.transpose(Image.FLIP_LEFT_RIGHT)
+    angle = math.degrees(math.atan2(b, a))
+    if abs(angle) > 0.01:
+        image = image.rotate(-angle, resample=Image.BICUBIC, expand=True)
+    center = _apply(item["matrix"], (item["width"] / 2, item["height"] / 2))
+    left = round(center[0] - image.width / 2)
+    top = round(center[1] - image.height / 2)
+    canvas.alpha_composite(image, (max(0, left), max(0, top)), (max(0, -left), max(0, -top)))
+
+
+def _draw_text(canvas, item):
+    font = _font(item["size"])
+    anchor = {"start": "ls", "middle": "ms", "end": "rs"}[item["anchor"]]
+    x, y = item["position"]
+    fill = item["color"]
+    if abs(item["angle"]) <= 0.01:
+        ImageDraw.Draw(canvas).text((x, y), item["text"], font=font, fill=fill, anchor=anchor)
+        return
+    # 在以锚点为中心的透明图层上绘制后绕锚点旋转
+    radius = int(font.getlength(item["text"]) + item["size"] * 2) + 1
+    layer = Image.new("RGBA", (radius * 2, radius * 2), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).text((radius, radius), item["text"], font=font, fill=fill, anchor=anchor)
+    layer = layer.rotate(-item["angle"], resample=Image.BICUBIC)
+    left, top = round(x) - radius, round(y) - radius
+    canvas.alpha_composite(layer, (max(0, left), max(0, top)), (max(0, -left), max(0, -top)))
+
+
+def _hex_rgb(color):
+    return tuple(int(color[i : i + 2], 16) for i in (1, 3, 5))
+
+
+def render_raster(items, size):
+    """
+    把绘制列表画到白色背景的RGBA位图上。
+
+    参数:
+        items (list): 按目标分辨率的SUPERSAMPLE倍生成的绘制列表
+        size (tuple): 画布像素尺寸(宽, 高)
+
+    返回:
+        PIL.Image: 画布
+    """
+    canvas = Image.new("RGBA", size, "white")
+    draw = ImageDraw.Draw(canvas, "RGBA")
+    for item in items:
+        if item["kind"] == "path":
+            if "fill" in item:
+                alpha = round(255 * item["opacity"])
+                color = _hex_rgb(item["fill"]) + (alpha,)
+                for points, _ in item["paths"]:
+                    draw.polygon(points, fill=color)
+            else:
+                width = max(1, round(item["width"]))
+                for points, closed in item["paths"]:
+                    if closed:
+                        points = points + points[1:2]
+                    segments = _dash_segments(points, item["dash"]) if item["dash"] else [points]
+                    for segment in segments:
+                        draw.line(segment, fill=item["stroke"], width=width, joint="curve")
+        elif item["kind"] == "image":
+            _paste_image(canvas, item)
+            draw = ImageDraw.Draw(canvas, "RGBA")
+        elif item["kind"] == "text":
+            _draw_text(canvas, item)
+    return canvas
+
+
+# ---------------------------------------------------------------- Visio兼容接口
+
+
+class NativeVisioPage:
+    """与Visio页面对象相同的Index/Name/NameU/Background属性与Export方法"""
+
+    def __init__(self, app, document, index, info):
+        self.app = app
+        self.Document = document
+        self.Index = index
+        self.Name = info["name"]
+        self.NameU = info["name_u"]
+        self.Background = info["background"]
+        self.info = info
+
+    def render_items(self, scale):
+        return _Renderer(self.Document.package, self.info, scale).render()
+
+    def to_svg(self):
+        """返回页面的SVG文档字节"""
+        items = self.render_items(SVG_PX_PER_INCH)
+        return render_svg(items, self.info["width"], self.info["height"])
+
+    def to_image(self, dpi=None):
+        """返回页面按dpi(默认config.NATIVE_RENDER_DPI)渲染的RGB位图(PIL.Image)"""
+        if Image is None:
+            raise Exception("未安装Pillow，原生渲染只能导出SVG")
+        dpi = dpi or self.app.dpi
+        size = (
+            max(1, round(self.info["width"] * dpi)),
+            max(1, round(self.info["height"] * dpi)),
+        )
+        items = self.render_items(dpi * SUPERSAMPLE)
+        canvas = render_raster(items, (size[0] * SUPERSAMPLE, size[1] * SUPERSAMPLE))
+        return canvas.resize(size, Image.LANCZOS).convert("RGB")
+
+    def Export(self, path):
+        # 与Visio一致，按扩展名决定导出格式
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".svg":
+            data = self.to_svg()
+            with open(path, "wb") as f:
+                f.write(data)
+        elif extension in _RASTER_FORMATS:
+            image = self.to_image()
+            image.save(path, _RASTER_FORMATS[extension], dpi=(self.app.dpi, self.app.dpi))
+        else:
+            raise Exception(f"原生渲染不支持导出{extension}格式: {path}")
+        self.app.export_count += 1
+
+
+class NativeVisioPages:
+    def __init__(self, pages):
+        self._pages = pages
+
+    @property
+    def Count(self):
+        return len(self._pages)
+
+    def Item(self, index):
+        return self._pages[index - 1]
+
+    def __iter__(self):
+        return iter(self._pages)
+
+    def __len__(self):
+        return len(self._pages)
+
+
+class NativeVisioDocument:
+    def __init__(self, app, path):
+        self.app = app
+        self.FullName = path
+        self.package = _VsdxPackage(path)
+        self.Pages = NativeVisioPages(
+            [
+                NativeVisioPage(app, self, i + 1, info)
+                for i, info in enumerate(self.package.pages)
+            ]
+        )
+
+    def Close(self):
+        self.package.close()
+        if self in self.app.open_documents:
+            self.app.open_documents.remove(self)
+
+
+class NativeVisioDocuments:
+    def __init__(self, app):
+        self.app = app
+
+    @property
+    def Count(self):
+        return len(self.app.open_documents)
+
+    def Open(self, path):
+        if not os.path.isfile(path):
+            raise Exception(f"无法打开文件: {path}")
+        if not zipfile.is_zipfile(path):
+            raise Exception(f"原生渲染只支持.vsdx文件: {path}")
+        try:
+            document = NativeVisioDocument(self.app, path)
+        except (KeyError, etree.XMLSyntaxError, zipfile.BadZipFile) as e:
+            raise Exception(f"无法解析.vsdx文件: {path} ({e})")
+        self.app.open_documents.append(document)
+        return document
+
+
+class NativeWebPageSettings:
+    def __init__(self):
+        self.TargetPath = ""
+        self.PriFormat = "PNG"
+        self.StartPage = 1
+        self.EndPage = 0
+
+
+class NativeSaveAsWeb:
+    """另存为网页对象，按bulk_export.py的约定把各页渲染为<网页名>_files/<网页名>_<页码>.png"""
+
+    def __init__(self, app):
+        self.app = app
+        self.WebPageSettings = NativeWebPageSettings()
+        self.document = None
+
+    def AttachToVisioDoc(self, document):
+        self.document = document
+
+    def CreatePages(self):
+        settings = self.WebPageSettings
+        stem = os.path.splitext(settings.TargetPath)[0]
+        files_dir = stem + "_files"
+        os.makedirs(files_dir, exist_ok=True)
+        pages = self.document.Pages._pages[settings.StartPage - 1 : settings.EndPage]
+        for i, page in enumerate(pages, settings.StartPage):
+            page.Export(os.path.join(files_dir, f"{os.path.basename(stem)}_{i}.png"))
+
+
+class NativeVisioApp:
+    """
+    用法同Visio.Application的原生渲染实例，不启动任何外部程序。
+
+    参数:
+        dpi (int, 可选): 导出位图的分辨率，默认取config.NATIVE_RENDER_DPI
+    """
+
+    RendererTag = RENDERER_TAG  # core.page_key_settings据此区分Visio与原生渲染的缓存图片
+
+    def __init__(self, dpi=None):
+        self.dpi = dpi or NATIVE_RENDER_DPI
+        self.Visible = False
+        self.Documents = NativeVisioDocuments(self)
+        self.SaveAsWebObject = NativeSaveAsWeb(self)
+        self.open_documents = []
+        self.export_count = 0
+
+    @property
+    def ActiveWindow(self):
+        raise Exception("原生渲染不支持复制粘贴方式，请改用导出PNG或导出矢量图")
+
+    def Quit(self):
+        for document in list(self.open_documents):
+            document.Close()
+
+
+class NativeVisioFactory:
+    """可pickle的NativeVisioApp工厂，用法同core.create_visio_app，可传给多进程工作池"""
+
+    RendererTag = RENDERER_TAG  # core.renderer_tag据此区分转换缓存
+
+    def __init__(self, **options):
+        self.options = options
+
+    def __call__(self):
+        return NativeVisioApp(**self.options)
@@ -0,0 +1,236 @@
+"""
+.vsdx 页面级渲染缓存。
+
+.vsdx是由各页面XML组成的压缩包，每页的缓存键由该页XML、其引用的母版/图片等部件、
+背景页以及文档级样式/主题共同计算，内容未变的页面直接复用上次导出的图片，
+只有发生变化的页面才需要调用 page.Export。
+缓存目录有容量上限，超出时按最近使用时间(LRU)淘汰。
+"""
+import hashlib
+import os
+import posixpath
+import shutil
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+
+from config import PAGE_CACHE_ENABLED, PAGE_CACHE_MAX_BYTES
+
+PAGE_CACHE_DIR_NAME = os.path.join("Converted_Files", ".page_cache")
+
+VISIO_NS = "http://schemas.microsoft.com/office/visio/2012/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# 所有页面共享、会影响渲染结果的文档级部件
+_DOCUMENT_PARTS = ("visio/document.xml",)
+_DOCUMENT_PART_PREFIXES = ("visio/theme/",)
+
+
+def _rels_path(part_name):
+    """返回部件对应的关系文件路径，如visio/pages/page1.xml -> visio/pages/_rels/page1.xml.rels"""
+    directory, name = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+
+def _read_rels(package, part_name):
+    """读取部件的内部关系，返回{关系ID: 目标部件路径}"""
+    rels_name = _rels_path(part_name)
+    try:
+        root = ET.fromstring(package.read(rels_name))
+    except KeyError:
+        return {}
+    directory = posixpath.dirname(part_name)
+    targets = {}
+    for rel in root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            targets[rel.get("Id")] = target.lstrip("/")
+        else:
+            targets[rel.get("Id")] = posixpath.normpath(posixpath.join(directory, target))
+    return targets
+
+
+def _hash_part_tree(package, part_name, digest, visited):
+    """把部件及其(递归)引用的所有部件内容加入哈希"""
+    if part_name in visited:
+        return
+    visited.add(part_name)
+    try:
+        data = package.read(part_name)
+    except KeyError:
+        return
+    digest.update(part_name.encode("utf-8") + b"\0")
+    digest.update(hashlib.sha256(data).digest())
+    for target in sorted(_read_rels(package, part_name).values()):
+        _hash_part_tree(package, target, digest, visited)
+
+
+def vsdx_page_keys(vsdx_path, settings=""):
+    """
+    计算.vsdx文件中每个页面的内容哈希。
+
+    参数:
+        vsdx_path (str): .vsdx文件路径
+        settings (str): 导出设置(格式、分辨率等)，会混入每个页面的键
+
+    返回:
+        dict: {页面通用名称NameU: 缓存键}；不是有效的.vsdx压缩包时返回空字典
+    """
+    if not zipfile.is_zipfile(vsdx_path):
+        return {}
+
+    try:
+        with zipfile.ZipFile(vsdx_path) as package:
+            names = package.namelist()
+            document_digest = hashlib.sha256(settings.encode("utf-8"))
+            for part_name in sorted(names):
+                if part_name in _DOCUMENT_PARTS or part_name.startswith(
+                    _DOCUMENT_PART_PREFIXES
+                ):
+                    document_digest.update(part_name.encode("utf-8") + b"\0")
+                    document_digest.update(package.read(part_name))
+
+            pages_part = "visio/pages/pages.xml"
+            pages_root = ET.fromstring(package.read(pages_part))
+            page_targets = _read_rels(package, pages_part)
+
+            pages = {}
+            for page in pages_root.iter(f"{{{VISIO_NS}}}Page"):
+                rel = page.find(f"{{{VISIO_NS}}}Rel")
+                if rel is None:
+                    continue
+                target = page_targets.get(rel.get(f"{{{REL_NS}}}id"))
+                if target is None:
+                    continue
+                page_sheet = page.find(f"{{{VISIO_NS}}}PageSheet")
+                pages[page.get("ID")] = {
+                    "name": page.get("NameU") or page.get("Name"),
+                    "target": target,
+                    "back_page": page.get("BackPage"),
+                    "sheet": ET.tostring(page_sheet) if page_sheet is not None else b"",
+                }
+
+            own_keys = {}
+            for page_id, info in pages.items():
+                digest = document_digest.copy()
+                digest.update(info["sheet"])
+                _hash_part_tree(package, info["target"], digest, set())
+                own_keys[page_id] = digest.hexdigest()
+    except (zipfile.BadZipFile, KeyError, ET.ParseError, OSError) as e:
+        print(f"解析页面缓存键失败: {vsdx_path} ({e})")
+        return {}
+
+    def full_key(page_id, seen=()):
+        # 前景页导出时会叠加背景页(可多级)，背景页变化也要使前景页失效
+        info = pages[page_id]
+        key = own_keys[page_id]
+        back_page = info["back_page"]
+        if back_page in pages and back_page not in seen:
+            key = hashlib.sha256(
+                (key + full_key(back_page, seen + (page_id,))).encode("ascii")
+            ).hexdigest()
+        return key
+
+    return {info["name"]: full_key(page_id) for page_id, info in pages.items()}
+
+
+class PageCache:
+    """
+    磁盘上的页面图片缓存，按最近使用时间淘汰。
+
+    以文件修改时间记录最近使用时间，不维护额外的索引文件，
+    因此多个工作进程可以同时读写同一个缓存目录。
+
+    参数:
+        cache_dir (str): 缓存目录
+        max_bytes (int): 缓存容量上限(字节)
+    """
+
+    def __init__(self, cache_dir, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._added_bytes = 0
+
+    def _path(self, key, extension):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{extension}")
+
+    def fetch(self, key, dest_path):
+        """缓存命中时把图片复制到dest_path并返回True"""
+        extension = dest_path.rsplit(".", 1)[-1].lower()
+        path = self._path(key, extension)
+        try:
+            shutil.copyfile(path, dest_path)
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def lookup(self, key, extension):
+        """返回缓存中图片的路径并更新其使用时间，不存在时返回None"""
+        path = self._path(key, extension)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, key, src_path):
+        """把刚导出的图片存入缓存，累计写入超过上限的十分之一时触发一次淘汰"""
+        extension = src_path.rsplit(".", 1)[-1].lower()
+        path = self._path(key, extension)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(src_path, temp_path)
+            os.replace(temp_path, path)
+            self._added_bytes += os.path.getsize(path)
+        except OSError as e:
+            print(f"写入页面缓存失败: {e}")
+            return
+        if self._added_bytes > self.max_bytes // 10:
+            self.trim()
+
+    def trim(self):
+        """删除最久未使用的图片，直到总大小不超过容量上限"""
+        self._added_bytes = 0
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp") and stat.st_mtime < time.time() - 3600:
+                    try:
+                        os.remove(path)  # 异常退出遗留的临时文件
+                    except OSError:
+                        pass  # 其他进程正在使用或已删除，下次再清理
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def open_page_cache(visio_dir, enabled=True):
+    """返回visio_dir对应的页面缓存，未启用时返回None"""
+    if not (enabled and PAGE_CACHE_ENABLED):
+        return None
+    return PageCache(os.path.join(visio_dir, PAGE_CACHE_DIR_NAME))
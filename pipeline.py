@@ -0,0 +1,282 @@
+"""
+流水线方式的导出PNG转换：Visio导出线程(生产者)与Word写入线程(消费者)通过有界队列衔接，
+第k+1页的导出与第k页的插入同时进行。
+"""
+import os
+import queue
+import threading
+import time
+
+from core import (
+    com_initialize,
+    com_uninitialize,
+    create_sink,
+    create_visio_app,
+    export_pages,
+    visio_to_word_export_png,
+)
+from page_cache import open_page_cache
+from tracing import page_done, span
+
+DEFAULT_PIPELINE_DEPTH = 4  # 队列中最多暂存的已导出页面数
+
+_DONE = object()
+
+
+def _export_producer(
+    visio_dir, file_list, visio_factory, page_cache, page_queue, stop_event
+):
+    """
+    生产者线程：在本线程内初始化COM并启动Visio，依次导出所有文件的页面。
+
+    放入队列的事件:
+        ("begin", 文件名) / ("page", 图片路径, 是否最后一页) / ("end", 文件名)
+        ("error", 异常) 表示导出失败，_DONE 表示全部完成
+    """
+
+    def put(item):
+        # 消费者出错退出时不再阻塞在满队列上
+        while not stop_event.is_set():
+            try:
+                page_queue.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    com_initialize()
+    visio_app = None
+    try:
+        visio_app = visio_factory()
+        for filename in file_list:
+            if not put(("begin", filename)):
+                return
+            with span("file", file=filename):
+                for image_path, is_last_page in export_pages(
+                    visio_app, visio_dir, filename, page_cache
+                ):
+                    if not put(("page", image_path, is_last_page)):
+                        os.remove(image_path)
+                        return
+            if not put(("end", filename)):
+                return
+        put(_DONE)
+    except Exception as e:
+        put(("error", e))
+    finally:
+        if visio_app is not None:
+            try:
+                visio_app.Quit()
+            except:
+                pass
+        com_uninitialize()
+
+
+def visio_to_word_export_png_pipelined(
+    visio_dir,
+    file_list,
+    update_progress=None,
+    separate_files=False,
+    word_processor="Word",
+    depth=DEFAULT_PIPELINE_DEPTH,
+    visio_factory=None,
+    office_factory=None,
+    use_page_cache=True,
+    doc_backend=None,
+    volume_pages=None,
+    volume_bytes=None,
+    merged_order=None,
+):
+    """
+    以生产者/消费者流水线方式执行导出PNG转换，输出与visio_to_word_export_png完全一致。
+
+    参数:
+        visio_dir (str): Visio文件所在目录路径
+        file_list (list): 要转换的Visio文件名列表
+        update_progress (function, 可选): 进度回调函数，格式为func(文件名, 当前序号, 总数)
+        separate_files (bool): 是否每个Visio文件生成单独的Word文档
+        word_processor (str): 目标办公软件类型，"Word"或"WPS"
+        depth (int): 有界队列容量，即磁盘上最多同时存在的待插入临时图片数
+        visio_factory (function, 可选): 创建Visio实例的函数，默认create_visio_app
+        office_factory (function, 可选): 创建办公应用实例的函数，默认create_office_app
+        use_page_cache (bool): 是否复用.vsdx中未修改页面上次导出的图片
+        doc_backend (str, 可选): 文档生成方式，"docx"(不启动Word)、"stream"或"com"，
+            默认取config.DOC_BACKEND
+        volume_pages (int, 可选): 合并文档每卷最多页数，默认取config.VOLUME_MAX_PAGES
+        volume_bytes (int, 可选): 合并文档每卷最多图片字节数，默认取config.VOLUME_MAX_BYTES
+        merged_order (list, 可选): 同core.visio_to_word_export_png
+
+    返回:
+        dict: 本次运行的统计信息，包括files、pages、elapsed(秒)和pages_per_sec
+
+    注意:
+    - Visio与Word分别在各自线程的COM环境中创建，COM对象不跨线程使用
+    - 队列已满时导出线程会等待，因此内存与临时文件占用不随页数增长
+    """
+    page_queue = queue.Queue(maxsize=max(1, depth))
+    stop_event = threading.Event()
+    total_files = len(file_list)
+    page_count = 0
+    start_time = time.perf_counter()
+
+    com_initialize()
+    try:
+        sink = create_sink(
+            visio_dir,
+            separate_files,
+            word_processor,
+            doc_backend,
+            office_factory,
+            volume_pages,
+            volume_bytes,
+            merged_order=merged_order,
+        )
+        # 流式写入方式可从检查点继续，已完成的文件不再导出
+        file_idx = sink.resume_point(file_list)
+        producer = threading.Thread(
+            target=_export_producer,
+            args=(
+                visio_dir,
+                file_list[file_idx:],
+                visio_factory or create_visio_app,
+                open_page_cache(visio_dir, use_page_cache),
+                page_queue,
+                stop_event,
+            ),
+            daemon=True,
+        )
+        producer.start()
+        try:
+            while True:
+                item = page_queue.get()
+                if item is _DONE:
+                    break
+
+                kind = item[0]
+                if kind == "begin":
+                    file_idx += 1
+                    file_page = 0
+                    current_file = item[1]
+                    if update_progress:
+                        update_progress(current_file, file_idx, total_files)
+                    sink.begin_file(current_file)
+                elif kind == "page":
+                    _, image_path, is_last_page = item
+                    file_page += 1
+                    try:
+                        with span("insert", file=current_file, page=file_page):
+                            sink.add_picture(image_path, is_last_page)
+                    finally:
+                        os.remove(image_path)
+                    page_count += 1
+                    page_done()
+                elif kind == "end":
+                    with span("end_file", file=item[1]):
+                        sink.end_file(item[1])
+                else:
+                    raise item[1]
+        except BaseException:
+            stop_event.set()
+            producer.join(timeout=5)
+            sink.abort()
+            raise
+        else:
+            with span("save"):
+                sink.close()
+        finally:
+            stop_event.set()
+            # 清理队列中尚未插入的临时图片
+            while True:
+                try:
+                    item = page_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _DONE and item[0] == "page":
+                    os.remove(item[1])
+            producer.join(timeout=5)
+    finally:
+        com_uninitialize()
+
+    elapsed = time.perf_counter() - start_time
+    return {
+        "files": total_files,
+        "pages": page_count,
+        "elapsed": elapsed,
+        "pages_per_sec": page_count / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def compare_throughput(
+    visio_dir,
+    file_list,
+    separate_files=False,
+    visio_factory=None,
+    office_factory=None,
+    doc_backend=None,
+):
+    """
+    分别以串行和流水线方式转换同一批文件，返回两者的耗时与每秒页数。
+    测量时关闭页面缓存，避免第二次运行直接命中第一次导出的图片。
+
+    返回:
+        dict: {"serial": 统计信息, "pipelined": 统计信息}，统计信息格式同
+        visio_to_word_export_png_pipelined的返回值
+    """
+    start_time = time.perf_counter()
+    visio_to_word_export_png(
+        visio_dir,
+        file_list,
+        None,
+        separate_files,
+        visio_factory=visio_factory,
+        office_factory=office_factory,
+        use_page_cache=False,
+        doc_backend=doc_backend,
+    )
+    serial_elapsed = time.perf_counter() - start_time
+
+    pipelined = visio_to_word_export_png_pipelined(
+        visio_dir,
+        file_list,
+        None,
+        separate_files,
+        visio_factory=visio_factory,
+        office_factory=office_factory,
+        use_page_cache=False,
+        doc_backend=doc_backend,
+    )
+    pages = pipelined["pages"]
+    serial = {
+        "files": len(file_list),
+        "pages": pages,
+        "elapsed": serial_elapsed,
+        "pages_per_sec": pages / serial_elapsed if serial_elapsed > 0 else 0.0,
+    }
+    return {"serial": serial, "pipelined": pipelined}
+
+
+if __name__ == "__main__":
+    # 使用模拟后端测量流水线的收益
+    import tempfile
+    from fake_office import FakeOfficeFactory, FakeVisioFactory
+
+    with tempfile.TemporaryDirectory() as visio_dir:
+        file_list = []
+        for i in range(10):
+            filename = f"diagram_{i + 1}.vsd"
+            with open(os.path.join(visio_dir, filename), "w") as f:
+                f.write(filename)
+            file_list.append(filename)
+
+        result = compare_throughput(
+            visio_dir,
+            file_list,
+            visio_factory=FakeVisioFactory(page_latency=0.02, pages_per_file=4),
+            office_factory=FakeOfficeFactory(insert_latency=0.02),
+            doc_backend="com",
+        )
+        for mode, stats in result.items():
+            print(
+                f"{mode}: {stats['pages']}页 用时{stats['elapsed']:.2f}秒 "
+                f"{stats['pages_per_sec']:.1f}页/秒"
+            )
@@ -0,0 +1,145 @@
+"""
+Visio文件扫描。
+
+基于os.scandir递归遍历目录(目录项自带文件类型，不必对每个条目再调用os.path.isfile)，
+支持包含/排除通配符，并按批次产出结果，供GUI边扫描边显示。
+返回的文件名是相对于扫描根目录的路径，转换输出会保持同样的子目录结构。
+"""
+import fnmatch
+import os
+
+from config import SCAN_EXCLUDE, SCAN_INCLUDE, SCAN_RECURSIVE
+
+DEFAULT_EXTENSIONS = (".vsdx", ".vsd")
+
+# 扫描时跳过的目录：转换输出目录以及流式写入的临时目录
+SKIPPED_DIRS = ("Converted_Files",)
+SKIPPED_DIR_SUFFIXES = (".parts",)
+
+
+def _matches(rel_path, patterns):
+    """相对路径或文件名匹配任一通配符时返回True，路径统一使用/分隔"""
+    rel_path = rel_path.replace(os.sep, "/")
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(
+        fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in patterns
+    )
+
+
+def is_scanned_dir(rel_path, exclude=None):
+    """
+    判断子目录是否需要扫描：跳过输出目录、流式写入的临时目录、隐藏目录与匹配排除通配符的目录。
+
+    参数:
+        rel_path (str): 相对于扫描根目录的目录路径
+        exclude (list, 可选): 排除通配符，默认取config.SCAN_EXCLUDE
+    """
+    exclude = SCAN_EXCLUDE if exclude is None else exclude
+    name = os.path.basename(rel_path)
+    return (
+        name not in SKIPPED_DIRS
+        and not name.endswith(SKIPPED_DIR_SUFFIXES)
+        and not name.startswith(".")
+        and not _matches(rel_path, exclude)
+    )
+
+
+def is_visio_file(rel_path, extensions=None, include=None, exclude=None):
+    """
+    判断文件是否为需要转换的Visio文件，参数含义同iter_visio_batches。
+
+    注意:
+    - 以"~$"开头的Office锁文件不算；Visio保存时的临时文件(如"~$$绘图1.~vsdx"、"*.tmp")扩展名不匹配，同样不算
+    """
+    extensions = tuple(e.lower() for e in (extensions or DEFAULT_EXTENSIONS))
+    include = SCAN_INCLUDE if include is None else include
+    exclude = SCAN_EXCLUDE if exclude is None else exclude
+    name = os.path.basename(rel_path)
+    if name.startswith("~$"):
+        return False
+    if os.path.splitext(name)[1].lower() not in extensions:
+        return False
+    if include and not _matches(rel_path, include):
+        return False
+    return not _matches(rel_path, exclude)
+
+
+def iter_visio_batches(
+    root,
+    extensions=None,
+    include=None,
+    exclude=None,
+    recursive=None,
+    batch_size=200,
+):
+    """
+    扫描目录并按批次产出Visio文件。
+
+    参数:
+        root (str): 扫描根目录
+        extensions (list, 可选): 要匹配的扩展名，默认.vsdx/.vsd
+        include (list, 可选): 包含通配符，非空时只返回匹配的文件，默认取config.SCAN_INCLUDE
+        exclude (list, 可选): 排除通配符，匹配的文件与目录(及其子目录)均跳过，
+            默认取config.SCAN_EXCLUDE
+        recursive (bool, 可选): 是否扫描子目录，默认取config.SCAN_RECURSIVE
+        batch_size (int): 每批最多文件数
+
+    返回:
+        generator: 每次产出一个相对路径列表
+
+    注意:
+    - 每个目录内先按名称顺序返回文件，再依次进入子目录，结果顺序稳定
+    - 以"~$"开头的Office锁文件、Converted_Files等输出目录以及符号链接目录会被跳过
+    - 无法访问的子目录会打印错误并跳过，根目录无法访问时抛出OSError
+    """
+    exclude = SCAN_EXCLUDE if exclude is None else exclude
+    recursive = SCAN_RECURSIVE if recursive is None else recursive
+
+    batch = []
+    pending_dirs = [""]
+    while pending_dirs:
+        rel_dir = pending_dirs.pop()
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            if not rel_dir:
+                raise
+            print(f"扫描目录失败: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and is_scanned_dir(rel_path, exclude):
+                        subdirs.append(rel_path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if not is_visio_file(rel_path, extensions, include, exclude):
+                continue
+            batch.append(rel_path)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        # 逆序压栈，使子目录按名称顺序出栈
+        pending_dirs.extend(reversed(subdirs))
+
+    if batch:
+        yield batch
+
+
+def scan_visio_files(root, extensions=None, include=None, exclude=None, recursive=None):
+    """
+    返回目录下所有Visio文件的相对路径列表，顺序同iter_visio_batches。
+    """
+    files = []
+    for batch in iter_visio_batches(root, extensions, include, exclude, recursive):
+        files.extend(batch)
+    return files
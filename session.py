@@ -0,0 +1,112 @@
+"""
+应用会话：在多次转换之间复用同一个Visio和Word/WPS实例。
+
+转换函数在结束时会调用应用的Quit，会话交给转换函数的是包装后的实例，
+其Quit为空操作，真正的退出由AppSession.close统一完成。
+"""
+from core import create_office_app, create_visio_app, renderer_tag
+
+
+class _KeepAlive:
+    """应用实例的包装，除Quit外的属性访问与赋值均转发给被包装的实例"""
+
+    def __init__(self, app):
+        object.__setattr__(self, "_app", app)
+
+    def __getattr__(self, name):
+        return getattr(self._app, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._app, name, value)
+
+    def Quit(self, *args, **kwargs):
+        pass  # 转换函数可能传入SaveChanges等参数，同样忽略
+
+
+class AppSession:
+    """
+    持有预热的Visio与Word/WPS实例，按需延迟启动。
+
+    参数:
+        visio_factory (function, 可选): 创建Visio实例的函数，默认create_visio_app
+        office_factory (function, 可选): 创建办公应用实例的函数，默认create_office_app
+
+    用法:
+        把session.visio_factory、session.office_factory作为转换函数的同名参数传入，
+        全部转换结束后调用close。会话内的实例只能在创建它的线程中使用。
+    """
+
+    def __init__(self, visio_factory=None, office_factory=None):
+        self._visio_factory = visio_factory or create_visio_app
+        self.RendererTag = renderer_tag(self._visio_factory)  # 供转换缓存区分渲染方式
+        self._office_factory = office_factory or create_office_app
+        self._visio_app = None
+        self._office_apps = {}
+
+    def visio_factory(self):
+        """返回会话中的Visio实例，首次调用时启动"""
+        if self._visio_app is None:
+            self._visio_app = self._visio_factory()
+        return _KeepAlive(self._visio_app)
+
+    @property
+    def process_visio_factory(self):
+        """
+        创建独立Visio实例的原始工厂(不经过会话)。
+
+        供在子进程中自行启动Visio、超时后将其结束的转换(supervisor.py)使用：
+        会话的visio_factory是绑定方法，子进程中无法使用会话的实例，其Quit也不会真正退出。
+        """
+        return self._visio_factory
+
+    def office_factory(self, app_type):
+        """返回会话中指定类型("Word"或"WPS")的办公应用实例，首次调用时启动"""
+        if app_type not in self._office_apps:
+            self._office_apps[app_type] = self._office_factory(app_type)
+        return _KeepAlive(self._office_apps[app_type])
+
+    def check(self):
+        """
+        检查已启动的实例是否仍可响应，不可响应时重置会话。
+
+        返回:
+            bool: 全部实例正常(或尚未启动)时返回True
+        """
+        for app in [self._visio_app] + list(self._office_apps.values()):
+            if app is None:
+                continue
+            try:
+                app.Documents.Count
+            except Exception as e:
+                print(f"应用实例无响应，将重新启动: {e}")
+                self.reset()
+                return False
+        return True
+
+    @property
+    def started(self):
+        """是否有已启动的实例"""
+        return self._visio_app is not None or bool(self._office_apps)
+
+    def reset(self):
+        """退出当前实例，下次使用时重新启动；转换出错后应用可能已不可用时调用"""
+        apps = [self._visio_app] + list(self._office_apps.values())
+        self._visio_app = None
+        self._office_apps = {}
+        for app in apps:
+            if app is None:
+                continue
+            try:
+                app.Quit()
+            except Exception as e:
+                print(f"退出应用时出错: {e}")
+
+    def close(self):
+        """退出会话中的所有应用"""
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,464 @@
+"""
+带超时保护的导出PNG转换。
+
+Visio在独立的工作进程中逐个文件导出页面，主进程监视进度：
+打开文件或导出某一页超过时限、或整个文件超过时限时，强制结束工作进程(及卡死的Visio)，
+按退避时间重试，多次失败后隔离该文件并继续处理后续文件，最后生成失败报告而不是中止整批转换。
+Word/WPS插入或保存时出错(卡死超时会被结束)同样如此：重新创建文档写入器后重试该文件。
+
+每个文件的全部页面导出成功后才写入文档，失败的文件不会在合并文档中留下残缺的页面。
+被隔离的文件记录在Converted_Files/.quarantine.json中，内容未修改前后续运行直接跳过。
+"""
+import functools
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from config import (
+    WATCHDOG_BACKOFF,
+    WATCHDOG_FILE_TIMEOUT,
+    WATCHDOG_PAGE_TIMEOUT,
+    WATCHDOG_RETRIES,
+)
+from convert_cache import CACHE_DIR_NAME, file_sha256
+from core import (
+    com_initialize,
+    com_uninitialize,
+    create_sink,
+    create_visio_app,
+    export_pages,
+    kill_visio_processes,
+    kill_word_processes,
+    uses_office_app,
+)
+from page_cache import open_page_cache
+from session import AppSession
+from tracing import page_done, span
+
+QUARANTINE_NAME = ".quarantine.json"
+FAILURE_REPORT_NAME = "failure_report.json"
+
+
+def _supervised_worker(task_queue, event_queue, visio_dir, temp_dir, visio_factory, page_cache):
+    """
+    工作进程入口：启动Visio后逐个领取文件导出，每导出一页上报一次进度。
+
+    上报的事件:
+        ("page", 文件名, 图片路径) / ("done", 文件名, 图片路径列表) / ("error", 文件名, 错误信息)
+    收到None表示任务结束。
+    """
+    com_initialize()
+    visio_app = None
+    try:
+        visio_app = visio_factory()
+        while True:
+            filename = task_queue.get()
+            if filename is None:
+                break
+            image_paths = []
+            try:
+                for image_path, _ in export_pages(
+                    visio_app, visio_dir, filename, page_cache, temp_dir
+                ):
+                    image_paths.append(image_path)
+                    event_queue.put(("page", filename, image_path))
+                event_queue.put(("done", filename, image_paths))
+            except Exception as e:
+                _remove_files(image_paths)
+                event_queue.put(("error", filename, str(e)))
+    except Exception as e:
+        event_queue.put(("error", None, f"启动Visio失败: {e}"))
+    finally:
+        if visio_app is not None:
+            try:
+                visio_app.Quit()
+            except:
+                pass
+        com_uninitialize()
+
+
+def _remove_files(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class _VisioWorker:
+    """受监视的导出工作进程，超时或崩溃后可强制结束并重新启动"""
+
+    def __init__(self, visio_dir, temp_dir, visio_factory, page_cache, kill_instance):
+        self.args = (visio_dir, temp_dir, visio_factory, page_cache)
+        self.kill_instance = kill_instance
+        self.process = None
+
+    def ensure_started(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        self.task_queue = multiprocessing.Queue()
+        self.event_queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_supervised_worker,
+            args=(self.task_queue, self.event_queue) + self.args,
+            daemon=True,
+        )
+        self.process.start()
+
+    def export(self, filename, file_timeout, page_timeout):
+        """
+        导出一个文件并等待结果。
+
+        返回:
+            tuple: ("done", 图片路径列表) / ("error", 错误信息) /
+            ("timeout", 错误信息) / ("crash", 错误信息)
+        """
+        self.ensure_started()
+        self.task_queue.put(filename)
+        start = last_event = time.monotonic()
+        image_paths = []
+        while True:
+            now = time.monotonic()
+            page_deadline = last_event + page_timeout
+            file_deadline = start + file_timeout
+            if now >= file_deadline:
+                outcome = ("timeout", f"整个文件超过{file_timeout}秒未完成")
+                break
+            if now >= page_deadline:
+                stage = "打开文件" if not image_paths else f"导出第{len(image_paths) + 1}页"
+                outcome = ("timeout", f"{stage}超过{page_timeout}秒无响应")
+                break
+            try:
+                event = self.event_queue.get(
+                    timeout=min(page_deadline, file_deadline, now + 0.5) - now
+                )
+            except queue.Empty:
+                if not self.process.is_alive():
+                    outcome = ("crash", f"工作进程意外退出(退出码{self.process.exitcode})")
+                    break
+                continue
+
+            kind, event_file, detail = event
+            if event_file not in (filename, None):
+                continue
+            last_event = time.monotonic()
+            if kind == "page":
+                image_paths.append(detail)
+            elif kind == "done":
+                return "done", detail
+            else:
+                return "error", detail
+
+        # 卡死或崩溃：结束工作进程并清理已导出的页面
+        self.kill()
+        _remove_files(image_paths)
+        return outcome
+
+    def kill(self):
+        """强制结束工作进程及其Visio实例"""
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.process = None
+        if self.kill_instance:
+            kill_visio_processes()
+
+    def stop(self):
+        """正常结束工作进程"""
+        if self.process is not None and self.process.is_alive():
+            self.task_queue.put(None)
+            self.process.join(timeout=10)
+            if self.process.is_alive():
+                self.kill()
+        self.process = None
+
+
+def _write_file(sink, filename, image_paths, page_timeout, file_timeout, kill_office):
+    """把一个文件的全部页面写入文档，插入单页或结束文件超时时结束卡死的Word/WPS"""
+    sink.begin_file(filename)
+    for i, image_path in enumerate(image_paths):
+        with span("insert", file=filename, page=i + 1), _Watchdog(page_timeout, kill_office):
+            sink.add_picture(image_path, i == len(image_paths) - 1)
+        page_done()
+    with span("end_file", file=filename), _Watchdog(file_timeout, kill_office):
+        sink.end_file(filename)
+
+
+def _abort_sink(sink):
+    """丢弃出错的写入器，清理失败时只打印错误"""
+    try:
+        sink.abort()
+    except Exception as e:
+        print(f"清理文档写入器失败: {e}")
+
+
+class _Watchdog:
+    """在with块执行超过timeout秒时调用on_timeout，用于结束卡死的Word/WPS使COM调用返回"""
+
+    def __init__(self, timeout, on_timeout):
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.fired = False
+
+    def _fire(self):
+        self.fired = True
+        self.on_timeout()
+
+    def __enter__(self):
+        self.timer = None
+        if self.on_timeout is not None:
+            self.timer = threading.Timer(self.timeout, self._fire)
+            self.timer.daemon = True
+            self.timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+class Quarantine:
+    """
+    被隔离文件的记录，按内容哈希判断文件是否已修改。
+
+    参数:
+        output_dir (str): 输出所在目录，记录保存在其Converted_Files下
+        visio_dir (str): Visio文件所在目录
+    """
+
+    def __init__(self, output_dir, visio_dir):
+        self.visio_dir = visio_dir
+        self.path = os.path.join(output_dir, CACHE_DIR_NAME, QUARANTINE_NAME)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _hash(self, filename):
+        return file_sha256(os.path.join(self.visio_dir, filename))
+
+    def contains(self, filename):
+        """文件已被隔离且内容未修改时返回True"""
+        entry = self.entries.get(filename)
+        if entry is None:
+            return False
+        if entry["hash"] != self._hash(filename):
+            del self.entries[filename]
+            return False
+        return True
+
+    def add(self, filename, error, attempts):
+        self.entries[filename] = {
+            "hash": self._hash(filename),
+            "error": error,
+            "attempts": attempts,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+
+
+def visio_to_word_export_png_supervised(
+    visio_dir,
+    file_list,
+    update_progress=None,
+    separate_files=False,
+    word_processor="Word",
+    visio_factory=None,
+    office_factory=None,
+    use_page_cache=True,
+    doc_backend=None,
+    volume_pages=None,
+    volume_bytes=None,
+    output_dir=None,
+    file_timeout=WATCHDOG_FILE_TIMEOUT,
+    page_timeout=WATCHDOG_PAGE_TIMEOUT,
+    retries=WATCHDOG_RETRIES,
+    backoff=WATCHDOG_BACKOFF,
+    merged_order=None,
+):
+    """
+    带超时保护的导出PNG转换，输出与visio_to_word_export_png一致(失败的文件除外)。
+
+    参数:
+        前11个参数及output_dir同visio_to_word_export_png
+        file_timeout (float): 单个文件导出的最长时间(秒)
+        page_timeout (float): 打开文件或导出单页的最长时间(秒)，Word/WPS插入单页同样适用
+        retries (int): 文件导出或写入文档失败后的重试次数
+        backoff (float): 第一次重试前的等待时间(秒)，之后每次加倍
+        merged_order (list, 可选): 同visio_to_word_export_png，失败的文件在合并文档中保留上次的内容
+
+    返回:
+        dict: 失败报告，包括converted(成功的文件)、failed([{file, error, attempts}])
+        和skipped(已隔离而跳过的文件)
+
+    注意:
+    - 使用真实Visio(visio_factory为None或create_visio_app)时，超时会终止所有visio.exe进程
+    - visio_factory不能是session.AppSession的visio_factory，工作进程需要独立的实例
+    - 写入文档出错(如Word/WPS卡死被结束)时重新创建写入器后重试；合并输出时先重新导出并写入已完成的文件，
+      stream方式只需写入最后一个检查点之后的文件
+    - 存在失败的文件时，报告同时写入Converted_Files/failure_report.json
+    """
+    if isinstance(getattr(visio_factory, "__self__", None), AppSession):
+        raise ValueError("超时保护的转换在工作进程中启动自己的Visio实例，请传入session.process_visio_factory")
+    output_root = output_dir or visio_dir
+    os.makedirs(output_root, exist_ok=True)
+    quarantine = Quarantine(output_root, visio_dir)
+    report = {"converted": [], "failed": [], "skipped": []}
+
+    # 使用真实Word/WPS时，插入或保存卡死则结束其进程，使卡住的COM调用出错返回
+    kill_office = None
+    if uses_office_app("export_png", doc_backend) and office_factory is None:
+        kill_office = functools.partial(kill_word_processes, word_processor)
+
+    worker = _VisioWorker(
+        visio_dir,
+        output_root,
+        visio_factory or create_visio_app,
+        open_page_cache(output_root, use_page_cache),
+        kill_instance=visio_factory in (None, create_visio_app),
+    )
+    total_files = len(file_list)
+
+    def new_sink():
+        return create_sink(
+            output_root,
+            separate_files,
+            word_processor,
+            doc_backend,
+            office_factory,
+            volume_pages,
+            volume_bytes,
+            merged_order=merged_order,
+        )
+
+    com_initialize()
+    sink = None
+    written = []  # 合并输出时本次已写入的文件，重建文档时重新写入
+    try:
+        sink = new_sink()
+        skip = sink.resume_point(file_list)
+        resumed = list(file_list[:skip])
+
+        def rebuild_sink():
+            """
+            重新创建写入器，合并输出时写回已完成的文件。
+
+            stream方式从检查点继续，只写回检查点之后的文件；写回的文件重新导出(未修改的页面命中页面缓存)，
+            图片不必在整个运行期间保留在磁盘上。写回同样失败时按退避时间重试，
+            多次失败后抛出异常中止整批转换(已完成的内容无法恢复)。
+            """
+            nonlocal sink
+            for attempt in range(1, retries + 2):
+                rebuilt = new_sink()
+                if separate_files:
+                    sink = rebuilt
+                    return
+                done = resumed + written
+                kept = rebuilt.resume_point(done)
+                try:
+                    for name in done[kept:]:
+                        outcome, detail = worker.export(name, file_timeout, page_timeout)
+                        if outcome != "done":
+                            raise Exception(f"重新导出{name}失败: {detail}")
+                        try:
+                            _write_file(
+                                rebuilt, name, detail, page_timeout, file_timeout, kill_office
+                            )
+                        finally:
+                            _remove_files(detail)
+                except Exception as e:
+                    _abort_sink(rebuilt)
+                    if attempt > retries:
+                        raise
+                    print(f"重建合并文档失败({attempt}/{retries + 1}): {e}")
+                    time.sleep(backoff * 2 ** (attempt - 1))
+                    continue
+                sink = rebuilt
+                return
+
+        for idx, filename in enumerate(file_list):
+            if idx < skip:
+                continue
+            if update_progress:
+                update_progress(filename, idx + 1, total_files)
+            if quarantine.contains(filename):
+                print(f"跳过已隔离的文件: {filename}")
+                report["skipped"].append(filename)
+                continue
+
+            attempts = 0
+            while True:
+                attempts += 1
+                with span("file", file=filename, attempt=attempts):
+                    outcome, detail = worker.export(filename, file_timeout, page_timeout)
+                if outcome == "done":
+                    break
+                print(f"导出失败({attempts}/{retries + 1}): {filename} - {detail}")
+                if attempts > retries:
+                    break
+                time.sleep(backoff * 2 ** (attempts - 1))
+
+            if outcome != "done":
+                quarantine.add(filename, detail, attempts)
+                report["failed"].append(
+                    {"file": filename, "error": detail, "attempts": attempts}
+                )
+                continue
+
+            # 插入或保存失败(如Word/WPS卡死被结束)时重建写入器后重试，多次失败后隔离该文件
+            image_paths = detail
+            error = None
+            for attempt in range(1, retries + 2):
+                if sink is None:
+                    rebuild_sink()
+                try:
+                    _write_file(sink, filename, image_paths, page_timeout, file_timeout, kill_office)
+                    error = None
+                    break
+                except Exception as e:
+                    error = f"写入文档失败: {e}"
+                    print(f"写入文档失败({attempt}/{retries + 1}): {filename} - {e}")
+                    _abort_sink(sink)
+                    sink = None
+                    if attempt <= retries:
+                        time.sleep(backoff * 2 ** (attempt - 1))
+
+            _remove_files(image_paths)
+            if error is not None:
+                quarantine.add(filename, error, attempt)
+                report["failed"].append({"file": filename, "error": error, "attempts": attempt})
+                continue
+            if not separate_files:
+                written.append(filename)
+            report["converted"].append(filename)
+
+        if sink is None:
+            rebuild_sink()
+    except BaseException:
+        if sink is not None:
+            _abort_sink(sink)
+        raise
+    else:
+        with span("save"):
+            sink.close()
+    finally:
+        worker.stop()
+        com_uninitialize()
+        quarantine.save()
+
+    report_path = os.path.join(output_root, CACHE_DIR_NAME, FAILURE_REPORT_NAME)
+    if report["failed"]:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"{len(report['failed'])}个文件转换失败，已隔离，详见{report_path}")
+        for failure in report["failed"]:
+            print(f"  {failure['file']}: {failure['error']}")
+    elif os.path.exists(report_path):
+        os.remove(report_path)
+    return report
@@ -0,0 +1,128 @@
+"""
+多目标导出的写入器。
+
+每个Visio文件只打开一次、每页只导出一次，导出的图片依次交给多个写入器：
+合并文档(output.docx)、单独文档(Converted_Files/原文件名.docx)以及
+图片目录(Converted_Files/原文件名/Page_1.png……，与visio_to_images的输出相同)。
+"""
+import os
+import shutil
+
+TARGET_MERGED = "merged"
+TARGET_SEPARATE = "separate"
+TARGET_IMAGES = "images"
+ALL_TARGETS = (TARGET_MERGED, TARGET_SEPARATE, TARGET_IMAGES)
+
+# 图片目录与文档共用同一次导出，只支持Word也能插入的格式
+IMAGE_FORMATS = ("PNG", "JPG", "GIF", "BMP")
+
+
+def image_dir_path(output_dir, filename):
+    """返回Visio文件对应的图片目录: output_dir/Converted_Files/原文件名/"""
+    return os.path.join(output_dir, "Converted_Files", os.path.splitext(filename)[0])
+
+
+def normalize_targets(targets):
+    """
+    检查输出目标并按固定顺序返回。
+
+    返回:
+        tuple: ALL_TARGETS中被选中的目标
+
+    异常:
+        ValueError: 包含未知目标或没有选择任何目标
+    """
+    unknown = set(targets) - set(ALL_TARGETS)
+    if unknown:
+        raise ValueError(f"未知的输出目标: {', '.join(sorted(unknown))}")
+    selected = tuple(target for target in ALL_TARGETS if target in targets)
+    if not selected:
+        raise ValueError("至少需要选择一个输出目标")
+    return selected
+
+
+class ImageDirSink:
+    """
+    把每页图片复制到文件对应的图片目录，文件开始时清空该目录，避免残留页数减少前的旧图片。
+
+    参数:
+        output_dir (str): 输出所在目录(Converted_Files的父目录)
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.current_dir = None
+        self.page = 0
+
+    def resume_point(self, file_list):
+        return 0
+
+    def begin_file(self, filename):
+        self.current_dir = image_dir_path(self.output_dir, filename)
+        shutil.rmtree(self.current_dir, ignore_errors=True)
+        os.makedirs(self.current_dir)
+        self.page = 0
+
+    def add_picture(self, image_path, is_last_page):
+        self.page += 1
+        extension = os.path.splitext(image_path)[1].lower()
+        shutil.copyfile(image_path, os.path.join(self.current_dir, f"Page_{self.page}{extension}"))
+
+    def add_vector_picture(self, vector_path, fallback_path, is_last_page):
+        self.add_picture(vector_path, is_last_page)
+
+    def end_file(self, filename):
+        self.current_dir = None
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class FanOutSink:
+    """
+    把每次调用依次转发给多个写入器。
+
+    参数:
+        sinks (list): 写入器列表，会原地修改图片的写入器(如ImageStageSink)应放在最后
+
+    注意:
+    - 各写入器的断点不一定一致，不支持断点续写，创建合并文档写入器时应关闭续写
+    - 不能再被VolumeSink包装，分卷应作用于其中的合并文档写入器
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def resume_point(self, file_list):
+        return 0
+
+    def begin_file(self, filename):
+        for sink in self.sinks:
+            sink.begin_file(filename)
+
+    def add_picture(self, image_path, is_last_page):
+        for sink in self.sinks:
+            sink.add_picture(image_path, is_last_page)
+
+    def add_vector_picture(self, vector_path, fallback_path, is_last_page):
+        for sink in self.sinks:
+            sink.add_vector_picture(vector_path, fallback_path, is_last_page)
+
+    def end_file(self, filename):
+        for sink in self.sinks:
+            sink.end_file(filename)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def abort(self):
+        # 某个写入器出错时仍然让其余写入器结束(丢弃内容或写检查点)
+        for sink in self.sinks:
+            try:
+                sink.abort()
+            except Exception as e:
+                print(f"结束写入器失败: {e}")
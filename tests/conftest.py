@@ -0,0 +1,116 @@
+"""
+测试共用的夹具：合成.vsdx样本、记录(并可注入失败)的模拟Visio导出，以及读取生成文档的辅助函数。
+
+测试全部使用fake_office中的模拟Visio/Word，不需要Windows与Office。
+"""
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+from lxml import etree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_office  # noqa: E402
+from benchmark import write_synthetic_vsdx  # noqa: E402
+from docx_patch import BOOKMARK_PREFIX, W_NS  # noqa: E402
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    返回生成合成.vsdx的函数：corpus({"a.vsdx": 页数, ...}, seed=0)，返回样本目录。
+
+    同一个文件以不同seed重新生成即可模拟内容被修改。
+    """
+
+    def make(pages_by_file, seed=0):
+        for index, (filename, pages) in enumerate(pages_by_file.items()):
+            write_synthetic_vsdx(
+                str(tmp_path / filename), pages=pages, shapes_per_page=2, seed=seed + index
+            )
+        return str(tmp_path)
+
+    return make
+
+
+class ExportLog:
+    """记录模拟Visio每次page.Export的(文件名, 页码)，fail_at中的页面导出时抛出RuntimeError"""
+
+    def __init__(self):
+        self.exports = []
+        self.fail_at = set()
+
+    def files(self):
+        return sorted({filename for filename, _ in self.exports})
+
+
+@pytest.fixture
+def export_log(monkeypatch):
+    log = ExportLog()
+    original = fake_office.FakeVisioPage.Export
+
+    def export(page, path):
+        # 临时图片名为temp_<文件名>_<页码>.<扩展名>，见core.temp_image_path
+        stem = os.path.splitext(os.path.basename(path))[0]
+        filename, _, number = stem[len("temp_"):].rpartition("_")
+        key = (filename, int(number))
+        if key in log.fail_at:
+            log.fail_at.discard(key)
+            raise RuntimeError(f"模拟Export失败: {path}")
+        log.exports.append(key)
+        return original(page, path)
+
+    monkeypatch.setattr(fake_office.FakeVisioPage, "Export", export)
+    return log
+
+
+def document_sections(path):
+    """
+    读取合并文档中各文件书签范围内的图片数。
+
+    返回:
+        list: 按文档顺序排列的(书签名, 图片数)
+    """
+    with zipfile.ZipFile(path) as package:
+        root = etree.fromstring(package.read("word/document.xml"))
+    sections = []
+    open_id = None
+    for element in root.iter(f"{{{W_NS}}}bookmarkStart", f"{{{W_NS}}}bookmarkEnd", f"{{{W_NS}}}drawing"):
+        if element.tag == f"{{{W_NS}}}bookmarkStart":
+            name = element.get(f"{{{W_NS}}}name")
+            if name.startswith(BOOKMARK_PREFIX):
+                open_id = element.get(f"{{{W_NS}}}id")
+                sections.append([name, 0])
+        elif element.tag == f"{{{W_NS}}}bookmarkEnd":
+            if element.get(f"{{{W_NS}}}id") == open_id:
+                open_id = None
+        elif open_id is not None:
+            sections[-1][1] += 1
+    return [tuple(section) for section in sections]
+
+
+def picture_count(path):
+    """文档中的图片数"""
+    with zipfile.ZipFile(path) as package:
+        return package.read("word/document.xml").count(b"<w:drawing>")
+
+
+def page_breaks(path):
+    """合并文档中各页图片所在段落是否设置了段前分页，按文档顺序排列"""
+    with zipfile.ZipFile(path) as package:
+        root = etree.fromstring(package.read("word/document.xml"))
+    return [
+        paragraph.find(f"{{{W_NS}}}pPr/{{{W_NS}}}pageBreakBefore") is not None
+        for paragraph in root.iter(f"{{{W_NS}}}p")
+        if paragraph.find(f".//{{{W_NS}}}drawing") is not None
+    ]
+
+
+def word_items(path):
+    """模拟Word保存的文档内容：[(类型, 图片SHA1或分页符类型)]，见fake_office.FakeWordDocument.SaveAs"""
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)["items"]
+    return [(item["type"], item.get("sha1", item.get("value"))) for item in items]
@@ -0,0 +1,44 @@
+"""性能基准：合成样本的结构与在子进程中运行的用例"""
+import zipfile
+
+import pytest
+
+import benchmark
+from fake_office import FakeVisioApp
+
+
+def test_synthetic_vsdx_has_requested_pages_and_shapes(tmp_path):
+    path = str(tmp_path / "a.vsdx")
+    benchmark.write_synthetic_vsdx(path, pages=3, shapes_per_page=4, seed=1)
+
+    with zipfile.ZipFile(path) as package:
+        page_xml = package.read("visio/pages/page2.xml")
+    document = FakeVisioApp().Documents.Open(path)
+
+    assert document.Pages.Count == 3
+    assert [document.Pages.Item(i).Name for i in (1, 2, 3)] == ["Page-1", "Page-2", "Page-3"]
+    assert page_xml.count(b"<Shape ") == 4
+
+
+def test_same_seed_generates_same_content(tmp_path):
+    paths = [str(tmp_path / name) for name in ("a.vsdx", "b.vsdx", "c.vsdx")]
+    for path, seed in zip(paths, (1, 1, 2)):
+        benchmark.write_synthetic_vsdx(path, pages=1, shapes_per_page=5, seed=seed)
+
+    def page(path):
+        with zipfile.ZipFile(path) as package:
+            return package.read("visio/pages/page1.xml")
+
+    assert page(paths[0]) == page(paths[1]) != page(paths[2])
+
+
+def test_cases_report_throughput(tmp_path):
+    results = benchmark.run_benchmark(
+        "small", "none", ["export_png/docx", "copy_paste"], root=str(tmp_path)
+    )
+
+    assert [result["case"] for result in results] == ["export_png/docx", "copy_paste"]
+    for result in results:
+        assert result["error"] is None
+        assert result["files_per_sec"] > 0
+        assert result["pages_per_sec"] == pytest.approx(result["files_per_sec"] * 2)
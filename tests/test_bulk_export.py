@@ -0,0 +1,66 @@
+"""批量导出：一次另存为网页得到与逐页导出相同的图片，图片数不符时改为逐页导出"""
+import os
+
+import fake_office
+from conftest import word_items
+from core import visio_to_word_export_png
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+
+FILES = {"a.vsdx": 3, "b.vsdx": 10}
+
+
+def convert(visio_dir, bulk_export, use_page_cache=False):
+    visio_to_word_export_png(
+        visio_dir,
+        list(FILES),
+        visio_factory=FakeVisioFactory(),
+        office_factory=FakeOfficeFactory(),
+        use_page_cache=use_page_cache,
+        doc_backend="com",
+        volume_pages=0,
+        volume_bytes=0,
+        bulk_export=bulk_export,
+    )
+    assert not [name for name in os.listdir(visio_dir) if name.startswith("temp_")]
+    return word_items(os.path.join(visio_dir, "output.docx"))
+
+
+def test_bulk_export_matches_page_export(corpus, export_log):
+    visio_dir = corpus(FILES)
+    expected = convert(visio_dir, bulk_export=False)
+    export_log.exports.clear()
+
+    # 第10页排在第9页之后，不按文件名的字典序
+    assert convert(visio_dir, bulk_export=True) == expected
+    assert export_log.exports == []
+
+
+def test_image_count_mismatch_falls_back_to_page_export(corpus, export_log, monkeypatch):
+    visio_dir = corpus(FILES)
+    expected = convert(visio_dir, bulk_export=False)
+    export_log.exports.clear()
+    create_pages = fake_office.FakeSaveAsWeb.CreatePages
+
+    def create_too_few_pages(save_as_web):
+        save_as_web.WebPageSettings.EndPage -= 1
+        return create_pages(save_as_web)
+
+    monkeypatch.setattr(fake_office.FakeSaveAsWeb, "CreatePages", create_too_few_pages)
+
+    assert convert(visio_dir, bulk_export=True) == expected
+    assert len(export_log.exports) == sum(FILES.values())
+
+
+def test_cached_pages_skip_the_bulk_export(corpus, monkeypatch):
+    visio_dir = corpus(FILES)
+    expected = convert(visio_dir, bulk_export=True, use_page_cache=True)
+    calls = []
+    create_pages = fake_office.FakeSaveAsWeb.CreatePages
+    monkeypatch.setattr(
+        fake_office.FakeSaveAsWeb,
+        "CreatePages",
+        lambda save_as_web: calls.append(1) or create_pages(save_as_web),
+    )
+
+    assert convert(visio_dir, bulk_export=True, use_page_cache=True) == expected
+    assert calls == []
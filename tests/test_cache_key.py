@@ -0,0 +1,86 @@
+"""转换设置变化时缓存失效，相同设置下命中缓存"""
+import json
+
+import pytest
+
+import core
+from core import create_conversion_cache, run_visio_task, visio_to_word_export_png
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+from native_render import NativeVisioFactory
+
+FILES = {"a.vsdx": 1, "b.vsdx": 2}
+
+
+@pytest.fixture(autouse=True)
+def no_taskkill(monkeypatch):
+    monkeypatch.setattr(core, "kill_visio_processes", lambda: None)
+    monkeypatch.setattr(core, "kill_word_processes", lambda word_processor="Word": None)
+
+
+def settings(visio_dir, **kwargs):
+    cache = create_conversion_cache(
+        visio_dir, visio_to_word_export_png, separate_files=True, **kwargs
+    )
+    return json.loads(cache.settings)
+
+
+def convert(visio_dir, **kwargs):
+    """执行一次带缓存的转换，返回实际转换的文件"""
+    converted = []
+    run_visio_task(
+        visio_dir,
+        visio_to_word_export_png,
+        separate_files=True,
+        update_progress=lambda filename, current, total: converted.append(filename),
+        visio_factory=FakeVisioFactory(),
+        office_factory=FakeOfficeFactory(),
+        **kwargs,
+    )
+    return converted
+
+
+def test_unchanged_settings_hit_the_cache(corpus):
+    visio_dir = corpus(FILES)
+    assert convert(visio_dir) == list(FILES)
+    assert convert(visio_dir) == []
+
+    corpus({"b.vsdx": 3}, seed=60)
+    assert convert(visio_dir) == ["b.vsdx"]
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [{"doc_backend": "com"}, {"word_processor": "WPS"}, {"bulk_export": True}],
+)
+def test_changed_argument_invalidates_the_cache(corpus, changed):
+    visio_dir = corpus(FILES)
+    convert(visio_dir)
+    assert convert(visio_dir, **changed) == list(FILES)
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [("DOC_BACKEND", "com"), ("VOLUME_MAX_PAGES", 10), ("IMAGE_FORMAT", "jpeg")],
+)
+def test_config_defaults_are_part_of_the_key(corpus, monkeypatch, name, value):
+    visio_dir = corpus(FILES)
+    before = settings(visio_dir)
+    monkeypatch.setattr(core, name, value)
+    assert settings(visio_dir) != before
+
+
+def test_explicit_value_equal_to_config_default_shares_the_key(corpus):
+    visio_dir = corpus(FILES)
+    assert settings(visio_dir) == settings(visio_dir, doc_backend=core.DOC_BACKEND)
+
+
+def test_renderer_is_part_of_the_key(corpus, monkeypatch):
+    visio_dir = corpus(FILES)
+    visio = settings(visio_dir, visio_factory=FakeVisioFactory())
+    native = settings(visio_dir, visio_factory=NativeVisioFactory())
+    assert visio["renderer"] == "visio"
+    assert native["renderer"] != visio["renderer"]
+
+    # 默认工厂按VISIO_BACKEND区分
+    monkeypatch.setattr(core, "VISIO_BACKEND", "native")
+    assert settings(visio_dir)["renderer"] == native["renderer"]
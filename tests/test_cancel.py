@@ -0,0 +1,74 @@
+"""通过async_jobs取消转换：已完成的文件保留，合并输出保持上次完整的文档"""
+import asyncio
+import os
+
+from async_jobs import FileStarted, start_conversion
+from core import visio_to_word_export_png
+from fake_office import FakeVisioFactory
+
+FILES = {"a.vsdx": 1, "b.vsdx": 2, "c.vsdx": 1, "d.vsdx": 1}
+
+
+def run_cancelled(visio_dir, cancel_before, **kwargs):
+    """转换到第cancel_before个文件时请求取消，返回(结束事件, 开始转换的文件)"""
+
+    async def main():
+        holder = {}
+
+        def update_progress(filename, current, total):
+            # 在转换线程中同步取消，结果不受事件投递时机影响
+            if current == cancel_before:
+                holder["job"].cancel()
+
+        job = start_conversion(
+            visio_dir,
+            visio_to_word_export_png,
+            kill_processes=False,
+            update_progress=update_progress,
+            visio_factory=FakeVisioFactory(),
+            volume_pages=0,
+            volume_bytes=0,
+            **kwargs,
+        )
+        holder["job"] = job
+        started = [event.file async for event in job if isinstance(event, FileStarted)]
+        return await job.wait(), started
+
+    return asyncio.run(main())
+
+
+def test_cancel_keeps_finished_separate_documents(corpus):
+    visio_dir = corpus(FILES)
+
+    finished, started = run_cancelled(visio_dir, 2, separate_files=True, doc_backend="docx")
+
+    assert finished.status == "cancelled"
+    assert started == ["a.vsdx", "b.vsdx"]
+    converted = {
+        name
+        for name in os.listdir(os.path.join(visio_dir, "Converted_Files"))
+        if name.endswith(".docx")
+    }
+    assert converted == {"a.docx", "b.docx"}
+
+
+def test_cancel_keeps_previous_merged_document(corpus):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    finished, _ = run_cancelled(visio_dir, 0, doc_backend="docx")
+    assert finished.status == "done"
+    with open(output_path, "rb") as f:
+        previous = f.read()
+
+    corpus({"c.vsdx": 3}, seed=50)
+    for doc_backend in ("docx", "stream"):
+        finished, _ = run_cancelled(visio_dir, 3, doc_backend=doc_backend, force=True)
+        assert finished.status == "cancelled"
+        with open(output_path, "rb") as f:
+            assert f.read() == previous
+
+    # 取消的运行没有记录到缓存，下次转换仍会更新修改过的文件
+    finished, _ = run_cancelled(visio_dir, 0, doc_backend="docx")
+    assert finished.status == "done" and finished.stats["converted"] == 1
+    with open(output_path, "rb") as f:
+        assert f.read() != previous
@@ -0,0 +1,46 @@
+"""清单任务在常驻应用会话中执行：出错或取消后不把未完成的文档留在应用中"""
+import pytest
+
+from async_jobs import ConversionCancelled
+from cli import normalize_job, run_job
+from fake_office import FakeVisioFactory, FakeWordApp
+from session import AppSession
+
+FILES = {"a.vsdx": 1, "b.vsdx": 2, "c.vsdx": 1}
+
+
+class RecordingOfficeFactory:
+    """记录创建的模拟Word实例"""
+
+    def __init__(self):
+        self.apps = []
+
+    def __call__(self, app_type="Word"):
+        self.apps.append(FakeWordApp())
+        return self.apps[-1]
+
+
+def stop_at_last_file(error):
+    def update_progress(filename, current, total):
+        if current == total:
+            raise error
+
+    return update_progress
+
+
+@pytest.mark.parametrize(
+    "error, status", [(RuntimeError("模拟转换出错"), "失败"), (ConversionCancelled(), "已取消")]
+)
+def test_interrupted_job_leaves_no_document_open(corpus, error, status):
+    visio_dir = corpus(FILES)
+    office_factory = RecordingOfficeFactory()
+    job = normalize_job(
+        {"dir": visio_dir, "doc_backend": "com", "volume_pages": 0, "volume_bytes": 0}
+    )
+
+    with AppSession(FakeVisioFactory(), office_factory) as session:
+        summary = run_job(job, session, update_progress=stop_at_last_file(error))
+
+        assert summary["status"] == status
+        assert not session.started
+        assert [(app.Documents.Count, app.quit) for app in office_factory.apps] == [(0, True)]
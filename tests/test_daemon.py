@@ -0,0 +1,109 @@
+"""常驻转换服务：令牌校验、任务提交与进度事件、取消等待中的任务"""
+import json
+import os
+import socket
+import stat
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import daemon
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+
+HOST = "127.0.0.1"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """在后台线程中启动服务，返回端口；结束时通过/shutdown停止"""
+    monkeypatch.setattr(daemon, "DAEMON_TOKEN_DIR", str(tmp_path))
+    port = free_port()
+    thread = threading.Thread(
+        target=daemon.serve,
+        kwargs={
+            "host": HOST,
+            "port": port,
+            "visio_factory": FakeVisioFactory(page_latency=0.05),
+            "office_factory": FakeOfficeFactory(),
+        },
+        daemon=True,
+    )
+    thread.start()
+    deadline = time.time() + 10
+    while not daemon.daemon_available(HOST, port):
+        assert time.time() < deadline, "服务未启动"
+        time.sleep(0.05)
+    yield port
+    daemon._request("/shutdown", {}, HOST, port).read()
+    thread.join(timeout=30)
+    assert not os.path.exists(daemon.token_path(port))
+
+
+def post(port, path, headers):
+    request = urllib.request.Request(
+        f"http://{HOST}:{port}{path}", data=b"{}", headers=headers
+    )
+    return urllib.request.urlopen(request, timeout=10)
+
+
+def test_token_file_is_private(service):
+    mode = os.stat(daemon.token_path(service)).st_mode
+    assert stat.S_IMODE(mode) == 0o600
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {"Content-Type": "application/json"},
+        {"Content-Type": "application/json", daemon.TOKEN_HEADER: "wrong"},
+        {"Content-Type": "application/json", "Origin": "http://example.com"},
+    ],
+)
+def test_requests_without_valid_token_are_rejected(service, headers):
+    if "Origin" in headers:
+        headers[daemon.TOKEN_HEADER] = daemon.read_token(service)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(service, "/shutdown", headers)
+    assert error.value.code == 403
+    assert daemon.daemon_available(HOST, service)
+
+
+def test_job_runs_and_streams_progress(service, corpus):
+    visio_dir = corpus({"a.vsdx": 1, "b.vsdx": 2})
+    progress = []
+
+    summary = daemon.run_remote(
+        {"dir": visio_dir, "volume_pages": 0, "volume_bytes": 0},
+        lambda filename, current, total: progress.append((filename, current, total)),
+        HOST,
+        service,
+    )
+
+    assert summary["status"] != "失败", summary
+    assert [(current, total) for _, current, total in progress][-1] == (2, 2)
+    assert os.path.exists(os.path.join(visio_dir, "output.docx"))
+
+
+def test_cancelled_queued_job_does_not_run(service, corpus):
+    visio_dir = corpus({"a.vsdx": 3, "b.vsdx": 3})
+    spec = {"dir": visio_dir, "volume_pages": 0, "volume_bytes": 0}
+    # 第一个任务占住工作线程，第二个任务在等待中被取消
+    first = daemon.submit_job(spec, HOST, service)
+    second = daemon.submit_job(dict(spec, force=True), HOST, service)
+    daemon.cancel_job(second, HOST, service)
+
+    events = list(daemon.stream_events(second, HOST, service))
+
+    assert events[-1]["summary"]["status"] == "已取消"
+    assert not any(event["type"] == "progress" for event in events)
+    with daemon._request(f"/jobs/{first}", host=HOST, port=service) as response:
+        assert json.load(response)["status"] in ("running", "done")
@@ -0,0 +1,100 @@
+"""python-docx直接生成文档：与通过Word插入的图片、尺寸和分页一致"""
+import hashlib
+import os
+import zipfile
+
+import pytest
+from lxml import etree
+
+from conftest import page_breaks, word_items
+from core import visio_to_word_export_png
+from docx_patch import merge_converted_docx
+from docx_sink import EMU_PER_INCH, fit_picture_size
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+
+FILES = {"a.vsdx": 2, "b.vsdx": 1, "c.vsdx": 2}
+PAGES = sum(FILES.values())
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def embedded_images(path):
+    """文档中按顺序出现的图片SHA1"""
+    with zipfile.ZipFile(path) as package:
+        rels = etree.fromstring(package.read("word/_rels/document.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+        document = etree.fromstring(package.read("word/document.xml"))
+        return [
+            hashlib.sha1(package.read("word/" + targets[blip.get(f"{{{R_NS}}}embed")])).hexdigest()
+            for blip in document.iter(f"{{{A_NS}}}blip")
+        ]
+
+
+def convert(visio_dir, doc_backend, separate_files=False):
+    visio_to_word_export_png(
+        visio_dir,
+        list(FILES),
+        separate_files=separate_files,
+        visio_factory=FakeVisioFactory(),
+        office_factory=FakeOfficeFactory(),
+        use_page_cache=False,
+        doc_backend=doc_backend,
+    )
+    return os.path.join(visio_dir, "output.docx")
+
+
+@pytest.mark.parametrize("doc_backend", ["docx", "stream"])
+def test_only_the_first_page_has_no_break(corpus, doc_backend):
+    output_path = convert(corpus(FILES), doc_backend)
+
+    assert page_breaks(output_path) == [False] + [True] * (PAGES - 1)
+
+
+def test_word_inserts_a_break_between_every_page(corpus):
+    output_path = convert(corpus(FILES), "com")
+
+    kinds = [kind for kind, _ in word_items(output_path)]
+    assert kinds == ["picture"] + ["break", "picture"] * (PAGES - 1)
+
+
+def test_large_pictures_shrink_to_the_usable_area():
+    inch = EMU_PER_INCH
+    assert fit_picture_size(96, 192, 96, 96, 4 * inch, 4 * inch) == (inch, 2 * inch)
+    # 未声明分辨率(python-docx返回72)按96 DPI计算
+    assert fit_picture_size(96, 96, 72, 72, 4 * inch, 4 * inch) == (inch, inch)
+    assert fit_picture_size(960, 480, 96, 96, 5 * inch, 4 * inch) == (5 * inch, int(2.5 * inch))
+    assert fit_picture_size(480, 960, 96, 96, 5 * inch, 4 * inch) == (2 * inch, 4 * inch)
+
+
+def test_docx_embeds_the_pictures_word_would_insert(corpus):
+    visio_dir = corpus(FILES)
+    output_path = convert(visio_dir, "com")
+    inserted = [sha1 for kind, sha1 in word_items(output_path) if kind == "picture"]
+
+    output_path = convert(visio_dir, "docx")
+
+    assert embedded_images(output_path) == inserted
+    assert len(inserted) == PAGES
+
+
+def test_separate_documents_are_written_per_file(corpus):
+    visio_dir = corpus(FILES)
+    convert(visio_dir, "docx", separate_files=True)
+
+    converted = os.path.join(visio_dir, "Converted_Files")
+    assert sorted(name for name in os.listdir(converted) if name.endswith(".docx")) == [
+        "a.docx",
+        "b.docx",
+        "c.docx",
+    ]
+    assert len(embedded_images(os.path.join(converted, "c.docx"))) == FILES["c.vsdx"]
+    assert not os.path.exists(os.path.join(visio_dir, "output.docx"))
+
+
+def test_merged_converted_documents_match(corpus):
+    visio_dir = corpus(FILES)
+    convert(visio_dir, "docx", separate_files=True)
+
+    merge_converted_docx(visio_dir, list(FILES))
+
+    assert page_breaks(os.path.join(visio_dir, "output.docx")) == [False] + [True] * (PAGES - 1)
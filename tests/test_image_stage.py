@@ -0,0 +1,89 @@
+"""图片后处理：缩小后显示尺寸不变，流式写入时内容相同的图片只保存一份，复制粘贴的页面原样写入"""
+import os
+import shutil
+import zipfile
+
+import pytest
+
+import image_stage
+from conftest import word_items
+from core import visio_to_word_copy_paste
+from docx_sink import picture_size
+from docx_stream import StreamingDocxSink
+from fake_office import FakeOfficeFactory, FakeVisioFactory, make_png
+from image_stage import ImageOptions, process_image
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def write_png(path, width, height, seed=b""):
+    with open(path, "wb") as f:
+        f.write(make_png(width, height, seed))
+    return str(path)
+
+
+def test_downscaled_image_keeps_its_display_size(tmp_path):
+    image_path = write_png(tmp_path / "page.png", 400, 200)
+    size = picture_size(image_path)
+
+    output_path = process_image(image_path, ImageOptions(max_width=100, target_dpi=0, image_format=""))
+
+    with Image.open(output_path) as image:
+        assert image.size == (100, 50)
+    assert picture_size(output_path) == pytest.approx(size, rel=0.01)
+
+
+def test_jpeg_conversion_writes_a_new_file(tmp_path):
+    image_path = write_png(tmp_path / "page.png", 64, 32)
+
+    output_path = process_image(image_path, ImageOptions(0, 0, "jpeg", 80))
+
+    assert output_path == str(tmp_path / "page.jpg")
+    with Image.open(output_path) as image:
+        assert (image.format, image.size) == ("JPEG", (64, 32))
+
+
+def test_small_image_is_left_untouched(tmp_path):
+    image_path = write_png(tmp_path / "page.png", 64, 32)
+    with open(image_path, "rb") as f:
+        original = f.read()
+
+    assert process_image(image_path, ImageOptions(max_width=100, target_dpi=0, image_format="")) == image_path
+    with open(image_path, "rb") as f:
+        assert f.read() == original
+
+
+@pytest.mark.parametrize("dedup, stored", [(True, 2), (False, 3)])
+def test_identical_images_are_stored_once(tmp_path, dedup, stored):
+    first = write_png(tmp_path / "first.png", 32, 32, b"same")
+    second = write_png(tmp_path / "second.png", 32, 32, b"other")
+    repeated = str(tmp_path / "repeated.png")
+    shutil.copyfile(first, repeated)
+
+    sink = StreamingDocxSink(str(tmp_path), resume=False, dedup=dedup)
+    sink.begin_file("a.vsdx")
+    for image_path, is_last_page in ((first, False), (second, False), (repeated, True)):
+        sink.add_picture(image_path, is_last_page)
+    sink.end_file("a.vsdx")
+    sink.close()
+
+    with zipfile.ZipFile(os.path.join(str(tmp_path), "output.docx")) as package:
+        media = [name for name in package.namelist() if name.startswith("word/media/")]
+        assert len(media) == stored
+        assert package.read("word/document.xml").count(b"<w:drawing>") == 3
+
+
+def test_pasted_pages_pass_through(corpus, monkeypatch):
+    monkeypatch.setattr(image_stage, "IMAGE_FORMAT", "jpeg")
+    visio_dir = corpus({"a.vsdx": 2})
+
+    visio_to_word_copy_paste(
+        visio_dir,
+        ["a.vsdx"],
+        volume_pages=0,
+        visio_factory=FakeVisioFactory(),
+        office_factory=FakeOfficeFactory(),
+    )
+
+    items = word_items(os.path.join(visio_dir, "output.docx"))
+    assert [item_type for item_type, _ in items].count("paste") == 2
@@ -0,0 +1,152 @@
+"""合并文档的增量更新(按书签就地替换)与单独文档的拼接"""
+import json
+import os
+import zipfile
+
+import pytest
+
+from conftest import document_sections, page_breaks, picture_count
+from core import run_visio_task, visio_to_word_export_png
+from docx_patch import (
+    load_merged_index,
+    merge_converted_docx,
+    patch_merged_docx,
+    write_merged_index,
+)
+from fake_office import FakeVisioFactory
+
+FILES = {"a.vsdx": 1, "b.vsdx": 2, "c.vsdx": 3}
+
+
+def convert(visio_dir, doc_backend, **kwargs):
+    stats = {}
+    run_visio_task(
+        visio_dir,
+        visio_to_word_export_png,
+        kill_processes=False,
+        stats=stats,
+        visio_factory=FakeVisioFactory(),
+        doc_backend=doc_backend,
+        volume_pages=0,
+        volume_bytes=0,
+        **kwargs,
+    )
+    return stats
+
+
+def index_files(output_path):
+    return [entry["file"] for entry in load_merged_index(output_path)["files"]]
+
+
+@pytest.mark.parametrize("doc_backend", ["docx", "stream"])
+def test_changed_file_is_patched_in_place(corpus, export_log, doc_backend):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    convert(visio_dir, doc_backend)
+    assert [pages for _, pages in document_sections(output_path)] == [1, 2, 3]
+
+    corpus({"b.vsdx": 4}, seed=20)
+    export_log.exports.clear()
+    stats = convert(visio_dir, doc_backend)
+
+    assert export_log.files() == ["b.vsdx"]
+    assert (stats["converted"], stats["skipped"]) == (1, 2)
+    assert index_files(output_path) == ["a.vsdx", "b.vsdx", "c.vsdx"]
+    assert [pages for _, pages in document_sections(output_path)] == [1, 4, 3]
+
+
+def test_deleted_file_only_adjusts_the_document(corpus, export_log):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    convert(visio_dir, "docx")
+
+    os.remove(os.path.join(visio_dir, "b.vsdx"))
+    export_log.exports.clear()
+    convert(visio_dir, "docx")
+
+    assert export_log.exports == []
+    assert index_files(output_path) == ["a.vsdx", "c.vsdx"]
+    assert [pages for _, pages in document_sections(output_path)] == [1, 3]
+
+
+def test_file_moved_to_the_front_loses_its_page_break(corpus):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    convert(visio_dir, "docx")
+
+    patch_merged_docx(output_path, ["c.vsdx", "a.vsdx", "b.vsdx"])
+
+    assert [pages for _, pages in document_sections(output_path)] == [3, 1, 2]
+    assert page_breaks(output_path) == [False] + [True] * 5
+
+
+def test_media_still_used_by_a_header_is_kept(corpus):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    convert(visio_dir, "docx")
+
+    # 页眉以包内绝对路径引用正文中的第一张图片
+    with zipfile.ZipFile(output_path) as package:
+        media = sorted(name for name in package.namelist() if name.startswith("word/media/"))
+    with zipfile.ZipFile(output_path, "a") as package:
+        package.writestr(
+            "word/_rels/header1.xml.rels",
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="/' + media[0] + '" Type="http://schemas.openxmlformats.'
+            'org/officeDocument/2006/relationships/image"/></Relationships>',
+        )
+    write_merged_index(output_path, list(FILES))
+
+    patch_merged_docx(output_path, ["a.vsdx", "c.vsdx"])
+
+    with zipfile.ZipFile(output_path) as package:
+        assert media[0] in package.namelist()
+
+
+def test_modified_output_is_rebuilt(corpus, export_log):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    convert(visio_dir, "docx")
+
+    # 手动保存过的output.docx与索引不符，不能就地更新
+    with open(output_path, "ab") as f:
+        f.write(b"\0")
+    corpus({"c.vsdx": 1}, seed=30)
+    export_log.exports.clear()
+    stats = convert(visio_dir, "docx")
+
+    assert stats["converted"] == 3
+    assert export_log.files() == ["c.vsdx"]  # 未修改的页面来自页面缓存
+    assert [pages for _, pages in document_sections(output_path)] == [1, 2, 1]
+
+
+def test_index_mismatch_falls_back_to_full_rebuild(corpus, export_log):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    convert(visio_dir, "docx")
+
+    # 索引指向文档中不存在的书签：不能跳过该文件，改为完整重建
+    index_path = os.path.join(visio_dir, "Converted_Files", ".merged_index.json")
+    with open(index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    index["files"][0]["bookmark"] = "_V2W_99"
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    corpus({"b.vsdx": 1}, seed=40)
+    stats = convert(visio_dir, "docx")
+
+    assert stats["skipped"] == 0
+    assert [pages for _, pages in document_sections(output_path)] == [1, 1, 3]
+
+
+def test_merge_separate_documents_in_given_order(corpus):
+    visio_dir = corpus(FILES)
+    convert(visio_dir, "docx", separate_files=True)
+
+    merged = merge_converted_docx(visio_dir, ["c.vsdx", "a.vsdx"])
+
+    output_path = os.path.join(visio_dir, "output.docx")
+    assert merged == ["c.vsdx", "a.vsdx"]
+    assert picture_count(output_path) == 4
+    assert index_files(output_path) == ["c.vsdx", "a.vsdx"]
+    assert [pages for _, pages in document_sections(output_path)] == [3, 1]
@@ -0,0 +1,76 @@
+"""SQLite子任务队列的租约过期与重新分配"""
+import time
+
+import pytest
+
+from job_queue import SqliteTaskQueue
+
+LEASE_SECONDS = 0.2
+
+
+@pytest.fixture
+def task_queue(tmp_path):
+    return SqliteTaskQueue(
+        str(tmp_path / "queue.sqlite3"), lease_seconds=LEASE_SECONDS, max_attempts=2
+    )
+
+
+def add_tasks(task_queue, *filenames):
+    return task_queue.create_batch(
+        [(0, filename, {"dir": "d", "files": [filename]}) for filename in filenames]
+    )
+
+
+def test_active_lease_is_not_reassigned(task_queue):
+    add_tasks(task_queue, "a.vsdx")
+    task = task_queue.lease("w1")
+    assert task["filename"] == "a.vsdx" and task["attempts"] == 1
+    assert task_queue.lease("w2") is None
+
+    # 心跳续租后仍不会分配给其他工作进程
+    time.sleep(LEASE_SECONDS * 0.6)
+    assert task_queue.heartbeat(task["id"], "w1")
+    time.sleep(LEASE_SECONDS * 0.6)
+    assert task_queue.lease("w2") is None
+
+
+def test_expired_lease_is_reassigned(task_queue):
+    batch_id = add_tasks(task_queue, "a.vsdx")
+    task = task_queue.lease("w1")
+    time.sleep(LEASE_SECONDS * 1.5)
+
+    retry = task_queue.lease("w2")
+    assert retry["id"] == task["id"] and retry["attempts"] == 2
+
+    # 原工作进程失去租约，迟到的心跳与结果都被拒绝
+    assert not task_queue.heartbeat(task["id"], "w1")
+    assert not task_queue.complete(task["id"], "w1", {"status": "成功"})
+    assert task_queue.complete(retry["id"], "w2", {"status": "成功"})
+    [row] = task_queue.tasks(batch_id)
+    assert (row["status"], row["worker"], row["result"]) == ("done", "w2", {"status": "成功"})
+    assert task_queue.unfinished() == 0
+
+
+def test_lease_expiring_too_often_marks_task_failed(task_queue):
+    batch_id = add_tasks(task_queue, "crash.vsdx", "b.vsdx")
+    for worker in ("w1", "w2"):
+        assert task_queue.lease(worker)["filename"] == "crash.vsdx"
+        time.sleep(LEASE_SECONDS * 1.5)
+
+    # 达到max_attempts的子任务不再分配，继续分配后面的子任务
+    assert task_queue.lease("w3")["filename"] == "b.vsdx"
+    crashed = task_queue.tasks(batch_id)[0]
+    assert crashed["status"] == "failed" and crashed["attempts"] == 2
+    assert "租约仍过期" in crashed["error"]
+
+
+def test_failed_task_is_requeued_until_max_attempts(task_queue):
+    batch_id = add_tasks(task_queue, "a.vsdx")
+    task = task_queue.lease("w1")
+    assert task_queue.fail(task["id"], "w1", "导出失败")
+    assert task_queue.tasks(batch_id)[0]["status"] == "pending"
+
+    task = task_queue.lease("w2")
+    assert task_queue.fail(task["id"], "w2", "导出失败")
+    assert task_queue.tasks(batch_id)[0]["status"] == "failed"
+    assert task_queue.lease("w3") is None
@@ -0,0 +1,117 @@
+"""原生渲染：不启动Visio，按.vsdx中的几何与文字渲染页面"""
+import os
+import zipfile
+
+import pytest
+
+from benchmark import write_synthetic_vsdx
+from conftest import picture_count
+from core import visio_to_word_export_png
+from native_render import NativeVisioApp, NativeVisioFactory
+
+Image = pytest.importorskip("PIL.Image")
+
+PAGE_WIDTH, PAGE_HEIGHT = 11.69, 8.27  # write_synthetic_vsdx的页面尺寸(英寸)
+
+RECTANGLE = (
+    '<Shape ID="1" Type="Shape">'
+    '<Cell N="PinX" V="3"/><Cell N="PinY" V="2"/><Cell N="Width" V="2"/><Cell N="Height" V="1"/>'
+    '<Cell N="LocPinX" V="1"/><Cell N="LocPinY" V="0.5"/><Cell N="LineColor" V="#000000"/>'
+    '<Section N="Geometry" IX="0">'
+    '<Row T="MoveTo" IX="1"><Cell N="X" V="0"/><Cell N="Y" V="0"/></Row>'
+    '<Row T="LineTo" IX="2"><Cell N="X" V="2"/><Cell N="Y" V="0"/></Row>'
+    '<Row T="LineTo" IX="3"><Cell N="X" V="2"/><Cell N="Y" V="1"/></Row>'
+    '<Row T="LineTo" IX="4"><Cell N="X" V="0"/><Cell N="Y" V="1"/></Row>'
+    '<Row T="LineTo" IX="5"><Cell N="X" V="0"/><Cell N="Y" V="0"/></Row>'
+    "</Section></Shape>"
+)
+
+
+def replace_page(path, number, shapes):
+    """把.vsdx第number页的形状替换为shapes"""
+    with zipfile.ZipFile(path) as package:
+        parts = {name: package.read(name) for name in package.namelist()}
+    page = parts[f"visio/pages/page{number}.xml"].decode("utf-8")
+    start, end = page.index("<Shapes>") + len("<Shapes>"), page.index("</Shapes>")
+    parts[f"visio/pages/page{number}.xml"] = (page[:start] + shapes + page[end:]).encode("utf-8")
+    with zipfile.ZipFile(path, "w") as package:
+        for name, data in parts.items():
+            package.writestr(name, data)
+
+
+def open_pages(path, dpi=20):
+    app = NativeVisioApp(dpi=dpi)
+    return app, list(app.Documents.Open(path).Pages)
+
+
+def test_shape_is_drawn_at_its_pin(tmp_path):
+    path = str(tmp_path / "a.vsdx")
+    write_synthetic_vsdx(path, pages=1, shapes_per_page=0)
+    replace_page(path, 1, RECTANGLE)
+    app, pages = open_pages(path)
+
+    image = pages[0].to_image().convert("L")
+    app.Quit()
+
+    assert image.size == (round(PAGE_WIDTH * 20), round(PAGE_HEIGHT * 20))
+    # 页面坐标原点在左下角：矩形占x 2~4英寸、y 1.5~2.5英寸
+    left, top, right, bottom = image.point(lambda value: 255 if value < 128 else 0).getbbox()
+    assert (left, right) == pytest.approx((40, 80), abs=2)
+    assert (top, bottom) == pytest.approx(((PAGE_HEIGHT - 2.5) * 20, (PAGE_HEIGHT - 1.5) * 20), abs=2)
+
+
+def test_svg_contains_shapes_and_text(tmp_path):
+    path = str(tmp_path / "a.vsdx")
+    write_synthetic_vsdx(path, pages=2, shapes_per_page=3)
+    app, pages = open_pages(path)
+
+    svg = pages[1].to_svg().decode("utf-8")
+    app.Quit()
+
+    assert svg.count("<path") >= 3
+    assert "步骤3" in svg
+
+
+def test_export_matches_the_visio_interface(tmp_path):
+    path = str(tmp_path / "a.vsdx")
+    write_synthetic_vsdx(path, pages=2, shapes_per_page=2)
+    app, pages = open_pages(path)
+
+    pages[0].Export(str(tmp_path / "page.png"))
+    pages[0].Export(str(tmp_path / "page.svg"))
+    with pytest.raises(Exception):
+        pages[0].Export(str(tmp_path / "page.emf"))
+    with pytest.raises(Exception):
+        app.ActiveWindow  # 不支持复制粘贴方式
+    app.Quit()
+
+    assert [page.NameU for page in pages] == ["Page-1", "Page-2"]
+    with Image.open(tmp_path / "page.png") as image:
+        assert image.format == "PNG"
+    assert app.open_documents == []
+
+
+def test_conversion_without_visio(corpus):
+    visio_dir = corpus({"a.vsdx": 2, "b.vsdx": 1})
+    with open(os.path.join(visio_dir, "c.vsd"), "wb") as f:
+        f.write(b"binary .vsd")
+
+    with pytest.raises(Exception, match="c.vsd"):
+        visio_to_word_export_png(
+            visio_dir,
+            ["a.vsdx", "b.vsdx", "c.vsd"],
+            visio_factory=NativeVisioFactory(dpi=20),
+            doc_backend="docx",
+            volume_pages=0,
+            volume_bytes=0,
+        )
+    visio_to_word_export_png(
+        visio_dir,
+        ["a.vsdx", "b.vsdx"],
+        visio_factory=NativeVisioFactory(dpi=20),
+        doc_backend="docx",
+        volume_pages=0,
+        volume_bytes=0,
+    )
+
+    assert picture_count(os.path.join(visio_dir, "output.docx")) == 3
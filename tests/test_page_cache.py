@@ -0,0 +1,60 @@
+"""页面缓存：未修改的页面复用上次导出的图片，超过容量时淘汰最久未使用的图片"""
+import os
+
+from core import visio_to_word_export_png
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+from page_cache import PageCache, vsdx_page_keys
+
+FILES = {"a.vsdx": 2, "b.vsdx": 3}
+
+
+def convert(visio_dir, file_list):
+    visio_to_word_export_png(
+        visio_dir,
+        file_list,
+        visio_factory=FakeVisioFactory(),
+        office_factory=FakeOfficeFactory(),
+    )
+
+
+def test_unchanged_pages_are_not_exported_again(corpus, export_log):
+    visio_dir = corpus(FILES)
+    convert(visio_dir, list(FILES))
+    assert len(export_log.exports) == 5
+
+    export_log.exports.clear()
+    convert(visio_dir, list(FILES))
+    assert export_log.exports == []
+
+    # 修改后的文件中内容变化的页面重新导出
+    corpus({"b.vsdx": 3}, seed=10)
+    convert(visio_dir, list(FILES))
+    assert export_log.files() == ["b.vsdx"]
+
+
+def test_keys_depend_on_page_content_and_settings(corpus):
+    visio_dir = corpus({"a.vsdx": 2})
+    path = os.path.join(visio_dir, "a.vsdx")
+    keys = vsdx_page_keys(path, "png")
+
+    assert sorted(keys) == ["Page-1", "Page-2"]
+    assert keys["Page-1"] != keys["Page-2"]
+    assert vsdx_page_keys(path, "png") == keys
+    assert vsdx_page_keys(path, "jpg")["Page-1"] != keys["Page-1"]
+    assert vsdx_page_keys(os.path.join(visio_dir, "missing.vsdx")) == {}
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path / "cache"))
+    source = tmp_path / "page.png"
+    source.write_bytes(b"\0" * 100)
+    for mtime, key in enumerate(("aa1", "bb2", "cc3"), 1):
+        cache.store(key, str(source))
+        os.utime(cache._path(key, "png"), (mtime, mtime))  # 修改时间即最近使用时间
+
+    assert cache.fetch("aa1", str(tmp_path / "out.png"))  # aa1成为最近使用的
+    cache.max_bytes = 250
+    cache.trim()
+
+    assert not os.path.exists(cache._path("bb2", "png"))
+    assert os.path.exists(cache._path("aa1", "png")) and os.path.exists(cache._path("cc3", "png"))
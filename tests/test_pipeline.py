@@ -0,0 +1,64 @@
+"""流水线导出：导出与插入同时进行，导出线程的异常传回调用方"""
+import os
+import threading
+
+import pytest
+
+import fake_office
+from conftest import word_items
+from core import visio_to_word_export_png
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+from pipeline import visio_to_word_export_png_pipelined
+
+FILES = {"a.vsdx": 3, "b.vsdx": 2, "c.vsdx": 3}
+
+
+def convert(func, visio_dir, **kwargs):
+    func(
+        visio_dir,
+        list(FILES),
+        visio_factory=FakeVisioFactory(page_latency=0.01),
+        office_factory=FakeOfficeFactory(insert_latency=0.03),
+        doc_backend="com",
+        use_page_cache=False,
+        **kwargs,
+    )
+    return word_items(os.path.join(visio_dir, "output.docx"))
+
+
+def test_export_overlaps_insertion(corpus, monkeypatch):
+    visio_dir = corpus(FILES)
+    expected = convert(visio_to_word_export_png, visio_dir)
+
+    inserting = threading.Event()
+    overlapped = []
+    add_picture = fake_office.FakeInlineShapes.AddPicture
+    export = fake_office.FakeVisioPage.Export
+
+    def timed_add_picture(shapes, path):
+        inserting.set()
+        try:
+            return add_picture(shapes, path)
+        finally:
+            inserting.clear()
+
+    def timed_export(page, path):
+        overlapped.append(inserting.is_set())
+        return export(page, path)
+
+    monkeypatch.setattr(fake_office.FakeInlineShapes, "AddPicture", timed_add_picture)
+    monkeypatch.setattr(fake_office.FakeVisioPage, "Export", timed_export)
+
+    assert convert(visio_to_word_export_png_pipelined, visio_dir) == expected
+    assert any(overlapped)
+
+
+def test_export_error_reaches_the_caller(corpus, export_log):
+    visio_dir = corpus(FILES)
+    export_log.fail_at.add(("b.vsdx", 2))
+
+    with pytest.raises(RuntimeError):
+        convert(visio_to_word_export_png_pipelined, visio_dir, depth=1)
+
+    assert not os.path.exists(os.path.join(visio_dir, "output.docx"))
+    assert not [name for name in os.listdir(visio_dir) if name.startswith("temp_")]
@@ -0,0 +1,64 @@
+"""递归扫描：包含/排除通配符、跳过的目录与分批产出"""
+import os
+
+from scanner import iter_visio_batches, scan_visio_files
+
+
+def make_tree(root, paths):
+    for path in paths:
+        full_path = os.path.join(root, *path.split("/"))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(b"")
+    return str(root)
+
+
+def native(*paths):
+    return [os.path.join(*path.split("/")) for path in paths]
+
+
+TREE = [
+    "b.vsdx",
+    "a.VSD",
+    "notes.txt",
+    "~$a.vsdx",
+    "sub/c.vsdx",
+    "sub/deep/d.vsdx",
+    "sub/old/e.vsdx",
+    "Converted_Files/f.vsdx",
+    "output.docx.parts/g.vsdx",
+    ".hidden/h.vsdx",
+]
+
+
+def test_recursive_scan_is_sorted_and_skips_outputs(tmp_path):
+    root = make_tree(tmp_path, TREE)
+
+    files = scan_visio_files(root, include=[], exclude=[], recursive=True)
+
+    assert files == native("a.VSD", "b.vsdx", "sub/c.vsdx", "sub/deep/d.vsdx", "sub/old/e.vsdx")
+    assert scan_visio_files(root, include=[], exclude=[], recursive=False) == ["a.VSD", "b.vsdx"]
+
+
+def test_include_and_exclude_patterns(tmp_path):
+    root = make_tree(tmp_path, TREE)
+
+    # 排除通配符匹配目录时跳过整个子目录
+    assert scan_visio_files(root, include=[], exclude=["old"], recursive=True) == native(
+        "a.VSD", "b.vsdx", "sub/c.vsdx", "sub/deep/d.vsdx"
+    )
+    assert scan_visio_files(root, include=["*.vsdx"], exclude=["sub/deep/*"], recursive=True) == (
+        native("b.vsdx", "sub/c.vsdx", "sub/old/e.vsdx")
+    )
+    assert scan_visio_files(root, include=["sub/*"], exclude=[], recursive=True) == native(
+        "sub/c.vsdx", "sub/deep/d.vsdx", "sub/old/e.vsdx"
+    )
+
+
+def test_batches_preserve_order(tmp_path):
+    root = make_tree(tmp_path, [f"{i:02d}.vsdx" for i in range(7)])
+
+    batches = list(iter_visio_batches(root, include=[], exclude=[], batch_size=3))
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert sum(batches, []) == [f"{i:02d}.vsdx" for i in range(7)]
@@ -0,0 +1,67 @@
+"""流式合并文档在文件中途出错后从检查点续写"""
+import functools
+import os
+
+import pytest
+
+import docx_stream
+from conftest import page_breaks
+from core import visio_to_word_export_png
+from fake_office import FakeVisioFactory
+
+FILES = {"a.vsdx": 1, "b.vsdx": 2, "c.vsdx": 3, "d.vsdx": 2}
+PAGES = sum(FILES.values())
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_every_file(monkeypatch):
+    # 每个文件边界都写检查点，续写点即为出错前最后完成的文件
+    monkeypatch.setattr(
+        docx_stream.StreamingDocxSink,
+        "__init__",
+        functools.partialmethod(docx_stream.StreamingDocxSink.__init__, checkpoint_pages=1),
+    )
+
+
+def convert(visio_dir):
+    visio_to_word_export_png(
+        visio_dir,
+        list(FILES),
+        visio_factory=FakeVisioFactory(),
+        doc_backend="stream",
+        use_page_cache=False,
+    )
+
+
+def test_resume_after_failure_in_the_middle_of_a_file(corpus, export_log):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    export_log.fail_at.add(("c.vsdx", 2))
+
+    with pytest.raises(RuntimeError):
+        convert(visio_dir)
+    assert not os.path.exists(output_path)
+    assert os.path.exists(output_path + ".parts")
+
+    export_log.exports.clear()
+    convert(visio_dir)
+
+    # a、b已在检查点中，c从第一页重新写入
+    assert export_log.files() == ["c.vsdx", "d.vsdx"]
+    assert page_breaks(output_path) == [False] + [True] * (PAGES - 1)
+    assert not os.path.exists(output_path + ".parts")
+
+
+def test_checkpoint_discarded_when_an_earlier_file_changes(corpus, export_log):
+    visio_dir = corpus(FILES)
+    output_path = os.path.join(visio_dir, "output.docx")
+    export_log.fail_at.add(("c.vsdx", 2))
+    with pytest.raises(RuntimeError):
+        convert(visio_dir)
+
+    corpus({"a.vsdx": 2}, seed=10)
+    export_log.exports.clear()
+    convert(visio_dir)
+
+    assert export_log.files() == sorted(FILES)
+    assert len(page_breaks(output_path)) == PAGES + 1
@@ -0,0 +1,83 @@
+"""超时保护转换在写入文档出错时重建写入器并继续"""
+import os
+
+import pytest
+
+import docx_sink
+from conftest import document_sections
+from fake_office import FakeVisioFactory
+from supervisor import visio_to_word_export_png_supervised
+
+FILES = {"a.vsdx": 1, "b.vsdx": 2, "c.vsdx": 1}
+
+
+@pytest.fixture
+def insert_failures(monkeypatch):
+    """{文件名: 剩余失败次数}，写入该文件的页面时抛出异常"""
+    failures = {}
+    original = docx_sink.DocxSink.add_picture
+
+    def add_picture(sink, image_path, is_last_page):
+        for filename, remaining in failures.items():
+            if f"temp_{filename}_" in os.path.basename(image_path) and remaining:
+                failures[filename] = remaining - 1
+                raise OSError(f"模拟写入失败: {image_path}")
+        return original(sink, image_path, is_last_page)
+
+    monkeypatch.setattr(docx_sink.DocxSink, "add_picture", add_picture)
+    return failures
+
+
+def convert(visio_dir):
+    return visio_to_word_export_png_supervised(
+        visio_dir,
+        list(FILES),
+        visio_factory=FakeVisioFactory(),
+        doc_backend="docx",
+        volume_pages=0,
+        volume_bytes=0,
+        retries=1,
+        backoff=0,
+    )
+
+
+def test_insert_failure_is_retried(corpus, insert_failures):
+    visio_dir = corpus(FILES)
+    insert_failures["b.vsdx"] = 1
+
+    report = convert(visio_dir)
+
+    assert report["converted"] == list(FILES) and report["failed"] == []
+    sections = document_sections(os.path.join(visio_dir, "output.docx"))
+    assert [pages for _, pages in sections] == [1, 2, 1]
+
+
+def test_repeated_insert_failure_quarantines_the_file(corpus, insert_failures):
+    visio_dir = corpus(FILES)
+    insert_failures["b.vsdx"] = 2
+
+    report = convert(visio_dir)
+
+    assert report["converted"] == ["a.vsdx", "c.vsdx"]
+    assert [failure["file"] for failure in report["failed"]] == ["b.vsdx"]
+    sections = document_sections(os.path.join(visio_dir, "output.docx"))
+    assert [pages for _, pages in sections] == [1, 1]
+    assert not [name for name in os.listdir(visio_dir) if name.startswith("temp_")]
+
+
+def test_images_are_removed_once_inserted(corpus, monkeypatch):
+    visio_dir = corpus(FILES)
+    leftovers = []
+    original = docx_sink.DocxSink.begin_file
+
+    def begin_file(sink, filename):
+        leftovers.append(sorted(name for name in os.listdir(visio_dir) if name.startswith("temp_")))
+        return original(sink, filename)
+
+    monkeypatch.setattr(docx_sink.DocxSink, "begin_file", begin_file)
+
+    report = convert(visio_dir)
+
+    assert report["converted"] == list(FILES)
+    for filename, images in zip(FILES, leftovers):
+        assert all(f"temp_{filename}_" in name for name in images)
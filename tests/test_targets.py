@@ -0,0 +1,69 @@
+"""多目标导出：每页只导出一次，同时生成合并文档、单独文档与图片目录"""
+import os
+
+import pytest
+
+from conftest import picture_count
+from core import visio_to_images, visio_to_multi_targets
+from fake_office import FakeVisioFactory
+from targets import ALL_TARGETS, image_dir_path, normalize_targets
+
+FILES = {"a.vsdx": 2, "b.vsdx": 3}
+
+
+def convert(visio_dir, targets):
+    visio_to_multi_targets(
+        visio_dir,
+        list(FILES),
+        targets=targets,
+        visio_factory=FakeVisioFactory(),
+        use_page_cache=False,
+        doc_backend="docx",
+        volume_pages=0,
+        volume_bytes=0,
+    )
+
+
+def read_images(visio_dir, filename):
+    image_dir = image_dir_path(visio_dir, filename)
+    images = {}
+    for name in sorted(os.listdir(image_dir)):
+        with open(os.path.join(image_dir, name), "rb") as f:
+            images[name] = f.read()
+    return images
+
+
+def test_all_targets_from_a_single_export(corpus, export_log):
+    visio_dir = corpus(FILES)
+    visio_to_images(visio_dir, list(FILES), visio_factory=FakeVisioFactory(), use_page_cache=False)
+    expected = {filename: read_images(visio_dir, filename) for filename in FILES}
+    export_log.exports.clear()
+
+    convert(visio_dir, ALL_TARGETS)
+
+    assert len(export_log.exports) == sum(FILES.values())
+    assert picture_count(os.path.join(visio_dir, "output.docx")) == sum(FILES.values())
+    for filename, pages in FILES.items():
+        converted = os.path.join(visio_dir, "Converted_Files", filename.replace(".vsdx", ".docx"))
+        assert picture_count(converted) == pages
+        assert read_images(visio_dir, filename) == expected[filename]
+    assert not [name for name in os.listdir(visio_dir) if name.startswith("temp_")]
+
+
+def test_image_directory_drops_stale_pages(corpus):
+    visio_dir = corpus(FILES)
+    convert(visio_dir, ["images"])
+    corpus({"b.vsdx": 1}, seed=30)
+
+    convert(visio_dir, ["images"])
+
+    assert list(read_images(visio_dir, "b.vsdx")) == ["Page_1.png"]
+    assert not os.path.exists(os.path.join(visio_dir, "output.docx"))
+
+
+def test_targets_are_validated():
+    assert normalize_targets(["images", "merged"]) == ("merged", "images")
+    with pytest.raises(ValueError):
+        normalize_targets([])
+    with pytest.raises(ValueError):
+        normalize_targets(["pdf"])
@@ -0,0 +1,78 @@
+"""缩略图：依次取内嵌缩略图与页面缓存中的第一页，内存LRU与磁盘缓存复用结果"""
+import io
+import os
+import zipfile
+
+import pytest
+
+from core import visio_to_word_export_png
+from fake_office import FakeVisioFactory, make_png
+from thumbnails import ThumbnailCache
+from vsdx_index import THUMBNAIL_REL_TYPE
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def embed_thumbnail(path, width, height):
+    """在.vsdx中加入docProps/thumbnail.png及其包关系"""
+    with zipfile.ZipFile(path) as package:
+        parts = {name: package.read(name) for name in package.namelist()}
+    rels = parts["_rels/.rels"].decode("utf-8")
+    parts["_rels/.rels"] = rels.replace(
+        "</Relationships>",
+        f'<Relationship Id="rIdThumb" Type="{THUMBNAIL_REL_TYPE}" '
+        'Target="docProps/thumbnail.png"/></Relationships>',
+    ).encode("utf-8")
+    parts["docProps/thumbnail.png"] = make_png(width, height, b"thumbnail")
+    with zipfile.ZipFile(path, "w") as package:
+        for name, data in parts.items():
+            package.writestr(name, data)
+
+
+def image_size(data):
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
+
+
+def test_embedded_thumbnail_is_scaled(corpus):
+    visio_dir = corpus({"a.vsdx": 2})
+    embed_thumbnail(os.path.join(visio_dir, "a.vsdx"), 400, 200)
+
+    data = ThumbnailCache(visio_dir, size=100).get("a.vsdx")
+
+    assert image_size(data) == (100, 50)
+
+
+def test_first_page_comes_from_the_page_cache(corpus, export_log):
+    visio_dir = corpus({"a.vsdx": 2})
+    visio_to_word_export_png(
+        visio_dir, ["a.vsdx"], visio_factory=FakeVisioFactory(), doc_backend="docx"
+    )
+    export_log.exports.clear()
+
+    data = ThumbnailCache(visio_dir, size=64).get("a.vsdx")
+
+    assert max(image_size(data)) == 64
+    assert export_log.exports == []
+
+
+def test_thumbnails_are_cached_in_memory_and_on_disk(corpus, monkeypatch):
+    visio_dir = corpus({"a.vsdx": 1, "b.vsdx": 1})
+    for filename in ("a.vsdx", "b.vsdx"):
+        embed_thumbnail(os.path.join(visio_dir, filename), 64, 64)
+    cache = ThumbnailCache(visio_dir, size=32, memory_items=1)
+    first = cache.get("a.vsdx")
+    cache.get("b.vsdx")
+    assert len(cache.memory) == 1  # a.vsdx已被挤出内存
+
+    renders = []
+    monkeypatch.setattr(ThumbnailCache, "_render", lambda cache, filename: renders.append(filename))
+    assert cache.get("a.vsdx") == first
+    assert ThumbnailCache(visio_dir, size=32).get("b.vsdx") is not None
+    assert renders == []
+
+    # 文件修改后重新生成
+    embed_thumbnail(os.path.join(visio_dir, "a.vsdx"), 64, 64)
+    os.utime(os.path.join(visio_dir, "a.vsdx"), ns=(1, 1))
+    assert cache.get("a.vsdx") is None
+    assert renders == ["a.vsdx"]
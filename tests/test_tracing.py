@@ -0,0 +1,70 @@
+"""分阶段耗时记录：转换中的区间、汇总以及JSON日志与Chrome trace"""
+import json
+
+import tracing
+from core import visio_to_word_export_png
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+
+FILES = {"a.vsdx": 1, "b.vsdx": 2}
+
+
+def convert(visio_dir):
+    visio_to_word_export_png(
+        visio_dir,
+        list(FILES),
+        visio_factory=FakeVisioFactory(),
+        office_factory=FakeOfficeFactory(),
+        use_page_cache=False,
+        doc_backend="docx",
+        volume_pages=0,
+        volume_bytes=0,
+    )
+
+
+def test_conversion_records_stages(corpus, tmp_path):
+    visio_dir = corpus(FILES)
+    tracer = tracing.start()
+    try:
+        convert(visio_dir)
+    finally:
+        assert tracing.stop() is tracer
+
+    exports = [span["args"] for span in tracer.spans if span["name"] == "export"]
+    summary = tracer.summary()
+
+    assert sorted((args["file"], args["page"]) for args in exports) == [
+        ("a.vsdx", 1), ("b.vsdx", 1), ("b.vsdx", 2)
+    ]
+    assert summary["stages"]["insert"]["count"] == 3
+    assert summary["stages"]["save"]["count"] == 1
+    assert sorted(filename for filename, _ in summary["slowest_files"]) == list(FILES)
+    assert tracer.pages_done == 3
+
+    log_path, trace_path = tracer.write(str(tmp_path / "trace"))
+    with open(log_path, encoding="utf-8") as f:
+        logged = [json.loads(line) for line in f]
+    with open(trace_path, encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+
+    assert len(logged) == len(tracer.spans)
+    assert [span["start_us"] for span in logged] == sorted(span["start_us"] for span in logged)
+    assert sum(event["ph"] == "X" for event in events) == len(tracer.spans)
+    assert any(event["ph"] == "M" and event["name"] == "thread_name" for event in events)
+
+
+def test_listeners_see_stages_without_tracer(corpus):
+    visio_dir = corpus(FILES)
+    seen = []
+
+    def listener(when, name, args, elapsed):
+        seen.append((when, name, (elapsed is None) == (when == "begin")))
+
+    tracing.add_listener(listener)
+    try:
+        convert(visio_dir)
+    finally:
+        tracing.remove_listener(listener)
+
+    assert tracing.active() is None
+    assert seen.count(("begin", "export", True)) == seen.count(("end", "export", True)) == 3
+    assert all(ok for _, _, ok in seen)
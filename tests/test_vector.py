@@ -0,0 +1,72 @@
+"""导出矢量图：SVG附带PNG后备图片嵌入文档，办公软件不支持SVG时插入后备图片"""
+import os
+import zipfile
+
+import pytest
+
+import fake_office
+from conftest import word_items
+from core import visio_to_word_export_vector
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+
+FILES = {"a.vsdx": 2, "b.vsdx": 1}
+PAGES = sum(FILES.values())
+
+
+def convert(visio_dir, doc_backend, vector_format, office_factory=None):
+    visio_to_word_export_vector(
+        visio_dir,
+        list(FILES),
+        visio_factory=FakeVisioFactory(),
+        office_factory=office_factory,
+        doc_backend=doc_backend,
+        volume_pages=0,
+        volume_bytes=0,
+        vector_format=vector_format,
+    )
+    assert not [name for name in os.listdir(visio_dir) if name.startswith("temp_")]
+    return os.path.join(visio_dir, "output.docx")
+
+
+def package_contents(path):
+    with zipfile.ZipFile(path) as package:
+        document = package.read("word/document.xml")
+        extensions = sorted(
+            {os.path.splitext(name)[1] for name in package.namelist() if name.startswith("word/media/")}
+        )
+        return document, extensions
+
+
+@pytest.mark.parametrize("doc_backend", ["docx", "stream"])
+def test_svg_pages_carry_a_png_fallback(corpus, doc_backend):
+    document, extensions = package_contents(convert(corpus(FILES), doc_backend, "svg"))
+
+    assert document.count(b"<w:drawing>") == PAGES
+    assert document.count(b"svgBlip") == PAGES
+    assert extensions == [".png", ".svg"]
+
+
+def test_emf_pages_are_embedded_directly(corpus):
+    document, extensions = package_contents(convert(corpus(FILES), "docx", "emf"))
+
+    assert document.count(b"<w:drawing>") == PAGES
+    assert extensions == [".emf"]
+
+
+def test_word_without_svg_support_gets_the_fallback(corpus, monkeypatch):
+    attempts = []
+    add_picture = fake_office.FakeInlineShapes.AddPicture
+
+    def record_add_picture(shapes, path):
+        attempts.append(os.path.splitext(path)[1])
+        return add_picture(shapes, path)
+
+    monkeypatch.setattr(fake_office.FakeInlineShapes, "AddPicture", record_add_picture)
+    office_factory = FakeOfficeFactory(unsupported_formats=(".svg",))
+
+    output_path = convert(corpus(FILES), "com", "svg", office_factory)
+
+    kinds = [kind for kind, _ in word_items(output_path)]
+    assert kinds.count("picture") == PAGES
+    # 第一次插入SVG失败后其余页面直接插入PNG
+    assert attempts == [".svg"] + [".png"] * PAGES
@@ -0,0 +1,137 @@
+"""合并文档自动分卷"""
+import json
+import os
+
+import pytest
+
+from conftest import page_breaks, picture_count
+from core import visio_to_word_copy_paste, visio_to_word_export_png
+from docx_patch import load_merged_index
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+from volumes import STAGING_DIR_NAME, VOLUME_INDEX_NAME
+
+FILES = {"a.vsdx": 2, "b.vsdx": 2, "c.vsdx": 2, "d.vsdx": 1}
+
+
+def convert(visio_dir, doc_backend, volume_pages):
+    visio_to_word_export_png(
+        visio_dir,
+        list(FILES),
+        visio_factory=FakeVisioFactory(),
+        doc_backend=doc_backend,
+        volume_pages=volume_pages,
+        volume_bytes=0,
+        use_page_cache=False,
+    )
+
+
+def read_volume_index(visio_dir):
+    with open(os.path.join(visio_dir, VOLUME_INDEX_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)["volumes"]
+
+
+@pytest.mark.parametrize("doc_backend", ["docx", "stream"])
+def test_volumes_split_at_file_boundaries(corpus, doc_backend):
+    visio_dir = corpus(FILES)
+    convert(visio_dir, doc_backend, volume_pages=3)
+
+    volumes = read_volume_index(visio_dir)
+    assert [volume["files"] for volume in volumes] == [
+        ["a.vsdx", "b.vsdx"],
+        ["c.vsdx", "d.vsdx"],
+    ]
+    assert [picture_count(os.path.join(visio_dir, volume["path"])) for volume in volumes] == [4, 3]
+    # 每个分卷的第一页不另起一页
+    assert [page_breaks(os.path.join(visio_dir, volume["path"]))[0] for volume in volumes] == [
+        False,
+        False,
+    ]
+    # 第一卷不是完整的合并文档，不能就地增量更新
+    assert load_merged_index(os.path.join(visio_dir, "output.docx")) is None
+    assert not os.path.exists(os.path.join(visio_dir, STAGING_DIR_NAME))
+
+
+def test_fewer_volumes_remove_stale_ones(corpus):
+    visio_dir = corpus(FILES)
+    convert(visio_dir, "docx", volume_pages=2)
+    assert len(read_volume_index(visio_dir)) == 4
+
+    convert(visio_dir, "docx", volume_pages=4)
+    assert len(read_volume_index(visio_dir)) == 2
+    assert sorted(name for name in os.listdir(visio_dir) if name.endswith(".docx")) == [
+        "output.docx",
+        "output_002.docx",
+    ]
+
+    convert(visio_dir, "docx", volume_pages=0)
+    assert not os.path.exists(os.path.join(visio_dir, VOLUME_INDEX_NAME))
+    assert not os.path.exists(os.path.join(visio_dir, "output_002.docx"))
+    assert picture_count(os.path.join(visio_dir, "output.docx")) == 7
+
+
+def test_failed_run_keeps_previous_volumes(corpus, export_log):
+    visio_dir = corpus(FILES)
+    convert(visio_dir, "docx", volume_pages=3)
+    before = {
+        name: os.path.getmtime(os.path.join(visio_dir, name))
+        for name in ("output.docx", "output_002.docx", VOLUME_INDEX_NAME)
+    }
+
+    export_log.fail_at.add(("d.vsdx", 1))
+    with pytest.raises(RuntimeError):
+        convert(visio_dir, "docx", volume_pages=1)
+
+    for name, mtime in before.items():
+        assert os.path.getmtime(os.path.join(visio_dir, name)) == mtime
+    assert not os.path.exists(os.path.join(visio_dir, "output_003.docx"))
+    assert not os.path.exists(os.path.join(visio_dir, STAGING_DIR_NAME))
+
+
+def copy_paste(visio_dir, volume_pages, update_progress=None):
+    visio_to_word_copy_paste(
+        visio_dir,
+        list(FILES),
+        update_progress,
+        volume_pages=volume_pages,
+        visio_factory=FakeVisioFactory(),
+        office_factory=FakeOfficeFactory(),
+    )
+
+
+def pasted_pages(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [item["type"] for item in json.load(f)["items"]].count("paste")
+
+
+def test_copy_paste_volumes_are_staged(corpus):
+    visio_dir = corpus(FILES)
+    copy_paste(visio_dir, volume_pages=3)
+
+    volumes = read_volume_index(visio_dir)
+    assert [volume["files"] for volume in volumes] == [
+        ["a.vsdx", "b.vsdx"],
+        ["c.vsdx", "d.vsdx"],
+    ]
+    assert [pasted_pages(os.path.join(visio_dir, volume["path"])) for volume in volumes] == [4, 3]
+    assert not os.path.exists(os.path.join(visio_dir, STAGING_DIR_NAME))
+
+
+def test_failed_copy_paste_keeps_previous_volumes(corpus):
+    visio_dir = corpus(FILES)
+    copy_paste(visio_dir, volume_pages=3)
+    before = {
+        name: os.path.getmtime(os.path.join(visio_dir, name))
+        for name in ("output.docx", "output_002.docx", VOLUME_INDEX_NAME)
+    }
+
+    def fail_at_last_file(filename, current, total):
+        if current == total:
+            raise RuntimeError("模拟转换中断")
+
+    with pytest.raises(RuntimeError):
+        copy_paste(visio_dir, volume_pages=1, update_progress=fail_at_last_file)
+
+    for name, mtime in before.items():
+        assert os.path.getmtime(os.path.join(visio_dir, name)) == mtime
+    assert not os.path.exists(os.path.join(visio_dir, "output_003.docx"))
+    assert not os.path.exists(os.path.join(visio_dir, STAGING_DIR_NAME))
@@ -0,0 +1,58 @@
+""".vsdx元数据索引：直接从压缩包读取页数与尺寸，按工作量从大到小排序"""
+import os
+
+import pytest
+
+import vsdx_index
+from vsdx_index import VsdxIndex, read_vsdx_metadata
+
+FILES = {"a.vsdx": 1, "b.vsdx": 4, "c.vsdx": 2}
+
+
+def test_metadata_is_read_without_visio(corpus):
+    visio_dir = corpus(FILES)
+
+    metadata = read_vsdx_metadata(os.path.join(visio_dir, "b.vsdx"))
+
+    assert metadata["page_count"] == 4
+    assert [page["name"] for page in metadata["pages"]] == ["Page-1", "Page-2", "Page-3", "Page-4"]
+    assert metadata["pages"][0]["width"] == pytest.approx(11.69)
+    assert metadata["thumbnail"] is None
+
+
+def test_unreadable_file_has_no_metadata(tmp_path):
+    path = tmp_path / "broken.vsdx"
+    path.write_bytes(b"not a zip")
+
+    assert read_vsdx_metadata(str(path)) is None
+
+
+def test_largest_files_are_scheduled_first(corpus):
+    visio_dir = corpus(FILES)
+    with open(os.path.join(visio_dir, "old.vsd"), "wb") as f:
+        f.write(b"binary .vsd")
+
+    index = VsdxIndex(visio_dir)
+
+    # 无法解析的.vsd页数记为0，排在最后；写入顺序不受影响
+    assert index.largest_first(list(FILES) + ["old.vsd"]) == ["b.vsdx", "c.vsdx", "a.vsdx", "old.vsd"]
+
+
+def test_index_is_reused_until_the_file_changes(corpus, monkeypatch):
+    visio_dir = corpus(FILES)
+    index = VsdxIndex(visio_dir)
+    index.largest_first(list(FILES))
+    index.save(keep=list(FILES))
+
+    reads = []
+    original = vsdx_index.read_vsdx_metadata
+    monkeypatch.setattr(
+        vsdx_index, "read_vsdx_metadata", lambda path: reads.append(path) or original(path)
+    )
+    index = VsdxIndex(visio_dir)
+    assert index.job_size("c.vsdx")[0] == 2
+    assert reads == []
+
+    corpus({"c.vsdx": 5}, seed=20)
+    assert index.job_size("c.vsdx")[0] == 5
+    assert [os.path.basename(path) for path in reads] == ["c.vsdx"]
@@ -0,0 +1,71 @@
+"""目录监视：去抖后一次报告一批变化，忽略锁文件与输出目录"""
+import os
+import queue
+import sys
+
+import pytest
+
+from watcher import DirectoryWatcher
+
+BACKENDS = [True] + ([False] if sys.platform.startswith("linux") else [])
+
+
+def touch(root, rel_path, data=b"x"):
+    path = os.path.join(root, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def watch(tmp_path):
+    watchers = []
+
+    def start(polling):
+        batches = queue.Queue()
+        watcher = DirectoryWatcher(
+            str(tmp_path), batches.put, debounce=0.3, poll_interval=0.05, polling=polling, recursive=True
+        )
+        watcher.start()
+        watchers.append(watcher)
+        return batches
+
+    yield start
+    for watcher in watchers:
+        watcher.stop()
+
+
+@pytest.mark.parametrize("polling", BACKENDS)
+def test_changes_are_reported_once_after_debounce(tmp_path, watch, polling):
+    root = str(tmp_path)
+    touch(root, "a.vsdx")
+    touch(root, "old.vsdx")
+    batches = watch(polling)
+
+    # 去抖时间内连续修改只报告一次
+    touch(root, "a.vsdx", b"xx")
+    touch(root, "a.vsdx", b"xxx")
+    touch(root, "sub/b.vsdx")
+    os.remove(os.path.join(root, "old.vsdx"))
+    touch(root, "~$a.vsdx")
+    touch(root, "Converted_Files/c.vsdx")
+    touch(root, "notes.txt")
+
+    assert batches.get(timeout=5) == ["a.vsdx", "old.vsdx", os.path.join("sub", "b.vsdx")]
+    with pytest.raises(queue.Empty):
+        batches.get(timeout=0.6)
+
+
+@pytest.mark.parametrize("polling", BACKENDS)
+def test_rewrite_with_the_same_state_is_not_reported(tmp_path, watch, polling):
+    root = str(tmp_path)
+    touch(root, "a.vsdx")
+    path = os.path.join(root, "a.vsdx")
+    stat = os.stat(path)
+    batches = watch(polling)
+
+    touch(root, "a.vsdx")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    with pytest.raises(queue.Empty):
+        batches.get(timeout=0.6)
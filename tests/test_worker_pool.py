@@ -0,0 +1,54 @@
+"""多进程导出：输出顺序与逐个导出一致，失败的文件在保存后统一报告"""
+import os
+
+import pytest
+
+from conftest import word_items
+from core import visio_to_word_export_png
+from fake_office import FakeOfficeFactory, FakeVisioFactory
+from worker_pool import visio_to_word_export_png_parallel
+
+FILES = {"a.vsdx": 3, "b.vsdx": 1, "c.vsdx": 4, "d.vsdx": 2}
+
+
+def convert(func, visio_dir, visio_factory=None, **kwargs):
+    func(
+        visio_dir,
+        list(FILES),
+        visio_factory=visio_factory or FakeVisioFactory(),
+        office_factory=FakeOfficeFactory(),
+        doc_backend="com",
+        use_page_cache=False,
+        **kwargs,
+    )
+    return word_items(os.path.join(visio_dir, "output.docx"))
+
+
+@pytest.mark.parametrize("largest_first", [False, True])
+def test_parallel_output_matches_sequential(corpus, largest_first):
+    visio_dir = corpus(FILES)
+    expected = convert(visio_to_word_export_png, visio_dir)
+
+    # 页面导出耗时不同，工作进程乱序完成
+    items = convert(
+        visio_to_word_export_png_parallel,
+        visio_dir,
+        FakeVisioFactory(page_latency=0.01),
+        workers=3,
+        largest_first=largest_first,
+    )
+
+    assert items == expected
+    assert [kind for kind, _ in items].count("picture") == sum(FILES.values())
+
+
+def test_failed_file_is_reported_after_saving_the_rest(corpus):
+    visio_dir = corpus(FILES)
+    os.remove(os.path.join(visio_dir, "b.vsdx"))
+
+    with pytest.raises(Exception, match="b.vsdx"):
+        convert(visio_to_word_export_png_parallel, visio_dir, workers=2)
+
+    items = word_items(os.path.join(visio_dir, "output.docx"))
+    assert [kind for kind, _ in items].count("picture") == sum(FILES.values()) - FILES["b.vsdx"]
+    assert not [name for name in os.listdir(visio_dir) if name.startswith("temp_")]
@@ -0,0 +1,213 @@
+"""
+GUI预览用的缩略图。
+
+缩略图来源依次为：.vsdx内嵌的docProps缩略图、页面缓存中第一页上次导出的图片、
+原生渲染(native_render.py)的第一页，都不需要启动Visio。生成的缩略图统一缩放为PNG，先放入内存LRU，
+再写入磁盘缓存(Converted_Files/.thumbnails，按最近使用时间淘汰)，
+文件大小与修改时间不变时直接复用。
+
+加载在后台线程中进行，连续切换选中文件时只处理最后一次请求，界面不会卡顿。
+
+注意:
+- 需要Pillow解码与缩放图片，未安装时不显示预览
+- Pillow只能在Windows上解码EMF格式的内嵌缩略图，其他平台改用后两种来源
+"""
+import collections
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from config import THUMBNAIL_DISK_MAX_BYTES, THUMBNAIL_MEMORY_ITEMS, THUMBNAIL_SIZE
+from page_cache import PAGE_CACHE_DIR_NAME, PageCache, vsdx_page_keys
+from vsdx_index import read_thumbnail, read_vsdx_metadata
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+THUMBNAIL_DIR_NAME = os.path.join("Converted_Files", ".thumbnails")
+
+
+def _to_thumbnail_png(data, size):
+    """把图片字节缩放为不超过size×size的PNG，无法解码时返回None"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "RGBA", "L"):
+                image = image.convert("RGBA")
+            output = io.BytesIO()
+            image.save(output, "PNG", optimize=True)
+    except Exception:
+        return None
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """
+    目录下Visio文件缩略图的内存LRU与磁盘缓存。
+
+    参数:
+        root (str): 扫描根目录，文件名为相对于它的路径
+        size (int): 缩略图最大边长(像素)
+        memory_items (int): 内存中最多保留的缩略图数量
+        disk_max_bytes (int): 磁盘缓存容量上限(字节)
+    """
+
+    def __init__(
+        self,
+        root,
+        size=THUMBNAIL_SIZE,
+        memory_items=THUMBNAIL_MEMORY_ITEMS,
+        disk_max_bytes=THUMBNAIL_DISK_MAX_BYTES,
+    ):
+        self.root = root
+        self.size = size
+        self.memory_items = memory_items
+        self.memory = collections.OrderedDict()
+        self.disk = PageCache(os.path.join(root, THUMBNAIL_DIR_NAME), disk_max_bytes)
+        self.page_cache = PageCache(os.path.join(root, PAGE_CACHE_DIR_NAME))
+        self._lock = threading.Lock()
+
+    def _key(self, filename):
+        stat = os.stat(os.path.join(self.root, filename))
+        text = f"{filename}|{stat.st_size}|{stat.st_mtime_ns}|{self.size}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, filename):
+        """
+        返回文件的缩略图。
+
+        返回:
+            bytes: PNG内容；没有可用的缩略图、文件不存在或未安装Pillow时返回None
+        """
+        if Image is None:
+            return None
+        try:
+            key = self._key(filename)
+        except OSError:
+            return None
+
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+        path = self.disk.lookup(key, "png")
+        if path is not None:
+            with open(path, "rb") as f:
+                data = f.read()
+        else:
+            data = self._render(filename)
+            if data is None:
+                return None  # 不缓存，转换后页面缓存中可能出现第一页图片
+            self._store_disk(key, data)
+
+        with self._lock:
+            self.memory[key] = data
+            while len(self.memory) > self.memory_items:
+                self.memory.popitem(last=False)
+        return data
+
+    def _render(self, filename):
+        """依次尝试内嵌缩略图、页面缓存中的第一页图片与原生渲染的第一页"""
+        path = os.path.join(self.root, filename)
+        metadata = read_vsdx_metadata(path)
+        if not metadata:
+            return None
+
+        thumbnail = read_thumbnail(path, metadata)
+        if thumbnail is not None:
+            data = _to_thumbnail_png(thumbnail[1], self.size)
+            if data is not None:
+                return data
+
+        foreground = [page for page in metadata["pages"] if not page["background"]]
+        if foreground:
+            key = vsdx_page_keys(path, "png").get(foreground[0]["name"])
+            cached = key and self.page_cache.lookup(key, "png")
+            if cached:
+                with open(cached, "rb") as f:
+                    return _to_thumbnail_png(f.read(), self.size)
+            return self._render_native(path, foreground[0]["name"])
+        return None
+
+    def _render_native(self, path, page_name):
+        """不经过Visio直接渲染指定页面，失败时返回None"""
+        from native_render import NativeVisioApp
+
+        app = NativeVisioApp()
+        try:
+            document = app.Documents.Open(path)
+            for page in document.Pages:
+                if page.NameU == page_name:
+                    dpi = self.size / max(page.info["width"], page.info["height"], 0.01)
+                    output = io.BytesIO()
+                    page.to_image(dpi).save(output, "PNG", optimize=True)
+                    return output.getvalue()
+        except Exception as e:
+            print(f"渲染缩略图失败: {path} ({e})")
+        finally:
+            app.Quit()
+        return None
+
+    def _store_disk(self, key, data):
+        try:
+            os.makedirs(self.disk.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix=".png", dir=self.disk.cache_dir)
+        except OSError as e:
+            print(f"写入缩略图缓存失败: {e}")
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            self.disk.store(key, temp_path)
+        finally:
+            os.remove(temp_path)
+
+
+class ThumbnailLoader:
+    """
+    后台加载缩略图，只处理最近一次请求。
+
+    参数:
+        callback (function): 加载完成后在后台线程中调用，格式为func(根目录, 文件名, PNG内容或None)
+
+    用法:
+        loader.request(root, filename)  # 选中文件变化时调用，之前未处理的请求被丢弃
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.caches = {}
+        self._pending = None
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cache_for(self, root):
+        """返回根目录对应的缓存，切换目录后之前目录的内存缓存仍然保留"""
+        if root not in self.caches:
+            self.caches[root] = ThumbnailCache(root)
+        return self.caches[root]
+
+    def request(self, root, filename):
+        with self._condition:
+            self._pending = (root, filename)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                root, filename = self._pending
+                self._pending = None
+            try:
+                data = self.cache_for(root).get(filename)
+            except Exception as e:
+                print(f"加载缩略图失败: {filename} ({e})")
+                data = None
+            self.callback(root, filename, data)
@@ -0,0 +1,228 @@
+"""
+分阶段耗时记录。
+
+转换流程在打开文件、导出页面、插入图片、分页、保存等位置调用span记录耗时，
+启用记录(start)后可输出每行一个JSON的日志、Chrome/Perfetto可打开的trace文件，
+以及最慢文件与页面的汇总。未启用时span为空操作，几乎没有额外开销。
+
+另外可以注册监听函数(add_listener)，在每个阶段开始与结束时得到通知，异步任务接口(async_jobs.py)
+据此产生逐页的进度事件。
+
+注意:
+- 多进程工作池中工作进程内的导出阶段不会被记录，主进程中的插入与保存仍会记录
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+_active = None
+_listeners = []
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """收集一次运行中的所有耗时区间"""
+
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.start_time = time.time()
+        self.spans = []
+        self.pages_done = 0
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _thread_id(self):
+        thread = threading.current_thread()
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads[thread.ident] = (len(self._threads) + 1, thread.name)
+            return self._threads[thread.ident][0]
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        begin = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.spans.append(
+                {
+                    "name": name,
+                    "start_us": (begin - self.start_ns) / 1000,
+                    "dur_us": (end - begin) / 1000,
+                    "tid": self._thread_id(),
+                    "args": args,
+                }
+            )
+
+    def page_done(self):
+        """登记一页已写入文档，用于计算实时速度"""
+        self.pages_done += 1
+
+    def pages_per_sec(self):
+        elapsed = (time.perf_counter_ns() - self.start_ns) / 1e9
+        return self.pages_done / elapsed if elapsed > 0 else 0.0
+
+    def write_json_log(self, path):
+        """每行写出一个区间，按开始时间排序"""
+        with open(path, "w", encoding="utf-8") as f:
+            for span in sorted(self.spans, key=lambda s: s["start_us"]):
+                f.write(json.dumps(span, ensure_ascii=False) + "\n")
+
+    def write_chrome_trace(self, path):
+        """写出Chrome trace格式(chrome://tracing或ui.perfetto.dev可直接打开)"""
+        pid = os.getpid()
+        events = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in self._threads.values()
+        ]
+        for span in self.spans:
+            events.append(
+                {
+                    "name": span["name"],
+                    "cat": "v2w",
+                    "ph": "X",
+                    "ts": span["start_us"],
+                    "dur": span["dur_us"],
+                    "pid": pid,
+                    "tid": span["tid"],
+                    "args": span["args"],
+                }
+            )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def write(self, output_dir, name="v2w_trace"):
+        """
+        在output_dir下写出name.jsonl与name.chrome.json。
+
+        返回:
+            tuple: (JSON日志路径, Chrome trace路径)
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        log_path = os.path.join(output_dir, f"{name}.jsonl")
+        trace_path = os.path.join(output_dir, f"{name}.chrome.json")
+        self.write_json_log(log_path)
+        self.write_chrome_trace(trace_path)
+        return log_path, trace_path
+
+    def summary(self, top=5):
+        """
+        汇总各阶段总耗时以及最慢的文件与页面。
+
+        返回:
+            dict: stages({阶段: {"count", "total_ms"}})、slowest_files([(文件, 毫秒)])、
+            slowest_pages([(文件, 页码, 毫秒)])，页面耗时为该页所有阶段之和
+        """
+        stages = {}
+        files = []
+        pages = {}
+        for span in self.spans:
+            stage = stages.setdefault(span["name"], {"count": 0, "total_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] += span["dur_us"] / 1000
+            args = span["args"]
+            if span["name"] == "file":
+                files.append((args.get("file"), span["dur_us"] / 1000))
+            elif "page" in args:
+                key = (args.get("file"), args["page"])
+                pages[key] = pages.get(key, 0.0) + span["dur_us"] / 1000
+        return {
+            "stages": stages,
+            "slowest_files": sorted(files, key=lambda x: -x[1])[:top],
+            "slowest_pages": sorted(
+                ((f, p, ms) for (f, p), ms in pages.items()), key=lambda x: -x[2]
+            )[:top],
+        }
+
+    def print_summary(self, top=5):
+        summary = self.summary(top)
+        print("各阶段耗时:")
+        for name, stage in sorted(summary["stages"].items(), key=lambda x: -x[1]["total_ms"]):
+            print(f"  {name:<12} {stage['count']:>6}次 {stage['total_ms']:>10.1f}毫秒")
+        if summary["slowest_files"]:
+            print("最慢的文件:")
+            for filename, ms in summary["slowest_files"]:
+                print(f"  {ms:>10.1f}毫秒  {filename}")
+        if summary["slowest_pages"]:
+            print("最慢的页面:")
+            for filename, page, ms in summary["slowest_pages"]:
+                print(f"  {ms:>10.1f}毫秒  {filename} 第{page}页")
+
+
+def start():
+    """开始记录，返回新的Tracer"""
+    global _active
+    _active = Tracer()
+    return _active
+
+
+def stop():
+    """停止记录，返回记录结果(未启用时为None)"""
+    global _active
+    tracer, _active = _active, None
+    return tracer
+
+
+def active():
+    """返回正在记录的Tracer，未启用时为None"""
+    return _active
+
+
+def add_listener(listener):
+    """
+    注册阶段监听函数。
+
+    参数:
+        listener (function): 格式为func(时机, 阶段名称, 参数字典, 耗时秒数)，时机为"begin"或"end"，
+            开始时耗时为None；阶段出错时不调用"end"。在执行该阶段的线程中调用，
+            "begin"时抛出的异常会中止该阶段
+    """
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    """取消注册阶段监听函数"""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+@contextlib.contextmanager
+def _observed_span(tracer, name, args):
+    listeners = list(_listeners)
+    for listener in listeners:
+        listener("begin", name, args, None)
+    begin = time.perf_counter()
+    if tracer is None:
+        yield
+    else:
+        with tracer.span(name, **args):
+            yield
+    elapsed = time.perf_counter() - begin
+    for listener in listeners:
+        listener("end", name, args, elapsed)
+
+
+def span(name, **args):
+    """记录一个阶段的耗时，用法: with span("export", file=文件名, page=页码): ..."""
+    tracer = _active
+    if _listeners:
+        return _observed_span(tracer, name, args)
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **args)
+
+
+def page_done():
+    """登记一页已写入文档"""
+    tracer = _active
+    if tracer is not None:
+        tracer.page_done()
@@ -0,0 +1,200 @@
+"""
+合并文档自动分卷。
+
+合并输出的页数或图片字节数达到预算后，在下一个文件开始前保存并关闭当前分卷，
+继续写入output_002.docx、output_003.docx……，同一个源文件不会被拆到两个分卷中。
+各分卷先写入临时目录(Converted_Files/.volumes)，全部完成后才替换正式的分卷并写出output_index.json，
+记录每个分卷包含的源文件；出错或取消时上次生成的分卷保持不变。
+"""
+import json
+import os
+import shutil
+
+VOLUME_INDEX_NAME = "output_index.json"
+STAGING_DIR_NAME = os.path.join("Converted_Files", ".volumes")
+
+
+def volume_path(visio_dir, number):
+    """返回第number个分卷的路径，第一卷沿用output.docx"""
+    if number == 1:
+        return os.path.join(visio_dir, "output.docx")
+    return os.path.join(visio_dir, f"output_{number:03d}.docx")
+
+
+def staging_path(visio_dir, number):
+    """返回第number个分卷写入时的临时路径"""
+    return os.path.join(
+        visio_dir, STAGING_DIR_NAME, os.path.basename(volume_path(visio_dir, number))
+    )
+
+
+def remove_stale_volumes(visio_dir):
+    """合并文档不再分卷时删除上次分卷遗留的分卷索引与第二卷及之后的分卷"""
+    index_path = os.path.join(visio_dir, VOLUME_INDEX_NAME)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            volumes = json.load(f).get("volumes", [])
+    except (OSError, ValueError):
+        volumes = []
+    for volume in volumes:
+        stale_path = volume_path(visio_dir, volume.get("number", 1))
+        if volume.get("number", 1) > 1 and os.path.exists(stale_path):
+            os.remove(stale_path)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+
+class VolumePlanner:
+    """
+    记录分卷内容并判断何时切换到下一卷。
+
+    参数:
+        visio_dir (str): 输出所在目录
+        max_pages (int, 可选): 每卷最多页数，0或None表示不限
+        max_bytes (int, 可选): 每卷最多嵌入的图片字节数，0或None表示不限
+    """
+
+    def __init__(self, visio_dir, max_pages=None, max_bytes=None):
+        self.visio_dir = visio_dir
+        self.max_pages = max_pages or 0
+        self.max_bytes = max_bytes or 0
+        self.volumes = [{"number": 1, "files": [], "pages": 0, "bytes": 0}]
+
+    @property
+    def current(self):
+        return self.volumes[-1]
+
+    @property
+    def current_path(self):
+        return volume_path(self.visio_dir, self.current["number"])
+
+    @property
+    def current_staging_path(self):
+        return staging_path(self.visio_dir, self.current["number"])
+
+    def should_roll(self):
+        """当前分卷已有内容且达到任一预算时返回True"""
+        volume = self.current
+        if not volume["files"]:
+            return False
+        return (self.max_pages and volume["pages"] >= self.max_pages) or (
+            self.max_bytes and volume["bytes"] >= self.max_bytes
+        )
+
+    def start_file(self, filename):
+        """
+        登记一个即将写入的源文件，需要换卷时先创建新分卷。
+
+        返回:
+            bool: 是否切换到了新分卷
+        """
+        rolled = bool(self.should_roll())
+        if rolled:
+            self.volumes.append(
+                {
+                    "number": self.current["number"] + 1,
+                    "files": [],
+                    "pages": 0,
+                    "bytes": 0,
+                }
+            )
+        self.current["files"].append(filename)
+        return rolled
+
+    def add_page(self, size=0):
+        """登记一页及其图片大小"""
+        self.current["pages"] += 1
+        self.current["bytes"] += size
+
+    def write_index(self):
+        """写出分卷索引，并删除上次运行遗留的多余分卷"""
+        index_path = os.path.join(self.visio_dir, VOLUME_INDEX_NAME)
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("volumes", [])
+        except (OSError, ValueError):
+            previous = []
+
+        last_number = self.current["number"]
+        for volume in previous:
+            if volume.get("number", 0) > last_number:
+                stale_path = volume_path(self.visio_dir, volume["number"])
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+
+        index = {
+            "volumes": [
+                {
+                    "number": volume["number"],
+                    "path": os.path.basename(volume_path(self.visio_dir, volume["number"])),
+                    "files": volume["files"],
+                    "pages": volume["pages"],
+                    "image_bytes": volume["bytes"],
+                }
+                for volume in self.volumes
+            ]
+        }
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+
+
+class VolumeSink:
+    """
+    按预算自动分卷的合并文档写入器，包装WordSink/DocxSink/StreamingDocxSink。
+
+    换卷时调用被包装写入器的next_volume(新路径)，由其保存并关闭当前分卷后开始新文档。
+    分卷都写入临时路径，close时统一替换为正式的分卷，abort时全部丢弃。
+
+    参数:
+        sink: 被包装的合并输出写入器，输出路径应为第一卷的临时路径(staging_path(目录, 1))
+        planner (VolumePlanner): 分卷计划
+    """
+
+    def __init__(self, sink, planner):
+        self.sink = sink
+        self.planner = planner
+        self.staging_dir = os.path.join(planner.visio_dir, STAGING_DIR_NAME)
+
+    def resume_point(self, file_list):
+        """分卷模式不支持断点续写"""
+        return 0
+
+    def begin_file(self, filename):
+        if self.planner.start_file(filename):
+            print(f"切换到新分卷: {os.path.basename(self.planner.current_path)}")
+            self.sink.next_volume(self.planner.current_staging_path)
+        self.sink.begin_file(filename)
+
+    def add_picture(self, image_path, is_last_page):
+        self.planner.add_page(os.path.getsize(image_path))
+        self.sink.add_picture(image_path, is_last_page)
+
+    def add_vector_picture(self, vector_path, fallback_path, is_last_page):
+        size = os.path.getsize(vector_path)
+        if fallback_path:
+            size += os.path.getsize(fallback_path)
+        self.planner.add_page(size)
+        self.sink.add_vector_picture(vector_path, fallback_path, is_last_page)
+
+    def add_pasted_page(self, is_last_page):
+        """复制粘贴方式的一页，粘贴内容的大小无法得知，只计入页数"""
+        self.planner.add_page()
+        self.sink.add_pasted_page(is_last_page)
+
+    def end_file(self, filename):
+        self.sink.end_file(filename)
+
+    def close(self):
+        self.sink.close()
+        for volume in self.planner.volumes:
+            os.replace(
+                staging_path(self.planner.visio_dir, volume["number"]),
+                volume_path(self.planner.visio_dir, volume["number"]),
+            )
+        self.planner.write_index()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+    def abort(self):
+        """丢弃本次写入的全部分卷，上次生成的分卷与索引保持不变"""
+        self.sink.abort()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
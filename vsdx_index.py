@@ -0,0 +1,222 @@
+"""
+.vsdx 元数据索引。
+
+直接从.vsdx压缩包读取页数、页面名称与尺寸、内嵌媒体大小以及docProps下的缩略图信息，
+不需要启动Visio。结果保存在Converted_Files/.vsdx_index.json中，文件大小与修改时间
+均未变化时直接复用，供GUI显示页数、估算耗时以及按工作量从大到小调度转换。
+
+注意:
+- .vsd等非压缩包格式无法解析，记录为None，调度时按文件大小估算
+"""
+import json
+import os
+import posixpath
+import threading
+import zipfile
+
+from lxml import etree
+
+from convert_cache import CACHE_DIR_NAME
+
+INDEX_NAME = ".vsdx_index.json"
+INDEX_VERSION = 1
+
+VISIO_NS = "http://schemas.microsoft.com/office/visio/2012/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+THUMBNAIL_REL_TYPE = (
+    "http://schemas.openxmlformats.org/package/2006/relationships/metadata/thumbnail"
+)
+
+_NS = {"v": VISIO_NS, "r": REL_NS, "p": PKG_REL_NS}
+
+
+def _cell_value(sheet, name):
+    """读取PageSheet中数值单元格的值(英寸)，不存在时返回None"""
+    if sheet is None:
+        return None
+    cells = sheet.xpath(f"v:Cell[@N='{name}']/@V", namespaces=_NS)
+    try:
+        return float(cells[0]) if cells else None
+    except ValueError:
+        return None
+
+
+def _thumbnail_part(package):
+    """返回包关系中声明的缩略图部件路径，如docProps/thumbnail.emf"""
+    try:
+        root = etree.fromstring(package.read("_rels/.rels"))
+    except KeyError:
+        return None
+    for rel in root.iterfind("p:Relationship", _NS):
+        if rel.get("Type") == THUMBNAIL_REL_TYPE:
+            return rel.get("Target", "").lstrip("/")
+    return None
+
+
+def read_vsdx_metadata(path):
+    """
+    读取.vsdx文件的元数据。
+
+    参数:
+        path (str): .vsdx文件路径
+
+    返回:
+        dict: pages([{name, width, height, background}]，尺寸单位英寸)、page_count、
+        media([{name, bytes}])、media_bytes、thumbnail({part, bytes}或None)；
+        不是有效的.vsdx压缩包时返回None
+    """
+    if not zipfile.is_zipfile(path):
+        return None
+    try:
+        with zipfile.ZipFile(path) as package:
+            pages_root = etree.fromstring(package.read("visio/pages/pages.xml"))
+            pages = []
+            for page in pages_root.iterfind("v:Page", _NS):
+                sheet = page.find("v:PageSheet", _NS)
+                pages.append(
+                    {
+                        "name": page.get("NameU") or page.get("Name"),
+                        "width": _cell_value(sheet, "PageWidth"),
+                        "height": _cell_value(sheet, "PageHeight"),
+                        "background": page.get("Background") == "1",
+                    }
+                )
+
+            media = [
+                {"name": posixpath.basename(info.filename), "bytes": info.file_size}
+                for info in package.infolist()
+                if info.filename.startswith("visio/media/") and not info.is_dir()
+            ]
+
+            thumbnail = None
+            thumbnail_part = _thumbnail_part(package)
+            if thumbnail_part:
+                try:
+                    info = package.getinfo(thumbnail_part)
+                    thumbnail = {"part": thumbnail_part, "bytes": info.file_size}
+                except KeyError:
+                    pass
+    except (zipfile.BadZipFile, KeyError, etree.XMLSyntaxError, OSError) as e:
+        print(f"读取.vsdx元数据失败: {path} ({e})")
+        return None
+
+    return {
+        "pages": pages,
+        "page_count": len(pages),
+        "media": media,
+        "media_bytes": sum(item["bytes"] for item in media),
+        "thumbnail": thumbnail,
+    }
+
+
+def read_thumbnail(path, metadata=None):
+    """
+    读取.vsdx内嵌的缩略图。
+
+    返回:
+        tuple: (扩展名, 图片字节)，如("emf", b"...")；没有缩略图时返回None
+    """
+    metadata = metadata if metadata is not None else read_vsdx_metadata(path)
+    if not metadata or not metadata["thumbnail"]:
+        return None
+    part = metadata["thumbnail"]["part"]
+    try:
+        with zipfile.ZipFile(path) as package:
+            data = package.read(part)
+    except (zipfile.BadZipFile, KeyError, OSError):
+        return None
+    return posixpath.splitext(part)[1].lstrip(".").lower(), data
+
+
+class VsdxIndex:
+    """
+    目录下Visio文件的元数据索引，按文件大小与修改时间判断记录是否有效。
+
+    参数:
+        root (str): 扫描根目录，文件名为相对于它的路径
+        output_dir (str, 可选): 索引所在目录(其Converted_Files下)，默认root
+    """
+
+    def __init__(self, root, output_dir=None):
+        self.root = root
+        self.path = os.path.join(output_dir or root, CACHE_DIR_NAME, INDEX_NAME)
+        self.entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                self.entries = index.get("entries", {})
+        except (OSError, ValueError):
+            pass
+
+    def get(self, filename):
+        """
+        返回文件的元数据，记录失效时重新读取。
+
+        返回:
+            dict: 同read_vsdx_metadata；无法解析或文件不存在时返回None
+        """
+        try:
+            stat = os.stat(os.path.join(self.root, filename))
+        except OSError:
+            return None
+        with self._lock:
+            entry = self.entries.get(filename)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["meta"]
+
+        meta = read_vsdx_metadata(os.path.join(self.root, filename))
+        with self._lock:
+            self.entries[filename] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "meta": meta,
+            }
+            self.dirty = True
+        return meta
+
+    def job_size(self, filename):
+        """
+        估算文件的转换工作量，用于从大到小调度。
+
+        返回:
+            tuple: (页数, 内嵌媒体字节数, 文件字节数)，无法解析的文件页数记为0
+        """
+        meta = self.get(filename)
+        with self._lock:
+            entry = self.entries.get(filename)
+        size = entry["size"] if entry else 0
+        if not meta:
+            return 0, 0, size
+        return meta["page_count"], meta["media_bytes"], size
+
+    def largest_first(self, file_list):
+        """返回按工作量从大到小排序的文件列表，工作量相同时保持原顺序"""
+        return sorted(file_list, key=lambda f: tuple(-x for x in self.job_size(f)))
+
+    def save(self, keep=None):
+        """
+        有变化时原子地写回索引。
+
+        参数:
+            keep (iterable, 可选): 仍然存在的文件，不在其中的记录会被删除
+        """
+        with self._lock:
+            if keep is not None:
+                keep = set(keep)
+                for filename in list(self.entries):
+                    if filename not in keep:
+                        del self.entries[filename]
+                        self.dirty = True
+            if not self.dirty:
+                return
+            entries = dict(self.entries)
+            self.dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
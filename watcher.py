@@ -0,0 +1,318 @@
+"""
+监视目录中Visio文件的变化。
+
+Linux上通过inotify(ctypes直接调用libc，不需要额外依赖)接收文件事件，其他平台或inotify不可用时
+定期扫描目录比较文件大小与修改时间。事件只作为提示，每次都重新读取文件状态与上次记录比较，
+一段时间内没有新的变化后(去抖)才把这批变化交给回调，连续保存、复制大文件时只触发一次转换。
+
+Office锁文件、Visio保存时的临时文件、Converted_Files等输出目录中的变化都会被忽略，规则与scanner.py相同。
+
+注意:
+- 回调在监视线程中调用，需要在其他线程(如COM所在线程)转换时应自行转交
+- 网络共享目录上其他电脑的修改inotify收不到，应设置config.WATCH_POLLING = True改用轮询
+- 只比较大小与修改时间，内容未变的保存也会报告，由转换缓存(convert_cache.py)按内容哈希跳过
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from config import SCAN_RECURSIVE, WATCH_DEBOUNCE, WATCH_POLL_INTERVAL, WATCH_POLLING
+from scanner import is_scanned_dir, is_visio_file, scan_visio_files
+
+# inotify事件掩码(见linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _InotifyBackend:
+    """
+    为根目录及其中需要扫描的子目录建立inotify监视。
+
+    wait返回变化文件的相对路径列表；目录新建、移走或事件队列溢出时返回None，表示需要全量比较。
+    """
+
+    def __init__(self, root, recursive):
+        self.root = root
+        self.recursive = recursive
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1失败")
+        self.dirs = {}  # 监视描述符 -> 相对目录
+        try:
+            self._add_tree("")
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_tree(self, rel_dir):
+        """监视目录及其需要扫描的子目录"""
+        pending = [rel_dir]
+        while pending:
+            rel_dir = pending.pop()
+            path = os.path.join(self.root, rel_dir)
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                if not rel_dir:
+                    raise OSError(ctypes.get_errno(), f"无法监视目录: {path}")
+                print(f"无法监视目录: {path} ({os.strerror(ctypes.get_errno())})")
+                continue
+            self.dirs[wd] = rel_dir
+            if not self.recursive:
+                continue
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        rel_path = os.path.join(rel_dir, entry.name)
+                        if entry.is_dir(follow_symlinks=False) and is_scanned_dir(rel_path):
+                            pending.append(rel_path)
+            except OSError as e:
+                print(f"扫描目录失败: {e}")
+
+    def _remove_tree(self, rel_dir):
+        """目录被移走后取消其及子目录的监视"""
+        prefix = rel_dir + os.sep
+        for wd, watched in list(self.dirs.items()):
+            if watched == rel_dir or watched.startswith(prefix):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def wait(self, timeout):
+        # 最多等待0.5秒，使监视线程能及时响应停止
+        readable, _, _ = select.select([self.fd], [], [], min(timeout, 0.5))
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        rescan = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            rel_dir = self.dirs.get(wd)
+            if rel_dir is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.dirs[wd]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue  # 由父目录的事件处理
+            rel_path = os.path.join(rel_dir, name)
+            if mask & IN_ISDIR:
+                if not (self.recursive and is_scanned_dir(rel_path)):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # 建立监视之前目录中可能已有文件，需要全量比较
+                    self._add_tree(rel_path)
+                    rescan = True
+                elif mask & IN_MOVED_FROM:
+                    self._remove_tree(rel_path)
+                    rescan = True
+                continue
+            changed.append(rel_path)
+        return None if rescan else changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingBackend:
+    """每隔interval秒要求一次全量比较"""
+
+    def __init__(self, interval, stop_event):
+        self.interval = interval
+        self._stop_event = stop_event
+
+    def wait(self, timeout):
+        self._stop_event.wait(min(timeout, self.interval))
+        return None
+
+    def close(self):
+        pass
+
+
+class DirectoryWatcher:
+    """
+    在后台线程中监视目录，把去抖后的一批变化交给回调。
+
+    参数:
+        root (str): 监视的目录
+        callback (function): 格式为func(变化文件的相对路径列表)，包括新增、修改、删除与重命名前后的文件
+        debounce (float): 最后一次变化之后等待多少秒才触发回调，默认取config.WATCH_DEBOUNCE
+        poll_interval (float): 轮询间隔(秒)，默认取config.WATCH_POLL_INTERVAL
+        polling (bool, 可选): 是否强制轮询，默认取config.WATCH_POLLING，非Linux平台始终轮询
+        recursive (bool, 可选): 是否监视子目录，默认取config.SCAN_RECURSIVE
+
+    用法:
+        watcher = DirectoryWatcher(目录, 回调)
+        watcher.start()
+        ...
+        watcher.stop()
+    """
+
+    def __init__(
+        self,
+        root,
+        callback,
+        debounce=WATCH_DEBOUNCE,
+        poll_interval=WATCH_POLL_INTERVAL,
+        polling=None,
+        recursive=None,
+    ):
+        self.root = root
+        self.callback = callback
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.polling = WATCH_POLLING if polling is None else polling
+        self.recursive = SCAN_RECURSIVE if recursive is None else recursive
+        self.backend_name = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._state = {}  # 相对路径 -> (大小, 修改时间)
+        self._reported = {}  # 上次报告时的文件状态
+
+    def start(self):
+        """记录当前文件状态并开始监视，之后的变化才会报告"""
+        self._stop_event.clear()
+        backend = None
+        if not self.polling and sys.platform.startswith("linux"):
+            try:
+                backend = _InotifyBackend(self.root, self.recursive)
+                self.backend_name = "inotify"
+            except (OSError, AttributeError) as e:
+                print(f"inotify不可用，改为轮询: {e}")
+        if backend is None:
+            backend = _PollingBackend(self.poll_interval, self._stop_event)
+            self.backend_name = "polling"
+        self._state = self._snapshot()
+        self._reported = dict(self._state)
+        self._thread = threading.Thread(target=self._run, args=(backend,), daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """停止监视，尚未到去抖时间的变化不再报告"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _stat(self, rel_path):
+        try:
+            stat = os.stat(os.path.join(self.root, rel_path))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _snapshot(self):
+        try:
+            files = scan_visio_files(self.root, recursive=self.recursive)
+        except OSError as e:
+            print(f"扫描目录失败: {e}")
+            return dict(self._state)  # 目录暂时无法访问时不当作全部删除
+        state = {}
+        for rel_path in files:
+            signature = self._stat(rel_path)
+            if signature is not None:
+                state[rel_path] = signature
+        return state
+
+    def _diff(self, hints):
+        """按事件提示(None表示全部)重新读取文件状态，返回与上次记录不同的文件"""
+        changed = set()
+        if hints is None:
+            state = self._snapshot()
+            for rel_path in self._state.keys() | state.keys():
+                if self._state.get(rel_path) != state.get(rel_path):
+                    changed.add(rel_path)
+            self._state = state
+            return changed
+        for rel_path in set(hints):
+            if not is_visio_file(rel_path):
+                continue
+            signature = self._stat(rel_path)
+            if self._state.get(rel_path) == signature:
+                continue
+            changed.add(rel_path)
+            if signature is None:
+                self._state.pop(rel_path, None)
+            else:
+                self._state[rel_path] = signature
+        return changed
+
+    def _run(self, backend):
+        pending = set()
+        last_change = 0.0
+        try:
+            while not self._stop_event.is_set():
+                if pending:
+                    timeout = max(0.0, last_change + self.debounce - time.monotonic())
+                else:
+                    timeout = self.poll_interval
+                changed = self._diff(backend.wait(timeout))
+                now = time.monotonic()
+                if changed:
+                    pending |= changed
+                    last_change = now
+                if pending and now - last_change >= self.debounce:
+                    # 去抖期间改回原样的文件(如重写后恢复修改时间)不报告
+                    batch = sorted(p for p in pending if self._state.get(p) != self._reported.get(p))
+                    for rel_path in pending:
+                        if rel_path in self._state:
+                            self._reported[rel_path] = self._state[rel_path]
+                        else:
+                            self._reported.pop(rel_path, None)
+                    pending.clear()
+                    if not batch:
+                        continue
+                    if self._stop_event.is_set():
+                        break
+                    try:
+                        self.callback(batch)
+                    except Exception as e:
+                        print(f"处理目录变化失败: {e}")
+        finally:
+            backend.close()
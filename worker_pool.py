@@ -0,0 +1,238 @@
+"""
+多进程并行导出：每个工作进程拥有独立的COM环境和Visio实例，从共享队列领取文件并导出页面，
+主进程按file_list顺序(即GUI中的排序号顺序)把导出的图片写入Word文档。
+分发任务时按.vsdx元数据索引估算的工作量从大到小排列，避免最大的文件最后才开始导出而拖长总时间。
+"""
+import multiprocessing
+import os
+import queue
+
+from config import SCHEDULE_LARGEST_FIRST
+from core import (
+    com_initialize,
+    com_uninitialize,
+    create_sink,
+    create_visio_app,
+    export_pages,
+)
+from page_cache import open_page_cache
+from tracing import page_done, span
+from vsdx_index import VsdxIndex
+
+
+def default_worker_count():
+    """默认工作进程数：CPU核数减一(主进程负责写入文档)，至少为1"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _export_worker(task_queue, result_queue, visio_dir, visio_factory, page_cache):
+    """
+    工作进程入口：在本进程内初始化COM并启动Visio，循环领取文件导出全部页面。
+
+    每个文件的结果以(序号, 文件名, 图片路径列表, 错误信息)放入result_queue，
+    收到None表示任务结束。
+    """
+    com_initialize()
+    visio_app = None
+    try:
+        visio_app = visio_factory()
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            idx, filename = task
+            image_paths = []
+            try:
+                for image_path, _ in export_pages(
+                    visio_app, visio_dir, filename, page_cache
+                ):
+                    image_paths.append(image_path)
+                result_queue.put((idx, filename, image_paths, None))
+            except Exception as e:
+                for image_path in image_paths:
+                    if os.path.exists(image_path):
+                        os.remove(image_path)
+                result_queue.put((idx, filename, [], str(e)))
+    except Exception as e:
+        # Visio无法启动，由主进程根据缺失的结果判断失败
+        print(f"工作进程启动Visio失败: {e}")
+    finally:
+        if visio_app is not None:
+            try:
+                visio_app.Quit()
+            except:
+                pass
+        com_uninitialize()
+
+
+def _drain(q):
+    """取出队列中当前的全部条目"""
+    items = []
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def _remove_images(image_paths):
+    for image_path in image_paths:
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
+
+def visio_to_word_export_png_parallel(
+    visio_dir,
+    file_list,
+    update_progress=None,
+    separate_files=False,
+    word_processor="Word",
+    workers=None,
+    visio_factory=None,
+    office_factory=None,
+    use_page_cache=True,
+    doc_backend=None,
+    volume_pages=None,
+    volume_bytes=None,
+    largest_first=None,
+    merged_order=None,
+):
+    """
+    以多进程工作池方式执行导出PNG转换，结果与visio_to_word_export_png一致。
+
+    参数:
+        visio_dir (str): Visio文件所在目录路径
+        file_list (list): 要转换的Visio文件名列表，决定输出文档中的顺序
+        update_progress (function, 可选): 进度回调函数，格式为func(文件名, 当前序号, 总数)
+        separate_files (bool): 是否每个Visio文件生成单独的Word文档
+        word_processor (str): 目标办公软件类型，"Word"或"WPS"
+        workers (int, 可选): 工作进程数，默认default_worker_count()
+        visio_factory (function, 可选): 创建Visio实例的函数，必须可被pickle
+        office_factory (function, 可选): 创建办公应用实例的函数，仅在主进程中调用
+        use_page_cache (bool): 是否复用.vsdx中未修改页面上次导出的图片
+        doc_backend (str, 可选): 文档生成方式，"docx"(不启动Word)、"stream"或"com"，
+            默认取config.DOC_BACKEND
+        volume_pages (int, 可选): 合并文档每卷最多页数，默认取config.VOLUME_MAX_PAGES
+        volume_bytes (int, 可选): 合并文档每卷最多图片字节数，默认取config.VOLUME_MAX_BYTES
+        largest_first (bool, 可选): 是否按页数从多到少分发任务(写入顺序不变)，
+            默认取config.SCHEDULE_LARGEST_FIRST
+        merged_order (list, 可选): 同core.visio_to_word_export_png
+
+    流程:
+    1. 启动workers个工作进程，各自初始化COM并打开独立的Visio实例
+    2. 工作进程从任务队列领取文件(默认工作量大的先领取)，导出全部页面为临时PNG
+    3. 主进程按file_list顺序接收结果，依次插入Word并删除临时图片
+    4. 全部完成后保存文档；如有文件失败，在保存后抛出异常列出失败文件
+
+    注意:
+    - Windows下调用方必须位于 if __name__ == "__main__" 保护之内
+    - 乱序完成的文件会暂存在内存中(仅保存图片路径)，直到其前序文件写入完成
+    """
+    total_files = len(file_list)
+    if total_files == 0:
+        return
+
+    visio_factory = visio_factory or create_visio_app
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    processes = []
+    failures = []
+    pending = {}
+
+    com_initialize()
+    try:
+        sink = create_sink(
+            visio_dir,
+            separate_files,
+            word_processor,
+            doc_backend,
+            office_factory,
+            volume_pages,
+            volume_bytes,
+            merged_order=merged_order,
+        )
+        try:
+            # 流式写入方式可从检查点继续，已完成的文件不再分发
+            next_idx = sink.resume_point(file_list)
+            workers = max(
+                1, min(workers or default_worker_count(), total_files - next_idx)
+            )
+            tasks = list(range(next_idx, total_files))
+            if SCHEDULE_LARGEST_FIRST if largest_first is None else largest_first:
+                index = VsdxIndex(visio_dir)
+                positions = {filename: idx for idx, filename in enumerate(file_list)}
+                tasks = [positions[f] for f in index.largest_first(file_list[next_idx:])]
+                try:
+                    index.save()
+                except OSError as e:
+                    print(f"保存元数据索引失败: {e}")
+            for idx in tasks:
+                task_queue.put((idx, file_list[idx]))
+            for _ in range(workers):
+                task_queue.put(None)
+
+            page_cache = open_page_cache(visio_dir, use_page_cache)
+            processes = [
+                multiprocessing.Process(
+                    target=_export_worker,
+                    args=(task_queue, result_queue, visio_dir, visio_factory, page_cache),
+                    daemon=True,
+                )
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+
+            while next_idx < total_files:
+                try:
+                    idx, filename, image_paths, error = result_queue.get(timeout=1)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        raise Exception("所有工作进程已退出，部分文件未能导出")
+                    continue
+
+                pending[idx] = (filename, image_paths, error)
+                while next_idx in pending:
+                    # 先回调再取出，回调中取消转换时这个文件的临时图片仍会在最后被清理
+                    if update_progress:
+                        update_progress(pending[next_idx][0], next_idx + 1, total_files)
+                    filename, image_paths, error = pending.pop(next_idx)
+                    next_idx += 1
+
+                    if error is not None:
+                        failures.append(f"{filename}: {error}")
+                        continue
+
+                    sink.begin_file(filename)
+                    for i, image_path in enumerate(image_paths):
+                        with span("insert", file=filename, page=i + 1):
+                            sink.add_picture(image_path, i == len(image_paths) - 1)
+                        os.remove(image_path)
+                        page_done()
+                    with span("end_file", file=filename):
+                        sink.end_file(filename)
+        except BaseException:
+            # 不再分发剩余的文件，工作进程导出完手上的文件后即退出
+            _drain(task_queue)
+            for _ in processes:
+                task_queue.put(None)
+            sink.abort()
+            raise
+        else:
+            with span("save"):
+                sink.close()
+    finally:
+        com_uninitialize()
+        for _, image_paths, _ in pending.values():
+            _remove_images(image_paths)
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        # 中途停止时工作进程可能已导出了之后的文件
+        for _, _, image_paths, _ in _drain(result_queue):
+            _remove_images(image_paths)
+
+    if failures:
+        raise Exception("以下文件转换失败:\n" + "\n".join(failures))